@@ -25,148 +25,87 @@
 # ============================================================
 # Fabric Notebook: Export Semantic Model tables -> Lakehouse Delta tables
 # FIXED: handles empty tables by supplying schema; continues on errors
+# Export logic lives in scripts/semantic_model_export.py (Arrow conversion
+# with explicit schemas, batched Delta writes, parallel scheduling)
 # ============================================================
 
-import re
-import pandas as pd
+import sys
 import sempy.fabric as fabric
 
-from pyspark.sql.types import (
-    StructType, StructField,
-    StringType, LongType, IntegerType, DoubleType, BooleanType,
-    TimestampType, DateType, DecimalType, BinaryType
-)
-
 # ----------------------------
 # CONFIG
 # ----------------------------
 SEMANTIC_MODEL = "BMD_sales"
 MODEL_WORKSPACE = None          # set workspace name or ID if semantic model isn't in the same workspace context
 TARGET_PREFIX = "sm_"
-OVERWRITE = True
+OVERWRITE = True                # full-export tables: overwrite (True) or append (False)
+
+# "incremental": tables in INCREMENTAL_TABLES only export rows at/after their
+# stored watermark (or with a blank watermark) and MERGE on their keys; every
+# other table (dimensions) is still fully overwritten. "full": overwrite
+# everything. MERGE never deletes, so each incremental table is fully
+# re-exported every full_every_days to drop rows deleted at the source.
+EXPORT_MODE = "incremental"
+INCREMENTAL_TABLES = {
+    "Fact_Visit": {"keys": ["VisitID"], "watermark": "updated_at", "full_every_days": 7},
+    "Fact_UserOrders": {"keys": ["UserOrderID"], "watermark": "UpdatedAt", "full_every_days": 7},
+}
+WATERMARK_TABLE = "sm_export_watermarks"
 
 EXPORT_ALL = True
 TABLES_TO_EXPORT = ["public user_orders", "public project_conversion", "Fact_ProjectConversion"]
 
-# Optional: exclude typical PBIX helper tables
-EXCLUDE_PATTERNS = [
-    r"^LocalDateTable_", r"^DateTableTemplate_", r"^Label_",
-    r"^LastRefresh_", r"^TranslatedReportLabels$", r"^ActionsMeasures$",
-    r"^VisualsEmptyStateMeasures$", r"^Measure$", r"^_Metrics$"
-]
+# Rows per Arrow conversion + Delta write; bounds driver memory on large tables
+BATCH_ROWS = 250_000
 
-# ----------------------------
-# Helpers
-# ----------------------------
-def should_exclude(name: str) -> bool:
-    return any(re.search(p, name) for p in EXCLUDE_PATTERNS)
-
-def safe_table_name(name: str) -> str:
-    n = re.sub(r"[^0-9a-zA-Z_]", "_", name)
-    n = re.sub(r"_+", "_", n).strip("_")
-    if re.match(r"^[0-9]", n):
-        n = f"t_{n}"
-    return n.lower()
-
-def clean_col_name(c: str) -> str:
-    c2 = re.sub(r"[^0-9a-zA-Z_]", "_", c)
-    c2 = re.sub(r"_+", "_", c2).strip("_")
-    return c2
-
-def clean_column_names_sdf(sdf):
-    for c in sdf.columns:
-        new_c = clean_col_name(c)
-        if new_c and new_c != c:
-            sdf = sdf.withColumnRenamed(c, new_c)
-    return sdf
-
-def pbi_to_spark_type(pbi_type: str):
-    """Best-effort mapping from semantic model data types -> Spark types."""
-    if not pbi_type:
-        return StringType()
-
-    t = str(pbi_type).strip().lower()
-
-    # Common Power BI / Vertipaq / SemPy labels
-    if t in ["string", "text"]:
-        return StringType()
-    if t in ["int64", "long", "bigint"]:
-        return LongType()
-    if t in ["int32", "int", "integer"]:
-        return IntegerType()
-    if t in ["double", "float"]:
-        return DoubleType()
-    if t in ["decimal", "currency", "fixed decimal number"]:
-        # If precision/scale known, update here; else keep a safe default
-        return DecimalType(38, 18)
-    if t in ["boolean", "bool", "logical"]:
-        return BooleanType()
-    if t in ["datetime", "timestamp", "date/time"]:
-        return TimestampType()
-    if t in ["date"]:
-        return DateType()
-    if t in ["binary"]:
-        return BinaryType()
-
-    # fallback
-    return StringType()
+# Tables exported concurrently (largest first) and retries per failed table
+MAX_PARALLEL_TABLES = 4
+TABLE_RETRIES = 2
+RETRY_BACKOFF_SECONDS = 5
+
+# Post-write check: "off", "metrics" (Delta commit row counts) or "sample" (+ sampled row hashes)
+VERIFY = "off"
+
+# Lakehouse folder holding semantic_model_export.py (upload from scripts/)
+EXPORT_MODULE_PATH = "/lakehouse/default/Files/scripts"
+
+if EXPORT_MODULE_PATH not in sys.path:
+    sys.path.insert(0, EXPORT_MODULE_PATH)
+
+import semantic_model_export as sme
+
+sme.enable_arrow(spark)
+
+def read_table(table_name: str):
+    if MODEL_WORKSPACE:
+        return fabric.read_table(SEMANTIC_MODEL, table_name, workspace=MODEL_WORKSPACE)
+    return fabric.read_table(SEMANTIC_MODEL, table_name)
+
+def run_dax(query: str):
+    if MODEL_WORKSPACE:
+        return fabric.evaluate_dax(SEMANTIC_MODEL, query, workspace=MODEL_WORKSPACE)
+    return fabric.evaluate_dax(SEMANTIC_MODEL, query)
 
 # ----------------------------
-# 1) Build column metadata map (for empty-table schema)
+# 1) Build column metadata map (explicit Spark schemas, empty tables)
 # ----------------------------
 cols_df = fabric.list_columns(dataset=SEMANTIC_MODEL, workspace=MODEL_WORKSPACE) if MODEL_WORKSPACE else fabric.list_columns(dataset=SEMANTIC_MODEL)
-
-# Try to detect column names in the metadata DF robustly
-# Common outputs contain: Table Name, Column Name, Data Type
-table_col = "Table Name" if "Table Name" in cols_df.columns else ("Table" if "Table" in cols_df.columns else None)
-col_col   = "Column Name" if "Column Name" in cols_df.columns else ("Column" if "Column" in cols_df.columns else None)
-type_col  = "Data Type" if "Data Type" in cols_df.columns else ("Type" if "Type" in cols_df.columns else None)
-
-if not (table_col and col_col):
-    raise ValueError(f"Could not find required columns in fabric.list_columns() output. Columns seen: {list(cols_df.columns)}")
-
-def build_schema_for_table(table_name: str) -> StructType:
-    tmeta = cols_df[cols_df[table_col] == table_name]
-    if tmeta.shape[0] == 0:
-        # As a fallback, if metadata isn't available, write a single dummy column.
-        return StructType([StructField("empty_table", StringType(), True)])
-
-    fields = []
-    for _, r in tmeta.iterrows():
-        raw_c = str(r[col_col])
-        spark_c = clean_col_name(raw_c) or "col"
-        spark_t = pbi_to_spark_type(r[type_col] if type_col else None)
-        fields.append(StructField(spark_c, spark_t, True))
-
-    # Remove duplicates if cleaning caused collisions
-    seen = set()
-    deduped = []
-    for f in fields:
-        name = f.name
-        if name in seen:
-            i = 2
-            new_name = f"{name}_{i}"
-            while new_name in seen:
-                i += 1
-                new_name = f"{name}_{i}"
-            deduped.append(StructField(new_name, f.dataType, True))
-            seen.add(new_name)
-        else:
-            deduped.append(f)
-            seen.add(name)
-
-    return StructType(deduped)
+catalog = sme.ColumnCatalog(cols_df)
 
 # ----------------------------
 # 2) Get tables from semantic model
 # ----------------------------
-tables_df = fabric.list_tables(SEMANTIC_MODEL, workspace=MODEL_WORKSPACE) if MODEL_WORKSPACE else fabric.list_tables(SEMANTIC_MODEL)
+# extended=True adds row counts, used to schedule the largest tables first
+tables_df = fabric.list_tables(SEMANTIC_MODEL, workspace=MODEL_WORKSPACE, extended=True) if MODEL_WORKSPACE else fabric.list_tables(SEMANTIC_MODEL, extended=True)
 
 tbl_name_col = "Name" if "Name" in tables_df.columns else tables_df.columns[0]
 tables_all = [t for t in tables_df[tbl_name_col].tolist() if isinstance(t, str)]
+table_sizes = {}
+if "Row Count" in tables_df.columns:
+    table_sizes = dict(zip(tables_df[tbl_name_col], tables_df["Row Count"].fillna(0)))
 tables_all = sorted(set(tables_all))  # dedupe
 
-tables = [t for t in tables_all if not should_exclude(t)]
+tables = [t for t in tables_all if not sme.should_exclude(t)]
 
 if not EXPORT_ALL:
     missing = sorted(set(TABLES_TO_EXPORT) - set(tables))
@@ -177,58 +116,27 @@ if not EXPORT_ALL:
 print(f"Exporting {len(tables)} tables from semantic model '{SEMANTIC_MODEL}'")
 
 # ----------------------------
-# 3) Export loop
+# 3) Parallel export (largest tables first)
 # ----------------------------
-mode = "overwrite" if OVERWRITE else "append"
-ok, skipped = [], []
-
-for t in tables:
-    try:
-        print(f"\nReading semantic model table: {t}")
-
-        pdf = fabric.read_table(SEMANTIC_MODEL, t, workspace=MODEL_WORKSPACE) if MODEL_WORKSPACE else fabric.read_table(SEMANTIC_MODEL, t)
-
-        # Handle empty result sets explicitly (Spark can't infer schema from empty) :contentReference[oaicite:3]{index=3}
-        if pdf is None or (isinstance(pdf, pd.DataFrame) and pdf.shape[0] == 0):
-            print(f"⚠️ Table '{t}' returned 0 rows. Creating empty Spark DF with schema from metadata.")
-            schema = build_schema_for_table(t)
-            sdf = spark.createDataFrame([], schema=schema)
-        else:
-            sdf = spark.createDataFrame(pdf)
-
-        sdf = clean_column_names_sdf(sdf)
-
-        target = safe_table_name(f"{TARGET_PREFIX}{SEMANTIC_MODEL}_{t}")
-        print(f"Writing Lakehouse Delta table: {target} (mode={mode})")
-
-        writer = (
-            sdf.write.format("delta")
-            .mode(mode)
-        )
-
-        # If overwriting, keep schema aligned
-        if OVERWRITE:
-            writer = writer.option("overwriteSchema", "true")
-
-        writer.saveAsTable(target)
-
-        cnt = spark.table(target).count()
-        print(f"✅ {target}: {cnt:,} rows")
-        ok.append((t, target, cnt))
-
-    except Exception as e:
-        print(f"❌ Skipping '{t}' due to error: {repr(e)}")
-        skipped.append((t, repr(e)))
-
-print("\n================ SUMMARY ================")
-print(f"✅ Exported: {len(ok)}")
-print(f"❌ Skipped:  {len(skipped)}")
-if skipped:
-    print("\nSkipped tables:")
-    for t, err in skipped[:25]:
-        print(f" - {t}: {err}")
-    if len(skipped) > 25:
-        print(f" ... and {len(skipped) - 25} more")
+incremental = {}
+if EXPORT_MODE == "incremental":
+    incremental = {t: sme.IncrementalSpec(**spec) for t, spec in INCREMENTAL_TABLES.items() if t in tables}
+
+summary = sme.export_tables(
+    spark, read_table, catalog, SEMANTIC_MODEL, tables,
+    sizes=table_sizes,
+    max_workers=MAX_PARALLEL_TABLES,
+    retries=TABLE_RETRIES,
+    backoff=RETRY_BACKOFF_SECONDS,
+    target_prefix=TARGET_PREFIX, overwrite=OVERWRITE, batch_rows=BATCH_ROWS,
+    verify=VERIFY,
+    incremental=incremental,
+    run_dax=run_dax,
+    store=sme.WatermarkStore(spark, WATERMARK_TABLE) if incremental else None
+)
+ok, skipped = summary.ok, summary.skipped
+
+sme.print_summary(summary)
 
 
 # METADATA ********************
@@ -0,0 +1,450 @@
+#!/usr/bin/env python3
+"""
+DAX Query Load Test
+Concurrent report users vs. the BMD dataset (or the local mock API)
+
+Replays a weighted mix of DAX queries through
+powerbi_report_builder.execute_dax_query at a target concurrency and rate,
+to see how latency holds up under many simultaneous report users:
+
+1. Workload: the EXECUTIVE_DASHBOARD_QUERIES presets plus one
+   SUMMARIZECOLUMNS query per visible data visual in the repo's reports
+   bound to BMD_sales.SemanticModel (report_document.py index; other
+   models' queries would only fail against the BMD dataset and skew the
+   numbers), or a `--workload` JSON file written by
+   `--dump-workload` and edited by hand
+2. asyncio drives the load: with `--rate`, a token bucket releases
+   requests at that many per second (open loop, `--burst` deep) and
+   `--concurrency` caps requests in flight, so time spent waiting for a
+   free slot shows up as queue delay; without `--rate`, `--concurrency`
+   virtual users send back-to-back (closed loop)
+3. Latency histograms and p50/p95/p99 per query and overall; raw samples
+   go to `--csv`, the summary to `--json`
+
+`--mock` starts mock_powerbi_server.py in-process, with its service time
+drawn from `--mock-dist` (uniform, normal, lognormal, exponential) around
+`--mock-latency-ms`, plus injected 429/503 rates, so the whole thing runs
+offline. Against the real service, mind the capacity: start small.
+
+Usage:
+    python scripts/dax_load_test.py --mock --concurrency 20 --rate 40 --duration 30
+    python scripts/dax_load_test.py --mock --mock-dist lognormal --mock-sigma 0.9 --csv samples.csv
+    python scripts/dax_load_test.py --presets-only --concurrency 4 --requests 100 --json load.json
+    python scripts/dax_load_test.py --dump-workload workload.json
+"""
+
+import argparse
+import asyncio
+import contextlib
+import csv
+import io
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+import powerbi_report_builder as pbr
+from mock_powerbi_server import LATENCY_DISTRIBUTIONS, MockSettings, start_mock_server
+from report_binding_validator import report_model_path
+from report_document import CACHE_DIR, FieldBinding, VisualEntry, find_reports, load_index
+from tmdl_model import DEFINITION_PATH, quote_name
+
+
+DEFAULT_CONCURRENCY = 8
+DEFAULT_DURATION = 30.0
+
+# Histogram bucket upper bounds (ms); the last bucket is open-ended
+HISTOGRAM_BOUNDS_MS = [5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000]
+
+
+# =============================================================================
+# Workload
+# =============================================================================
+
+@dataclass
+class WorkloadQuery:
+    name: str
+    query: str
+    weight: float = 1.0
+    source: str = "preset"         # preset / visual / file
+
+
+def _dax_column(ref: FieldBinding) -> str:
+    return f"{quote_name(ref.table)}[{ref.name.replace(']', ']]')}]"
+
+
+def visual_query(visual: VisualEntry) -> Optional[str]:
+    """SUMMARIZECOLUMNS roughly equivalent to what a visual sends on render"""
+    groups, values = [], []
+    for ref in visual.query_fields:
+        if ref.kind == "column":
+            groups.append(_dax_column(ref))
+        elif ref.kind == "measure":
+            values.append(f'"{ref.name}", {_dax_column(ref)}')
+        elif ref.kind == "aggregation":
+            values.append(f'"Sum of {ref.name}", SUM({_dax_column(ref)})')
+    args = list(dict.fromkeys(groups)) + list(dict.fromkeys(values))
+    if not args:
+        return None
+    return "EVALUATE\nSUMMARIZECOLUMNS(\n    " + ",\n    ".join(args) + "\n)"
+
+
+def report_workload(paths: List[str], cache_dir: Optional[str] = CACHE_DIR) -> List[WorkloadQuery]:
+    """One query per visible visual with resolvable fields; identical queries are merged by weight"""
+    by_query: Dict[str, WorkloadQuery] = {}
+    for path in paths:
+        index = load_index(path, cache_dir)
+        folder = os.path.dirname(index.path) if index.layout == "legacy" else index.path
+        report = os.path.splitext(os.path.basename(folder))[0]
+        for page in index.pages:
+            if page.kind == "tooltip":
+                continue
+            for visual in page.visuals:
+                query = None if visual.hidden else visual_query(visual)
+                if query is None:
+                    continue
+                if query in by_query:
+                    by_query[query].weight += 1
+                else:
+                    name = f"{report}/{page.display_name}/{visual.name}"
+                    by_query[query] = WorkloadQuery(name, query, 1.0, "visual")
+    return list(by_query.values())
+
+
+def dataset_reports(definition: str = DEFINITION_PATH, cache_dir: Optional[str] = CACHE_DIR) -> List[str]:
+    """Reports bound to `definition`; unbound ones count as bound to it, as in report_binding_validator"""
+    target = os.path.abspath(definition)
+    return [path for path in find_reports()
+            if os.path.abspath(report_model_path(load_index(path, cache_dir)) or definition) == target]
+
+
+def build_workload(reports: Optional[List[str]], preset_weight: float, visual_weight: float,
+                   presets_only: bool = False) -> List[WorkloadQuery]:
+    workload = [WorkloadQuery(name, query, preset_weight, "preset")
+                for name, query in pbr.EXECUTIVE_DASHBOARD_QUERIES.items()]
+    if not presets_only:
+        for q in report_workload(reports or dataset_reports()):
+            q.weight *= visual_weight
+            workload.append(q)
+    return [q for q in workload if q.weight > 0]
+
+
+def load_workload(path: str) -> List[WorkloadQuery]:
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return [WorkloadQuery(d["name"], d["query"], float(d.get("weight", 1.0)), d.get("source", "file"))
+            for d in data]
+
+
+# =============================================================================
+# Rate limiting and load generation
+# =============================================================================
+
+class TokenBucket:
+    """Async token bucket: `rate` tokens per second, at most `capacity` banked"""
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+@dataclass
+class Sample:
+    name: str
+    offset_s: float                # when the request was due, from the start of the run
+    queue_ms: float                # due -> a concurrency slot was free
+    latency_ms: float              # execute_dax_query wall time (includes client retries)
+    error: Optional[str] = None
+
+
+def result_error(result: Dict[str, Any]) -> Optional[str]:
+    """Error text from an execute_dax_query result, or None when it succeeded"""
+    if "error" in result:
+        return str(result["error"])[:200]
+    for r in result.get("results", []):
+        if "error" in r:
+            return json.dumps(r["error"])[:200]
+    return None if "results" in result else "empty response"
+
+
+async def run_load(workload: List[WorkloadQuery], execute: Callable[[str], Dict[str, Any]],
+                   concurrency: int, rate: float = 0.0, burst: float = 1.0,
+                   duration: float = DEFAULT_DURATION, requests: Optional[int] = None,
+                   seed: Optional[int] = None) -> List[Sample]:
+    """Send weighted-random queries until `duration` seconds pass or `requests` are sent"""
+    loop = asyncio.get_running_loop()
+    pool = ThreadPoolExecutor(max_workers=concurrency)
+    slots = asyncio.Semaphore(concurrency)
+    rng = random.Random(seed)
+    weights = [q.weight for q in workload]
+    samples: List[Sample] = []
+    start = time.perf_counter()
+    deadline = start + duration
+    sent = 0
+
+    def next_query() -> Optional[WorkloadQuery]:
+        nonlocal sent
+        if (requests is not None and sent >= requests) or time.perf_counter() >= deadline:
+            return None
+        sent += 1
+        return rng.choices(workload, weights)[0]
+
+    async def send(q: WorkloadQuery, due: float) -> None:
+        async with slots:
+            began = time.perf_counter()
+            try:
+                error = result_error(await loop.run_in_executor(pool, execute, q.query))
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+            ended = time.perf_counter()
+        samples.append(Sample(q.name, due - start, (began - due) * 1000, (ended - began) * 1000, error))
+
+    try:
+        if rate > 0:
+            bucket = TokenBucket(rate, burst)
+            in_flight = set()
+            while True:
+                await bucket.acquire()
+                q = next_query()
+                if q is None:
+                    break
+                task = asyncio.ensure_future(send(q, time.perf_counter()))
+                in_flight.add(task)
+                task.add_done_callback(in_flight.discard)
+            if in_flight:
+                await asyncio.gather(*in_flight)
+        else:
+            async def user() -> None:
+                while True:
+                    q = next_query()
+                    if q is None:
+                        return
+                    await send(q, time.perf_counter())
+            await asyncio.gather(*(user() for _ in range(concurrency)))
+    finally:
+        pool.shutdown(wait=True)
+    return samples
+
+
+# =============================================================================
+# Statistics
+# =============================================================================
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * p // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def histogram(values: List[float]) -> List[int]:
+    counts = [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)
+    for v in values:
+        i = next((i for i, bound in enumerate(HISTOGRAM_BOUNDS_MS) if v <= bound), len(HISTOGRAM_BOUNDS_MS))
+        counts[i] += 1
+    return counts
+
+
+@dataclass
+class LatencyStats:
+    name: str
+    requests: int = 0
+    errors: int = 0
+    mean_ms: float = 0.0
+    p50_ms: float = 0.0
+    p95_ms: float = 0.0
+    p99_ms: float = 0.0
+    max_ms: float = 0.0
+    queue_p95_ms: float = 0.0
+    histogram: List[int] = field(default_factory=list)
+
+    @classmethod
+    def of(cls, name: str, samples: List[Sample]) -> "LatencyStats":
+        ok = sorted(s.latency_ms for s in samples if s.error is None)
+        queue = sorted(s.queue_ms for s in samples)
+        return cls(
+            name=name, requests=len(samples), errors=sum(1 for s in samples if s.error),
+            mean_ms=sum(ok) / len(ok) if ok else 0.0,
+            p50_ms=percentile(ok, 50), p95_ms=percentile(ok, 95), p99_ms=percentile(ok, 99),
+            max_ms=ok[-1] if ok else 0.0, queue_p95_ms=percentile(queue, 95), histogram=histogram(ok),
+        )
+
+
+@dataclass
+class LoadReport:
+    target: str
+    concurrency: int
+    rate: float
+    elapsed_s: float
+    overall: LatencyStats
+    queries: List[LatencyStats]
+    errors: Dict[str, int]
+
+    @property
+    def throughput(self) -> float:
+        return self.overall.requests / self.elapsed_s if self.elapsed_s else 0.0
+
+
+def summarize(samples: List[Sample], target: str, concurrency: int, rate: float, elapsed_s: float) -> LoadReport:
+    by_name: Dict[str, List[Sample]] = {}
+    errors: Dict[str, int] = {}
+    for s in samples:
+        by_name.setdefault(s.name, []).append(s)
+        if s.error:
+            errors[s.error] = errors.get(s.error, 0) + 1
+    queries = sorted((LatencyStats.of(n, ss) for n, ss in by_name.items()), key=lambda q: -q.p95_ms)
+    return LoadReport(target, concurrency, rate, elapsed_s, LatencyStats.of("(all)", samples), queries, errors)
+
+
+# =============================================================================
+# CLI
+# =============================================================================
+
+def _bucket_label(i: int) -> str:
+    if i == len(HISTOGRAM_BOUNDS_MS):
+        return f"> {HISTOGRAM_BOUNDS_MS[-1]:,} ms"
+    return f"<= {HISTOGRAM_BOUNDS_MS[i]:,} ms"
+
+
+def print_report(report: LoadReport, top: int) -> None:
+    o = report.overall
+    mode = f"{report.rate:g}/s open loop" if report.rate else "closed loop"
+    print(f"\n{report.target}: {o.requests} requests in {report.elapsed_s:.1f} s "
+          f"({report.throughput:.1f}/s, concurrency {report.concurrency}, {mode})")
+    print(f"  p50 {o.p50_ms:.0f} ms | p95 {o.p95_ms:.0f} ms | p99 {o.p99_ms:.0f} ms | "
+          f"max {o.max_ms:.0f} ms | queue p95 {o.queue_p95_ms:.0f} ms | errors {o.errors}")
+
+    peak = max(o.histogram) if o.histogram else 0
+    print("\n  Latency histogram (successful requests)")
+    for i, count in enumerate(o.histogram):
+        if count:
+            print(f"  {_bucket_label(i):>12s} {count:>7d} {'█' * max(1, round(40 * count / peak))}")
+
+    print(f"\n  {'Query':50s} {'Reqs':>6s} {'Err':>5s} {'p50':>7s} {'p95':>7s} {'p99':>7s}")
+    for q in report.queries[:top]:
+        status = "❌" if q.errors == q.requests else ("⚠️" if q.errors else "✅")
+        print(f"{status} {q.name[-50:]:50s} {q.requests:>6d} {q.errors:>5d} "
+              f"{q.p50_ms:>7.0f} {q.p95_ms:>7.0f} {q.p99_ms:>7.0f}")
+    if len(report.queries) > top:
+        print(f"  ... {len(report.queries) - top} more (see --json)")
+    for error, count in sorted(report.errors.items(), key=lambda e: -e[1])[:5]:
+        print(f"  ❌ {count} x {error}")
+
+
+def write_csv(samples: List[Sample], path: str) -> None:
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["name", "offset_s", "queue_ms", "latency_ms", "ok", "error"])
+        for s in sorted(samples, key=lambda s: s.offset_s):
+            writer.writerow([s.name, f"{s.offset_s:.4f}", f"{s.queue_ms:.2f}", f"{s.latency_ms:.2f}",
+                             int(s.error is None), s.error or ""])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test DAX queries at a target concurrency and rate")
+    parser.add_argument("reports", nargs="*", help="Reports to take visual queries from (default: all bound to the BMD model)")
+    parser.add_argument("--workload", help="Workload JSON ([{name, query, weight}]) instead of presets + visuals")
+    parser.add_argument("--presets-only", action="store_true", help="Only the EXECUTIVE_DASHBOARD_QUERIES presets")
+    parser.add_argument("--preset-weight", type=float, default=1.0, help="Weight of each preset query")
+    parser.add_argument("--visual-weight", type=float, default=1.0, help="Weight of each visual query")
+    parser.add_argument("--dump-workload", metavar="PATH", help="Write the workload JSON and exit")
+    parser.add_argument("-c", "--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Requests in flight")
+    parser.add_argument("--rate", type=float, default=0.0, help="Requests per second (0: closed loop)")
+    parser.add_argument("--burst", type=float, default=1.0, help="Token bucket depth for --rate")
+    parser.add_argument("--duration", type=float, default=DEFAULT_DURATION, help="Seconds to run")
+    parser.add_argument("-n", "--requests", type=int, help="Stop after this many requests")
+    parser.add_argument("--retries", type=int, help="Client retries per request (default: client setting)")
+    parser.add_argument("--seed", type=int, help="Seed for the query mix")
+    parser.add_argument("--mock", action="store_true", help="Run against an in-process mock API")
+    parser.add_argument("--mock-latency-ms", type=float, default=120.0, help="Mock service time centre")
+    parser.add_argument("--mock-jitter-ms", type=float, default=30.0, help="Mock uniform jitter / normal sd")
+    parser.add_argument("--mock-dist", choices=LATENCY_DISTRIBUTIONS, default="lognormal",
+                        help="Mock service time distribution")
+    parser.add_argument("--mock-sigma", type=float, default=0.5, help="Mock lognormal shape")
+    parser.add_argument("--mock-throttle-rate", type=float, default=0.0, help="Mock fraction of 429s")
+    parser.add_argument("--mock-error-rate", type=float, default=0.0, help="Mock fraction of 503s")
+    parser.add_argument("--top", type=int, default=15, help="Queries listed in the table")
+    parser.add_argument("--json", metavar="PATH", help="Write the summary JSON")
+    parser.add_argument("--csv", metavar="PATH", help="Write raw samples CSV")
+    args = parser.parse_args()
+
+    try:
+        workload = load_workload(args.workload) if args.workload else \
+            build_workload(args.reports, args.preset_weight, args.visual_weight, args.presets_only)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"❌ {e}")
+        return 1
+    if not workload:
+        print("❌ Empty workload")
+        return 1
+    print(f"Workload: {len(workload)} queries "
+          f"({sum(1 for q in workload if q.source == 'preset')} presets, "
+          f"{sum(1 for q in workload if q.source == 'visual')} from report visuals)")
+    if args.dump_workload:
+        with open(args.dump_workload, "w", encoding="utf-8") as f:
+            json.dump([asdict(q) for q in workload], f, indent=2)
+        print(f"✅ Wrote {args.dump_workload}")
+        return 0
+
+    server = None
+    config = pbr.PowerBIConfig()
+    if args.mock:
+        server, api_base = start_mock_server(settings=MockSettings(
+            latency_ms=args.mock_latency_ms, jitter_ms=args.mock_jitter_ms, latency_dist=args.mock_dist,
+            latency_sigma=args.mock_sigma, throttle_rate=args.mock_throttle_rate,
+            error_rate=args.mock_error_rate))
+        config = pbr.PowerBIConfig(api_base=api_base)
+        os.environ.setdefault("POWERBI_ACCESS_TOKEN", "mock")
+    client = pbr.get_default_client()
+    # One pooled connection per request in flight
+    client.session = pbr.create_session(args.concurrency)
+    client.max_concurrency = args.concurrency
+    if args.retries is not None:
+        client.max_retries = args.retries
+
+    print(f"Target: {config.api_base} (dataset {config.dataset_id})")
+    start = time.perf_counter()
+    # execute_dax_query prints every failed response; failures are tallied in the report instead
+    with contextlib.redirect_stdout(io.StringIO()):
+        samples = asyncio.run(run_load(
+            workload, lambda q: pbr.execute_dax_query(q, config), args.concurrency,
+            args.rate, args.burst, args.duration, args.requests, args.seed))
+    elapsed = time.perf_counter() - start
+    if server is not None:
+        server.shutdown()
+
+    report = summarize(samples, "mock" if args.mock else config.api_base, args.concurrency, args.rate, elapsed)
+    print_report(report, args.top)
+    if args.csv:
+        write_csv(samples, args.csv)
+        print(f"\n✅ Wrote {len(samples)} samples to {args.csv}")
+    if args.json:
+        out = asdict(report)
+        out.update(throughput=report.throughput, histogram_bounds_ms=HISTOGRAM_BOUNDS_MS)
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(out, f, indent=2)
+        print(f"✅ Wrote {args.json}")
+    return 1 if report.overall.errors == report.overall.requests else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
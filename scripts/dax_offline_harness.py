@@ -0,0 +1,1036 @@
+#!/usr/bin/env python3
+"""
+Offline DAX Evaluation Harness
+EXECUTIVE_DASHBOARD_QUERIES -> SQL over a local replica of the Fact/Dim tables
+
+The preset queries in powerbi_report_builder.py only run against the live
+dataset. This translates the subset of DAX they use into SQL and runs it
+over a local copy of the model tables, so measure rewrites can be timed
+without touching the capacity:
+
+1. Supported DAX: DEFINE MEASURE, EVALUATE SUMMARIZECOLUMNS / ROW,
+   ORDER BY, COUNTROWS, SUM/AVERAGE/MIN/MAX/COUNT/DISTINCTCOUNT, FILTER,
+   DIVIDE, IF, and CALCULATE/CALCULATETABLE with column predicates,
+   FILTER or KEEPFILTERS arguments. Anything else is reported as
+   unsupported rather than guessed at
+2. Every aggregate becomes one column of a per-fact-table CTE
+   (`COUNT(*) FILTER (WHERE ...)`) grouped by the SUMMARIZECOLUMNS columns;
+   dimensions are joined along the model's active many-to-one
+   relationships (tmdl_model.py) plus any `--relationship` extras
+3. Queries run in parallel, one connection each, and report rows and
+   timings (min/median over `--repeat` runs)
+
+The replica is a Lakehouse-style folder of Delta/Parquet tables (named like
+the semantic_model_export.py output, e.g. `sm_bmd_sales_fact_visit`, or
+after the model table itself), a DuckDB database file or a SQLite file.
+Folders are queried through DuckDB when it's installed; otherwise the
+columns the queries use are loaded into a temporary SQLite file first.
+
+BLANK follows SQL NULL rules, so `BLANK() + 1` is BLANK here rather than 1;
+counts over no rows are BLANK as in DAX.
+
+Usage:
+    python scripts/dax_offline_harness.py --data /lakehouse/default/Tables
+    python scripts/dax_offline_harness.py zone_performance --data replica.duckdb --repeat 5
+    python scripts/dax_offline_harness.py --queries rewrites.json --data /tmp/tables --json
+    python scripts/dax_offline_harness.py --sql                  # print the translated SQL only
+"""
+
+import argparse
+import json
+import os
+import re
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import pyarrow as pa
+
+from model_size_estimator import (
+    DEFAULT_DATA_PATH, DEFAULT_DATASET, DEFAULT_PREFIX, clean_name, find_table_path, is_delta,
+    open_dataset, target_table_name
+)
+from powerbi_report_builder import EXECUTIVE_DASHBOARD_QUERIES
+from tmdl_model import DEFINITION_PATH, load_model, unquote_name
+
+
+DEFAULT_WORKERS = 4
+DEFAULT_SHOW_ROWS = 10
+
+
+class UnsupportedDax(ValueError):
+    """DAX outside the subset this harness translates"""
+
+
+class ReplicaError(Exception):
+    """Table not in the model, replica missing a table/column, or not readable"""
+
+
+# =============================================================================
+# DAX parsing
+# =============================================================================
+
+TOKEN_RE = re.compile(r"""
+    (?P<ws>\s+|//[^\n]*|--[^\n]*|/\*.*?\*/)
+  | (?P<string>"(?:[^"]|"")*")
+  | (?P<number>\d+(?:\.\d+)?)
+  | (?P<table>'(?:[^']|'')*')
+  | (?P<column>\[(?:[^\]]|\]\])*\])
+  | (?P<op><>|<=|>=|==|&&|\|\||[-+*/=<>&(),{}])
+  | (?P<name>[A-Za-z_][A-Za-z0-9_]*)
+""", re.X | re.S)
+
+
+@dataclass
+class Token:
+    kind: str
+    text: str
+
+
+@dataclass(frozen=True)
+class Literal:
+    sql: str
+
+
+@dataclass(frozen=True)
+class ColumnRef:
+    table: Optional[str]           # None for a bare [Name]: a measure, or a column in row context
+    column: str
+
+
+@dataclass(frozen=True)
+class TableRef:
+    name: str
+
+
+@dataclass(frozen=True)
+class Call:
+    name: str
+    args: Tuple
+
+
+@dataclass(frozen=True)
+class Binary:
+    op: str
+    left: Any
+    right: Any
+
+
+@dataclass(frozen=True)
+class Unary:
+    op: str
+    operand: Any
+
+
+@dataclass
+class DaxQuery:
+    measures: Dict[str, Any]
+    evaluate: Any
+    order_by: List[Tuple[Any, bool]]  # (expression, descending)
+
+
+def tokenize(text: str) -> List[Token]:
+    tokens, pos = [], 0
+    while pos < len(text):
+        m = TOKEN_RE.match(text, pos)
+        if not m:
+            raise UnsupportedDax(f"unexpected character {text[pos]!r} at offset {pos}")
+        pos = m.end()
+        if m.lastgroup != "ws":
+            tokens.append(Token(m.lastgroup, m.group()))
+    return tokens
+
+
+def _bracket(text: str) -> str:
+    return text[1:-1].replace("]]", "]")
+
+
+def _fmt(ref: ColumnRef) -> str:
+    return f"{ref.table or ''}[{ref.column}]"
+
+
+class Parser:
+    # Lowest to highest precedence
+    BINARY = [("||",), ("&&",), ("=", "==", "<>", "<", ">", "<=", ">=", "IN"), ("&",), ("+", "-"), ("*", "/")]
+
+    def __init__(self, text: str):
+        self.tokens = tokenize(text)
+        self.i = 0
+
+    def peek(self) -> Optional[Token]:
+        return self.tokens[self.i] if self.i < len(self.tokens) else None
+
+    def next(self) -> Token:
+        tok = self.peek()
+        if tok is None:
+            raise UnsupportedDax("unexpected end of query")
+        self.i += 1
+        return tok
+
+    def near(self) -> str:
+        tok = self.peek()
+        return repr(tok.text) if tok else "end of query"
+
+    def accept(self, text: str) -> bool:
+        tok = self.peek()
+        if tok and tok.kind in ("op", "name") and tok.text.upper() == text:
+            self.i += 1
+            return True
+        return False
+
+    def expect(self, text: str) -> None:
+        if not self.accept(text):
+            raise UnsupportedDax(f"expected {text} near {self.near()}")
+
+    def expression(self, level: int = 0) -> Any:
+        if level == len(self.BINARY):
+            return self.unary()
+        left = self.expression(level + 1)
+        while True:
+            tok = self.peek()
+            if tok is None or tok.kind not in ("op", "name") or tok.text.upper() not in self.BINARY[level]:
+                return left
+            self.i += 1
+            left = Binary(tok.text.upper(), left, self.expression(level + 1))
+
+    def unary(self) -> Any:
+        tok = self.peek()
+        if tok and tok.kind == "op" and tok.text in ("-", "+"):
+            self.i += 1
+            return Unary(tok.text, self.unary())
+        if tok and tok.kind == "name" and tok.text.upper() == "NOT":
+            self.i += 1
+            return Unary("NOT", self.unary())
+        return self.primary()
+
+    def primary(self) -> Any:
+        tok = self.next()
+        if tok.kind == "number":
+            return Literal(tok.text)
+        if tok.kind == "string":
+            return Literal("'" + tok.text[1:-1].replace('""', '"').replace("'", "''") + "'")
+        if tok.kind == "column":
+            return ColumnRef(None, _bracket(tok.text))
+        if tok.text == "(":
+            inner = self.expression()
+            self.expect(")")
+            return inner
+        if tok.text == "{":
+            # Table constructor of scalars, as in `[Col] IN {"a", "b"}`
+            items = [] if self.accept("}") else [self.expression()]
+            while items and self.accept(","):
+                items.append(self.expression())
+            if items:
+                self.expect("}")
+            return Call("{}", tuple(items))
+        if tok.kind in ("name", "table"):
+            name = unquote_name(tok.text)
+            nxt = self.peek()
+            if tok.kind == "name" and nxt and nxt.text == "(":
+                self.i += 1
+                args = []
+                if not self.accept(")"):
+                    args.append(self.expression())
+                    while self.accept(","):
+                        args.append(self.expression())
+                    self.expect(")")
+                return Call(name.upper(), tuple(args))
+            if nxt and nxt.kind == "column":
+                self.i += 1
+                return ColumnRef(name, _bracket(nxt.text))
+            return TableRef(name)
+        raise UnsupportedDax(f"unexpected {tok.text!r}")
+
+
+def parse_query(text: str) -> DaxQuery:
+    p = Parser(text)
+    measures: Dict[str, Any] = {}
+    if p.accept("DEFINE"):
+        while p.accept("MEASURE"):
+            table, column = p.next(), p.next()
+            if table.kind not in ("name", "table") or column.kind != "column":
+                raise UnsupportedDax("expected MEASURE Table[Name] = <expression>")
+            p.expect("=")
+            measures[_bracket(column.text)] = p.expression()
+        if p.peek() and p.peek().text.upper() != "EVALUATE":
+            raise UnsupportedDax(f"DEFINE {p.peek().text.upper()} is not supported")
+    p.expect("EVALUATE")
+    evaluate = p.expression()
+    order_by = []
+    if p.accept("ORDER"):
+        p.expect("BY")
+        while True:
+            e = p.expression()
+            descending = p.accept("DESC")
+            if not descending:
+                p.accept("ASC")
+            order_by.append((e, descending))
+            if not p.accept(","):
+                break
+    if p.peek() is not None:
+        raise UnsupportedDax(f"unexpected {p.near()} (one EVALUATE per query)")
+    return DaxQuery(measures, evaluate, order_by)
+
+
+# =============================================================================
+# Relationships
+# =============================================================================
+
+@dataclass(frozen=True)
+class Relationship:
+    from_table: str                # many side
+    from_column: str
+    to_table: str                  # one side
+    to_column: str
+    active: bool = True
+
+
+_MODEL_COLUMN_RE = re.compile(r"^('(?:[^']|'')*'|[^.]+)\.(.+)$")
+_RELATIONSHIP_ARG_RE = re.compile(r"^\s*(.+?)\[(.+?)\]\s*=\s*(.+?)\[(.+?)\]\s*$")
+
+
+def _split_model_column(ref: str) -> Tuple[str, str]:
+    m = _MODEL_COLUMN_RE.match(ref.strip())
+    if not m:
+        raise ValueError(f"can't parse relationship column {ref!r}")
+    return unquote_name(m.group(1)), unquote_name(m.group(2))
+
+
+def model_relationships(definition: str, include_inactive: bool = False) -> List[Relationship]:
+    """Active (optionally also inactive) relationships of a TMDL model, many side first"""
+    rels = []
+    for r in load_model(definition).relationships:
+        active = (r.prop("isActive") or "true").lower() != "false"
+        if (not active and not include_inactive) or not r.prop("fromColumn") or not r.prop("toColumn"):
+            continue
+        rels.append(Relationship(*_split_model_column(r.prop("fromColumn")),
+                                 *_split_model_column(r.prop("toColumn")), active))
+    return rels
+
+
+def parse_relationship(text: str) -> Relationship:
+    """`Fact_Order[ClientKey]=Dim_Client[ClientKey]` (many side first)"""
+    m = _RELATIONSHIP_ARG_RE.match(text)
+    if not m:
+        raise ValueError(f"expected Many[Column]=One[Column], got {text!r}")
+    return Relationship(unquote_name(m.group(1)), m.group(2), unquote_name(m.group(3)), m.group(4))
+
+
+# =============================================================================
+# Replicas
+# =============================================================================
+
+def _import_duckdb():
+    try:
+        import duckdb
+    except ImportError:
+        raise ImportError("DuckDB replicas need the duckdb package: pip install duckdb")
+    return duckdb
+
+
+def quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+@dataclass
+class ReplicaTable:
+    name: str                      # model table
+    sql_name: str                  # replica table
+    columns: Dict[str, str]        # cleaned lower-case name -> replica column
+    path: Optional[str] = None
+
+
+class Replica:
+    """Model names used as-is, no data behind them (translation only)"""
+    engine = "none"
+    location = "(model names)"
+
+    def __init__(self):
+        self._tables: Dict[str, ReplicaTable] = {}
+
+    def table(self, name: str) -> ReplicaTable:
+        if name not in self._tables:
+            self._tables[name] = self._resolve(name)
+        return self._tables[name]
+
+    def column(self, table: str, column: str) -> str:
+        t = self.table(table)
+        if not t.columns:
+            return column
+        actual = t.columns.get(clean_name(column).lower())
+        if actual is None:
+            raise ReplicaError(f"column {table}[{column}] not found in replica table {t.sql_name}")
+        return actual
+
+    def _resolve(self, name: str) -> ReplicaTable:
+        return ReplicaTable(name, name, {})
+
+    def _candidates(self, name: str, dataset: str, prefix: str) -> List[str]:
+        return [target_table_name(dataset, name, prefix), name, clean_name(name).lower()]
+
+    def prepare(self, used: Dict[str, Set[str]]) -> None:
+        pass
+
+    def connect(self):
+        raise ReplicaError("no replica data to run against (use --data)")
+
+    def close(self) -> None:
+        pass
+
+
+class FolderReplica(Replica):
+    """Lakehouse-style folder of Delta/Parquet tables"""
+
+    def __init__(self, path: str, dataset: str, prefix: str, engine: str):
+        super().__init__()
+        self.location = path
+        self.dataset, self.prefix, self.engine = dataset, prefix, engine
+        self._con = None
+        self._db_path: Optional[str] = None
+
+    def _resolve(self, name: str) -> ReplicaTable:
+        for candidate in self._candidates(name, self.dataset, self.prefix):
+            path = find_table_path(self.location, candidate)
+            if path:
+                names = open_dataset(path).schema.names
+                return ReplicaTable(name, candidate, {clean_name(n).lower(): n for n in names}, path)
+        raise ReplicaError(f"table {name} not found in {self.location} "
+                           f"(tried {', '.join(self._candidates(name, self.dataset, self.prefix))})")
+
+    def _by_sql_name(self) -> Dict[str, ReplicaTable]:
+        return {t.sql_name: t for t in self._tables.values()}
+
+    def prepare(self, used: Dict[str, Set[str]]) -> None:
+        if self.engine == "duckdb":
+            self._con = _import_duckdb().connect()
+            for sql_name, t in self._by_sql_name().items():
+                if sql_name not in used:
+                    continue
+                if is_delta(t.path):
+                    from deltalake import DeltaTable
+                    files = DeltaTable(t.path).file_uris()
+                else:
+                    files = open_dataset(t.path).files
+                listing = ", ".join("'" + f.replace("'", "''") + "'" for f in files)
+                self._con.execute(f"CREATE VIEW {quote(sql_name)} AS SELECT * FROM "
+                                  f"read_parquet([{listing}], hive_partitioning = true, union_by_name = true)")
+            return
+
+        fd, self._db_path = tempfile.mkstemp(prefix="dax_replica_", suffix=".sqlite")
+        os.close(fd)
+        con = sqlite3.connect(self._db_path)
+        try:
+            for sql_name, t in self._by_sql_name().items():
+                if sql_name not in used:
+                    continue
+                dataset = open_dataset(t.path)
+                columns = sorted(used[sql_name]) or dataset.schema.names[:1]
+                con.execute(f"CREATE TABLE {quote(sql_name)} ({', '.join(quote(c) for c in columns)})")
+                insert = (f"INSERT INTO {quote(sql_name)} VALUES ({', '.join('?' for _ in columns)})")
+                for batch in dataset.to_batches(columns=columns):
+                    con.executemany(insert, _sqlite_rows(batch))
+            con.commit()
+        finally:
+            con.close()
+
+    def connect(self):
+        if self.engine == "duckdb":
+            return self._con.cursor()
+        return sqlite3.connect(f"file:{self._db_path}?mode=ro", uri=True, check_same_thread=False)
+
+    def close(self) -> None:
+        if self._con is not None:
+            self._con.close()
+        if self._db_path and os.path.exists(self._db_path):
+            os.remove(self._db_path)
+
+
+def _sqlite_rows(batch: pa.RecordBatch) -> List[tuple]:
+    """Row tuples SQLite can bind: temporals as ISO text, decimals as floats"""
+    columns = []
+    for col in batch.columns:
+        if pa.types.is_dictionary(col.type):
+            col = col.cast(col.type.value_type)
+        if pa.types.is_temporal(col.type):
+            col = col.cast(pa.string())
+        elif pa.types.is_decimal(col.type):
+            col = col.cast(pa.float64())
+        columns.append(col.to_pylist())
+    return list(zip(*columns))
+
+
+class DatabaseReplica(Replica):
+    """A DuckDB or SQLite database file holding the replica tables"""
+
+    def __init__(self, path: str, dataset: str, prefix: str, engine: str):
+        super().__init__()
+        self.location = path
+        self.dataset, self.prefix, self.engine = dataset, prefix, engine
+        if engine == "duckdb":
+            self._con = _import_duckdb().connect(path, read_only=True)
+            rows = self._con.execute("SELECT table_name, column_name FROM information_schema.columns").fetchall()
+        else:
+            self._con = None
+            with sqlite3.connect(f"file:{path}?mode=ro", uri=True) as con:
+                rows = [(t, c[1]) for (t,) in con.execute(
+                    "SELECT name FROM sqlite_master WHERE type IN ('table', 'view')").fetchall()
+                    for c in con.execute(f"PRAGMA table_info({quote(t)})").fetchall()]
+        self._schema: Dict[str, Tuple[str, Dict[str, str]]] = {}
+        for table, column in rows:
+            entry = self._schema.setdefault(table.lower(), (table, {}))
+            entry[1][clean_name(column).lower()] = column
+
+    def _resolve(self, name: str) -> ReplicaTable:
+        for candidate in self._candidates(name, self.dataset, self.prefix):
+            entry = self._schema.get(candidate.lower())
+            if entry:
+                return ReplicaTable(name, entry[0], entry[1], self.location)
+        raise ReplicaError(f"table {name} not found in {self.location}")
+
+    def connect(self):
+        if self.engine == "duckdb":
+            return self._con.cursor()
+        return sqlite3.connect(f"file:{self.location}?mode=ro", uri=True, check_same_thread=False)
+
+    def close(self) -> None:
+        if self._con is not None:
+            self._con.close()
+
+
+def open_replica(path: Optional[str], dataset: str = DEFAULT_DATASET, prefix: str = DEFAULT_PREFIX,
+                 engine: str = "auto") -> Replica:
+    if path is None:
+        return Replica()
+    if os.path.isdir(path):
+        if engine == "auto":
+            try:
+                _import_duckdb()
+                engine = "duckdb"
+            except ImportError:
+                engine = "sqlite"
+        return FolderReplica(path, dataset, prefix, engine)
+    if os.path.isfile(path):
+        if path.endswith(".duckdb"):
+            engine = "duckdb"
+        return DatabaseReplica(path, dataset, prefix, "duckdb" if engine == "duckdb" else "sqlite")
+    raise ReplicaError(f"replica not found: {path}")
+
+
+# =============================================================================
+# DAX -> SQL
+# =============================================================================
+
+AGGREGATES = {
+    "SUM": "SUM({})", "AVERAGE": "AVG({})", "MIN": "MIN({})", "MAX": "MAX({})",
+    "COUNT": "COUNT({})", "DISTINCTCOUNT": "COUNT(DISTINCT {})",
+}
+COUNTING = {"COUNTROWS", "COUNT", "DISTINCTCOUNT"}
+SQL_OPERATORS = {"==": "=", "&&": "AND", "||": "OR", "&": "||"}
+
+Filters = Tuple[Tuple[Tuple[str, ...], str], ...]  # (model tables the predicate reads, SQL predicate)
+
+
+@dataclass(frozen=True)
+class Atom:
+    """One aggregate over a fact table's rows under a fixed set of filters"""
+    table: str
+    aggregate: str
+    filters: Filters
+    blank_if_zero: bool
+
+
+class Translator:
+    def __init__(self, query: DaxQuery, replica: Replica, relationships: List[Relationship],
+                 model_tables: Optional[Set[str]] = None):
+        self.query = query
+        self.replica = replica
+        self.model_tables = model_tables
+        self.outgoing: Dict[str, List[Relationship]] = {}
+        for r in relationships:
+            self.outgoing.setdefault(r.from_table, []).append(r)
+        self.groups: List[ColumnRef] = []
+        self.atoms: Dict[Atom, str] = {}
+        self.used: Dict[str, Set[str]] = {}
+        self._expanding: List[str] = []
+        self._reads: Optional[Set[str]] = None
+
+    # --- names -------------------------------------------------------------
+
+    def table_sql(self, table: str) -> str:
+        if self.model_tables is not None and table not in self.model_tables:
+            raise ReplicaError(f"table {table} not in model")
+        if self._reads is not None:
+            self._reads.add(table)
+        sql_name = self.replica.table(table).sql_name
+        self.used.setdefault(sql_name, set())
+        return quote(sql_name)
+
+    def column(self, table: str, column: str) -> str:
+        actual = self.replica.column(table, column)
+        self.table_sql(table)
+        self.used[self.replica.table(table).sql_name].add(actual)
+        return f"{quote(table)}.{quote(actual)}"
+
+    def cte(self, table: str) -> str:
+        return quote("f_" + clean_name(table).lower())
+
+    # --- expressions -------------------------------------------------------
+
+    def expr(self, e: Any, filters: Filters, row: Optional[str] = None) -> str:
+        """SQL for a DAX scalar; `row` is the table iterated by an enclosing FILTER"""
+        if isinstance(e, Literal):
+            return e.sql
+        if isinstance(e, ColumnRef):
+            if e.column in self.query.measures and (e.table is None or row is None):
+                if row is not None:
+                    raise UnsupportedDax(f"measure [{e.column}] used inside a FILTER condition")
+                return self.measure(e.column, filters)
+            if row is None:
+                raise UnsupportedDax(f"column {_fmt(e)} used outside an aggregate or FILTER")
+            return self.column(e.table or row, e.column)
+        if isinstance(e, Unary):
+            return f"({'NOT ' if e.op == 'NOT' else e.op}{self.expr(e.operand, filters, row)})"
+        if isinstance(e, Binary) and e.op == "IN":
+            if not (isinstance(e.right, Call) and e.right.name == "{}" and e.right.args):
+                raise UnsupportedDax("IN is only supported with a {...} list")
+            values = ", ".join(self.expr(v, filters, row) for v in e.right.args)
+            return f"({self.expr(e.left, filters, row)} IN ({values}))"
+        if isinstance(e, Binary):
+            op = SQL_OPERATORS.get(e.op, e.op)
+            return f"({self.expr(e.left, filters, row)} {op} {self.expr(e.right, filters, row)})"
+        if isinstance(e, Call):
+            return self.call(e, filters, row)
+        raise UnsupportedDax(f"table {e.name} used as a scalar")
+
+    def call(self, e: Call, filters: Filters, row: Optional[str]) -> str:
+        name, args = e.name, e.args
+        if name in ("TRUE", "FALSE", "BLANK") and not args:
+            return "NULL" if name == "BLANK" else name
+        if name == "NOT" and len(args) == 1:
+            return f"(NOT {self.expr(args[0], filters, row)})"
+        if name == "ISBLANK" and len(args) == 1:
+            return f"({self.expr(args[0], filters, row)} IS NULL)"
+        if name == "RELATED" and len(args) == 1 and isinstance(args[0], ColumnRef) and row:
+            return self.column(args[0].table, args[0].column)
+        if name == "DIVIDE" and len(args) in (2, 3):
+            a, b = (self.expr(x, filters, row) for x in args[:2])
+            alt = self.expr(args[2], filters, row) if len(args) == 3 else "NULL"
+            return f"(CASE WHEN {b} IS NULL OR {b} = 0 THEN {alt} ELSE CAST({a} AS DOUBLE) / {b} END)"
+        if name == "IF" and len(args) in (2, 3):
+            otherwise = self.expr(args[2], filters, row) if len(args) == 3 else "NULL"
+            return (f"(CASE WHEN {self.expr(args[0], filters, row)} THEN {self.expr(args[1], filters, row)} "
+                    f"ELSE {otherwise} END)")
+        if row is not None:
+            raise UnsupportedDax(f"{name}() inside a FILTER condition")
+        if name == "COUNTROWS" and len(args) == 1:
+            table, table_filters = self.table_expr(args[0], filters)
+            return self.atom(table, "COUNT(*)", table_filters, True)
+        if name in AGGREGATES and len(args) == 1:
+            ref = args[0]
+            if not isinstance(ref, ColumnRef) or not ref.table:
+                raise UnsupportedDax(f"{name}() needs a Table[Column] argument")
+            return self.atom(ref.table, AGGREGATES[name].format(self.column(ref.table, ref.column)),
+                             filters, name in COUNTING)
+        if name == "CALCULATE" and args:
+            return self.expr(args[0], filters + self.filter_args(args[1:]))
+        raise UnsupportedDax(f"{name}() with {len(args)} argument(s) is not supported")
+
+    def measure(self, name: str, filters: Filters) -> str:
+        if name in self._expanding:
+            raise UnsupportedDax(f"measure [{name}] references itself")
+        self._expanding.append(name)
+        try:
+            return self.expr(self.query.measures[name], filters)
+        finally:
+            self._expanding.pop()
+
+    def table_expr(self, e: Any, filters: Filters) -> Tuple[str, Filters]:
+        """(model table, filters) for a table expression: Table, FILTER(...), CALCULATETABLE(...)"""
+        if isinstance(e, TableRef):
+            self.table_sql(e.name)
+            return e.name, filters
+        if isinstance(e, Call) and e.name == "FILTER" and len(e.args) == 2:
+            table, table_filters = self.table_expr(e.args[0], filters)
+            return table, table_filters + (self.predicate(e.args[1], table),)
+        if isinstance(e, Call) and e.name == "CALCULATETABLE" and e.args:
+            return self.table_expr(e.args[0], filters + self.filter_args(e.args[1:]))
+        raise UnsupportedDax("table expressions are limited to Table, FILTER and CALCULATETABLE")
+
+    def filter_args(self, args: Tuple, intersect: bool = False) -> Filters:
+        """CALCULATE/SUMMARIZECOLUMNS filter arguments as (table, predicate) pairs"""
+        result: Filters = ()
+        for arg in args:
+            keep = intersect
+            if isinstance(arg, Call) and arg.name == "KEEPFILTERS" and len(arg.args) == 1:
+                arg, keep = arg.args[0], True
+            if isinstance(arg, Call) and arg.name in ("FILTER", "CALCULATETABLE"):
+                _, table_filters = self.table_expr(arg, ())
+                result += table_filters
+                continue
+            refs = _column_refs(arg)
+            tables = {r.table for r in refs}
+            if not refs or None in tables or len(tables) != 1:
+                raise UnsupportedDax("filter arguments must be FILTER(...) or a predicate over one table's columns")
+            table = tables.pop()
+            overridden = [r for r in refs if r in self.groups]
+            if overridden and not keep:
+                raise UnsupportedDax(f"filter on grouped column {_fmt(overridden[0])} replaces the row's "
+                                     f"filter; wrap it in KEEPFILTERS to intersect")
+            result += (self.predicate(arg, table),)
+        return result
+
+    def predicate(self, e: Any, row: str) -> Tuple[Tuple[str, ...], str]:
+        """A FILTER condition over `row`'s table, with every table it reads (RELATED ones need joins)"""
+        outer, self._reads = self._reads, {row}
+        try:
+            sql = self.expr(e, (), row=row)
+            return tuple(sorted(self._reads)), sql
+        finally:
+            if outer is not None:
+                outer |= self._reads
+            self._reads = outer
+
+    def atom(self, table: str, aggregate: str, filters: Filters, blank_if_zero: bool) -> str:
+        key = Atom(table, aggregate, tuple(sorted(set(filters))), blank_if_zero)
+        if key not in self.atoms:
+            self.atoms[key] = f"a{len(self.atoms) + 1}"
+        return f"{self.cte(table)}.{self.atoms[key]}"
+
+    # --- joins ---------------------------------------------------------------
+
+    def joins(self, fact: str, needed: Set[str]) -> List[str]:
+        """LEFT JOINs from a fact table to the tables it filters/groups by, along many-to-one paths"""
+        parent: Dict[str, Optional[Relationship]] = {fact: None}
+        queue = [fact]
+        while queue:
+            current = queue.pop(0)
+            for r in self.outgoing.get(current, []):
+                if r.to_table not in parent:
+                    parent[r.to_table] = r
+                    queue.append(r.to_table)
+        edges: List[Relationship] = []
+        for table in sorted(needed - {fact}):
+            self.table_sql(table)  # a table missing from the model has no path either; say so instead
+            if table not in parent:
+                raise UnsupportedDax(f"no active relationship path from {fact} to {table}")
+            path = []
+            while parent[table] is not None:
+                path.append(parent[table])
+                table = parent[table].from_table
+            edges.extend(r for r in reversed(path) if r not in edges)
+        return [f"LEFT JOIN {self.table_sql(r.to_table)} AS {quote(r.to_table)} ON "
+                f"{self.column(r.from_table, r.from_column)} = {self.column(r.to_table, r.to_column)}"
+                for r in edges]
+
+    # --- query -------------------------------------------------------------
+
+    def translate(self) -> str:
+        ev = self.query.evaluate
+        if not isinstance(ev, Call) or ev.name not in ("SUMMARIZECOLUMNS", "ROW"):
+            raise UnsupportedDax("EVALUATE supports SUMMARIZECOLUMNS(...) and ROW(...)")
+        args = list(ev.args)
+        group_args, filter_args = [], []
+        if ev.name == "SUMMARIZECOLUMNS":
+            while args and not (isinstance(args[0], Literal) and args[0].sql.startswith("'")):
+                arg = args.pop(0)
+                (group_args if isinstance(arg, ColumnRef) and arg.table else filter_args).append(arg)
+        self.groups = group_args
+        filters = self.filter_args(tuple(filter_args), intersect=True)
+        if len(args) % 2 or not args:
+            raise UnsupportedDax(f'{ev.name} needs "name", expression pairs')
+
+        outputs: List[Tuple[str, str]] = []
+        for name, e in zip(args[::2], args[1::2]):
+            if not (isinstance(name, Literal) and name.sql.startswith("'")):
+                raise UnsupportedDax(f'{ev.name} needs "name", expression pairs')
+            outputs.append((f"[{name.sql[1:-1]}]", self.expr(e, filters)))
+        group_names = [f"{g.table}[{g.column}]" for g in self.groups]
+        if self.groups and not self.atoms:
+            raise UnsupportedDax("SUMMARIZECOLUMNS without an aggregate")
+        order = self.order_by(outputs, group_names, filters)
+
+        keys = [f"k{i + 1}" for i in range(len(self.groups))]
+        by_table: Dict[str, List[Tuple[Atom, str]]] = {}
+        for atom, alias in self.atoms.items():
+            by_table.setdefault(atom.table, []).append((atom, alias))
+        ctes = []
+        for table, atoms in by_table.items():
+            needed = {g.table for g in self.groups} | {t for a, _ in atoms for tables, _ in a.filters for t in tables}
+            joins = self.joins(table, needed)
+            select = [f"{self.column(g.table, g.column)} AS {k}" for g, k in zip(self.groups, keys)]
+            for atom, alias in atoms:
+                sql = atom.aggregate
+                if atom.filters:
+                    sql += f" FILTER (WHERE {' AND '.join(p for _, p in atom.filters)})"
+                if atom.blank_if_zero:
+                    sql = f"NULLIF({sql}, 0)"
+                select.append(f"{sql} AS {alias}")
+            body = f"SELECT {', '.join(select)}\n    FROM {self.table_sql(table)} AS {quote(table)}"
+            for join in joins:
+                body += f"\n    {join}"
+            if keys:
+                body += f"\n    GROUP BY {', '.join(str(i + 1) for i in range(len(keys)))}"
+            ctes.append(f"{self.cte(table)} AS (\n    {body}\n)")
+
+        ctes_sql = list(ctes)
+        columns = [f"keys.{k} AS {quote(n)}" for k, n in zip(keys, group_names)]
+        columns += [f"{sql} AS {quote(n)}" for n, sql in outputs]
+        hidden = [sql for sql, _ in order if sql is not None]
+        columns += [f"{sql} AS {quote(f'__sort{i + 1}')}" for i, sql in enumerate(hidden)]
+        if keys:
+            union = "\n    UNION\n    ".join(f"SELECT {', '.join(keys)} FROM {self.cte(t)}" for t in by_table)
+            ctes_sql.append(f"keys AS (\n    {union}\n)")
+            source = "keys" + "".join(
+                f"\nLEFT JOIN {self.cte(t)} ON " +
+                " AND ".join(f"keys.{k} IS NOT DISTINCT FROM {self.cte(t)}.{k}" for k in keys)
+                for t in by_table)
+        else:
+            source = "\nCROSS JOIN ".join(self.cte(t) for t in by_table)
+        inner = f"SELECT {', '.join(columns)}" + (f"\nFROM {source}" if source else "")
+
+        visible = [quote(n) for n in group_names] + [quote(n) for n, _ in outputs]
+        sql = (f"WITH {', '.join(ctes_sql)}\n" if ctes_sql else "") + \
+              f"SELECT {', '.join(visible)}\nFROM (\n{inner}\n) AS result"
+        if ev.name == "SUMMARIZECOLUMNS":
+            sql += "\nWHERE " + " OR ".join(f"{quote(n)} IS NOT NULL" for n, _ in outputs)
+        if order:
+            terms, sort = [], 0
+            for hidden, (target, descending) in order:
+                if hidden is not None:
+                    sort += 1
+                    target = quote(f"__sort{sort}")
+                # BLANK sorts lowest in DAX
+                terms.append(f"{target} {'DESC NULLS LAST' if descending else 'ASC NULLS FIRST'}")
+            sql += f"\nORDER BY {', '.join(terms)}"
+        return sql
+
+    def order_by(self, outputs: List[Tuple[str, str]], group_names: List[str],
+                 filters: Filters) -> List[Tuple[Optional[str], Tuple[str, bool]]]:
+        """(hidden sort SQL or None, (output column, descending)) per ORDER BY term"""
+        names = {n for n, _ in outputs}
+        order = []
+        for e, descending in self.query.order_by:
+            if isinstance(e, ColumnRef) and e.table is None and f"[{e.column}]" in names:
+                order.append((None, (quote(f"[{e.column}]"), descending)))
+            elif isinstance(e, ColumnRef) and e.table and f"{e.table}[{e.column}]" in group_names:
+                order.append((None, (quote(f"{e.table}[{e.column}]"), descending)))
+            else:
+                order.append((self.expr(e, filters), ("", descending)))
+        return order
+
+
+def _column_refs(e: Any) -> List[ColumnRef]:
+    if isinstance(e, ColumnRef):
+        return [e]
+    if isinstance(e, (Binary,)):
+        return _column_refs(e.left) + _column_refs(e.right)
+    if isinstance(e, Unary):
+        return _column_refs(e.operand)
+    if isinstance(e, Call):
+        return [r for a in e.args for r in _column_refs(a)]
+    return []
+
+
+# =============================================================================
+# Running
+# =============================================================================
+
+@dataclass
+class QueryRun:
+    name: str
+    dax: str
+    sql: Optional[str] = None
+    tables: Dict[str, List[str]] = field(default_factory=dict)
+    columns: List[str] = field(default_factory=list)
+    rows: List[list] = field(default_factory=list)
+    timings_ms: List[float] = field(default_factory=list)
+    unsupported: bool = False
+    error: Optional[str] = None
+
+    @property
+    def min_ms(self) -> float:
+        return min(self.timings_ms) if self.timings_ms else 0.0
+
+    @property
+    def median_ms(self) -> float:
+        return statistics.median(self.timings_ms) if self.timings_ms else 0.0
+
+
+def translate_query(name: str, dax: str, replica: Replica, relationships: List[Relationship],
+                    model_tables: Optional[Set[str]] = None) -> QueryRun:
+    run = QueryRun(name, dax)
+    try:
+        translator = Translator(parse_query(dax), replica, relationships, model_tables)
+        run.sql = translator.translate()
+        run.tables = {t: sorted(c) for t, c in translator.used.items()}
+    except UnsupportedDax as e:
+        run.unsupported = True
+        run.error = f"unsupported DAX: {e}"
+    except ReplicaError as e:
+        run.error = str(e)
+    return run
+
+
+def execute(run: QueryRun, replica: Replica, repeat: int = 1) -> QueryRun:
+    con = replica.connect()
+    try:
+        for _ in range(max(1, repeat)):
+            start = time.perf_counter()
+            cursor = con.execute(run.sql)
+            rows = cursor.fetchall()
+            run.timings_ms.append((time.perf_counter() - start) * 1000)
+        run.columns = [d[0] for d in cursor.description]
+        run.rows = [list(r) for r in rows]
+    except Exception as e:
+        run.error = f"{type(e).__name__}: {e}"
+    finally:
+        con.close()
+    return run
+
+
+def run_queries(queries: Dict[str, str], replica: Replica, relationships: List[Relationship],
+                workers: int = DEFAULT_WORKERS, repeat: int = 1,
+                model_tables: Optional[Set[str]] = None) -> Tuple[List[QueryRun], float]:
+    """Translate every query, load what they use once, then run them in parallel.
+    Returns the runs and the replica load time in ms."""
+    runs = [translate_query(name, dax, replica, relationships, model_tables) for name, dax in queries.items()]
+    runnable = [r for r in runs if r.sql]
+    if not runnable:
+        return runs, 0.0
+    used: Dict[str, Set[str]] = {}
+    for r in runnable:
+        for table, columns in r.tables.items():
+            used.setdefault(table, set()).update(columns)
+    start = time.perf_counter()
+    replica.prepare(used)
+    load_ms = (time.perf_counter() - start) * 1000
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(lambda r: execute(r, replica, repeat), runnable))
+    return runs, load_ms
+
+
+def load_queries(path: str) -> Dict[str, str]:
+    """{name: dax} from a JSON file, or one query from a .dax file (named after the file)"""
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith(".json"):
+            return {str(k): str(v) for k, v in json.load(f).items()}
+        return {os.path.splitext(os.path.basename(path))[0]: f.read()}
+
+
+# =============================================================================
+# CLI
+# =============================================================================
+
+def _cell(value: Any) -> str:
+    if isinstance(value, float):
+        return f"{value:,.4f}".rstrip("0").rstrip(".")
+    return "" if value is None else str(value)
+
+
+def print_rows(run: QueryRun, limit: int) -> None:
+    shown = [[_cell(v) for v in row] for row in run.rows[:limit]]
+    widths = [max([len(c)] + [len(r[i]) for r in shown]) for i, c in enumerate(run.columns)]
+    print("    " + "  ".join(c.ljust(w) for c, w in zip(run.columns, widths)))
+    for row in shown:
+        print("    " + "  ".join(v.ljust(w) for v, w in zip(row, widths)))
+    if len(run.rows) > limit:
+        print(f"    ... {len(run.rows) - limit} more row(s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run DAX preset queries offline as SQL over a local replica")
+    parser.add_argument("names", nargs="*", help="Queries to run (default: all)")
+    parser.add_argument("--queries", help="JSON {name: dax} or a .dax file (default: EXECUTIVE_DASHBOARD_QUERIES)")
+    parser.add_argument("--data", default=DEFAULT_DATA_PATH,
+                        help="Replica: Delta/Parquet folder, .duckdb or SQLite file")
+    parser.add_argument("--dataset", default=DEFAULT_DATASET, help="Dataset name in exported table names")
+    parser.add_argument("--prefix", default=DEFAULT_PREFIX, help="Prefix of exported table names")
+    parser.add_argument("--engine", choices=["auto", "duckdb", "sqlite"], default="auto",
+                        help="SQL engine for folder replicas (auto: DuckDB when installed)")
+    parser.add_argument("--model", default=DEFINITION_PATH, help="Model definition for relationships")
+    parser.add_argument("--relationship", action="append", default=[], metavar="MANY[COL]=ONE[COL]",
+                        help="Extra many-to-one relationship (repeatable)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Queries run in parallel")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per query for timings")
+    parser.add_argument("--rows", type=int, default=DEFAULT_SHOW_ROWS, help="Result rows shown per query")
+    parser.add_argument("--sql", action="store_true", help="Print the translated SQL; don't run")
+    parser.add_argument("--json", action="store_true", help="Output JSON")
+    args = parser.parse_args()
+
+    try:
+        queries = load_queries(args.queries) if args.queries else dict(EXECUTIVE_DASHBOARD_QUERIES)
+        relationships = model_relationships(args.model) + [parse_relationship(r) for r in args.relationship]
+        # Names from --relationship count as tables, so they also work without a model
+        model_tables = set(load_model(args.model).tables) or None
+        if model_tables is not None:
+            model_tables |= {t for r in relationships for t in (r.from_table, r.to_table)}
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}")
+        return 1
+    unknown = [n for n in args.names if n not in queries]
+    if unknown:
+        print(f"❌ Unknown query: {', '.join(unknown)} (available: {', '.join(queries)})")
+        return 1
+    if args.names:
+        queries = {n: queries[n] for n in args.names}
+
+    data = args.data if (os.path.exists(args.data) or not args.sql) else None
+    try:
+        replica = open_replica(data, args.dataset, args.prefix, args.engine)
+    except (ImportError, ReplicaError, sqlite3.Error) as e:
+        print(f"❌ {e}")
+        return 1
+
+    if args.sql:
+        for name, dax in queries.items():
+            run = translate_query(name, dax, replica, relationships, model_tables)
+            print(f"-- {name}")
+            print(f"{run.sql};\n" if run.sql else f"-- ❌ {run.error}\n")
+        replica.close()
+        return 0
+
+    start = time.perf_counter()
+    try:
+        runs, load_ms = run_queries(queries, replica, relationships, args.workers, args.repeat, model_tables)
+    except (ImportError, ReplicaError, OSError) as e:
+        print(f"❌ {e}")
+        return 1
+    finally:
+        replica.close()
+    elapsed = (time.perf_counter() - start) * 1000
+    failed = [r for r in runs if r.error and not r.unsupported]
+
+    if args.json:
+        out = {"replica": replica.location, "engine": replica.engine, "load_ms": load_ms,
+               "elapsed_ms": elapsed, "queries": []}
+        for r in runs:
+            d = asdict(r)
+            d.update(min_ms=r.min_ms, median_ms=r.median_ms)
+            out["queries"].append(d)
+        print(json.dumps(out, indent=2, default=str))
+        return 1 if failed else 0
+
+    print(f"Replica: {replica.location} ({replica.engine}, prepared in {load_ms:.0f} ms)")
+    for r in runs:
+        if r.error:
+            print(f"\n{'⚠️' if r.unsupported else '❌'} {r.name}: {r.error}")
+            continue
+        runs_note = f", median {r.median_ms:.1f} ms over {len(r.timings_ms)} runs" if len(r.timings_ms) > 1 else ""
+        print(f"\n✅ {r.name}: {len(r.rows)} row(s) in {r.min_ms:.1f} ms{runs_note}")
+        print_rows(r, args.rows)
+
+    ran = sum(1 for r in runs if r.timings_ms and not r.error)
+    unsupported = sum(1 for r in runs if r.unsupported)
+    print(f"\n{'='*70}")
+    print(f"{len(runs)} queries: {ran} ran, {unsupported} unsupported, {len(failed)} failed "
+          f"in {elapsed:.0f} ms ({args.workers} workers)")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,496 @@
+#!/usr/bin/env python3
+"""
+Eventstream Emulator
+Recorded SemanticModelLogs -> Monitoring_Eventstream (replayed locally) -> Parquet / DuckDB
+
+Monitoring_Eventstream routes the SemanticModelLogs source into the
+Eventhouse table of the same name through the `SemanticModelLogs_Mapping`
+JSON ingestion mapping. This replays recorded events through the same
+wiring on a laptop, so the monitoring analytics can be built and
+benchmarked at production event rates without a Fabric capacity:
+
+1. The pipeline is read from the repo: source, stream and destination from
+   eventstream.json, the destination table's columns and KQL types and its
+   JSON mapping from the Eventhouse DatabaseSchema.kql, plus any ManageFields
+   operators on the way
+2. A producer replays recorded events (JSONL or Parquet exports) on their
+   original timeline scaled by `--speed` (or at a fixed `--rate`) into a
+   bounded asyncio queue; when the sink falls behind, the queue fills and
+   the producer waits (backpressure) instead of buffering without limit
+3. A consumer cuts micro-batches by size or age, applies the mapping (JSON
+   paths -> typed columns, unknown fields dropped, missing ones null) and
+   lands each batch into Parquet part files or a DuckDB table off the event
+   loop, reporting throughput, end-to-end lag and time spent backpressured
+
+Usage:
+    python scripts/eventstream_emulator.py SemanticModelLogs.jsonl --out landing/
+    python scripts/eventstream_emulator.py recorded/ --speed 60 --batch-size 5000 --sink duckdb --out monitoring.duckdb
+    python scripts/eventstream_emulator.py SemanticModelLogs.jsonl --rate 2000 --loop 10 --queue-size 1000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import sys
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from metrics_regression_detector import to_utc
+from model_size_estimator import open_dataset
+from query_log_analyzer import find_logs
+from report_document import REPO_ROOT
+
+
+MONITORING_PATH = os.path.join(REPO_ROOT, "Monitoring_sample")
+EVENTSTREAM_PATH = os.path.join(MONITORING_PATH, "Monitoring_Eventstream.Eventstream", "eventstream.json")
+SCHEMA_PATH = os.path.join(MONITORING_PATH, "Monitoring_Eventhouse.Eventhouse", ".children",
+                           "Monitoring_Database.KQLDatabase", "DatabaseSchema.kql")
+DEFAULT_QUEUE_SIZE = 10_000
+DEFAULT_BATCH_SIZE = 1_000
+DEFAULT_BATCH_SECONDS = 1.0
+READ_BATCH_ROWS = 10_000
+
+
+# =============================================================================
+# Pipeline definition
+# =============================================================================
+
+KQL_TYPES = {
+    "datetime": pa.timestamp("us", tz="UTC"),
+    "string": pa.string(),
+    "long": pa.int64(),
+    "int": pa.int32(),
+    "real": pa.float64(),
+    "double": pa.float64(),
+    "decimal": pa.float64(),
+    "bool": pa.bool_(),
+    "boolean": pa.bool_(),
+    "guid": pa.string(),
+    "timespan": pa.string(),
+    # Kept as JSON text; KQL parses it back with todynamic()
+    "dynamic": pa.string(),
+}
+
+_TABLE_RE = re.compile(r"^\.create(?:-merge)?\s+table\s+(\w+)\s*\((.*)\)\s*$", re.M)
+_MAPPING_RE = re.compile(r"^\.create(?:-or-alter)?\s+table\s+(\w+)\s+ingestion\s+json\s+mapping\s+'([^']+)'\s*\n```\n(.*?)\n```",
+                         re.M | re.S)
+_PATH_RE = re.compile(r"\['((?:[^'\\]|\\.)*)'\]|\.([A-Za-z_][\w]*)")
+
+
+@dataclass
+class MappedColumn:
+    name: str
+    path: Tuple[str, ...]
+    kql_type: str
+
+
+@dataclass
+class Pipeline:
+    source: str
+    stream: str
+    table: str
+    mapping: str
+    columns: List[MappedColumn]
+    skipped_operators: List[str] = field(default_factory=list)
+
+    @property
+    def schema(self) -> pa.Schema:
+        return pa.schema([(c.name, KQL_TYPES.get(c.kql_type, pa.string())) for c in self.columns])
+
+
+def json_path(path: str) -> Tuple[str, ...]:
+    """Keys of a simple ingestion-mapping JSONPath ($['a'].b['c'])"""
+    if not path.startswith("$"):
+        raise ValueError(f"unsupported mapping path '{path}'")
+    return tuple(quoted.replace("\\'", "'") if quoted else bare for quoted, bare in _PATH_RE.findall(path[1:]))
+
+
+def parse_table_schemas(kql: str) -> Dict[str, List[Tuple[str, str]]]:
+    tables = {}
+    for name, body in _TABLE_RE.findall(kql):
+        tables[name] = [tuple(part.strip().split(":", 1)) for part in body.split(",") if ":" in part]
+    return tables
+
+
+def parse_json_mappings(kql: str) -> Dict[Tuple[str, str], List[dict]]:
+    return {(table, name): json.loads(body) for table, name, body in _MAPPING_RE.findall(kql)}
+
+
+def _manage_fields(operator: dict, columns: List[MappedColumn]) -> List[MappedColumn]:
+    """Keep/rename the columns listed by a ManageFields operator"""
+    by_name = {c.name: c for c in columns}
+    kept = []
+    for spec in (operator.get("properties") or {}).get("columns") or []:
+        name = spec.get("name") or spec.get("column") or ""
+        source = by_name.get(name) or MappedColumn(name, json_path(spec.get("path") or f"$['{name}']"), "string")
+        kept.append(MappedColumn(spec.get("alias") or name, source.path, spec.get("dataType") or source.kql_type))
+    return kept or columns
+
+
+def load_pipeline(eventstream_path: str = EVENTSTREAM_PATH, schema_path: str = SCHEMA_PATH,
+                  destination: Optional[str] = None) -> Pipeline:
+    with open(eventstream_path, "r", encoding="utf-8-sig") as f:
+        stream = json.load(f)
+    with open(schema_path, "r", encoding="utf-8-sig") as f:
+        kql = f.read()
+
+    targets = [d for d in stream.get("destinations", []) if d.get("type") == "Eventhouse"
+               and destination in (None, d.get("name"), (d.get("properties") or {}).get("tableName"))]
+    if not targets:
+        raise ValueError(f"{eventstream_path}: no Eventhouse destination{' ' + destination if destination else ''}")
+    target = targets[0]
+    props = target.get("properties") or {}
+    table, mapping_name = props.get("tableName"), props.get("mappingRuleName")
+
+    schemas = parse_table_schemas(kql)
+    if table not in schemas:
+        raise ValueError(f"{schema_path}: table {table} is not defined")
+    types = dict(schemas[table])
+    mapping = parse_json_mappings(kql).get((table, mapping_name))
+    if mapping is None:
+        # Without a mapping, Eventhouse matches top-level fields to columns by name
+        columns = [MappedColumn(name, (name,), kql_type) for name, kql_type in schemas[table]]
+    else:
+        columns = [MappedColumn(m["column"], json_path((m.get("Properties") or {}).get("Path") or f"$['{m['column']}']"),
+                                m.get("datatype") or types.get(m["column"], "string")) for m in mapping]
+
+    # Walk back from the destination through operators to the source
+    nodes = {n["name"]: n for kind in ("sources", "streams", "operators") for n in stream.get(kind, [])}
+    chain, skipped, name = [], [], (target.get("inputNodes") or [{}])[0].get("name")
+    stream_name = name or ""
+    while name in nodes:
+        node = nodes[name]
+        if node in stream.get("operators", []):
+            chain.append(node)
+        elif node in stream.get("streams", []):
+            stream_name = name
+        name = (node.get("inputNodes") or [{}])[0].get("name")
+    for operator in reversed(chain):
+        if operator.get("type") == "ManageFields":
+            columns = _manage_fields(operator, columns)
+        else:
+            skipped.append(f"{operator.get('name')} ({operator.get('type')})")
+    source = next((s.get("name") for s in stream.get("sources", [])), "")
+    return Pipeline(source, stream_name, table, mapping_name or "", columns, skipped)
+
+
+# =============================================================================
+# Recorded events
+# =============================================================================
+
+def _event_time(event: Dict[str, Any], time_field: str) -> Optional[float]:
+    value = event.get(time_field)
+    if isinstance(value, datetime):
+        moment = value
+    elif isinstance(value, str) and value:
+        try:
+            moment = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    else:
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+def read_events(paths: List[str]) -> Iterator[Dict[str, Any]]:
+    """Recorded events in file order, from JSONL or Parquet exports"""
+    for path in find_logs(paths):
+        if os.path.isdir(path) or path.endswith(".parquet"):
+            for batch in open_dataset(path).to_batches(batch_size=READ_BATCH_ROWS):
+                yield from batch.to_pylist()
+            continue
+        with open(path, "r", encoding="utf-8-sig") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+# =============================================================================
+# Projection and sinks
+# =============================================================================
+
+def _lookup(event: Any, path: Tuple[str, ...]) -> Any:
+    for key in path:
+        if not isinstance(event, dict):
+            return None
+        event = event.get(key)
+    return event
+
+
+def _column(values: List[Any], kql_type: str, arrow_type: pa.DataType) -> pa.Array:
+    if kql_type == "dynamic":
+        return pa.array([v if v is None or isinstance(v, str) else json.dumps(v, default=str) for v in values],
+                        pa.string())
+    if pa.types.is_timestamp(arrow_type):
+        return to_utc(pa.array([v if v is None or isinstance(v, datetime) else str(v) for v in values]))
+    if pa.types.is_string(arrow_type):
+        return pa.array([v if v is None or isinstance(v, str) else str(v) for v in values], pa.string())
+    try:
+        return pa.array(values, arrow_type)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError):
+        # Numbers recorded as text; unparseable values land as null like a failed ingestion cast
+        text = pa.array([None if v is None else str(v) for v in values], pa.string())
+        return pc.cast(pc.if_else(pc.match_substring_regex(text, r"^\s*-?[\d.eE+]+\s*$"), text, None), arrow_type)
+
+
+def project(events: List[Dict[str, Any]], pipeline: Pipeline) -> pa.Table:
+    schema = pipeline.schema
+    return pa.table([_column([_lookup(e, c.path) for e in events], c.kql_type, schema.field(c.name).type)
+                     for c in pipeline.columns], schema=schema)
+
+
+class ParquetSink:
+    """Numbered part files in a folder, like the Eventhouse extents a batch becomes"""
+
+    def __init__(self, folder: str):
+        self.folder = folder
+        os.makedirs(folder, exist_ok=True)
+        self.parts = len([n for n in os.listdir(folder) if n.endswith(".parquet")])
+
+    def write(self, table: pa.Table) -> None:
+        pq.write_table(table, os.path.join(self.folder, f"part-{self.parts:06d}.parquet"))
+        self.parts += 1
+
+    def close(self) -> None:
+        pass
+
+
+class DuckDBSink:
+    def __init__(self, path: str, table: str):
+        try:
+            import duckdb
+        except ImportError:
+            raise ImportError("--sink duckdb needs the duckdb package: pip install duckdb")
+        self.conn = duckdb.connect(path)
+        self.table = table
+        self.created = False
+
+    def write(self, table: pa.Table) -> None:
+        self.conn.register("micro_batch", table)
+        if not self.created:
+            self.conn.execute(f'CREATE TABLE IF NOT EXISTS "{self.table}" AS SELECT * FROM micro_batch LIMIT 0')
+            self.created = True
+        self.conn.execute(f'INSERT INTO "{self.table}" SELECT * FROM micro_batch')
+        self.conn.unregister("micro_batch")
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+def open_sink(kind: str, out: str, table: str):
+    if kind == "duckdb":
+        return DuckDBSink(out, table)
+    return ParquetSink(out)
+
+
+# =============================================================================
+# Replay
+# =============================================================================
+
+@dataclass
+class ReplayStats:
+    events: int = 0
+    landed: int = 0
+    batches: int = 0
+    skipped_untimed: int = 0
+    elapsed_s: float = 0.0
+    blocked_s: float = 0.0          # producer waiting on a full queue
+    max_queue: int = 0
+    write_s: float = 0.0
+    lag_ms: List[float] = field(default_factory=list, repr=False)
+
+    @property
+    def events_per_s(self) -> float:
+        return self.landed / self.elapsed_s if self.elapsed_s else 0.0
+
+    def lag_percentile(self, q: float) -> float:
+        if not self.lag_ms:
+            return 0.0
+        values = sorted(self.lag_ms)
+        return values[min(len(values) - 1, int(q * len(values)))]
+
+
+async def _timeline(events: Iterator[Dict[str, Any]], time_field: str, speed: float, rate: Optional[float],
+                    loop_count: int, stats: ReplayStats) -> AsyncIterator[Tuple[Dict[str, Any], float]]:
+    """Events with the wall-clock time each is due; recorded gaps scaled by `speed`"""
+    clock = asyncio.get_running_loop().time
+    start = clock()
+    recorded = list(events) if loop_count > 1 else events
+    first, last, shift, n = None, None, 0.0, 0
+    for round_ in range(loop_count):
+        for event in recorded:
+            if rate:
+                due = start + n / rate
+            else:
+                at = _event_time(event, time_field)
+                if at is None:
+                    stats.skipped_untimed += 1
+                    continue
+                first = at if first is None else first
+                last = at if last is None else max(last, at)
+                due = start + ((at + shift - first) / speed if speed else 0.0)
+            wait = due - clock()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            n += 1
+            yield (event, due)
+        if first is not None and last is not None:
+            # Next round continues the timeline right after the recording ends
+            shift = (round_ + 1) * (last - first + 1.0)
+
+
+async def replay(paths: List[str], pipeline: Pipeline, sink, speed: float = 1.0, rate: Optional[float] = None,
+                 queue_size: int = DEFAULT_QUEUE_SIZE, batch_size: int = DEFAULT_BATCH_SIZE,
+                 batch_seconds: float = DEFAULT_BATCH_SECONDS, loop_count: int = 1, time_field: str = "Timestamp",
+                 limit: Optional[int] = None, progress=None) -> ReplayStats:
+    stats = ReplayStats()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+    clock = asyncio.get_running_loop().time
+    done = object()
+
+    async def producer():
+        async for event, due in _timeline(read_events(paths), time_field, speed, rate, loop_count, stats):
+            if limit is not None and stats.events >= limit:
+                break
+            if queue.full():
+                blocked = clock()
+                await queue.put((event, due))
+                stats.blocked_s += clock() - blocked
+            else:
+                queue.put_nowait((event, due))
+            stats.events += 1
+            stats.max_queue = max(stats.max_queue, queue.qsize())
+        await queue.put(done)
+
+    async def land(batch: List[Tuple[Dict[str, Any], float]]) -> None:
+        table = project([e for e, _ in batch], pipeline)
+        started = clock()
+        # Off the event loop so the producer keeps its timeline while a batch is written
+        await asyncio.to_thread(sink.write, table)
+        finished = clock()
+        stats.write_s += finished - started
+        stats.lag_ms.extend((finished - due) * 1000 for _, due in batch)
+        stats.landed += len(batch)
+        stats.batches += 1
+        if progress:
+            progress(stats)
+
+    async def consumer():
+        batch: List[Tuple[Dict[str, Any], float]] = []
+        opened = clock()
+        while True:
+            timeout = max(0.0, opened + batch_seconds - clock()) if batch else None
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout)
+            except asyncio.TimeoutError:
+                item = None
+            if item is done:
+                break
+            if item is not None:
+                if not batch:
+                    opened = clock()
+                batch.append(item)
+            if batch and (len(batch) >= batch_size or clock() - opened >= batch_seconds):
+                await land(batch)
+                batch = []
+        if batch:
+            await land(batch)
+
+    started = clock()
+    await asyncio.gather(producer(), consumer())
+    stats.elapsed_s = clock() - started
+    return stats
+
+
+# =============================================================================
+# CLI
+# =============================================================================
+
+def print_pipeline(pipeline: Pipeline) -> None:
+    print(f"\n{pipeline.source} -> {pipeline.stream} -> {pipeline.table} "
+          f"({pipeline.mapping or 'by name'}, {len(pipeline.columns)} columns)")
+    for skipped in pipeline.skipped_operators:
+        print(f"⚠️ Operator {skipped} is not emulated; events pass through unchanged")
+
+
+def print_stats(stats: ReplayStats) -> None:
+    print(f"\n{'='*70}")
+    print(f"✅ {stats.landed:,} events in {stats.batches:,} batches, {stats.elapsed_s:.1f} s "
+          f"({stats.events_per_s:,.0f} events/s)")
+    print(f"   Lag p50 {stats.lag_percentile(0.5):,.0f} ms, p95 {stats.lag_percentile(0.95):,.0f} ms, "
+          f"max {max(stats.lag_ms, default=0):,.0f} ms; sink busy {stats.write_s:.1f} s")
+    if stats.blocked_s:
+        print(f"⚠️ Backpressure: producer waited {stats.blocked_s:.1f} s on a full queue (max depth {stats.max_queue:,})")
+    if stats.skipped_untimed:
+        print(f"⚠️ {stats.skipped_untimed:,} events without a timestamp were skipped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded SemanticModelLogs through the eventstream locally")
+    parser.add_argument("events", nargs="+", help="Recorded events (JSONL or Parquet files/folders)")
+    parser.add_argument("--eventstream", default=EVENTSTREAM_PATH, help="eventstream.json")
+    parser.add_argument("--schema", default=SCHEMA_PATH, help="Eventhouse DatabaseSchema.kql")
+    parser.add_argument("--destination", help="Destination name or table (default: first Eventhouse one)")
+    parser.add_argument("--sink", choices=["parquet", "duckdb"], default="parquet")
+    parser.add_argument("--out", help="Parquet folder or DuckDB file (default: ./<table> or ./<table>.duckdb)")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay speed-up; 0 = as fast as possible")
+    parser.add_argument("--rate", type=float, help="Fixed events/s instead of the recorded timeline")
+    parser.add_argument("--loop", type=int, default=1, help="Replay the recording this many times")
+    parser.add_argument("--limit", type=int, help="Stop after this many events")
+    parser.add_argument("--time-field", default="Timestamp", help="Event time field of the recording")
+    parser.add_argument("--queue-size", type=int, default=DEFAULT_QUEUE_SIZE, help="Events buffered before backpressure")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Events per micro-batch")
+    parser.add_argument("--batch-seconds", type=float, default=DEFAULT_BATCH_SECONDS, help="Max micro-batch age")
+    parser.add_argument("--json", action="store_true", help="Output stats as JSON")
+    args = parser.parse_args()
+
+    try:
+        pipeline = load_pipeline(args.eventstream, args.schema, args.destination)
+        out = args.out or (f"{pipeline.table}.duckdb" if args.sink == "duckdb" else pipeline.table)
+        sink = open_sink(args.sink, out, pipeline.table)
+    except (OSError, ValueError, ImportError) as e:
+        print(f"❌ {e}")
+        return 1
+    if not args.json:
+        print_pipeline(pipeline)
+
+    def progress(stats: ReplayStats) -> None:
+        if stats.batches % 10 == 0:
+            print(f"  {stats.landed:,} landed, queue {stats.max_queue:,} max, "
+                  f"lag p95 {stats.lag_percentile(0.95):,.0f} ms")
+
+    try:
+        stats = asyncio.run(replay(args.events, pipeline, sink, args.speed, args.rate, args.queue_size,
+                                   args.batch_size, args.batch_seconds, args.loop, args.time_field, args.limit,
+                                   None if args.json else progress))
+    except KeyboardInterrupt:
+        print("\n⚠️ Interrupted")
+        return 1
+    except (OSError, ValueError, pa.ArrowException) as e:
+        print(f"❌ {e}")
+        return 1
+    finally:
+        sink.close()
+
+    if args.json:
+        report = {k: v for k, v in asdict(stats).items() if k != "lag_ms"}
+        report.update(out=out, events_per_s=stats.events_per_s,
+                      lag_p50_ms=stats.lag_percentile(0.5), lag_p95_ms=stats.lag_percentile(0.95))
+        print(json.dumps(report, indent=2))
+    else:
+        print_stats(stats)
+        print(f"   Landed in {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,546 @@
+#!/usr/bin/env python3
+"""
+Incremental Refresh Policy Generator
+BMD_sales fact tables (Fact_Visit, Fact_UserOrders, Fact_RetailOrder)
+
+The fact tables are single import partitions, so every refresh reloads all
+history. For each table this:
+
+  1. picks the date column that drives the policy (visit_date_time,
+     CreatedAt, order_date, or --column) and traces it back through the
+     partition's renames to the source column name
+  2. finds the step that reads the fact's source table (e.g.
+     Source = #"public visits") and inserts a RangeStart/RangeEnd filter
+     right after it, rewiring later steps to the filtered table
+  3. re-runs the folding analyzer on the rewritten M and refuses to write
+     unless the filter folds to PostgreSQL (otherwise every partition would
+     still pull the full table into the mashup engine)
+  4. writes a `refreshPolicy` (rolling window + incremental window, with
+     an optional detect-data-changes polling expression) into the table's
+     TMDL, and RangeStart/RangeEnd parameters into expressions.tmdl
+
+Rows with a null date fall outside every partition once the filter is in
+place; --pg reports the column's type, range and null count before you
+commit to a policy (connection settings as in pg_bulk_loader.py).
+
+Without --write the planned TMDL changes are printed as a unified diff.
+
+Usage:
+    python scripts/incremental_refresh_policy.py
+    python scripts/incremental_refresh_policy.py --table Fact_Visit --rolling-periods 3 --incremental-periods 14
+    python scripts/incremental_refresh_policy.py --table Fact_UserOrders --detect-changes UpdatedAt --write
+    python scripts/incremental_refresh_policy.py --pg
+"""
+
+import argparse
+import difflib
+import os
+import re
+import sys
+import uuid
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+from m_folding_analyzer import FoldingAnalyzer
+from m_parser import MNode, MSyntaxError, parse_m, let_steps
+from tmdl_model import DEFINITION_PATH, TmdlModel, TmdlObject, load_model
+
+
+# Policy date column per fact table (model column names)
+DEFAULT_DATE_COLUMNS = {
+    "Fact_Visit": "visit_date_time",
+    "Fact_UserOrders": "CreatedAt",
+    "Fact_RetailOrder": "order_date",
+}
+
+GRANULARITIES = ("day", "month", "quarter", "year")
+FILTER_STEP_NAME = "FilteredByRefreshRange"
+RANGE_PARAMETERS = ("RangeStart", "RangeEnd")
+
+
+@dataclass
+class PolicySpec:
+    table: str
+    column: str                          # model column
+    column_type: Optional[str] = None    # datetime | date (None = infer from the name)
+    rolling_granularity: str = "year"
+    rolling_periods: int = 3
+    incremental_granularity: str = "day"
+    incremental_periods: int = 10
+    detect_changes: Optional[str] = None  # model column for the polling expression
+
+
+@dataclass
+class PolicyResult:
+    spec: PolicySpec
+    source_column: str = ""
+    polling_column: Optional[str] = None
+    root_step: str = ""
+    source_ref: str = ""                 # what the root step reads, e.g. public visits
+    source_table: Optional[str] = None
+    column_type: str = "datetime"
+    new_m: str = ""
+    filter_folds: bool = False
+    folding_note: str = ""
+    errors: List[str] = field(default_factory=list)
+    warnings: List[str] = field(default_factory=list)
+    stats: Dict[str, object] = field(default_factory=dict)
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+
+# =============================================================================
+# M rewriting
+# =============================================================================
+
+def _m_name(name: str) -> str:
+    return name if re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*", name) else '#"' + name.replace('"', '""') + '"'
+
+
+def _input_chain(expr: MNode) -> Tuple[List[MNode], Optional[MNode]]:
+    """Calls nested through first arguments (outermost first) and what the innermost one reads"""
+    calls = []
+    while expr.kind == "call" and expr.args:
+        calls.append(expr)
+        expr = expr.args[0]
+    return calls, expr
+
+
+def trace_source_column(steps: List[Tuple[str, MNode]], result_step: str, column: str) -> str:
+    """Follow Table.RenameColumns back from the result to the name the source uses"""
+    by_name = dict(steps)
+    name, step = column, result_step
+    seen = set()
+    while step in by_name and step not in seen:
+        seen.add(step)
+        calls, source = _input_chain(by_name[step])
+        for expr in calls:
+            if expr.call_name() == "Table.RenameColumns" and len(expr.args) > 1 and expr.args[1].kind == "list":
+                for pair in expr.args[1].children:
+                    if pair.kind == "list" and len(pair.children) == 2 \
+                            and all(c.kind == "literal" for c in pair.children) and pair.children[1].value == name:
+                        name = pair.children[0].value
+        step = source.value if source.kind == "ident" else None
+    return name
+
+
+def main_chain_root(steps: List[Tuple[str, MNode]], result_step: str, expressions: Dict[str, TmdlObject]) -> Optional[str]:
+    """The step that reads the partition's primary source, following first arguments back from the result"""
+    by_name = dict(steps)
+    step, seen = result_step, set()
+    while step in by_name and step not in seen:
+        seen.add(step)
+        expr = by_name[step]
+        if expr.kind == "ident" and expr.value in expressions:
+            return step
+        if expr.kind in ("field", "item"):
+            return step
+        _, source = _input_chain(expr)
+        if source.kind != "ident":
+            return None
+        if source.value not in by_name:
+            return step if source.value in expressions else None
+        step = source.value
+    return None
+
+
+def source_table_of(expr: MNode, expressions: Dict[str, TmdlObject]) -> Optional[str]:
+    """schema.table navigated to by a step, directly or through a shared expression"""
+    nodes = list(expr.walk())
+    if expr.kind == "ident" and expr.value in expressions:
+        try:
+            nodes = list(parse_m(expressions[expr.value].expression or "").walk())
+        except MSyntaxError:
+            return None
+    for node in nodes:
+        if node.kind == "item" and node.children[1].kind == "record":
+            fields = {k: v.value for k, v in node.children[1].record_fields().items() if v.kind == "literal"}
+            if "Item" in fields:
+                return f"{fields.get('Schema', 'public')}.{fields['Item']}"
+    return None
+
+
+def infer_column_type(source_column: str) -> str:
+    """visit_date_time / created_at / CreatedAt are timestamps; order_date is a date"""
+    if re.search(r"time|_at$|[a-z]At$", source_column, re.IGNORECASE if "_" in source_column else 0):
+        return "datetime"
+    return "date" if "date" in source_column.lower() else "datetime"
+
+
+def range_predicate(column: str, column_type: str) -> str:
+    field_ref = f"[{column}]" if re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*", column) else f'[#"{column}"]'
+    if column_type == "date":
+        return f"{field_ref} >= Date.From(RangeStart) and {field_ref} < Date.From(RangeEnd)"
+    return f"{field_ref} >= RangeStart and {field_ref} < RangeEnd"
+
+
+def add_range_filter(m_text: str, root: str, column: str, column_type: str) -> Tuple[str, str]:
+    """Insert the RangeStart/RangeEnd filter after `root` and point later steps at it"""
+    tree = parse_m(m_text)
+    step_names = {name for name, _ in let_steps(tree)}
+    filter_name = FILTER_STEP_NAME
+    n = 2
+    while filter_name in step_names:
+        filter_name = f"{FILTER_STEP_NAME}{n}"
+        n += 1
+
+    binding = next(b for b in tree.children[:-1] if b.value == root)
+    line_start = m_text.rfind("\n", 0, binding.start) + 1
+    indent = re.match(r"[ \t]*", m_text[line_start:]).group()
+
+    # Rewire references (back to front so offsets stay valid)
+    refs = sorted((n for n in tree.walk() if n.kind == "ident" and n.value == root), key=lambda n: -n.start)
+    text = m_text
+    insert_at = binding.children[0].end
+    for node in refs:
+        if node.start < insert_at:
+            continue
+        text = text[:node.start] + _m_name(filter_name) + text[node.end:]
+
+    step = (f",\n{indent}// Incremental refresh window; the service sets RangeStart/RangeEnd per partition\n"
+            f"{indent}{_m_name(filter_name)} = Table.SelectRows({_m_name(root)}, "
+            f"each {range_predicate(column, column_type)})")
+    return text[:insert_at] + step + text[insert_at:], filter_name
+
+
+def polling_expression(source_ref: str, column: str) -> str:
+    return (f"let\n    MaxChanged = List.Max({source_ref}[{column}])\nin\n    MaxChanged")
+
+
+def check_filter_folds(model: TmdlModel, table: str, partition: TmdlObject, new_m: str,
+                       filter_step: str) -> Tuple[bool, str]:
+    """Run the folding analyzer on the rewritten partition and report the filter step"""
+    original = partition.properties.get("source", "")
+    partition.properties["source"] = new_m
+    try:
+        report = FoldingAnalyzer(model).analyze(table)
+    finally:
+        partition.properties["source"] = original
+    if report.error:
+        return False, report.error
+    step = next((s for s in report.steps if s.name == filter_step), None)
+    if step is None:
+        return False, "filter step not found in the rewritten query"
+    if step.folds:
+        after = f"; folding later breaks at {report.first_break}" if report.first_break else ""
+        return True, f"filter folds to PostgreSQL{after}"
+    return False, step.reason or "filter does not fold"
+
+
+# =============================================================================
+# TMDL rendering
+# =============================================================================
+
+def _indent_block(text: str, tabs: int) -> List[str]:
+    prefix = "\t" * tabs
+    return [prefix + line if line.strip() else "" for line in text.split("\n")]
+
+
+def _tabs(line: str) -> int:
+    return len(line) - len(line.lstrip("\t"))
+
+
+def _source_block(lines: List[str], partition: TmdlObject) -> Tuple[int, int, int, bool]:
+    """(source line, body start, body end, fenced) of a partition's `source =` property"""
+    src = next(i for i in range(partition.line, len(lines)) if re.match(r"^\t+source\s*=", lines[i]))
+    fenced = lines[src].rstrip().endswith("```")
+    end = src + 1
+    if fenced:
+        while end < len(lines) and lines[end].strip() != "```":
+            end += 1
+    else:
+        while end < len(lines) and (not lines[end].strip() or _tabs(lines[end]) > _tabs(lines[src]) + 1):
+            end += 1
+        while end > src + 1 and not lines[end - 1].strip():
+            end -= 1
+    return src, src + 1, end, fenced
+
+
+def apply_m_edits(body: List[str], old_m: str, new_m: str) -> List[str]:
+    """
+    Apply an M rewrite to the raw TMDL body lines.
+
+    tmdl_model dedents and right-strips expression text, so unchanged lines
+    are copied from the file as they are and only edited or inserted lines
+    are re-indented.
+    """
+    lead = next((i for i, l in enumerate(body) if l.strip()), len(body))
+    cut = min((_tabs(l) for l in body if l.strip()), default=0)
+    raw = body[lead:]
+    old_lines, new_lines = old_m.split("\n"), new_m.split("\n")
+    out = body[:lead]
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    for op, i1, i2, j1, j2 in matcher.get_opcodes():
+        if op == "equal":
+            out.extend(raw[i1:i2])
+        else:
+            out.extend("\t" * cut + l if l.strip() else "" for l in new_lines[j1:j2])
+    return out + raw[len(old_lines):]
+
+
+def render_refresh_policy(result: PolicyResult, source_lines: List[str]) -> List[str]:
+    """refreshPolicy block; source_lines is the partition's `source =` property as written"""
+    spec = result.spec
+    lines = [
+        "\trefreshPolicy",
+        "\t\tpolicyType: basic",
+        f"\t\trollingWindowGranularity: {spec.rolling_granularity}",
+        f"\t\trollingWindowPeriods: {spec.rolling_periods}",
+        f"\t\tincrementalGranularity: {spec.incremental_granularity}",
+        f"\t\tincrementalPeriods: {spec.incremental_periods}",
+    ]
+    if result.polling_column:
+        polling = polling_expression(_m_name(result.source_ref), result.polling_column)
+        lines += ["\t\tpollingExpression ="] + _indent_block(polling, 4)
+    lines.append(re.sub(r"^\t+source", "\t\tsourceExpression", source_lines[0]))
+    return lines + source_lines[1:] + [""]
+
+
+def render_range_parameters(existing: Dict[str, TmdlObject], start: date, end: date) -> List[str]:
+    lines = []
+    for name, value in zip(RANGE_PARAMETERS, (start, end)):
+        if name in existing:
+            continue
+        lines += [
+            f"expression {name} = #datetime({value.year}, {value.month}, {value.day}, 0, 0, 0) "
+            f"meta [IsParameterQuery=true, Type=\"DateTime\", IsParameterQueryRequired=true]",
+            f"\tlineageTag: {uuid.uuid4()}",
+            "",
+            "\tannotation PBI_ResultType = DateTime",
+            "",
+        ]
+    return lines
+
+
+def rewrite_table_file(text: str, partition: TmdlObject, result: PolicyResult) -> str:
+    """Rewrite the partition source and put the refreshPolicy in front of the partition"""
+    lines = text.split("\n")
+    src, body_start, body_end, fenced = _source_block(lines, partition)
+    lines[body_start:body_end] = apply_m_edits(lines[body_start:body_end], partition.prop("source", ""), result.new_m)
+    _, _, body_end, _ = _source_block(lines, partition)
+    source_lines = lines[src:body_end + (1 if fenced else 0)]
+
+    p_index = partition.line - 1
+    start = next((i for i, l in enumerate(lines) if l.startswith("\trefreshPolicy")), None)
+    if start is not None:
+        # An existing policy is replaced
+        stop = start + 1
+        while stop < len(lines) and (not lines[stop].strip() or lines[stop].startswith("\t\t")):
+            stop += 1
+        del lines[start:stop]
+        if start < p_index:
+            p_index -= stop - start
+    lines[p_index:p_index] = render_refresh_policy(result, source_lines)
+    return "\n".join(lines)
+
+
+# =============================================================================
+# Planning
+# =============================================================================
+
+def pick_date_column(table: TmdlObject, requested: Optional[str]) -> Optional[str]:
+    if requested:
+        return requested if table.child("column", requested) else None
+    default = DEFAULT_DATE_COLUMNS.get(table.name)
+    if default and table.child("column", default):
+        return default
+    dated = [c.name for c in table.columns if c.prop("dataType") == "dateTime" and c.prop("sourceColumn")]
+    for hint in ("date_time", "order_date", "date", "created"):
+        for name in dated:
+            if hint in name.lower():
+                return name
+    return dated[0] if dated else None
+
+
+def plan_policy(model: TmdlModel, spec: PolicySpec) -> PolicyResult:
+    result = PolicyResult(spec)
+    table = model.tables.get(spec.table)
+    if table is None:
+        result.errors.append(f"table {spec.table} not found")
+        return result
+    partitions = [p for p in table.partitions if (p.expression or "").strip() == "m"]
+    if len(partitions) != 1:
+        result.errors.append(f"expected one M partition, found {len(partitions)}")
+        return result
+    partition = partitions[0]
+
+    column = pick_date_column(table, spec.column)
+    if column is None:
+        result.errors.append(f"no date column {spec.column or ''} found".replace("  ", " "))
+        return result
+    spec.column = column
+    source_column = table.child("column", column).prop("sourceColumn") or column
+
+    m_text = partition.prop("source", "")
+    try:
+        tree = parse_m(m_text)
+    except MSyntaxError as e:
+        result.errors.append(f"partition M does not parse: {e}")
+        return result
+    steps = let_steps(tree)
+    result_step = tree.children[-1].value if tree.kind == "let" and tree.children[-1].kind == "ident" else None
+    if result_step is None:
+        result.errors.append("partition does not end in a step reference")
+        return result
+
+    if any(n.kind == "ident" and n.value in RANGE_PARAMETERS for n in tree.walk()):
+        result.errors.append("partition already filters on RangeStart/RangeEnd")
+        return result
+
+    root = main_chain_root(steps, result_step, model.expressions)
+    if root is None:
+        result.errors.append("could not find the step that reads the source table")
+        return result
+    result.root_step = root
+    root_expr = dict(steps)[root]
+    result.source_ref = root_expr.value if root_expr.kind == "ident" and root_expr.value in model.expressions else root
+    result.source_table = source_table_of(dict(steps)[root], model.expressions)
+    result.source_column = trace_source_column(steps, result_step, source_column)
+    result.column_type = spec.column_type or infer_column_type(result.source_column)
+    if spec.detect_changes:
+        polled = table.child("column", spec.detect_changes)
+        if polled is None:
+            result.warnings.append(f"{spec.detect_changes} is not a model column; polling the source column as named")
+        name = polled.prop("sourceColumn") if polled else spec.detect_changes
+        result.polling_column = trace_source_column(steps, result_step, name or spec.detect_changes)
+
+    result.new_m, filter_step = add_range_filter(m_text, root, result.source_column, result.column_type)
+    result.filter_folds, result.folding_note = check_filter_folds(model, table.name, partition, result.new_m, filter_step)
+    if not result.filter_folds:
+        result.errors.append(f"date filter does not fold: {result.folding_note}")
+    return result
+
+
+def analyze_source_column(result: PolicyResult) -> None:
+    """Column type, range and null count from PostgreSQL (one scan of the column)"""
+    import psycopg2
+    from pg_bulk_loader import PgConfig, quote_ident
+
+    schema, _, table = (result.source_table or "").rpartition(".")
+    if not table:
+        result.warnings.append("source table unknown; skipped PostgreSQL analysis")
+        return
+    column = result.source_column
+    with psycopg2.connect(**PgConfig.from_env().connect_kwargs()) as conn, conn.cursor() as cur:
+        cur.execute("SELECT data_type FROM information_schema.columns "
+                    "WHERE table_schema = %s AND table_name = %s AND column_name = %s",
+                    (schema or "public", table, column))
+        row = cur.fetchone()
+        if row is None:
+            result.errors.append(f"{result.source_table} has no column {column}")
+            return
+        data_type = row[0]
+        col = quote_ident(column)
+        cur.execute(f"SELECT min({col}), max({col}), count(*) - count({col}), count(*) "
+                    f"FROM {quote_ident(schema or 'public')}.{quote_ident(table)}")
+        low, high, nulls, total = cur.fetchone()
+    result.stats = {"data_type": data_type, "min": str(low), "max": str(high), "nulls": nulls, "rows": total}
+    actual = "date" if data_type == "date" else "datetime"
+    if result.spec.column_type is None and actual != result.column_type:
+        result.warnings.append(f"{column} is {data_type}; rerun with --column-type {actual}")
+    if nulls:
+        result.warnings.append(f"{nulls:,} of {total:,} rows have a null {column} and would not be loaded")
+    if low is not None:
+        span_years = date.today().year - low.year + 1
+        if result.spec.rolling_granularity == "year" and span_years > result.spec.rolling_periods:
+            result.warnings.append(f"data starts in {low.year}; a {result.spec.rolling_periods}-year window "
+                                   f"drops the oldest {span_years - result.spec.rolling_periods} year(s)")
+
+
+# =============================================================================
+# CLI
+# =============================================================================
+
+def _diff(path: str, old: str, new: str) -> str:
+    rel = os.path.relpath(path)
+    return "".join(difflib.unified_diff(old.splitlines(True), new.splitlines(True), f"a/{rel}", f"b/{rel}"))
+
+
+def main():
+    today = date.today()
+    parser = argparse.ArgumentParser(description="Generate incremental refresh policies for fact tables")
+    parser.add_argument("definition", nargs="?", default=DEFINITION_PATH, help="SemanticModel definition folder")
+    parser.add_argument("--table", "-t", action="append", default=[], help="Fact table (default: the three facts)")
+    parser.add_argument("--column", help="Model date column driving the policy")
+    parser.add_argument("--column-type", choices=("datetime", "date"), help="Source column type (default: inferred)")
+    parser.add_argument("--rolling-granularity", default="year", choices=GRANULARITIES)
+    parser.add_argument("--rolling-periods", type=int, default=3, help="History kept (default 3)")
+    parser.add_argument("--incremental-granularity", default="day", choices=GRANULARITIES)
+    parser.add_argument("--incremental-periods", type=int, default=10, help="Recent periods refreshed (default 10)")
+    parser.add_argument("--detect-changes", help="Model column (e.g. updated_at) for a detect-data-changes poll")
+    parser.add_argument("--desktop-start", default=date(today.year, today.month, 1).isoformat(),
+                        help="RangeStart value used by Desktop (default: first of this month)")
+    parser.add_argument("--desktop-end", default=date(today.year + today.month // 12, today.month % 12 + 1, 1).isoformat(),
+                        help="RangeEnd value used by Desktop (default: first of next month)")
+    parser.add_argument("--pg", action="store_true", help="Check the source column in PostgreSQL")
+    parser.add_argument("--write", action="store_true", help="Write the TMDL changes (default: print a diff)")
+    args = parser.parse_args()
+
+    model = load_model(args.definition)
+    tables = args.table or list(DEFAULT_DATE_COLUMNS)
+    results = []
+    for name in tables:
+        spec = PolicySpec(name, args.column or "", args.column_type, args.rolling_granularity, args.rolling_periods,
+                          args.incremental_granularity, args.incremental_periods, args.detect_changes)
+        result = plan_policy(model, spec)
+        if result.ok and args.pg:
+            try:
+                analyze_source_column(result)
+            except Exception as e:
+                result.warnings.append(f"PostgreSQL analysis failed: {e}")
+        results.append(result)
+
+    for r in results:
+        status = "✅" if r.ok else "❌"
+        print(f"{status} {r.spec.table}: {r.spec.column} -> {r.source_table or '?'}.{r.source_column or '?'} "
+              f"({r.column_type}), filter after step {r.root_step or '?'}")
+        if r.folding_note:
+            print(f"   {r.folding_note}")
+        if r.stats:
+            print(f"   {r.stats['data_type']}, {r.stats['min']} .. {r.stats['max']}, "
+                  f"{r.stats['rows']:,} rows, {r.stats['nulls']:,} null")
+        for w in r.warnings:
+            print(f"   ⚠️ {w}")
+        for e in r.errors:
+            print(f"   ❌ {e}")
+
+    ready = [r for r in results if r.ok]
+    if not ready:
+        return 1
+
+    changes: Dict[str, Tuple[str, str]] = {}
+    for r in ready:
+        table = model.tables[r.spec.table]
+        partition = next(p for p in table.partitions if (p.expression or "").strip() == "m")
+        path = partition.path
+        old = changes[path][1] if path in changes else open(path, "r", encoding="utf-8-sig").read()
+        changes[path] = (changes.get(path, (old, old))[0], rewrite_table_file(old, partition, r))
+
+    expressions_path = os.path.join(model.path, "expressions.tmdl")
+    with open(expressions_path, "r", encoding="utf-8-sig") as f:
+        old_expr = f.read()
+    params = render_range_parameters(model.expressions, date.fromisoformat(args.desktop_start),
+                                     date.fromisoformat(args.desktop_end))
+    if params:
+        changes[expressions_path] = (old_expr, old_expr.rstrip("\n") + "\n\n" + "\n".join(params))
+
+    if not args.write:
+        for path, (old, new) in changes.items():
+            sys.stdout.write(_diff(path, old, new))
+        print(f"\n{len(ready)} polic{'y' if len(ready) == 1 else 'ies'} planned; rerun with --write to apply")
+        return 0 if len(ready) == len(results) else 1
+
+    for path, (_, new) in changes.items():
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(new)
+        os.replace(tmp, path)
+        print(f"✅ Wrote {os.path.relpath(path)}")
+    return 0 if len(ready) == len(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+Shared-Source Deduplication Report
+BMD_sales M partitions and shared expressions
+
+Finds transformations that several partitions compute independently, such
+as the users_territory "first territory per user" grouping that Fact_Visit,
+Dim_User and others each derive from #"public users_territory".
+
+Every step is hashed as a Merkle tree of its normalised syntax: step names
+and formatting are erased, and references to other steps or queries are
+replaced by the hash of their own definition. Two steps therefore match
+when they compute the same thing from the same source, even if one reads
+#"public visits" and the other navigates PostgreSQL.Database(...) inline.
+A second, looser hash also ignores text literals (output column names,
+filter constants) to surface near-identical derivations.
+
+For each duplicate the report proposes where to share it:
+  * folded steps -> a shared staging expression (keeps the SQL pushed down;
+    every partition still sends its own query)
+  * steps evaluated in the mashup engine -> a Lakehouse table loaded once
+    (pg_bulk_loader.py / semantic_model_export.py), since a shared M
+    expression is re-evaluated by every partition that references it
+
+Duplicated source reads per refresh are counted per source table, and in
+rows when counts are supplied (same JSON format as m_folding_analyzer.py).
+
+Usage:
+    python scripts/m_dedup_report.py
+    python scripts/m_dedup_report.py --near --min-queries 3
+    python scripts/m_dedup_report.py --row-counts counts.json --json
+    python scripts/m_dedup_report.py --show-m      # print proposed staging M
+"""
+
+import argparse
+import hashlib
+import json
+import re
+import sys
+import textwrap
+from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional, Set, Tuple
+
+from m_folding_analyzer import FoldingAnalyzer, SCALAR_TABLE_FUNCTIONS
+from m_parser import MNode, MSyntaxError, parse_m, let_steps
+from tmdl_model import DEFINITION_PATH, TmdlModel, load_model
+
+
+# Steps that are plain source navigation are shared expressions already
+TRIVIAL_FUNCTIONS = {"PostgreSQL.Database", "Table.Buffer"}
+
+
+@dataclass
+class StepInfo:
+    query: str
+    step: str
+    function: str
+    exact: str
+    near: str
+    tables: Tuple[str, ...]
+    deps: Tuple[str, ...]                # local steps this step reads
+    start: int
+    end: int
+
+
+@dataclass
+class Duplicate:
+    key: str
+    match: str                           # exact | near
+    function: str
+    occurrences: List[Tuple[str, str]]   # (query, step)
+    tables: List[str]
+    folds: bool
+    proposal: str
+    staging_name: str
+    duplicate_reads: int                 # extra source-table reads per refresh
+    duplicate_rows: Optional[int] = None
+    staging_m: str = ""
+
+    @property
+    def queries(self) -> List[str]:
+        return sorted({q for q, _ in self.occurrences})
+
+
+def _digest(*parts: str) -> str:
+    return hashlib.sha1("\x1f".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+class StepHasher:
+    """Merkle hashes of every let step across the model's M queries"""
+
+    def __init__(self, model: TmdlModel):
+        self.model = model
+        self.sources = model.m_sources()
+        self.trees: Dict[str, MNode] = {}
+        self.steps: Dict[str, Dict[str, MNode]] = {}
+        self.errors: Dict[str, str] = {}
+        for name, text in self.sources.items():
+            try:
+                tree = parse_m(text)
+            except MSyntaxError as e:
+                self.errors[name] = str(e)
+                continue
+            self.trees[name] = tree
+            self.steps[name] = dict(let_steps(tree))
+        self._memo: Dict[Tuple[str, str, bool], Tuple[str, Tuple[str, ...]]] = {}
+        self._active: Set[Tuple[str, str, bool]] = set()
+
+    def query_hash(self, query: str, near: bool) -> Tuple[str, Tuple[str, ...]]:
+        tree = self.trees.get(query)
+        if tree is None:
+            return _digest("unparsed", query), ()
+        body = tree.children[-1] if tree.kind == "let" else tree
+        return self._hash(body, query, near)
+
+    def step_hash(self, query: str, step: str, near: bool) -> Tuple[str, Tuple[str, ...]]:
+        key = (query, step, near)
+        if key in self._memo:
+            return self._memo[key]
+        if key in self._active:
+            return _digest("cycle", query, step), ()
+        self._active.add(key)
+        result = self._hash(self.steps[query][step], query, near)
+        self._active.discard(key)
+        self._memo[key] = result
+        return result
+
+    def _hash(self, node: MNode, query: str, near: bool, navigation: bool = False) -> Tuple[str, Tuple[str, ...]]:
+        """(hash, source tables) with references inlined"""
+        if node.kind == "ident":
+            if node.value in self.steps.get(query, {}):
+                return self.step_hash(query, node.value, near)
+            if node.value in self.trees and node.value != query:
+                return self.query_hash(node.value, near)
+            return _digest("ident", node.value), ()
+
+        tables: Set[str] = set()
+        if node.kind == "item" and node.children[1].kind == "record":
+            fields = {k: v.value for k, v in node.children[1].record_fields().items() if v.kind == "literal"}
+            if fields.get("Item"):
+                tables.add(f"{fields.get('Schema', 'public')}.{fields['Item']}")
+            navigation = True
+
+        value = "" if node.value is None else str(node.value)
+        if near and not navigation:
+            # Near matches ignore output names and text constants
+            if node.kind == "literal" and node.value not in ("true", "false", "null") \
+                    and not re.fullmatch(r"-?[\d.]+", value):
+                value = "<text>"
+            elif node.kind == "field_def":
+                value = "<name>"
+        child_hashes = []
+        for c in node.children:
+            h, t = self._hash(c, query, near, navigation)
+            child_hashes.append(h)
+            tables |= set(t)
+        return _digest(node.kind, str(value), *child_hashes), tuple(sorted(tables))
+
+    def step_infos(self) -> List[StepInfo]:
+        infos = []
+        for query, steps in self.steps.items():
+            for step, expr in steps.items():
+                exact, tables = self.step_hash(query, step, False)
+                near, _ = self.step_hash(query, step, True)
+                deps = tuple(sorted({n.value for n in expr.walk()
+                                     if n.kind == "ident" and n.value in steps and n.value != step}))
+                infos.append(StepInfo(query, step, expr.call_name() or expr.kind, exact, near,
+                                      tables, deps, expr.start, expr.end))
+        return infos
+
+
+def _staging_name(function: str, tables: List[str]) -> str:
+    base = "_".join(t.split(".")[-1] for t in tables[:2]) or "local"
+    verb = function.split(".")[-1].lower() if function else "step"
+    return f"stg_{base}_{verb}"
+
+
+def _staging_m(hasher: StepHasher, query: str, step: str) -> str:
+    """Let expression reproducing a step and the local steps it depends on"""
+    steps = hasher.steps[query]
+    needed, stack = [], [step]
+    while stack:
+        s = stack.pop()
+        if s in needed:
+            continue
+        needed.append(s)
+        stack.extend(n.value for n in steps[s].walk() if n.kind == "ident" and n.value in steps)
+    text = hasher.sources[query]
+    order = [s for s in steps if s in needed]
+    lines = []
+    for s in order:
+        node = steps[s]
+        name = s if re.fullmatch(r"[A-Za-z_][A-Za-z0-9_.]*", s) else '#"' + s.replace('"', '""') + '"'
+        first, _, rest = text[node.start:node.end].strip().partition("\n")
+        body = first + ("\n" + textwrap.indent(textwrap.dedent(rest.expandtabs(4)), "    ") if rest else "")
+        lines.append(f"    {name} = {body}")
+    last = order[-1] if re.fullmatch(r"[A-Za-z_][A-Za-z0-9_.]*", order[-1]) else '#"' + order[-1] + '"'
+    return "let\n" + ",\n".join(lines) + f"\nin\n    {last}"
+
+
+def find_duplicates(model: TmdlModel, row_counts: Optional[Dict[str, int]] = None,
+                    near: bool = False, min_queries: int = 2) -> Tuple[List[Duplicate], StepHasher]:
+    hasher = StepHasher(model)
+    folding = FoldingAnalyzer(model, row_counts)
+    counts = {k.lower(): v for k, v in (row_counts or {}).items()}
+    infos = [i for i in hasher.step_infos()
+             if i.function.startswith("Table.") and i.tables
+             and i.function not in TRIVIAL_FUNCTIONS and i.function not in SCALAR_TABLE_FUNCTIONS]
+
+    groups: Dict[Tuple[str, str], List[StepInfo]] = {}
+    for info in infos:
+        groups.setdefault(("exact", info.exact), []).append(info)
+        if near:
+            groups.setdefault(("near", info.near), []).append(info)
+
+    candidates = {}
+    for (match, key), members in groups.items():
+        if len({m.query for m in members}) < min_queries:
+            continue
+        if match == "near" and len({m.exact for m in members}) == 1:
+            continue                     # already reported as an exact match
+        candidates[(match, key)] = members
+
+    # Keep maximal duplicates: drop a group whose steps all feed a step of
+    # another duplicate group spanning the same queries
+    covered: Set[Tuple[str, str]] = set()
+    for (match, key), members in candidates.items():
+        queries = {m.query for m in members}
+        for other_key, others in candidates.items():
+            if other_key == (match, key) or {o.query for o in others} != queries:
+                continue
+            if all(any(m.step in o.deps and o.query == m.query for o in others) for m in members):
+                covered.add((match, key))
+                break
+
+    duplicates = []
+    for (match, key), members in candidates.items():
+        if (match, key) in covered:
+            continue
+        first = members[0]
+        tables = sorted({t for m in members for t in m.tables})
+        folds = all(next((s.folds for s in folding.analyze(m.query).steps if s.name == m.step), False)
+                    for m in members)
+        extra = len(members) - 1
+        per_read = [counts.get(t.lower()) for t in first.tables]
+        rows = extra * sum(per_read) if per_read and all(r is not None for r in per_read) else None
+        proposal = ("shared staging expression (folds to PostgreSQL)" if folds
+                    else "Lakehouse table loaded once (evaluated in the mashup engine)")
+        duplicates.append(Duplicate(
+            key, match, first.function,
+            sorted((m.query, m.step) for m in members), tables, folds, proposal,
+            _staging_name(first.function, list(first.tables)),
+            duplicate_reads=extra * len(first.tables), duplicate_rows=rows,
+            staging_m=_staging_m(hasher, first.query, first.step),
+        ))
+    duplicates.sort(key=lambda d: (-(d.duplicate_rows or 0), -d.duplicate_reads, d.staging_name))
+
+    # Disambiguate proposed names
+    seen: Dict[str, int] = {}
+    for d in duplicates:
+        seen[d.staging_name] = seen.get(d.staging_name, 0) + 1
+        if seen[d.staging_name] > 1:
+            d.staging_name += f"_{seen[d.staging_name]}"
+    return duplicates, hasher
+
+
+def source_reads(hasher: StepHasher) -> Dict[str, List[str]]:
+    """Source table -> partitions that read it during a full model refresh"""
+    reads: Dict[str, Set[str]] = {}
+    for query in hasher.trees:
+        if query in hasher.model.expressions:
+            continue
+        _, tables = hasher.query_hash(query, False)
+        for step in hasher.steps.get(query, {}):
+            tables += hasher.step_hash(query, step, False)[1]
+        for t in set(tables):
+            reads.setdefault(t, set()).add(query)
+    return {t: sorted(q) for t, q in reads.items()}
+
+
+# =============================================================================
+# CLI
+# =============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Find duplicated M transformations across partitions")
+    parser.add_argument("definition", nargs="?", default=DEFINITION_PATH, help="SemanticModel definition folder")
+    parser.add_argument("--near", action="store_true", help="Also match steps that differ only in text literals")
+    parser.add_argument("--min-queries", type=int, default=2, help="Minimum partitions sharing a step (default 2)")
+    parser.add_argument("--row-counts", help='JSON file of {"schema.table": rows}')
+    parser.add_argument("--show-m", action="store_true", help="Print the proposed staging expression M")
+    parser.add_argument("--json", action="store_true", help="Output JSON")
+    args = parser.parse_args()
+
+    model = load_model(args.definition)
+    row_counts = {}
+    if args.row_counts:
+        with open(args.row_counts, "r", encoding="utf-8") as f:
+            row_counts = json.load(f)
+    duplicates, hasher = find_duplicates(model, row_counts, args.near, args.min_queries)
+    reads = source_reads(hasher)
+
+    if args.json:
+        print(json.dumps({
+            "duplicates": [dict(asdict(d), queries=d.queries) for d in duplicates],
+            "source_reads": reads,
+            "unparsed": hasher.errors,
+        }, indent=2))
+        return 0
+
+    print(f"Duplicated transformations ({len(duplicates)})")
+    print("=" * 70)
+    for d in duplicates:
+        rows = f", ~{d.duplicate_rows:,} rows" if d.duplicate_rows is not None else ""
+        print(f"\n{'≈' if d.match == 'near' else '='} {d.function} over {', '.join(d.tables)} "
+              f"in {len(d.queries)} partitions")
+        for query, step in d.occurrences:
+            print(f"    {query} / {step}")
+        print(f"  → {d.proposal}: {d.staging_name}")
+        print(f"  Duplicated source reads per refresh: {d.duplicate_reads}{rows}")
+        if args.show_m:
+            print("  " + d.staging_m.replace("\n", "\n  "))
+
+    multi = sorted(((t, q) for t, q in reads.items() if len(q) > 1), key=lambda x: (-len(x[1]), x[0]))
+    print(f"\nSource tables read by more than one partition ({len(multi)})")
+    print("=" * 70)
+    for table, queries in multi:
+        rows = row_counts.get(table)
+        extra = f"  (~{(len(queries) - 1) * rows:,} extra rows)" if rows is not None else ""
+        print(f"  {table:36s} {len(queries):3d} reads{extra}")
+    total = sum(len(q) - 1 for _, q in multi)
+    print(f"\nRedundant source reads per full refresh: {total}")
+    for name, err in hasher.errors.items():
+        print(f"❌ {name}: {err}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,492 @@
+#!/usr/bin/env python3
+"""
+Power Query Folding Analyzer
+BMD_sales M partitions against the PostgreSQL source
+
+Walks every M partition's `let` chain offline and classifies each step as
+folding (still part of the SQL sent to PostgreSQL) or evaluated locally in
+the mashup engine, finds the first step that breaks folding and why, and
+estimates how many rows cross from PostgreSQL into the engine at each
+break. Shared expressions (#"public visits", ...) and references between
+queries are followed, so a partition built on a folded expression is
+analysed end to end.
+
+Folding rules are modelled on the PostgreSQL connector: row filters,
+projections, renames, type changes, sorts, distinct, same-source joins and
+groupings with SQL aggregates fold; Table.Buffer, index columns,
+List.First aggregations, culture-dependent date names and other functions
+without a SQL translation do not. They are heuristics - confirm a specific
+step with "View Native Query" or Query Diagnostics in Power BI Desktop.
+
+Row estimates come from a JSON file ({"public.visits": 54155, ...}) or,
+with --pg, from pg_class.reltuples (no table scans; see pg_bulk_loader.py
+for connection settings). Without them, pulled rows are reported per
+source table.
+
+Usage:
+    python scripts/m_folding_analyzer.py
+    python scripts/m_folding_analyzer.py --table Fact_Visit --table Dim_User
+    python scripts/m_folding_analyzer.py --row-counts counts.json --json
+    python scripts/m_folding_analyzer.py --pg
+"""
+
+import argparse
+import json
+import sys
+from dataclasses import dataclass, field, asdict, replace
+from typing import Dict, List, Optional, Set, Tuple
+
+from m_parser import MNode, MSyntaxError, parse_m, let_steps
+from tmdl_model import DEFINITION_PATH, TmdlModel, load_model
+
+
+# Table functions the PostgreSQL connector can translate to SQL, given
+# foldable inputs and lambdas
+FOLDABLE_TABLE_FUNCTIONS = {
+    "Table.SelectRows", "Table.SelectColumns", "Table.RemoveColumns",
+    "Table.RenameColumns", "Table.ReorderColumns", "Table.TransformColumnTypes",
+    "Table.Sort", "Table.Distinct", "Table.FirstN", "Table.Skip", "Table.Range",
+    "Table.Group", "Table.NestedJoin", "Table.Join", "Table.ExpandTableColumn",
+    "Table.AddColumn", "Table.DuplicateColumn", "Table.Combine",
+    "Table.ReplaceValue", "Table.RemoveRowsWithErrors", "Table.SelectRowsWithErrors",
+}
+
+# Functions that always pull their input into the mashup engine
+BREAKING_TABLE_FUNCTIONS = {
+    "Table.Buffer": "Table.Buffer materialises its input in the mashup engine",
+    "Table.AddIndexColumn": "index columns have no SQL translation",
+    "Table.FillDown": "fill down is row-order dependent",
+    "Table.FillUp": "fill up is row-order dependent",
+    "Table.PromoteHeaders": "header promotion is evaluated locally",
+    "Table.Pivot": "pivot is not folded by the PostgreSQL connector",
+    "Table.Unpivot": "unpivot is not folded by the PostgreSQL connector",
+    "Table.UnpivotOtherColumns": "unpivot is not folded by the PostgreSQL connector",
+    "Table.TransformColumns": "arbitrary column transforms are evaluated locally",
+    "Table.SplitColumn": "column splitting is evaluated locally",
+    "Table.ExpandRecordColumn": "record expansion is evaluated locally",
+    "Table.ExpandListColumn": "list expansion is evaluated locally",
+    "Table.Transpose": "transpose is evaluated locally",
+    "Table.ReverseRows": "row reversal is evaluated locally",
+    "Table.FromColumns": "table constructed locally",
+}
+
+# Table functions returning scalars/metadata rather than tables
+SCALAR_TABLE_FUNCTIONS = {
+    "Table.RowCount", "Table.ColumnNames", "Table.IsEmpty", "Table.FirstValue",
+    "Table.Column", "Table.ToRecords", "Table.ToRows", "Table.ToList", "Table.Schema",
+    "Table.Contains", "Table.First", "Table.Last", "Table.Max", "Table.Min",
+}
+
+# Functions allowed inside folded lambdas (each ..., Table.Group aggregates)
+FOLDABLE_SCALAR_FUNCTIONS = {
+    "Text.From", "Text.Upper", "Text.Lower", "Text.Trim", "Text.Start", "Text.End",
+    "Text.Length", "Text.Contains", "Text.StartsWith", "Text.EndsWith", "Text.Middle",
+    "Text.Range", "Text.Replace", "Text.Combine",
+    "Number.From", "Number.Round", "Number.RoundUp", "Number.RoundDown", "Number.Abs",
+    "Number.Mod", "Number.IntegerDivide", "Int64.From", "Int32.From", "Decimal.From",
+    "Double.From", "Value.Equals",
+    "Date.From", "Date.Year", "Date.Month", "Date.Day", "Date.QuarterOfYear",
+    "Date.DayOfWeek", "Date.DayOfYear", "Date.AddDays", "Date.AddMonths", "Date.AddYears",
+    "DateTime.Date", "DateTime.Time", "DateTime.From", "Duration.Days",
+    "List.Sum", "List.Count", "List.Min", "List.Max", "List.Average",
+    "List.NonNullCount", "List.Contains", "Table.RowCount",
+}
+
+# Sources that never fold
+LOCAL_SOURCES = {
+    "GoogleSheets.Contents", "Excel.Workbook", "Csv.Document", "Web.Contents",
+    "Json.Document", "Xml.Tables", "SharePoint.Files", "Folder.Files", "File.Contents",
+}
+LOCAL_TABLE_CONSTRUCTORS = {"#table", "Table.FromRecords", "Table.FromList", "Table.FromRows", "Table.FromValue"}
+
+
+@dataclass
+class Flow:
+    """What a step or expression evaluates to, as far as folding is concerned"""
+    kind: str = "value"                 # table | database | function | value
+    folds: bool = False
+    source: Optional[str] = None
+    tables: Tuple[str, ...] = ()
+    rows: Optional[int] = None
+    origin: str = ""
+    reason: str = ""
+
+
+@dataclass
+class StepReport:
+    name: str
+    function: str
+    folds: Optional[bool]               # None for non-table steps
+    reason: str = ""
+    rows: Optional[int] = None
+    pulled_rows: Optional[int] = None
+    pulled_from: List[str] = field(default_factory=list)
+
+    @property
+    def status(self) -> str:
+        return "·" if self.folds is None else ("✅" if self.folds else "❌")
+
+
+@dataclass
+class FoldingReport:
+    name: str
+    kind: str                            # partition | expression
+    steps: List[StepReport] = field(default_factory=list)
+    source: Optional[str] = None
+    tables: List[str] = field(default_factory=list)
+    result_folds: bool = False
+    first_break: Optional[str] = None
+    break_reason: str = ""
+    pulled_rows: int = 0
+    pulled_unknown: List[str] = field(default_factory=list)
+    error: Optional[str] = None
+
+
+def _called_functions(node: MNode) -> Set[str]:
+    return {n.call_name() for n in node.walk() if n.call_name()}
+
+
+def _lambdas(node: MNode) -> List[MNode]:
+    return [n for n in node.walk() if n.kind in ("each", "function")]
+
+
+class FoldingAnalyzer:
+    """
+    Evaluates query-folding state over the model's M queries.
+
+    Queries are analysed lazily and memoised, so a shared expression used by
+    many partitions is walked once.
+    """
+
+    def __init__(self, model: TmdlModel, row_counts: Optional[Dict[str, int]] = None):
+        self.model = model
+        self.sources = model.m_sources()
+        self.row_counts = {k.lower(): v for k, v in (row_counts or {}).items()}
+        self.reports: Dict[str, FoldingReport] = {}
+        self._results: Dict[str, Flow] = {}
+        self._in_progress: Set[str] = set()
+
+    # -- public API ----------------------------------------------------------
+
+    def analyze(self, name: str) -> FoldingReport:
+        if name in self.reports:
+            return self.reports[name]
+        kind = "expression" if name in self.model.expressions else "partition"
+        report = FoldingReport(name, kind)
+        self.reports[name] = report
+        self._in_progress.add(name)
+        try:
+            tree = parse_m(self.sources[name])
+        except MSyntaxError as e:
+            report.error = f"parse error: {e}"
+            self._results[name] = Flow(origin=name)
+            self._in_progress.discard(name)
+            return report
+
+        env: Dict[str, Flow] = {}
+        pulled_seen: Set[str] = set()
+        steps = let_steps(tree)
+        for step_name, expr in steps:
+            step = self._step(name, step_name, expr, env, pulled_seen)
+            report.steps.append(step)
+        result = self._eval(tree.children[-1], env, name, "(result)") if tree.kind == "let" else env.get("(expression)", Flow())
+
+        self._results[name] = result
+        self._in_progress.discard(name)
+        report.result_folds = result.kind == "table" and result.folds
+        report.source = result.source
+        report.tables = sorted(set(result.tables) | {t for s in report.steps for t in s.pulled_from})
+        for step in report.steps:
+            if step.folds is False and report.first_break is None:
+                report.first_break, report.break_reason = step.name, step.reason
+            if step.pulled_rows is not None:
+                report.pulled_rows += step.pulled_rows
+        report.pulled_unknown = sorted({t for s in report.steps if s.pulled_rows is None for t in s.pulled_from})
+        return report
+
+    def analyze_all(self, include_expressions: bool = False) -> List[FoldingReport]:
+        names = [n for n in self.sources if include_expressions or n not in self.model.expressions]
+        return [self.analyze(n) for n in names]
+
+    # -- evaluation ----------------------------------------------------------
+
+    def _rows(self, tables: Tuple[str, ...]) -> Optional[int]:
+        counts = [self.row_counts.get(t.lower()) for t in tables]
+        return sum(counts) if counts and all(c is not None for c in counts) else None
+
+    def _step(self, query: str, name: str, expr: MNode, env: Dict[str, Flow], pulled_seen: Set[str]) -> StepReport:
+        fn = expr.call_name() or ("#" + expr.kind if expr.kind != "ident" else expr.value)
+        inputs: List[Flow] = []
+        flow = replace(self._eval(expr, env, query, name, inputs), origin=f"{query}/{name}")
+        env[name] = flow
+
+        step = StepReport(name, fn, flow.folds if flow.kind in ("table", "database") else None,
+                          reason=flow.reason, rows=flow.rows)
+        pulled: List[Optional[int]] = []
+        if flow.kind == "table" and not flow.folds:
+            # Every folded input consumed here is fetched in full by the engine
+            for inp in inputs:
+                if inp.kind == "table" and inp.folds and inp.origin not in pulled_seen:
+                    pulled_seen.add(inp.origin)
+                    step.pulled_from.extend(inp.tables)
+                    pulled.append(inp.rows)
+            if pulled and all(r is not None for r in pulled):
+                step.pulled_rows = sum(pulled)
+        return step
+
+    def _lookup(self, name: str, env: Dict[str, Flow]) -> Flow:
+        if name in env:
+            return env[name]
+        if name in self.sources:
+            if name in self._in_progress:
+                return Flow("table", reason=f"circular reference to {name}")
+            self.analyze(name)
+            result = self._results[name]
+            return Flow(result.kind, result.folds, result.source, result.tables, result.rows,
+                        origin=name, reason=result.reason)
+        return Flow("value")
+
+    def _eval(self, node: MNode, env: Dict[str, Flow], query: str, step: str,
+              inputs: Optional[List[Flow]] = None) -> Flow:
+        inputs = inputs if inputs is not None else []
+        kind = node.kind
+
+        if kind == "ident":
+            flow = self._lookup(node.value, env)
+            inputs.append(flow)
+            return flow
+        if kind == "let":
+            inner = dict(env)
+            for b in node.children[:-1]:
+                inner[b.value] = replace(self._eval(b.children[0], inner, query, f"{step}/{b.value}"),
+                                         origin=f"{query}/{step}/{b.value}")
+            return self._eval(node.children[-1], inner, query, step, inputs)
+        if kind in ("each", "function"):
+            return Flow("function")
+        if kind == "item":
+            target = self._eval(node.children[0], env, query, step, inputs)
+            index = node.children[1]
+            if target.kind == "table" and index.kind == "record":
+                # Sheet/workbook navigation keeps the source's folding state
+                return Flow("table", target.folds, target.source, target.tables, target.rows, reason=target.reason)
+            if target.kind == "database" and index.kind == "record":
+                fields = {k: v.value for k, v in index.record_fields().items() if v.kind == "literal"}
+                table = ".".join(p for p in (fields.get("Schema"), fields.get("Item") or fields.get("Name")) if p)
+                tables = (table,) if table else ()
+                return Flow("table", target.folds, target.source, tables, self._rows(tables))
+            return Flow("value")
+        if kind == "field" and node.children:
+            # Navigation: Source{[Schema=..., Item=...]}[Data]
+            target = self._eval(node.children[0], env, query, step, inputs)
+            return target if target.kind == "table" and node.value == "Data" else Flow("value")
+        if kind == "projection" and node.children:
+            target = self._eval(node.children[0], env, query, step, inputs)
+            return target if target.kind == "table" else Flow("value")
+        if kind == "call":
+            return self._eval_call(node, env, query, step, inputs)
+        if kind == "if":
+            branches = [self._eval(c, env, query, step, inputs) for c in node.children[1:]]
+            tables = [b for b in branches if b.kind == "table"]
+            if not tables:
+                return Flow("value")
+            # The condition is evaluated first; the chosen branch still folds
+            # if every branch does against the same source
+            folds = all(b.folds for b in tables) and len({b.source for b in tables}) == 1
+            return Flow("table", folds, tables[0].source, tuple(sorted({t for b in tables for t in b.tables})),
+                        tables[0].rows, reason="" if folds else next((b.reason for b in tables if not b.folds and b.reason),
+                                                                "branches differ in folding or source"))
+        return Flow("value")
+
+    def _eval_call(self, node: MNode, env: Dict[str, Flow], query: str, step: str, inputs: List[Flow]) -> Flow:
+        fn = node.call_name() or ""
+        args = node.args
+
+        if fn == "PostgreSQL.Database":
+            host = args[0].value if args and args[0].kind == "literal" else "?"
+            db = args[1].value if len(args) > 1 and args[1].kind == "literal" else "?"
+            return Flow("database", True, f"PostgreSQL {host}/{db}")
+        if fn.endswith(".Database") or fn.endswith(".Databases"):
+            return Flow("database", True, fn)
+        if fn in LOCAL_SOURCES:
+            return Flow("table", False, fn, reason=f"{fn} does not support folding")
+        if fn in LOCAL_TABLE_CONSTRUCTORS:
+            rows = len(args[1].children) if fn == "#table" and len(args) > 1 and args[1].kind == "list" else None
+            if fn == "Table.FromRecords" and args and args[0].kind == "list":
+                rows = len(args[0].children)
+            return Flow("table", False, "local", rows=rows, reason=f"{fn} builds the table in the engine")
+        if fn == "Value.NativeQuery":
+            target = self._eval(args[0], env, query, step, inputs) if args else Flow()
+            options = args[3].record_fields() if len(args) > 3 else {}
+            enabled = options.get("EnableFolding")
+            folds = enabled is not None and enabled.kind == "literal" and enabled.value == "true"
+            return Flow("table", folds, target.source, ("native query",),
+                        reason="" if folds else "Value.NativeQuery without [EnableFolding = true]")
+
+        if not fn.startswith("Table."):
+            for a in args:
+                self._eval(a, env, query, step, inputs)
+            return Flow("value")
+
+        arg_flows = []
+        for a in args:
+            # Table.Combine({A, B}) takes its tables as a list
+            for item in (a.children if a.kind == "list" else [a]):
+                arg_flows.append(self._eval(item, env, query, step, inputs))
+        tables_in = [f for f in arg_flows if f.kind == "table"]
+        if fn in SCALAR_TABLE_FUNCTIONS:
+            return Flow("value")
+        if not tables_in:
+            return Flow("table", False, reason=f"{fn} has no table input")
+
+        all_tables = tuple(t for f in tables_in for t in f.tables)
+        first = tables_in[0]
+        rows = first.rows
+        if fn == "Table.Combine":
+            rows = self._rows(all_tables)
+        elif fn == "Table.FirstN" and len(args) > 1 and args[1].kind == "literal" and rows is not None:
+            try:
+                rows = min(rows, int(float(args[1].value)))
+            except ValueError:
+                pass
+
+        def result(folds: bool, reason: str = "") -> Flow:
+            return Flow("table", folds, first.source, all_tables, rows, reason=reason)
+
+        if fn in BREAKING_TABLE_FUNCTIONS:
+            return result(False, BREAKING_TABLE_FUNCTIONS[fn])
+        if fn not in FOLDABLE_TABLE_FUNCTIONS:
+            return result(False, f"{fn} is not known to fold")
+
+        local = [f for f in tables_in if not f.folds]
+        if local:
+            if all(not f.folds for f in tables_in):
+                return result(False, "input is already evaluated locally")
+            names = sorted({t for f in local for t in f.tables}) or ["local data"]
+            more = f" (+{len(names) - 3} more)" if len(names) > 3 else ""
+            return result(False, f"{fn} combines a folded query with locally evaluated "
+                                 f"{', '.join(names[:3])}{more}")
+        if len({f.source for f in tables_in}) > 1:
+            return result(False, f"{fn} combines different sources")
+
+        if fn == "Table.ReplaceValue" and any(n.kind == "ident" and n.value == "Replacer.ReplaceText"
+                                              for a in args for n in a.walk()):
+            return result(False, "Replacer.ReplaceText has no SQL translation")
+
+        unfoldable = set()
+        for a in args:
+            for lam in _lambdas(a):
+                unfoldable |= {f for f in _called_functions(lam) if f not in FOLDABLE_SCALAR_FUNCTIONS}
+                if any(n.kind == "try" for n in lam.walk()):
+                    unfoldable.add("try/otherwise")
+        if unfoldable:
+            return result(False, f"{', '.join(sorted(unfoldable))} has no PostgreSQL translation")
+        return result(True)
+
+
+# =============================================================================
+# Row counts
+# =============================================================================
+
+def row_counts_from_postgres(tables: List[str]) -> Dict[str, int]:
+    """pg_class.reltuples estimates for schema.table names (catalog only, no scans)"""
+    import psycopg2
+    from pg_bulk_loader import PgConfig, quote_ident
+
+    config = PgConfig.from_env()
+    counts = {}
+    with psycopg2.connect(**config.connect_kwargs()) as conn, conn.cursor() as cur:
+        for name in tables:
+            schema, _, table = name.rpartition(".")
+            cur.execute("SELECT to_regclass(%s)", (f"{quote_ident(schema or 'public')}.{quote_ident(table)}",))
+            if cur.fetchone()[0] is None:
+                continue
+            cur.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)",
+                        (f"{quote_ident(schema or 'public')}.{quote_ident(table)}",))
+            value = cur.fetchone()[0]
+            if value is not None and value >= 0:
+                counts[name] = int(value)
+    return counts
+
+
+# =============================================================================
+# CLI
+# =============================================================================
+
+def _fmt_rows(rows: Optional[int]) -> str:
+    return "?" if rows is None else f"{rows:,}"
+
+
+def print_report(report: FoldingReport, verbose: bool = True) -> None:
+    tables = ", ".join(report.tables) or "-"
+    print(f"\n{report.name} ({report.kind}; {report.source or 'no foldable source'}: {tables})")
+    if report.error:
+        print(f"  ❌ {report.error}")
+        return
+    if verbose:
+        for step in report.steps:
+            note = f"  {step.reason}" if step.reason and step.folds is False else ""
+            pulled = ""
+            if step.pulled_from:
+                pulled = f"  ⬇ pulls {_fmt_rows(step.pulled_rows)} rows ({', '.join(step.pulled_from)})"
+            print(f"  {step.status} {step.name:38s} {step.function:28s}{note}{pulled}")
+    if report.first_break:
+        print(f"  Folding breaks at {report.first_break}: {report.break_reason}")
+    elif report.result_folds:
+        print("  Fully folded to a single source query")
+    unknown = f" + unknown rows from {', '.join(report.pulled_unknown)}" if report.pulled_unknown else ""
+    print(f"  Rows pulled into the mashup engine: {report.pulled_rows:,}{unknown}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze Power Query folding in TMDL M partitions")
+    parser.add_argument("definition", nargs="?", default=DEFINITION_PATH, help="SemanticModel definition folder")
+    parser.add_argument("--table", "-t", action="append", default=[], help="Table/query to analyze (repeatable)")
+    parser.add_argument("--expressions", action="store_true", help="Also report shared expressions")
+    parser.add_argument("--row-counts", help='JSON file of {"schema.table": rows}')
+    parser.add_argument("--pg", action="store_true", help="Read row estimates from PostgreSQL (PG* env vars)")
+    parser.add_argument("--summary", action="store_true", help="Only print the summary table")
+    parser.add_argument("--json", action="store_true", help="Output JSON")
+    args = parser.parse_args()
+
+    model = load_model(args.definition)
+    row_counts: Dict[str, int] = {}
+    if args.row_counts:
+        with open(args.row_counts, "r", encoding="utf-8") as f:
+            row_counts.update(json.load(f))
+    if args.pg:
+        try:
+            from pg_bulk_loader import source_tables
+            row_counts.update(row_counts_from_postgres([f"{s}.{t}" for s, t in source_tables()]))
+        except Exception as e:
+            print(f"⚠️ Could not read row estimates from PostgreSQL: {e}", file=sys.stderr)
+
+    analyzer = FoldingAnalyzer(model, row_counts)
+    missing = [t for t in args.table if t not in analyzer.sources]
+    if missing:
+        print(f"❌ No M query named: {', '.join(missing)}")
+        return 1
+    reports = [analyzer.analyze(t) for t in args.table] if args.table else analyzer.analyze_all(args.expressions)
+
+    if args.json:
+        print(json.dumps([asdict(r) for r in reports], indent=2))
+        return 0
+
+    if not args.summary:
+        for report in reports:
+            print_report(report)
+
+    broken = sorted((r for r in reports if r.first_break),
+                    key=lambda r: (-(r.pulled_rows or 0), r.name))
+    print(f"\n{'='*70}")
+    print(f"{len(reports)} queries: {sum(1 for r in reports if r.result_folds)} fully folded, "
+          f"{len(broken)} break folding, {sum(1 for r in reports if r.error)} unparsed")
+    if broken:
+        print(f"\n{'Query':28s} {'Pulled rows':>12s}  First break")
+        for r in broken:
+            rows = _fmt_rows(r.pulled_rows) + ("+?" if r.pulled_unknown else "")
+            print(f"{r.name[:28]:28s} {rows:>12s}  {r.first_break}: {r.break_reason}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
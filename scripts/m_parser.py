@@ -0,0 +1,518 @@
+#!/usr/bin/env python3
+"""
+Power Query M Parser
+Offline tokenizer + parser for the M used in BMD_sales partitions/expressions
+
+Covers the expression language the model actually uses: let/in chains,
+records, lists, function calls, `each` and `(x) => ...` functions,
+if/then/else, try/otherwise, field and item access (`[Data]`,
+`Source{[Schema = "public", Item = "visits"]}`), operators, `type ...`
+expressions and #"quoted" / #date(...) identifiers. Comments are dropped.
+
+Every node is an MNode(kind, value, children), which keeps analysis code
+(folding, step deduplication) generic: walk() visits all nodes and
+canonical() gives a hashable form with literals kept and layout removed.
+
+Usage:
+    from m_parser import parse_m, let_steps
+    tree = parse_m(source_text)
+    for name, expr in let_steps(tree):
+        print(name, expr.call_name())
+
+    python scripts/m_parser.py <file.m>     # print the parsed step list
+"""
+
+import re
+import sys
+from dataclasses import dataclass, field
+from typing import Any, Iterator, List, Optional, Tuple
+
+
+KEYWORDS = {
+    "let", "in", "each", "if", "then", "else", "and", "or", "not", "try",
+    "otherwise", "catch", "error", "type", "meta", "as", "is", "section",
+    "shared", "true", "false", "null",
+}
+
+_TOKEN_RE = re.compile(r"""
+    (?P<ws>\s+)
+  | (?P<comment>//[^\n]*|/\*.*?\*/)
+  | (?P<qident>\#"(?:[^"]|"")*")
+  | (?P<hashident>\#[A-Za-z_][A-Za-z0-9_]*)
+  | (?P<number>0[xX][0-9a-fA-F]+|(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+  | (?P<text>"(?:[^"]|"")*")
+  | (?P<ident>@?[A-Za-z_][A-Za-z0-9_]*(?:\.[A-Za-z_][A-Za-z0-9_]*)*)
+  | (?P<op>=>|<=|>=|<>|\.\.\.|\.\.|\?\?|[{}\[\]()\,;=<>+\-*/&!?@.])
+""", re.VERBOSE | re.DOTALL)
+
+
+class MSyntaxError(ValueError):
+    pass
+
+
+@dataclass
+class Token:
+    kind: str          # ident, keyword, number, text, op, eof
+    value: str
+    pos: int
+    end: int = 0       # offset after the raw token text (quotes included)
+
+
+def tokenize(text: str) -> List[Token]:
+    tokens = []
+    pos = 0
+    while pos < len(text):
+        m = _TOKEN_RE.match(text, pos)
+        if not m:
+            raise MSyntaxError(f"Unexpected character {text[pos]!r} at offset {pos}")
+        kind = m.lastgroup
+        value = m.group()
+        if kind == "qident":
+            tokens.append(Token("ident", value[2:-1].replace('""', '"'), pos, m.end()))
+        elif kind == "hashident":
+            tokens.append(Token("ident", value, pos, m.end()))
+        elif kind == "ident":
+            tokens.append(Token("keyword" if value in KEYWORDS else "ident", value, pos, m.end()))
+        elif kind == "text":
+            tokens.append(Token("text", value[1:-1].replace('""', '"'), pos, m.end()))
+        elif kind in ("number", "op"):
+            tokens.append(Token(kind, value, pos, m.end()))
+        pos = m.end()
+    tokens.append(Token("eof", "", len(text)))
+    return tokens
+
+
+@dataclass
+class MNode:
+    """
+    Generic M syntax node.
+
+    kind / value / children:
+      let        -      [binding..., body]          binding: value=name, [expr]
+      ident      name   []
+      literal    value  []                          (number, text, logical, null)
+      call       -      [function, arg...]
+      list       -      [item...]                   range: [lo, hi]
+      record     -      [field_def...]              field_def: value=name, [expr]
+      field      name   [target | none]             [Col] / x[Col]; value ends in ? if optional
+      projection names  [target | none]             x[[a], [b]]
+      item       -      [target, index]             x{0} / x{[k = v]}
+      each       -      [body]
+      function   params [body]
+      if         -      [cond, then, else]
+      binop      op     [left, right]
+      unop       op     [operand]
+      type       -      [type expr]                 type_constructor: value=table|function
+      try        -      [expr, otherwise?]
+      error      -      [expr]
+      meta       -      [expr, record]
+    """
+    kind: str
+    value: Any = None
+    children: List["MNode"] = field(default_factory=list)
+    start: int = 0
+    end: int = 0
+
+    def walk(self) -> Iterator["MNode"]:
+        yield self
+        for c in self.children:
+            yield from c.walk()
+
+    def call_name(self) -> Optional[str]:
+        """Function name for calls like Table.Group(...); None otherwise"""
+        if self.kind == "call" and self.children and self.children[0].kind == "ident":
+            return self.children[0].value
+        return None
+
+    @property
+    def args(self) -> List["MNode"]:
+        return self.children[1:] if self.kind == "call" else []
+
+    def canonical(self) -> tuple:
+        return (self.kind, self.value, tuple(c.canonical() for c in self.children))
+
+    def record_fields(self) -> dict:
+        return {f.value: f.children[0] for f in self.children} if self.kind == "record" else {}
+
+
+class _Parser:
+    def __init__(self, text: str):
+        self.text = text
+        self.tokens = tokenize(text)
+        self.i = 0
+
+    # -- token helpers -------------------------------------------------------
+
+    @property
+    def tok(self) -> Token:
+        return self.tokens[self.i]
+
+    def peek(self, offset: int = 1) -> Token:
+        return self.tokens[min(self.i + offset, len(self.tokens) - 1)]
+
+    def at(self, value: str, kind: Optional[str] = None) -> bool:
+        t = self.tok
+        return t.value == value and (kind is None or t.kind == kind) and t.kind not in ("text",)
+
+    def accept(self, value: str) -> bool:
+        if self.at(value) and self.tok.kind != "text":
+            self.i += 1
+            return True
+        return False
+
+    def expect(self, value: str) -> Token:
+        if not self.at(value):
+            raise MSyntaxError(f"Expected {value!r} at offset {self.tok.pos}, got {self.tok.value!r}")
+        t = self.tok
+        self.i += 1
+        return t
+
+    def node(self, kind: str, value: Any, children: List[MNode], start: int) -> MNode:
+        end = self.tokens[self.i - 1].end if self.i else start
+        return MNode(kind, value, children, start, end)
+
+    # -- grammar -------------------------------------------------------------
+
+    def parse(self) -> MNode:
+        expr = self.expression()
+        self.accept(";")
+        if self.tok.kind != "eof":
+            raise MSyntaxError(f"Unexpected {self.tok.value!r} at offset {self.tok.pos}")
+        return expr
+
+    def expression(self) -> MNode:
+        t = self.tok
+        if t.kind == "keyword":
+            if t.value == "let":
+                return self.let_expression()
+            if t.value == "each":
+                self.i += 1
+                return self.node("each", None, [self.expression()], t.pos)
+            if t.value == "if":
+                return self.if_expression()
+            if t.value == "try":
+                return self.try_expression()
+            if t.value == "error":
+                self.i += 1
+                return self.node("error", None, [self.expression()], t.pos)
+        if t.value == "(" and self._is_function():
+            return self.function_expression()
+        return self.coalesce()
+
+    def let_expression(self) -> MNode:
+        start = self.expect("let").pos
+        bindings = []
+        while True:
+            name_tok = self.tok
+            if name_tok.kind not in ("ident", "keyword"):
+                raise MSyntaxError(f"Expected step name at offset {name_tok.pos}")
+            self.i += 1
+            self.expect("=")
+            expr = self.expression()
+            bindings.append(MNode("binding", name_tok.value, [expr], name_tok.pos, expr.end))
+            if not self.accept(","):
+                break
+        self.expect("in")
+        body = self.expression()
+        return self.node("let", None, bindings + [body], start)
+
+    def if_expression(self) -> MNode:
+        start = self.expect("if").pos
+        cond = self.expression()
+        self.expect("then")
+        then = self.expression()
+        self.expect("else")
+        other = self.expression()
+        return self.node("if", None, [cond, then, other], start)
+
+    def try_expression(self) -> MNode:
+        start = self.expect("try").pos
+        expr = self.expression()
+        children = [expr]
+        if self.accept("otherwise"):
+            children.append(self.expression())
+        elif self.accept("catch"):
+            children.append(self.expression())
+        return self.node("try", None, children, start)
+
+    def _is_function(self) -> bool:
+        """'(' params ')' ['as' type] '=>' lookahead"""
+        depth = 0
+        j = self.i
+        while j < len(self.tokens):
+            v = self.tokens[j].value
+            if self.tokens[j].kind == "text":
+                j += 1
+                continue
+            if v == "(":
+                depth += 1
+            elif v == ")":
+                depth -= 1
+                if depth == 0:
+                    k = j + 1
+                    if self.tokens[k].value == "as":
+                        k += 2
+                        while self.tokens[k].value in ("nullable",) or self.tokens[k].kind == "ident":
+                            if self.tokens[k].value == "=>":
+                                break
+                            k += 1
+                    return self.tokens[k].value == "=>"
+            elif self.tokens[j].kind == "eof":
+                return False
+            j += 1
+        return False
+
+    def function_expression(self) -> MNode:
+        start = self.expect("(").pos
+        params = []
+        while not self.at(")"):
+            self.accept("optional")
+            params.append(self.tok.value)
+            self.i += 1
+            if self.accept("as"):
+                self.accept("nullable")
+                self.i += 1
+            if not self.accept(","):
+                break
+        self.expect(")")
+        if self.accept("as"):
+            self.accept("nullable")
+            self.i += 1
+        self.expect("=>")
+        body = self.expression()
+        return self.node("function", tuple(params), [body], start)
+
+    def _binary(self, ops: Tuple[str, ...], operand) -> MNode:
+        left = operand()
+        while self.tok.kind in ("op", "keyword") and self.tok.value in ops:
+            op = self.tok.value
+            self.i += 1
+            right = operand()
+            left = MNode("binop", op, [left, right], left.start, right.end)
+        return left
+
+    def coalesce(self) -> MNode:
+        return self._binary(("??",), self.logical_or)
+
+    def logical_or(self) -> MNode:
+        return self._binary(("or",), self.logical_and)
+
+    def logical_and(self) -> MNode:
+        return self._binary(("and",), self.is_as)
+
+    def is_as(self) -> MNode:
+        left = self.equality()
+        while self.tok.kind == "keyword" and self.tok.value in ("is", "as"):
+            op = self.tok.value
+            self.i += 1
+            self.accept("nullable")
+            right = self.primary_type()
+            left = MNode("binop", op, [left, right], left.start, right.end)
+        return left
+
+    def equality(self) -> MNode:
+        return self._binary(("=", "<>"), self.relational)
+
+    def relational(self) -> MNode:
+        return self._binary(("<", ">", "<=", ">="), self.additive)
+
+    def additive(self) -> MNode:
+        return self._binary(("+", "-", "&"), self.multiplicative)
+
+    def multiplicative(self) -> MNode:
+        return self._binary(("*", "/"), self.metadata)
+
+    def metadata(self) -> MNode:
+        expr = self.unary()
+        if self.accept("meta"):
+            meta = self.unary()
+            return MNode("meta", None, [expr, meta], expr.start, meta.end)
+        return expr
+
+    def unary(self) -> MNode:
+        t = self.tok
+        if t.value in ("+", "-") and t.kind == "op" or t.value == "not" and t.kind == "keyword":
+            self.i += 1
+            operand = self.unary()
+            return MNode("unop", t.value, [operand], t.pos, operand.end)
+        if t.value == "type" and t.kind == "keyword":
+            self.i += 1
+            return self.node("type", None, [self.primary_type()], t.pos)
+        return self.postfix(self.primary())
+
+    def primary_type(self) -> MNode:
+        start = self.tok.pos
+        self.accept("nullable")
+        if self.tok.kind == "ident" and self.tok.value in ("table", "function") and self.peek().value in ("[", "("):
+            name = self.tok.value
+            self.i += 1
+            inner = self.primary()
+            return self.node("type_constructor", name, [inner], start)
+        return self.postfix(self.primary())
+
+    def primary(self) -> MNode:
+        t = self.tok
+        if t.kind == "number":
+            self.i += 1
+            return self.node("literal", t.value, [], t.pos)
+        if t.kind == "text":
+            self.i += 1
+            return self.node("literal", t.value, [], t.pos)
+        if t.kind == "keyword" and t.value in ("true", "false", "null"):
+            self.i += 1
+            return self.node("literal", t.value, [], t.pos)
+        if t.kind == "ident" or (t.kind == "keyword" and t.value in ("type", "section", "shared")):
+            self.i += 1
+            return self.node("ident", t.value, [], t.pos)
+        if t.value == "(":
+            self.i += 1
+            expr = self.expression()
+            self.expect(")")
+            return expr
+        if t.value == "{":
+            return self.list_expression()
+        if t.value == "[":
+            return self.bracket_expression(None)
+        if t.value == "...":
+            self.i += 1
+            return self.node("error", "not implemented", [], t.pos)
+        if t.value == "@":
+            self.i += 1
+            return self.primary()
+        raise MSyntaxError(f"Unexpected {t.value!r} at offset {t.pos}")
+
+    def list_expression(self) -> MNode:
+        start = self.expect("{").pos
+        items = []
+        while not self.at("}"):
+            item = self.expression()
+            if self.accept(".."):
+                hi = self.expression()
+                item = MNode("range", None, [item, hi], item.start, hi.end)
+            items.append(item)
+            if not self.accept(","):
+                break
+        self.expect("}")
+        return self.node("list", None, items, start)
+
+    def _generalized_name(self, stop: Tuple[str, ...]) -> str:
+        """Field names may contain spaces/punctuation: read raw text up to a stop token"""
+        first = self.tok
+        if first.kind == "ident" and self.peek().value in stop and self.peek().kind != "text":
+            self.i += 1
+            return first.value
+        start = first.pos
+        depth = 0
+        while self.tok.kind != "eof":
+            v = self.tok.value
+            if self.tok.kind != "text":
+                if v in ("(", "["):
+                    depth += 1
+                elif v in (")",) and depth:
+                    depth -= 1
+                elif v == "]" and depth:
+                    depth -= 1
+                elif depth == 0 and v in stop:
+                    break
+            self.i += 1
+        return self.text[start:self.tok.pos].strip()
+
+    def bracket_expression(self, target: Optional[MNode]) -> MNode:
+        """Record literal `[a = 1]`, field access `[Col]` / `x[Col]`, or projection `x[[a], [b]]`"""
+        start = self.expect("[").pos
+        if self.at("]"):
+            self.i += 1
+            return self.node("record", None, [], start)
+        if self.at("["):
+            fields = []
+            while self.accept("["):
+                fields.append(self._generalized_name(("]",)))
+                self.expect("]")
+                if not self.accept(","):
+                    break
+            self.expect("]")
+            children = [target] if target else []
+            return self.node("projection", tuple(fields), children, start)
+
+        mark = self.i
+        name = self._generalized_name(("=", "]", ","))
+        if self.at("=") and target is None:
+            fields = []
+            self.i = mark
+            while True:
+                field_start = self.tok.pos
+                fname = self._generalized_name(("=",))
+                self.expect("=")
+                value = self.expression()
+                fields.append(MNode("field_def", fname, [value], field_start, value.end))
+                if not self.accept(","):
+                    break
+            self.expect("]")
+            return self.node("record", None, fields, start)
+        self.expect("]")
+        optional = self.accept("?")
+        children = [target] if target else []
+        return self.node("field", name + ("?" if optional else ""), children, start if target is None else target.start)
+
+    def postfix(self, expr: MNode) -> MNode:
+        while True:
+            if self.at("("):
+                self.i += 1
+                args = []
+                while not self.at(")"):
+                    args.append(self.expression())
+                    if not self.accept(","):
+                        break
+                self.expect(")")
+                expr = MNode("call", None, [expr] + args, expr.start, self.tokens[self.i - 1].pos + 1)
+            elif self.at("{"):
+                self.i += 1
+                index = self.expression()
+                self.expect("}")
+                optional = self.accept("?")
+                expr = MNode("item", "?" if optional else None, [expr, index], expr.start, self.tokens[self.i - 1].pos + 1)
+            elif self.at("["):
+                expr = self.bracket_expression(expr)
+            else:
+                return expr
+
+
+def parse_m(text: str) -> MNode:
+    """Parse an M expression (a partition source or shared expression)"""
+    return _Parser(text).parse()
+
+
+def let_steps(tree: MNode) -> List[Tuple[str, MNode]]:
+    """(step name, expression) for a top-level let; a bare expression is one step named after its kind"""
+    if tree.kind != "let":
+        return [("(expression)", tree)]
+    return [(b.value, b.children[0]) for b in tree.children[:-1]]
+
+
+def let_result(tree: MNode) -> Optional[str]:
+    """Name of the step a let returns, if it returns a plain step reference"""
+    if tree.kind == "let" and tree.children[-1].kind == "ident":
+        return tree.children[-1].value
+    return None
+
+
+def identifiers(node: MNode) -> Iterator[str]:
+    """Identifier references in a subtree (step names, shared expressions, functions)"""
+    for n in node.walk():
+        if n.kind == "ident":
+            yield n.value
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python m_parser.py <file.m>")
+        return 1
+    with open(sys.argv[1], "r", encoding="utf-8") as f:
+        tree = parse_m(f.read())
+    for name, expr in let_steps(tree):
+        print(f"{name:40s} {expr.call_name() or expr.kind}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
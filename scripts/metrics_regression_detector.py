@@ -0,0 +1,541 @@
+#!/usr/bin/env python3
+"""
+Execution Metrics Regression Detector
+SM_ExecutionMetrics exports -> per-fingerprint baselines -> regressions per deployment
+
+Monitoring_Report charts SM_ExecutionMetrics (SM Duration, SM CPU Time,
+SM DirectQuery Time Total, ...) but nothing says whether a model change
+made a query slower. This keeps the history locally and tests every
+deployment of the semantic model:
+
+1. Exported SM_ExecutionMetrics (JSONL, CSV or Parquet) are ingested into a
+   local Parquet store, deduplicated by OperationId and keyed by query
+   fingerprint: the normalized DAX of the operation's QueryEnd event when a
+   SemanticModelLogs export is given (query_log_analyzer.py), otherwise the
+   report visual. Observations older than `--retain-days` are compacted away
+2. Deployments are the git commits touching the model definition (plus any
+   `--deployment` times). For each deployment, fingerprint and metric the
+   pre-deployment window becomes a baseline, frozen in the store with a
+   sample of its values so it outlives the raw observations
+3. The post-deployment window is tested against the baseline: Mann-Whitney
+   for a shift of the median, a hypergeometric test for more of its values
+   above the pooled p95 than chance. p-values are corrected across all
+   tests (Benjamini-Hochberg); significant shifts above `--min-ratio` are
+   ranked by the time they add per window
+
+Without deployments (`--changepoint`, or no git history and no
+`--deployment`), each fingerprint's own strongest upward shift in log
+latency is used as the split instead. The split is found on every other
+observation and tested on the ones in between, so choosing it doesn't
+bias the p-values; this costs half the samples per test. Exits 1 when a
+regression is found.
+
+Usage:
+    python scripts/metrics_regression_detector.py SM_ExecutionMetrics.parquet --queries SemanticModelLogs.jsonl
+    python scripts/metrics_regression_detector.py --deployment 2026-10-01T18:00Z --metric duration cpu
+    python scripts/metrics_regression_detector.py exports/ --changepoint --json
+"""
+
+import argparse
+import json
+import math
+import os
+import subprocess
+import sys
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from query_log_analyzer import (QUERY_OPERATIONS, find_logs, fingerprint_id, guess_dialect, log_columns,
+                                normalize_query, stream_log)
+from tmdl_model import DEFINITION_PATH
+
+
+STORE_DIR = os.environ.get("METRICS_BASELINE_STORE",
+                           os.path.join(os.path.expanduser("~"), ".cache", "bmd-metrics-baseline"))
+DEFAULT_BASELINE_DAYS = 14
+DEFAULT_AFTER_DAYS = 7
+DEFAULT_RETAIN_DAYS = 90
+DEFAULT_MIN_SAMPLES = 20
+DEFAULT_ALPHA = 0.01
+DEFAULT_MIN_RATIO = 1.2
+# Values kept per frozen baseline
+BASELINE_SAMPLE = 500
+# Observation files before they are compacted into one
+MAX_PARTS = 16
+LABEL_CHARS = 200
+
+
+# =============================================================================
+# Observations
+# =============================================================================
+
+# Store metric -> SM_ExecutionMetrics column (first present wins)
+METRICS = {
+    "duration": ["TotalDurationMs", "DurationMs"],
+    "cpu": ["TotalCpuTimeMs", "CpuTimeMs"],
+    "dq_time": ["DirectQueryTotalTimeMs"],
+    "dq_rows": ["DirectQueryTotalRows"],
+}
+TIME_COLUMNS = ["TimeStart", "Timestamp", "TimeEnd"]
+TIMESTAMP = pa.timestamp("us", tz="UTC")
+
+OBSERVATION_SCHEMA = pa.schema([
+    ("fingerprint", pa.string()),
+    ("label", pa.string()),
+    ("time", TIMESTAMP),
+    ("operation_id", pa.string()),
+    *[(m, pa.float64()) for m in METRICS],
+])
+BASELINE_SCHEMA = pa.schema([
+    ("fingerprint", pa.string()),
+    ("metric", pa.string()),
+    ("deployment", TIMESTAMP),
+    ("window_start", TIMESTAMP),
+    ("n", pa.int64()),
+    ("p50", pa.float64()),
+    ("p95", pa.float64()),
+    ("mean", pa.float64()),
+    ("sample", pa.list_(pa.float64())),
+])
+
+
+def to_utc(values: pa.Array) -> pa.Array:
+    """Timestamps from ISO strings or timestamp columns; naive values are taken as UTC"""
+    if pa.types.is_timestamp(values.type):
+        if values.type.tz is None:
+            return pc.assume_timezone(values.cast(pa.timestamp("us")), "UTC")
+        return values.cast(TIMESTAMP)
+    values = pc.cast(values, pa.string())
+    try:
+        return pc.cast(values, TIMESTAMP)
+    except pa.ArrowInvalid:
+        return pc.assume_timezone(pc.cast(values, pa.timestamp("us")), "UTC")
+
+
+def query_fingerprints(paths: List[str]) -> Dict[str, Tuple[str, str]]:
+    """OperationId -> (fingerprint, label) from SemanticModelLogs QueryEnd events"""
+    by_operation: Dict[str, Tuple[str, str]] = {}
+    cache: Dict[str, Tuple[str, str]] = {}
+    for path in find_logs(paths):
+        names = set(log_columns(path))
+        if not {"OperationId", "OperationName", "EventText"} <= names:
+            raise ValueError(f"{path}: query logs need OperationId, OperationName and EventText")
+        types = {"OperationId": pa.string(), "OperationName": pa.string(), "EventText": pa.string()}
+        for batch in stream_log(path, types):
+            batch = batch.filter(pc.fill_null(pc.equal(batch.column("OperationName"), "QueryEnd"), False))
+            for op, text in zip(batch.column("OperationId").to_pylist(), batch.column("EventText").to_pylist()):
+                if not op or not text:
+                    continue
+                if text not in cache:
+                    normalized = normalize_query(text, guess_dialect(text, QUERY_OPERATIONS["QueryEnd"]))
+                    cache[text] = (fingerprint_id(normalized), normalized[:LABEL_CHARS])
+                by_operation[op] = cache[text]
+    return by_operation
+
+
+def read_observations(path: str, queries: Dict[str, Tuple[str, str]]) -> pa.Table:
+    """One exported SM_ExecutionMetrics file as store rows"""
+    names = set(log_columns(path))
+    time_column = next((c for c in TIME_COLUMNS if c in names), None)
+    sources = {m: next((c for c in cols if c in names), None) for m, cols in METRICS.items()}
+    if time_column is None or sources["duration"] is None:
+        raise ValueError(f"{path}: needs a time ({', '.join(TIME_COLUMNS)}) and a duration column")
+    keys = [c for c in ("OperationId", "ReportId", "VisualId", "Operation", "QueryDialect") if c in names]
+    types = {c: pa.string() for c in [time_column, *keys]}
+    types.update({c: pa.float64() for c in sources.values() if c})
+
+    tables = []
+    for batch in stream_log(path, types):
+        n = batch.num_rows
+        column = {c: batch.column(c) for c in batch.schema.names}
+        ops = column["OperationId"].to_pylist() if "OperationId" in column else [None] * n
+        visuals = (pc.binary_join_element_wise(column["ReportId"], column["VisualId"], "/").to_pylist()
+                   if "VisualId" in column else [None] * n)
+        fallback = (pc.binary_join_element_wise(*[pc.fill_null(column[c], "") for c in ("Operation", "QueryDialect")
+                                                  if c in column], " ").to_pylist()
+                    if "Operation" in column else [None] * n)
+        fingerprints, labels = [], []
+        for op, visual, other in zip(ops, visuals, fallback):
+            fp, label = queries.get(op) or ((fingerprint_id(f"visual:{visual}"), visual) if visual else
+                                            (fingerprint_id(f"operation:{other}"), other) if other else (None, None))
+            fingerprints.append(fp)
+            labels.append(label)
+        table = pa.table({
+            "fingerprint": pa.array(fingerprints, pa.string()),
+            "label": pa.array(labels, pa.string()),
+            "time": to_utc(column[time_column]),
+            "operation_id": pa.array(ops, pa.string()),
+            **{m: (pc.cast(column[c], pa.float64()) if c else pa.nulls(n, pa.float64())) for m, c in sources.items()},
+        }, schema=OBSERVATION_SCHEMA)
+        keep = pc.and_(pc.is_valid(table.column("fingerprint")), pc.is_valid(table.column("time")))
+        tables.append(table.filter(keep))
+    return pa.concat_tables(tables) if tables else OBSERVATION_SCHEMA.empty_table()
+
+
+# =============================================================================
+# Store
+# =============================================================================
+
+class MetricsStore:
+    """Parquet observations (rolling) plus frozen baselines in one folder"""
+
+    def __init__(self, root: str = STORE_DIR):
+        self.root = root
+        self.observations_dir = os.path.join(root, "observations")
+        self.baselines_path = os.path.join(root, "baselines.parquet")
+
+    def _parts(self) -> List[str]:
+        if not os.path.isdir(self.observations_dir):
+            return []
+        return sorted(os.path.join(self.observations_dir, n) for n in os.listdir(self.observations_dir)
+                      if n.endswith(".parquet"))
+
+    def observations(self, columns: Optional[List[str]] = None) -> pa.Table:
+        parts = self._parts()
+        if not parts:
+            return OBSERVATION_SCHEMA.empty_table().select(columns or OBSERVATION_SCHEMA.names)
+        return ds.dataset(parts, schema=OBSERVATION_SCHEMA, format="parquet").to_table(columns=columns)
+
+    def _write_part(self, table: pa.Table, tag: str) -> None:
+        os.makedirs(self.observations_dir, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+        pq.write_table(table, os.path.join(self.observations_dir, f"{tag}-{stamp}.parquet"))
+
+    def append(self, table: pa.Table, retain_days: int = DEFAULT_RETAIN_DAYS) -> int:
+        """Adds operations not stored yet; returns how many were new"""
+        seen = self.observations(["operation_id"]).column("operation_id").drop_null()
+        if len(seen):
+            table = table.filter(pc.or_(pc.invert(pc.is_in(table.column("operation_id"), value_set=seen.unique())),
+                                        pc.is_null(table.column("operation_id"))))
+        if table.num_rows:
+            self._write_part(table, "part")
+        if len(self._parts()) > MAX_PARTS:
+            self.compact(retain_days)
+        return table.num_rows
+
+    def compact(self, retain_days: int = DEFAULT_RETAIN_DAYS) -> None:
+        parts = self._parts()
+        table = self.observations()
+        if table.num_rows:
+            cutoff = pc.subtract(pc.max(table.column("time")), pa.scalar(timedelta(days=retain_days)))
+            table = table.filter(pc.greater_equal(table.column("time"), cutoff))
+        self._write_part(table.sort_by([("fingerprint", "ascending"), ("time", "ascending")]), "compact")
+        for p in parts:
+            os.remove(p)
+
+    def baselines(self) -> Dict[Tuple[str, str, datetime], dict]:
+        if not os.path.isfile(self.baselines_path):
+            return {}
+        rows = pq.read_table(self.baselines_path, schema=BASELINE_SCHEMA).to_pylist()
+        return {(r["fingerprint"], r["metric"], r["deployment"]): r for r in rows}
+
+    def save_baselines(self, baselines: Dict[Tuple[str, str, datetime], dict]) -> None:
+        os.makedirs(self.root, exist_ok=True)
+        pq.write_table(pa.Table.from_pylist(list(baselines.values()), schema=BASELINE_SCHEMA), self.baselines_path)
+
+
+# =============================================================================
+# Deployments
+# =============================================================================
+
+@dataclass
+class Deployment:
+    time: datetime
+    label: str
+
+
+def git_deployments(model_dir: str) -> List[Deployment]:
+    """Commits touching the model definition, oldest first"""
+    try:
+        out = subprocess.run(["git", "log", "--format=%cI %h %s", "--", "."], cwd=model_dir,
+                             capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return []
+    deployments = []
+    for line in out.splitlines():
+        stamp, _, label = line.partition(" ")
+        deployments.append(Deployment(datetime.fromisoformat(stamp).astimezone(timezone.utc), label))
+    return sorted(deployments, key=lambda d: d.time)
+
+
+def parse_deployment(value: str) -> Deployment:
+    stamp, _, label = value.partition("=")
+    moment = datetime.fromisoformat(stamp.replace("Z", "+00:00"))
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return Deployment(moment.astimezone(timezone.utc), label or stamp)
+
+
+# =============================================================================
+# Tests
+# =============================================================================
+
+def mann_whitney_greater(after: np.ndarray, before: np.ndarray) -> float:
+    """One-sided p-value that `after` is stochastically larger (normal approximation, tie-corrected)"""
+    n1, n2 = len(after), len(before)
+    _, inverse, counts = np.unique(np.concatenate([after, before]), return_inverse=True, return_counts=True)
+    ranks = (np.cumsum(counts) - (counts - 1) / 2.0)[inverse]
+    u = ranks[:n1].sum() - n1 * (n1 + 1) / 2.0
+    n = n1 + n2
+    ties = float((counts.astype(np.float64) ** 3 - counts).sum())
+    sigma = math.sqrt(n1 * n2 / 12.0 * ((n + 1) - ties / (n * (n - 1))))
+    if sigma == 0:
+        return 1.0
+    z = (u - n1 * n2 / 2.0 - 0.5) / sigma
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def hypergeometric_tail(k: int, population: int, successes: int, draws: int) -> float:
+    """P(X >= k) for X ~ Hypergeometric(population, successes, draws)"""
+    top_k = min(successes, draws)
+    if k <= max(0, draws - (population - successes)):
+        return 1.0
+    if k > top_k:
+        return 0.0
+
+    def log_choose(n: int, r: int) -> float:
+        return math.lgamma(n + 1) - math.lgamma(r + 1) - math.lgamma(n - r + 1)
+
+    terms = [log_choose(successes, i) + log_choose(population - successes, draws - i)
+             for i in range(k, top_k + 1)]
+    top = max(terms)
+    return min(1.0, math.exp(top - log_choose(population, draws)) * sum(math.exp(t - top) for t in terms))
+
+
+def upper_tail_test(after: np.ndarray, before: np.ndarray, q: float = 0.95) -> float:
+    """
+    One-sided p-value that more of `after` lies above the pooled q-quantile
+    than chance: exact given the pooled values, unlike comparing against
+    the baseline's own estimated p95
+    """
+    pooled = np.concatenate([after, before])
+    threshold = np.quantile(pooled, q)
+    return hypergeometric_tail(int((after > threshold).sum()), len(pooled), int((pooled > threshold).sum()),
+                               len(after))
+
+
+def benjamini_hochberg(p_values: List[float]) -> List[float]:
+    m = len(p_values)
+    order = sorted(range(m), key=lambda i: p_values[i])
+    q, running = [1.0] * m, 1.0
+    for rank in range(m, 0, -1):
+        i = order[rank - 1]
+        running = min(running, p_values[i] * m / rank)
+        q[i] = running
+    return q
+
+
+def changepoint(values: np.ndarray, min_size: int) -> Optional[int]:
+    """Split index of the strongest upward shift in mean log value, if any"""
+    n = len(values)
+    if n < 2 * min_size:
+        return None
+    c = np.cumsum(np.log1p(np.maximum(values, 0)))
+    k = np.arange(min_size, n - min_size + 1)
+    left = c[k - 1] / k
+    right = (c[-1] - c[k - 1]) / (n - k)
+    stat = (right - left) * np.sqrt(k * (n - k) / n)
+    best = int(np.argmax(stat))
+    return int(k[best]) if stat[best] > 0 else None
+
+
+def summarize(values: np.ndarray) -> Tuple[float, float, float]:
+    p50, p95 = np.quantile(values, [0.5, 0.95])
+    return float(p50), float(p95), float(values.mean())
+
+
+def freeze_baseline(fp: str, metric: str, deployment: datetime, start: datetime, values: np.ndarray) -> dict:
+    p50, p95, mean = summarize(values)
+    sample = values
+    if len(values) > BASELINE_SAMPLE:
+        sample = np.random.default_rng(0).choice(values, BASELINE_SAMPLE, replace=False)
+    return {"fingerprint": fp, "metric": metric, "deployment": deployment, "window_start": start,
+            "n": len(values), "p50": p50, "p95": p95, "mean": mean, "sample": sample.tolist()}
+
+
+# =============================================================================
+# Detection
+# =============================================================================
+
+@dataclass
+class Regression:
+    fingerprint: str
+    label: str
+    metric: str
+    deployment: str
+    deployed_at: str
+    kind: str                      # deployment / changepoint
+    n_before: int
+    n_after: int
+    p50_before: float
+    p50_after: float
+    p95_before: float
+    p95_after: float
+    ratio: float
+    added_ms: float                # (mean after - mean before) * n after
+    p_value: float
+    q_value: float = 1.0
+    significant: bool = False
+
+
+def _test(fp: str, label: str, metric: str, deployment: Deployment, kind: str, baseline: dict,
+          after: np.ndarray) -> Regression:
+    before = np.asarray(baseline["sample"], dtype=np.float64)
+    p50, p95, mean = summarize(after)
+    p_value = min(1.0, 2 * min(mann_whitney_greater(after, before), upper_tail_test(after, before)))
+    ratio = max(p50 / baseline["p50"] if baseline["p50"] else math.inf if p50 else 1.0,
+                p95 / baseline["p95"] if baseline["p95"] else math.inf if p95 else 1.0)
+    return Regression(fp, label, metric, deployment.label, deployment.time.isoformat(), kind,
+                      baseline["n"], len(after), baseline["p50"], p50, baseline["p95"], p95, ratio,
+                      (mean - baseline["mean"]) * len(after), p_value)
+
+
+def detect(store: MetricsStore, deployments: List[Deployment], metrics: List[str], use_changepoint: bool,
+           baseline_days: int = DEFAULT_BASELINE_DAYS, after_days: int = DEFAULT_AFTER_DAYS,
+           min_samples: int = DEFAULT_MIN_SAMPLES, alpha: float = DEFAULT_ALPHA,
+           min_ratio: float = DEFAULT_MIN_RATIO) -> List[Regression]:
+    table = store.observations(["fingerprint", "label", "time", *metrics])
+    if table.num_rows == 0:
+        return []
+    table = table.sort_by([("fingerprint", "ascending"), ("time", "ascending")])
+    groups = table.group_by("fingerprint", use_threads=False).aggregate([("fingerprint", "count")])
+    times = pc.cast(table.column("time"), pa.int64()).to_numpy()
+    values = {m: table.column(m).to_numpy(zero_copy_only=False) for m in metrics}
+    labels = table.column("label")
+    baselines = store.baselines()
+    deployment_us = [int(d.time.timestamp() * 1e6) for d in deployments]
+    day_us = 86_400 * 10**6
+
+    results, offset = [], 0
+    for fp, count in zip(groups.column("fingerprint").to_pylist(), groups.column("fingerprint_count").to_pylist()):
+        t = times[offset:offset + count]
+        label = labels[offset].as_py() or fp
+        for metric in metrics:
+            v = values[metric][offset:offset + count].astype(np.float64)
+            valid = ~np.isnan(v)
+            tv, vv = t[valid], v[valid]
+            if use_changepoint:
+                # The split is the argmax of a shift statistic, so testing the values it was chosen on
+                # finds a "regression" in pure noise; choose it on every other observation, test the rest
+                split = changepoint(vv[0::2], min_samples)
+                if split is None:
+                    continue
+                at_us = tv[0::2][split]
+                held_t, held_v = tv[1::2], vv[1::2]
+                before, after = held_v[held_t < at_us], held_v[held_t >= at_us]
+                if len(before) < min_samples or len(after) < min_samples:
+                    continue
+                at = datetime.fromtimestamp(at_us / 1e6, timezone.utc)
+                baseline = freeze_baseline(fp, metric, at, datetime.fromtimestamp(tv[0] / 1e6, timezone.utc),
+                                           before)
+                results.append(_test(fp, label, metric, Deployment(at, "changepoint"), "changepoint",
+                                     baseline, after))
+                continue
+            for i, (deployment, at) in enumerate(zip(deployments, deployment_us)):
+                start = max(at - baseline_days * day_us, deployment_us[i - 1] if i else 0)
+                end = min(at + after_days * day_us, deployment_us[i + 1] if i + 1 < len(deployments) else 2**62)
+                key = (fp, metric, deployment.time)
+                baseline = baselines.get(key)
+                before = vv[(tv >= start) & (tv < at)]
+                # Refreshed while the raw window is complete, kept once it has been compacted away
+                if len(before) >= min_samples and (baseline is None or len(before) >= baseline["n"]):
+                    baseline = freeze_baseline(fp, metric, deployment.time,
+                                               datetime.fromtimestamp(start / 1e6, timezone.utc), before)
+                    baselines[key] = baseline
+                if baseline is None:
+                    continue
+                after = vv[(tv >= at) & (tv < end)]
+                if len(after) >= min_samples:
+                    results.append(_test(fp, label, metric, deployment, "deployment", baseline, after))
+        offset += count
+    store.save_baselines(baselines)
+
+    for r, q in zip(results, benjamini_hochberg([r.p_value for r in results])):
+        r.q_value = q
+        r.significant = q <= alpha and r.ratio >= min_ratio and r.added_ms > 0
+    return sorted(results, key=lambda r: (not r.significant, -r.added_ms))
+
+
+# =============================================================================
+# CLI
+# =============================================================================
+
+def print_regressions(results: List[Regression], top: int) -> None:
+    flagged = [r for r in results if r.significant]
+    if not flagged:
+        print(f"\n✅ No significant regression in {len(results)} test(s)")
+        return
+    print(f"\n❌ {len(flagged)} regression(s) in {len(results)} test(s)")
+    print(f"\n  {'#':>3s} {'Fingerprint':12s} {'Metric':8s} {'Deployment':22s} {'n':>9s} "
+          f"{'p50 ms':>15s} {'p95 ms':>15s} {'x':>5s} {'Added s':>9s} {'q':>8s}  Query")
+    for i, r in enumerate(flagged[:top], 1):
+        print(f"  {i:>3d} {r.fingerprint:12s} {r.metric:8s} {r.deployment[:22]:22s} "
+              f"{r.n_before:>4d}/{r.n_after:<4d} {r.p50_before:>6.0f}->{r.p50_after:<7.0f}"
+              f"{r.p95_before:>6.0f}->{r.p95_after:<7.0f}{r.ratio:>5.1f} {r.added_ms / 1000:>9.1f} "
+              f"{r.q_value:>8.1e}  {r.label[:60]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detect latency/CPU regressions per query after model deployments")
+    parser.add_argument("logs", nargs="*", help="SM_ExecutionMetrics exports (JSONL/CSV/Parquet) to ingest")
+    parser.add_argument("--queries", nargs="+", default=[],
+                        help="SemanticModelLogs exports to fingerprint operations by their DAX")
+    parser.add_argument("--store", default=STORE_DIR, help="Baseline store folder")
+    parser.add_argument("--model", default=os.path.dirname(DEFINITION_PATH),
+                        help="Semantic model whose git history gives the deployments")
+    parser.add_argument("--deployment", action="append", default=[], metavar="TIME[=LABEL]",
+                        help="Extra deployment time (ISO 8601, UTC unless offset given)")
+    parser.add_argument("--no-git", action="store_true", help="Don't take deployments from git")
+    parser.add_argument("--changepoint", action="store_true", help="Split each fingerprint at its own changepoint")
+    parser.add_argument("--metric", nargs="+", choices=list(METRICS), default=["duration", "cpu"])
+    parser.add_argument("--baseline-days", type=int, default=DEFAULT_BASELINE_DAYS)
+    parser.add_argument("--after-days", type=int, default=DEFAULT_AFTER_DAYS)
+    parser.add_argument("--retain-days", type=int, default=DEFAULT_RETAIN_DAYS)
+    parser.add_argument("--min-samples", type=int, default=DEFAULT_MIN_SAMPLES, help="Per window")
+    parser.add_argument("--alpha", type=float, default=DEFAULT_ALPHA, help="False discovery rate")
+    parser.add_argument("--min-ratio", type=float, default=DEFAULT_MIN_RATIO,
+                        help="Smallest p50/p95 increase worth flagging")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--json", action="store_true", help="Output JSON")
+    args = parser.parse_args()
+
+    log = (lambda *_: None) if args.json else print
+    start = time.perf_counter()
+    store = MetricsStore(args.store)
+    try:
+        queries = query_fingerprints(args.queries) if args.queries else {}
+        for path in find_logs(args.logs):
+            added = store.append(read_observations(path, queries), args.retain_days)
+            log(f"  {os.path.relpath(path)}: {added:,} new operation(s)")
+        deployments = [] if args.no_git or args.changepoint else git_deployments(args.model)
+        deployments = sorted(deployments + [parse_deployment(d) for d in args.deployment], key=lambda d: d.time)
+        use_changepoint = args.changepoint or not deployments
+        if use_changepoint and not args.changepoint:
+            log("⚠️ No deployments known; splitting each fingerprint at its changepoint")
+        results = detect(store, deployments, args.metric, use_changepoint, args.baseline_days, args.after_days,
+                         args.min_samples, args.alpha, args.min_ratio)
+    except (OSError, ValueError, pa.ArrowException) as e:
+        print(f"❌ {e}")
+        return 1
+    elapsed = time.perf_counter() - start
+    failed = any(r.significant for r in results)
+
+    if args.json:
+        print(json.dumps([asdict(r) for r in results if r.significant], indent=2))
+        return 1 if failed else 0
+
+    print(f"\n{len(deployments)} deployment(s), {len(results)} test(s) in {elapsed:.2f} s")
+    print_regressions(results, args.top)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
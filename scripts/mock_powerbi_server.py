@@ -0,0 +1,597 @@
+#!/usr/bin/env python3
+"""
+Local Power BI REST API stand-in
+
+Emulates the subset of the Power BI REST API used by powerbi_report_builder.py
+so batching, retry and throttling behaviour can be exercised without a tenant
+or capacity.
+
+Emulated endpoints:
+    POST [/groups/{ws}]/datasets/{id}/executeQueries
+    GET  [/groups/{ws}]/datasets/{id}/refreshes
+    POST [/groups/{ws}]/datasets/{id}/refreshes         (enhanced refresh body accepted)
+    GET  [/groups/{ws}]/datasets/{id}/refreshes/{requestId}
+    GET  /groups, [/groups/{ws}]/datasets, [/groups/{ws}]/reports   (paged via @odata.nextLink)
+    GET  [/groups/{ws}]/datasets/{id}
+    GET  [/groups/{ws}]/reports/{id}/Export              (streamed, honours Range)
+    POST [/groups/{ws}]/imports                         (multipart or {"fileUrl"})
+    POST [/groups/{ws}]/imports/createTemporaryUploadLocation
+    PUT  /blob/{id}?comp=block|blocklist                  (Azure blob stand-in)
+    GET  [/groups/{ws}]/reports/{id}/pages
+    POST [/groups/{ws}]/reports/{id}/ExportTo
+    GET  [/groups/{ws}]/reports/{id}/exports/{exportId}[/file]
+
+Export payloads are generated on the fly (byte at offset p is p % 251), so
+multi-GB downloads cost no memory or disk on the server side.
+
+Usage:
+    python scripts/mock_powerbi_server.py --port 8765 --latency-ms 150 --throttle-rate 0.1
+    python scripts/mock_powerbi_server.py --latency-ms 120 --latency-dist lognormal --latency-sigma 0.8
+
+    # then, in another shell
+    export POWERBI_API_BASE=http://127.0.0.1:8765/v1.0/myorg
+    export POWERBI_ACCESS_TOKEN=dummy
+    python scripts/powerbi_report_builder.py dax --all-presets
+"""
+
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+
+API_PREFIX = "/v1.0/myorg"
+
+# "Label", [Measure] pairs inside SUMMARIZECOLUMNS
+OUTPUT_COLUMN_PATTERN = re.compile(r'"([^"]+)"\s*,\s*\[')
+# Table[Column] group-by columns inside SUMMARIZECOLUMNS
+GROUP_COLUMN_PATTERN = re.compile(r"^\s*'?([A-Za-z_][\w ]*)'?\[([^\]]+)\]\s*,?\s*$", re.MULTILINE)
+
+
+@dataclass
+class MockSettings:
+    """Behaviour knobs for the mock server"""
+    latency_ms: float = 50.0
+    jitter_ms: float = 0.0
+    latency_dist: str = "uniform"   # see LATENCY_DISTRIBUTIONS
+    latency_sigma: float = 0.5      # lognormal shape (spread of the tail)
+    throttle_rate: float = 0.0      # fraction of requests answered with 429
+    error_rate: float = 0.0         # fraction of requests answered with 503
+    retry_after: int = 1
+    max_queries_per_request: int = 1
+    group_rows: int = 5
+    last_refresh: str = "2025-01-01T00:00:00Z"
+    workspace_count: int = 3
+    items_per_workspace: int = 4    # datasets and reports per workspace
+    page_size: int = 100            # collection items per page before @odata.nextLink
+    export_size: int = 64 * 1024 * 1024
+    drop_after_bytes: int = 0       # close export connections after this many bytes (0 = never)
+    pages_per_report: int = 6
+    export_job_seconds: float = 3.0     # render time of an ExportTo job
+    export_file_size: int = 256 * 1024
+    export_concurrency_limit: int = 0   # 429 when more jobs render at once (0 = unlimited)
+    refresh_seconds: float = 0.0        # time an enhanced refresh stays InProgress
+    refresh_fail_tables: Tuple[str, ...] = ()   # tables whose refresh fails
+
+
+# Export payload pattern: byte at offset p is p % PATTERN_PERIOD
+PATTERN_PERIOD = 251
+STREAM_CHUNK = 1024 * 1024
+_PATTERN = bytes(i % PATTERN_PERIOD for i in range(STREAM_CHUNK + PATTERN_PERIOD))
+
+
+def pattern_bytes(offset: int, length: int) -> bytes:
+    """Slice of the synthetic export payload starting at offset (length <= STREAM_CHUNK)"""
+    start = offset % PATTERN_PERIOD
+    return _PATTERN[start:start + length]
+
+
+# latency_ms is the centre of each distribution: uniform/normal mean (jitter_ms as
+# half-width / standard deviation), lognormal median, exponential mean
+LATENCY_DISTRIBUTIONS = ("uniform", "normal", "lognormal", "exponential")
+
+
+def sample_latency_ms(s: MockSettings) -> float:
+    """One simulated service time for a request"""
+    if s.latency_dist == "normal":
+        return max(0.0, random.gauss(s.latency_ms, s.jitter_ms))
+    if s.latency_dist == "lognormal":
+        return s.latency_ms * math.exp(random.gauss(0.0, s.latency_sigma))
+    if s.latency_dist == "exponential":
+        return random.expovariate(1.0 / s.latency_ms) if s.latency_ms > 0 else 0.0
+    return s.latency_ms + (random.uniform(-s.jitter_ms, s.jitter_ms) if s.jitter_ms else 0.0)
+
+
+def utc_now_iso() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+def fake_query_rows(query: str, group_rows: int) -> List[Dict[str, Any]]:
+    """Build plausible rows for a DAX query from its output column names"""
+    measures = OUTPUT_COLUMN_PATTERN.findall(query)
+    groups = [f"{t.strip()}[{c}]" for t, c in GROUP_COLUMN_PATTERN.findall(query)]
+    row_count = group_rows if groups else 1
+    rng = random.Random(hash(query) & 0xFFFFFFFF)
+    rows = []
+    for i in range(row_count):
+        row: Dict[str, Any] = {g: f"Value {i + 1}" for g in groups}
+        for m in measures:
+            row[f"[{m}]"] = rng.randint(0, 100000)
+        rows.append(row)
+    return rows
+
+
+class MockPowerBIHandler(BaseHTTPRequestHandler):
+    """Request handler dispatching on ROUTES"""
+
+    server_version = "MockPowerBI/1.0"
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out as separate writes on a keep-alive connection;
+    # with Nagle on, the body waits for the client's delayed ACK (~40 ms) and
+    # every response carries that stall on top of the configured latency
+    disable_nagle_algorithm = True
+
+    @property
+    def settings(self) -> MockSettings:
+        return self.server.settings
+
+    def log_message(self, format, *args):
+        if getattr(self.server, "verbose", False):
+            super().log_message(format, *args)
+
+    def _send_json(self, status: int, payload: Any, headers: Optional[Dict[str, str]] = None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self) -> Dict[str, Any]:
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        return json.loads(self.rfile.read(length))
+
+    def _simulate_service(self) -> bool:
+        """Apply latency and injected failures. Returns False if a failure was sent."""
+        s = self.settings
+        delay = sample_latency_ms(s)
+        if delay > 0:
+            time.sleep(delay / 1000)
+        roll = random.random()
+        if roll < s.throttle_rate:
+            self._send_json(429, {"error": {"code": "TooManyRequests"}},
+                            headers={"Retry-After": str(s.retry_after)})
+            return False
+        if roll < s.throttle_rate + s.error_rate:
+            self._send_json(503, {"error": {"code": "ServiceUnavailable"}})
+            return False
+        return True
+
+    def _query_params(self) -> Dict[str, str]:
+        return dict(parse_qsl(urlsplit(self.path).query))
+
+    def _workspace_id(self) -> str:
+        match = re.search(r"/groups/([^/?]+)", self.path)
+        return match.group(1) if match else "me"
+
+    def _send_page(self, items: List[Dict[str, Any]]):
+        """Send a collection page, adding @odata.nextLink while items remain"""
+        skip = int(self._query_params().get("$skip", 0))
+        page_size = self.settings.page_size
+        payload: Dict[str, Any] = {"value": items[skip:skip + page_size]}
+        if skip + page_size < len(items):
+            host = self.headers.get("Host", "127.0.0.1")
+            payload["@odata.nextLink"] = f"http://{host}{urlsplit(self.path).path}?$skip={skip + page_size}"
+        self._send_json(200, payload)
+
+    def _dispatch(self, method: str):
+        path = self.path.split("?", 1)[0]
+        if path.startswith(API_PREFIX):
+            path = path[len(API_PREFIX):]
+        path = re.sub(r"^/groups/[^/]+(?=/)", "", path)
+        for route_method, pattern, handler in ROUTES:
+            if route_method != method:
+                continue
+            match = pattern.fullmatch(path)
+            if match:
+                self.server.request_count += 1
+                handler(self, match)
+                return
+        self._send_json(404, {"error": {"code": "NotFound", "path": self.path}})
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PUT(self):
+        self._dispatch("PUT")
+
+    def _drain_body(self) -> int:
+        """Read and discard the request body in chunks, returning its size"""
+        remaining = int(self.headers.get("Content-Length") or 0)
+        total = 0
+        while remaining > 0:
+            data = self.rfile.read(min(STREAM_CHUNK, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            total += len(data)
+        return total
+
+    # -------------------------------------------------------------------------
+    # Endpoints
+    # -------------------------------------------------------------------------
+
+    def execute_queries(self, match: re.Match):
+        body = self._read_json()
+        if not self._simulate_service():
+            return
+        queries = body.get("queries", [])
+        if not queries or len(queries) > self.settings.max_queries_per_request:
+            self._send_json(400, {"error": {
+                "code": "BadRequest",
+                "message": f"Expected 1..{self.settings.max_queries_per_request} queries, got {len(queries)}"
+            }})
+            return
+        results = [
+            {"tables": [{"rows": fake_query_rows(q.get("query", ""), self.settings.group_rows)}]}
+            for q in queries
+        ]
+        self._send_json(200, {"results": results})
+
+    def list_refreshes(self, match: re.Match):
+        refreshed = self.settings.last_refresh
+        self._send_json(200, {"value": [{
+            "requestId": "00000000-0000-0000-0000-000000000000",
+            "refreshType": "ViaApi",
+            "startTime": refreshed,
+            "endTime": refreshed,
+            "status": "Completed"
+        }]})
+
+    def list_workspaces(self, match: re.Match):
+        if not self._simulate_service():
+            return
+        self._send_page([
+            {"id": f"ws-{i:04d}", "name": f"Workspace {i}", "isOnDedicatedCapacity": True,
+             "capacityId": f"cap-{i % 2}"}
+            for i in range(self.settings.workspace_count)
+        ])
+
+    def list_items(self, match: re.Match):
+        if not self._simulate_service():
+            return
+        kind = match.group(1)[:-1]
+        ws = self._workspace_id()
+        self._send_page([
+            {"id": f"{ws}-{kind}-{i:04d}", "name": f"{kind.title()} {i}"}
+            for i in range(self.settings.items_per_workspace)
+        ])
+
+    def get_dataset(self, match: re.Match):
+        if not self._simulate_service():
+            return
+        self._send_json(200, {
+            "id": match.group(1),
+            "name": "BMD_sales",
+            "isRefreshable": True,
+            "targetStorageMode": "Abf"
+        })
+
+    def export_report(self, match: re.Match):
+        self._stream_payload(self.settings.export_size)
+
+    def _stream_payload(self, size: int):
+        """Send the synthetic payload of the given size, honouring Range and injected drops"""
+        start = 0
+        range_header = self.headers.get("Range")
+        if range_header:
+            range_match = re.fullmatch(r"bytes=(\d+)-", range_header.strip())
+            start = int(range_match.group(1)) if range_match else 0
+            if start >= size:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{size}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{size - 1}/{size}")
+        else:
+            self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(size - start))
+        self.send_header("Accept-Ranges", "bytes")
+        self.end_headers()
+
+        offset, sent = start, 0
+        drop_after = self.settings.drop_after_bytes
+        while offset < size:
+            length = min(STREAM_CHUNK, size - offset)
+            if drop_after and sent + length > drop_after:
+                # Simulate a dropped connection part-way through the transfer
+                self.close_connection = True
+                return
+            self.wfile.write(pattern_bytes(offset, length))
+            offset += length
+            sent += length
+
+    def create_upload_location(self, match: re.Match):
+        self._drain_body()
+        host = self.headers.get("Host", "127.0.0.1")
+        blob_id = uuid.uuid4().hex
+        self.server.blobs[blob_id] = {"blocks": {}, "size": 0}
+        self._send_json(200, {
+            "url": f"http://{host}/blob/{blob_id}?sv=2020-01-01&sig=mock",
+            "expirationTime": utc_now_iso()
+        })
+
+    def put_blob(self, match: re.Match):
+        blob = self.server.blobs.get(match.group(1))
+        params = self._query_params()
+        if blob is None:
+            self._drain_body()
+            self._send_json(404, {"error": {"code": "BlobNotFound"}})
+            return
+        if params.get("comp") == "block":
+            blob["blocks"][params.get("blockid", "")] = self._drain_body()
+        elif params.get("comp") == "blocklist":
+            length = int(self.headers.get("Content-Length") or 0)
+            ids = re.findall(r"<Latest>([^<]+)</Latest>", self.rfile.read(length).decode("utf-8"))
+            missing = [b for b in ids if b not in blob["blocks"]]
+            if missing:
+                self._send_json(400, {"error": {"code": "InvalidBlockList", "missing": missing}})
+                return
+            blob["size"] = sum(blob["blocks"][b] for b in ids)
+        else:
+            blob["size"] = self._drain_body()
+        self.send_response(201)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def create_import(self, match: re.Match):
+        content_type = self.headers.get("Content-Type", "")
+        if content_type.startswith("multipart/form-data"):
+            size = self._drain_body()
+            source = "multipart"
+        else:
+            file_url = self._read_json().get("fileUrl", "")
+            blob = self.server.blobs.get(urlsplit(file_url).path.rsplit("/", 1)[-1])
+            if blob is None:
+                self._send_json(400, {"error": {"code": "InvalidFileUrl"}})
+                return
+            size = blob["size"]
+            source = "fileUrl"
+        params = self._query_params()
+        self._send_json(202, {
+            "id": str(uuid.uuid4()),
+            "name": params.get("datasetDisplayName"),
+            "importState": "Publishing",
+            "source": source,
+            "receivedBytes": size
+        })
+
+    def list_pages(self, match: re.Match):
+        if not self._simulate_service():
+            return
+        self._send_page([
+            {"name": f"ReportSection{i:02d}", "displayName": f"Page {i + 1}", "order": i}
+            for i in range(self.settings.pages_per_report)
+        ])
+
+    def _export_status(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        elapsed = time.perf_counter() - job["started"]
+        duration = self.settings.export_job_seconds
+        done = elapsed >= duration
+        if done and not job["done"]:
+            # Caller holds server.lock
+            job["done"] = True
+            self.server.exports_in_flight -= 1
+        return {
+            "id": job["id"],
+            "status": "Succeeded" if done else "Running",
+            "percentComplete": 100 if done else int(100 * elapsed / duration),
+            "resourceFileExtension": job["extension"]
+        }
+
+    def submit_export(self, match: re.Match):
+        body = self._read_json()
+        if not self._simulate_service():
+            return
+        limit = self.settings.export_concurrency_limit
+        with self.server.lock:
+            # Settle finished jobs so the in-flight count is current
+            for job in self.server.exports.values():
+                if not job["done"] and time.perf_counter() - job["started"] >= self.settings.export_job_seconds:
+                    job["done"] = True
+                    self.server.exports_in_flight -= 1
+            if limit and self.server.exports_in_flight >= limit:
+                self._send_json(429, {"error": {"code": "TooManyRequests"}},
+                                headers={"Retry-After": str(self.settings.retry_after)})
+                return
+            self.server.exports_in_flight += 1
+            self.server.max_exports_in_flight = max(self.server.max_exports_in_flight,
+                                                    self.server.exports_in_flight)
+        export_id = uuid.uuid4().hex
+        job = {
+            "id": export_id,
+            "report": match.group(1),
+            "format": body.get("format"),
+            "extension": "." + str(body.get("format", "pdf")).lower(),
+            "started": time.perf_counter(),
+            "done": False
+        }
+        self.server.exports[export_id] = job
+        self._send_json(202, {"id": export_id, "status": "NotStarted", "percentComplete": 0})
+
+    def get_export(self, match: re.Match):
+        job = self.server.exports.get(match.group(2))
+        if job is None:
+            self._send_json(404, {"error": {"code": "ExportNotFound"}})
+            return
+        with self.server.lock:
+            status = self._export_status(job)
+        self._send_json(200, status)
+
+    def get_export_file(self, match: re.Match):
+        job = self.server.exports.get(match.group(2))
+        if job is None or not job["done"]:
+            self._send_json(404, {"error": {"code": "ExportNotReady"}})
+            return
+        self._stream_payload(self.settings.export_file_size)
+
+    def trigger_refresh(self, match: re.Match):
+        body = self._read_json()
+        request_id = str(uuid.uuid4())
+        objects = body.get("objects", [])
+        failed = [o for o in objects if o.get("table") in self.settings.refresh_fail_tables]
+        with self.server.lock:
+            self.server.refreshes[request_id] = {
+                "body": body,
+                "started": time.time(),
+                "failed": failed,
+            }
+        if not failed:
+            self.settings.last_refresh = utc_now_iso()
+        location = f"http://{self.headers.get('Host', '127.0.0.1')}{urlsplit(self.path).path}/{request_id}"
+        self.send_response(202)
+        self.send_header("Location", location)
+        self.send_header("x-ms-request-id", request_id)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def get_refresh(self, match: re.Match):
+        refresh = self.server.refreshes.get(match.group(2))
+        if refresh is None:
+            self._send_json(404, {"error": {"code": "RefreshNotFound"}})
+            return
+        running = time.time() - refresh["started"] < self.settings.refresh_seconds
+        status = "Unknown" if running else ("Failed" if refresh["failed"] else "Completed")
+        objects = [dict(o, status="InProgress" if running else
+                        ("Failed" if o in refresh["failed"] else "Completed"))
+                   for o in refresh["body"].get("objects", [])]
+        self._send_json(200, {
+            "requestId": match.group(2),
+            "type": refresh["body"].get("type", "full"),
+            "status": status,
+            "extendedStatus": "InProgress" if running else status,
+            "objects": objects,
+            "messages": [{"code": "TableRefreshFailed", "message": f"Refresh failed for {o['table']}"}
+                         for o in refresh["failed"]] if not running else [],
+        })
+
+
+Route = Tuple[str, "re.Pattern[str]", Callable[[MockPowerBIHandler, re.Match], None]]
+
+ROUTES: List[Route] = [
+    ("POST", re.compile(r"/datasets/([^/]+)/executeQueries"), MockPowerBIHandler.execute_queries),
+    ("GET", re.compile(r"/datasets/([^/]+)/refreshes"), MockPowerBIHandler.list_refreshes),
+    ("GET", re.compile(r"/datasets/([^/]+)/refreshes/([^/]+)"), MockPowerBIHandler.get_refresh),
+    ("POST", re.compile(r"/datasets/([^/]+)/refreshes"), MockPowerBIHandler.trigger_refresh),
+    ("GET", re.compile(r"/groups"), MockPowerBIHandler.list_workspaces),
+    ("GET", re.compile(r"/(datasets|reports)"), MockPowerBIHandler.list_items),
+    ("GET", re.compile(r"/datasets/([^/]+)"), MockPowerBIHandler.get_dataset),
+    ("GET", re.compile(r"/reports/([^/]+)/Export"), MockPowerBIHandler.export_report),
+    ("GET", re.compile(r"/reports/([^/]+)/pages"), MockPowerBIHandler.list_pages),
+    ("POST", re.compile(r"/reports/([^/]+)/ExportTo"), MockPowerBIHandler.submit_export),
+    ("GET", re.compile(r"/reports/([^/]+)/exports/([^/]+)"), MockPowerBIHandler.get_export),
+    ("GET", re.compile(r"/reports/([^/]+)/exports/([^/]+)/file"), MockPowerBIHandler.get_export_file),
+    ("POST", re.compile(r"/imports/createTemporaryUploadLocation"), MockPowerBIHandler.create_upload_location),
+    ("POST", re.compile(r"/imports"), MockPowerBIHandler.create_import),
+    ("PUT", re.compile(r"/blob/([^/]+)"), MockPowerBIHandler.put_blob),
+]
+
+
+def start_mock_server(
+    port: int = 0,
+    settings: Optional[MockSettings] = None,
+    verbose: bool = False
+) -> Tuple[ThreadingHTTPServer, str]:
+    """
+    Start the mock server on a background thread.
+
+    Returns:
+        (server, api_base). Call server.shutdown() to stop it.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), MockPowerBIHandler)
+    server.daemon_threads = True
+    server.settings = settings or MockSettings()
+    server.verbose = verbose
+    server.request_count = 0
+    server.blobs = {}
+    server.exports = {}
+    server.refreshes = {}
+    server.exports_in_flight = 0
+    server.max_exports_in_flight = 0
+    server.lock = threading.Lock()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    api_base = f"http://127.0.0.1:{server.server_address[1]}{API_PREFIX}"
+    return server, api_base
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Power BI REST API stand-in")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Base latency per request")
+    parser.add_argument("--jitter-ms", type=float, default=0.0,
+                        help="Uniform +/- latency jitter (standard deviation with --latency-dist normal)")
+    parser.add_argument("--latency-dist", choices=LATENCY_DISTRIBUTIONS, default="uniform",
+                        help="Service time distribution around --latency-ms")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="Lognormal shape (tail weight)")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction of 429 responses")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of 503 responses")
+    parser.add_argument("--max-queries", type=int, default=1, help="Queries accepted per executeQueries call")
+    parser.add_argument("--workspaces", type=int, default=3, help="Workspaces returned by GET /groups")
+    parser.add_argument("--page-size", type=int, default=100, help="Items per collection page")
+    parser.add_argument("--export-mb", type=int, default=64, help="Size of exported .pbix payloads in MiB")
+    parser.add_argument("--drop-after-mb", type=int, default=0,
+                        help="Drop export connections after this many MiB (0 = never)")
+    parser.add_argument("--export-job-seconds", type=float, default=3.0, help="Render time of ExportTo jobs")
+    parser.add_argument("--export-limit", type=int, default=0,
+                        help="Concurrent ExportTo jobs before 429 (0 = unlimited)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Log every request")
+    args = parser.parse_args()
+
+    settings = MockSettings(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        latency_dist=args.latency_dist,
+        latency_sigma=args.latency_sigma,
+        throttle_rate=args.throttle_rate,
+        error_rate=args.error_rate,
+        max_queries_per_request=args.max_queries,
+        workspace_count=args.workspaces,
+        page_size=args.page_size,
+        export_size=args.export_mb * 1024 * 1024,
+        drop_after_bytes=args.drop_after_mb * 1024 * 1024,
+        export_job_seconds=args.export_job_seconds,
+        export_concurrency_limit=args.export_limit
+    )
+    server, api_base = start_mock_server(args.port, settings, verbose=args.verbose)
+    print(f"Mock Power BI API listening on {api_base}")
+    print(f"  export POWERBI_API_BASE={api_base}")
+    print("  export POWERBI_ACCESS_TOKEN=dummy")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,534 @@
+#!/usr/bin/env python3
+"""
+Semantic Model Size & Cardinality Estimator
+BMD_sales.SemanticModel vs. exported sm_bmd_sales_* Lakehouse tables
+
+Offline estimate of the VertiPaq memory each model column costs, so columns
+can be dropped or split before the model hits capacity limits:
+
+1. Column catalog (name, dataType, summarizeBy, encodingHint,
+   isAvailableInMdx) comes from the TMDL definition via tmdl_model.py
+2. Column statistics come from one vectorized pass over the table exports
+   written by Sales_convert.Notebook (Delta or Parquet, one folder per
+   table named like `sm_bmd_sales_fact_visit`): rows, blanks, distinct
+   count, min/max and the character size of the distinct text values.
+   pyarrow scans the files batch by batch; with `--engine duckdb` DuckDB
+   runs the same statistics as SQL
+3. Each column gets an encoding (value vs hash, or the model's
+   encodingHint), a dictionary size, a bit-packed data size and an
+   attribute-hierarchy size; columns are ranked by the total
+
+The data size assumes plain bit-packing in export row order. VertiPaq's
+run-length encoding and row reordering usually shrink it, so treat totals
+as an upper bound that ranks columns reliably rather than as exact bytes.
+
+Requires pyarrow (plus `deltalake` for Delta folders); `--engine duckdb`
+needs the `duckdb` package.
+
+Usage:
+    python scripts/model_size_estimator.py --data /lakehouse/default/Tables
+    python scripts/model_size_estimator.py --data /tmp/tables --table Fact_Visit --top 40
+    python scripts/model_size_estimator.py --data /tmp/tables --engine duckdb --json
+"""
+
+import argparse
+import json
+import math
+import os
+import re
+import sys
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+from tmdl_model import DEFINITION_PATH, TmdlModel, TmdlObject, load_model
+
+
+DEFAULT_DATA_PATH = "/lakehouse/default/Tables"
+DEFAULT_DATASET = "BMD_sales"
+DEFAULT_PREFIX = "sm_"
+
+# Rows per column segment (VertiPaq default for import models)
+SEGMENT_ROWS = 8 * 1024 * 1024
+# Hash dictionary: per-entry overhead (hash bucket + offsets) on top of the value
+DICT_ENTRY_OVERHEAD = 24
+NUMBER_DICT_BYTES = 8
+# Strings are held as UTF-16 in the dictionary
+BYTES_PER_CHAR = 2
+# Attribute hierarchy (POS_TO_ID + ID_TO_POS), per distinct value
+HIERARCHY_BYTES = 8
+# Decimal/currency columns are value encoded as scaled integers
+DECIMAL_SCALE = 10_000
+
+# Unique-value buffers are compacted once they grow past this many values
+COMPACT_VALUES = 1_000_000
+
+# Recommendation thresholds
+HIGH_CARDINALITY_RATIO = 0.5
+LARGE_COLUMN_BYTES = 1024 * 1024
+KEY_NAME_RE = re.compile(r"(?:^id$|_id$|ID$|Id$|Key$|_key$|Code$)")
+
+
+# =============================================================================
+# Data model
+# =============================================================================
+
+@dataclass
+class ColumnStats:
+    name: str
+    arrow_type: str
+    rows: int
+    nulls: int
+    distinct: int
+    min: Optional[str] = None
+    max: Optional[str] = None
+    # Sum of distinct text lengths (characters), text columns only
+    dict_chars: Optional[int] = None
+    # max - min for whole-number columns, and for columns that are whole
+    # numbers once scaled like a fixed decimal (None otherwise)
+    int_range: Optional[int] = None
+    scaled_range: Optional[int] = None
+    has_time: bool = False
+    url_like: bool = False
+
+
+@dataclass
+class ColumnEstimate:
+    table: str
+    column: str
+    data_type: str
+    summarize_by: str
+    kind: str                      # data / calculated
+    hidden: bool
+    rows: int
+    distinct: int
+    nulls: int
+    encoding: str                  # value / hash
+    encoding_source: str           # hint / estimated
+    bits: int
+    dictionary_bytes: int
+    data_bytes: int
+    hierarchy_bytes: int
+    notes: List[str] = field(default_factory=list)
+
+    @property
+    def total_bytes(self) -> int:
+        return self.dictionary_bytes + self.data_bytes + self.hierarchy_bytes
+
+    @property
+    def cardinality_ratio(self) -> float:
+        return self.distinct / self.rows if self.rows else 0.0
+
+
+@dataclass
+class TableEstimate:
+    table: str
+    target: str
+    path: Optional[str]
+    rows: int = 0
+    columns: List[ColumnEstimate] = field(default_factory=list)
+    unmatched_model_columns: List[str] = field(default_factory=list)
+    unmatched_data_columns: List[str] = field(default_factory=list)
+    error: Optional[str] = None
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(c.total_bytes for c in self.columns)
+
+
+# =============================================================================
+# Naming (mirrors semantic_model_export.py)
+# =============================================================================
+
+def clean_name(name: str) -> str:
+    n = re.sub(r"[^0-9a-zA-Z_]", "_", name)
+    return re.sub(r"_+", "_", n).strip("_")
+
+
+def target_table_name(dataset: str, table: str, prefix: str = DEFAULT_PREFIX) -> str:
+    n = clean_name(f"{prefix}{dataset}_{table}")
+    if re.match(r"^[0-9]", n):
+        n = f"t_{n}"
+    return n.lower()
+
+
+def find_table_path(data_dir: str, target: str) -> Optional[str]:
+    for candidate in (target, f"{target}.parquet"):
+        path = os.path.join(data_dir, candidate)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def is_delta(path: str) -> bool:
+    return os.path.isdir(os.path.join(path, "_delta_log"))
+
+
+# =============================================================================
+# Column statistics
+# =============================================================================
+
+def _scalar(value: pa.Scalar) -> Optional[str]:
+    v = value.as_py()
+    return None if v is None else str(v)
+
+
+def _has_time(values: pa.Array) -> bool:
+    if not pa.types.is_timestamp(values.type) or len(values) == 0:
+        return False
+    days = pc.floor_temporal(values, unit="day")
+    return bool(pc.any(pc.not_equal(values, days)).as_py())
+
+
+def _int_range(values: pa.Array, scale: int = 1) -> Optional[int]:
+    """Range (max - min) of values * scale when all of them are whole numbers at that scale"""
+    if len(values) == 0:
+        return None
+    t = values.type
+    if pa.types.is_integer(t) or pa.types.is_boolean(t):
+        lo, hi = pc.min_max(values.cast(pa.int64())).values()
+        return (hi.as_py() - lo.as_py()) * scale
+    if pa.types.is_floating(t) or pa.types.is_decimal(t):
+        scaled = pc.multiply(values.cast(pa.float64()), scale)
+        if pc.max(pc.abs(pc.subtract(scaled, pc.round(scaled)))).as_py() > 1e-6:
+            return None
+        lo, hi = pc.min_max(scaled).values()
+        return round(hi.as_py() - lo.as_py())
+    return None
+
+
+def stats_from_uniques(name: str, column_type: pa.DataType, rows: int, nulls: int,
+                       uniques: pa.Array) -> ColumnStats:
+    """Column statistics from the distinct non-null values of a column"""
+    stats = ColumnStats(name, str(column_type), rows, nulls, len(uniques))
+    if len(uniques) == 0:
+        return stats
+    if pa.types.is_string(uniques.type) or pa.types.is_large_string(uniques.type):
+        stats.dict_chars = pc.sum(pc.utf8_length(uniques)).as_py() or 0
+        stats.url_like = bool(pc.any(pc.starts_with(uniques, "http")).as_py())
+    else:
+        try:
+            lo, hi = pc.min_max(uniques).values()
+            stats.min, stats.max = _scalar(lo), _scalar(hi)
+        except pa.ArrowNotImplementedError:
+            pass
+        stats.int_range = _int_range(uniques)
+        stats.scaled_range = _int_range(uniques, DECIMAL_SCALE)
+        stats.has_time = _has_time(uniques)
+    return stats
+
+
+def open_dataset(path: str) -> ds.Dataset:
+    if is_delta(path):
+        try:
+            from deltalake import DeltaTable
+        except ImportError:
+            raise ImportError("Delta tables need the deltalake package: pip install deltalake")
+        return DeltaTable(path).to_pyarrow_dataset()
+    return ds.dataset(path, format="parquet")
+
+
+def arrow_column_stats(path: str, columns: Optional[List[str]] = None) -> Dict[str, ColumnStats]:
+    """One batched scan: per-column null counts and distinct values, compacted as they grow"""
+    dataset = open_dataset(path)
+    names = [n for n in dataset.schema.names if columns is None or n in columns]
+    types = {n: dataset.schema.field(n).type for n in names}
+    nulls = {n: 0 for n in names}
+    chunks: Dict[str, List[pa.Array]] = {n: [] for n in names}
+    buffered = {n: 0 for n in names}
+    rows = 0
+
+    def compact(name: str) -> None:
+        merged = pa.concat_arrays(chunks[name]) if len(chunks[name]) > 1 else chunks[name][0]
+        chunks[name] = [pc.unique(merged)]
+        buffered[name] = len(chunks[name][0])
+
+    for batch in dataset.to_batches(columns=names):
+        rows += batch.num_rows
+        for name in names:
+            col = batch.column(name)
+            nulls[name] += col.null_count
+            values = pc.unique(col.drop_null() if col.null_count else col)
+            chunks[name].append(values)
+            buffered[name] += len(values)
+            if buffered[name] > COMPACT_VALUES:
+                compact(name)
+
+    result = {}
+    for name in names:
+        if chunks[name]:
+            compact(name)
+            uniques = chunks[name][0]
+        else:
+            uniques = pa.array([], type=types[name])
+        result[name] = stats_from_uniques(name, types[name], rows, nulls[name], uniques)
+    return result
+
+
+def duckdb_column_stats(path: str, columns: Optional[List[str]] = None) -> Dict[str, ColumnStats]:
+    """Same statistics as arrow_column_stats, computed by DuckDB"""
+    try:
+        import duckdb
+    except ImportError:
+        raise ImportError("--engine duckdb needs the duckdb package: pip install duckdb")
+    con = duckdb.connect()
+    if is_delta(path):
+        con.execute("INSTALL delta; LOAD delta")
+        source = f"delta_scan('{path}')"
+    elif os.path.isdir(path):
+        source = f"read_parquet('{os.path.join(path, '**', '*.parquet')}')"
+    else:
+        source = f"read_parquet('{path}')"
+    con.execute(f"CREATE VIEW t AS SELECT * FROM {source}")
+    schema = con.execute("DESCRIBE t").fetchall()
+    names = [r[0] for r in schema if columns is None or r[0] in columns]
+
+    result = {}
+    rows = con.execute("SELECT count(*) FROM t").fetchone()[0]
+    for name in names:
+        q = '"' + name.replace('"', '""') + '"'
+        # DISTINCT values go through Arrow so both engines share the stats code
+        uniques = con.execute(f"SELECT DISTINCT {q} FROM t WHERE {q} IS NOT NULL").arrow().column(0)
+        uniques = uniques.combine_chunks() if uniques.num_chunks else pa.array([], type=uniques.type)
+        nulls = con.execute(f"SELECT count(*) - count({q}) FROM t").fetchone()[0]
+        result[name] = stats_from_uniques(name, uniques.type, rows, nulls, uniques)
+    con.close()
+    return result
+
+
+# =============================================================================
+# VertiPaq estimate
+# =============================================================================
+
+def _bits(values: int) -> int:
+    return math.ceil(math.log2(values)) if values > 1 else 0
+
+
+def _packed_bytes(rows: int, bits: int) -> int:
+    """Bit-packed segment storage, rounded up to whole 64-bit words per segment"""
+    if rows == 0 or bits == 0:
+        return 0
+    total = 0
+    for start in range(0, rows, SEGMENT_ROWS):
+        seg = min(SEGMENT_ROWS, rows - start)
+        total += math.ceil(seg * bits / 64) * 8
+    return total
+
+
+def estimate_column(table: str, column: TmdlObject, stats: ColumnStats) -> ColumnEstimate:
+    data_type = column.prop("dataType", "string") or "string"
+    hint = (column.prop("encodingHint") or "").lower()
+    in_mdx = (column.prop("isAvailableInMdx") or "true").lower() != "false"
+    # Blank is a dictionary entry of its own
+    entries = stats.distinct + (1 if stats.nulls else 0)
+
+    if data_type == "string":
+        dictionary = (stats.dict_chars or 0) * BYTES_PER_CHAR + entries * DICT_ENTRY_OVERHEAD
+    else:
+        dictionary = entries * (NUMBER_DICT_BYTES + DICT_ENTRY_OVERHEAD)
+    hash_bits = _bits(entries)
+    hash_total = dictionary + _packed_bytes(stats.rows, hash_bits)
+
+    value_range = stats.scaled_range if data_type == "decimal" else stats.int_range
+    value_ok = data_type in ("int64", "decimal", "double", "boolean") and value_range is not None
+    value_bits = _bits(value_range + 1 + (1 if stats.nulls else 0)) if value_ok else 0
+    value_total = _packed_bytes(stats.rows, value_bits) if value_ok else None
+
+    if hint in ("value", "hash"):
+        encoding, source = ("value" if hint == "value" and value_ok else "hash"), "hint"
+    else:
+        # VertiPaq samples the data and keeps whichever encoding is smaller
+        encoding = "value" if value_total is not None and value_total <= hash_total else "hash"
+        source = "estimated"
+
+    est = ColumnEstimate(
+        table=table, column=column.name, data_type=data_type,
+        summarize_by=column.prop("summarizeBy", "default") or "default",
+        kind="calculated" if column.expression else "data",
+        hidden=column.is_hidden, rows=stats.rows, distinct=stats.distinct, nulls=stats.nulls,
+        encoding=encoding, encoding_source=source,
+        bits=value_bits if encoding == "value" else hash_bits,
+        dictionary_bytes=0 if encoding == "value" else dictionary,
+        data_bytes=_packed_bytes(stats.rows, value_bits if encoding == "value" else hash_bits),
+        hierarchy_bytes=entries * HIERARCHY_BYTES if in_mdx else 0,
+    )
+    est.notes = recommendations(est, stats, in_mdx)
+    return est
+
+
+def recommendations(est: ColumnEstimate, stats: ColumnStats, in_mdx: bool) -> List[str]:
+    notes = []
+    large = est.total_bytes >= LARGE_COLUMN_BYTES
+    high_card = est.cardinality_ratio >= HIGH_CARDINALITY_RATIO and est.distinct > 1
+    if est.data_type == "string" and stats.url_like and large:
+        notes.append("URL/path text: keep a Has* flag in the model and the link in the Lakehouse")
+    elif est.data_type == "string" and high_card and large:
+        notes.append("high-cardinality text: drop, or move to a detail table / DirectQuery")
+    if est.data_type == "dateTime" and stats.has_time and high_card:
+        notes.append("date + time in one column: split into a date column and a time column")
+    if est.data_type == "double" and high_card and large:
+        notes.append("high-precision double: round it or store a fixed decimal")
+    if in_mdx and est.hidden and high_card and est.hierarchy_bytes:
+        notes.append(f"hidden: set isAvailableInMdx: false (saves {fmt_bytes(est.hierarchy_bytes)})")
+    if est.summarize_by not in ("none", "default") and KEY_NAME_RE.search(est.column) \
+            and est.data_type in ("int64", "double", "decimal"):
+        notes.append("key column summarized: set summarizeBy: none")
+    return notes
+
+
+# =============================================================================
+# Model x data join
+# =============================================================================
+
+def _data_column_map(names: List[str]) -> Dict[str, str]:
+    """Lower-cased cleaned name -> data column name"""
+    return {clean_name(n).lower(): n for n in names}
+
+
+def estimate_table(table: TmdlObject, data_dir: str, dataset: str, prefix: str,
+                   engine: str) -> TableEstimate:
+    target = target_table_name(dataset, table.name, prefix)
+    path = find_table_path(data_dir, target)
+    result = TableEstimate(table.name, target, path)
+    if path is None:
+        result.error = "no export found"
+        return result
+
+    model_columns = [c for c in table.columns if (c.prop("type") or "") != "rowNumber"]
+    collect = duckdb_column_stats if engine == "duckdb" else arrow_column_stats
+    try:
+        stats = collect(path)
+    except ImportError:
+        raise
+    except Exception as e:
+        result.error = f"{type(e).__name__}: {e}"
+        return result
+
+    data_map = _data_column_map(list(stats))
+    matched = set()
+    for col in model_columns:
+        data_name = data_map.get(clean_name(col.name).lower())
+        if data_name is None:
+            result.unmatched_model_columns.append(col.name)
+            continue
+        matched.add(data_name)
+        result.columns.append(estimate_column(table.name, col, stats[data_name]))
+        result.rows = stats[data_name].rows
+    result.unmatched_data_columns = [n for n in stats if n not in matched]
+    return result
+
+
+def estimate_model(model: TmdlModel, data_dir: str, dataset: str = DEFAULT_DATASET,
+                   prefix: str = DEFAULT_PREFIX, tables: Optional[List[str]] = None,
+                   engine: str = "arrow") -> List[TableEstimate]:
+    results = []
+    for name, table in model.tables.items():
+        if tables and name not in tables:
+            continue
+        results.append(estimate_table(table, data_dir, dataset, prefix, engine))
+    return results
+
+
+# =============================================================================
+# CLI
+# =============================================================================
+
+def fmt_bytes(n: int) -> str:
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if n < 1024 or unit == "GiB":
+            return f"{n:,.0f} {unit}" if unit == "B" else f"{n:,.1f} {unit}"
+        n /= 1024
+    return f"{n:,.1f} GiB"
+
+
+def print_report(results: List[TableEstimate], top: int) -> None:
+    found = [r for r in results if r.columns]
+    columns = sorted((c for r in found for c in r.columns), key=lambda c: -c.total_bytes)
+    total = sum(c.total_bytes for c in columns) or 1
+
+    print(f"\n{'#':>3s} {'Column':44s} {'Type':9s} {'Enc':5s} {'Distinct':>10s} "
+          f"{'Dictionary':>11s} {'Data':>11s} {'Hierarchy':>11s} {'Total':>11s} {'Share':>6s}")
+    for i, c in enumerate(columns[:top] if top else columns, 1):
+        name = f"{c.table}[{c.column}]"
+        enc = c.encoding + ("*" if c.encoding_source == "hint" else "")
+        print(f"{i:3d} {name[:44]:44s} {c.data_type:9s} {enc:5s} {c.distinct:>10,d} "
+              f"{fmt_bytes(c.dictionary_bytes):>11s} {fmt_bytes(c.data_bytes):>11s} "
+              f"{fmt_bytes(c.hierarchy_bytes):>11s} {fmt_bytes(c.total_bytes):>11s} "
+              f"{c.total_bytes / total:6.1%}")
+
+    print(f"\n{'Table':36s} {'Rows':>12s} {'Columns':>8s} {'Total':>11s}")
+    for r in sorted(found, key=lambda r: -r.total_bytes):
+        print(f"{r.table[:36]:36s} {r.rows:>12,d} {len(r.columns):>8d} {fmt_bytes(r.total_bytes):>11s}")
+
+    flagged = [c for c in columns if c.notes]
+    if flagged:
+        print("\nRecommendations:")
+        for c in flagged:
+            for note in c.notes:
+                print(f"  ⚠️ {c.table}[{c.column}] ({fmt_bytes(c.total_bytes)}): {note}")
+
+    for r in results:
+        if r.error and r.error != "no export found":
+            print(f"  ❌ {r.table}: {r.error}")
+        elif r.unmatched_model_columns and r.columns:
+            print(f"  ⚠️ {r.table}: no data for {', '.join(r.unmatched_model_columns)}")
+
+    missing = [r.table for r in results if r.error == "no export found"]
+    print(f"\n{'='*70}")
+    print(f"Estimated model size: {fmt_bytes(sum(r.total_bytes for r in found))} "
+          f"across {len(found)} table(s), {len(columns)} column(s)")
+    if missing:
+        shown = ", ".join(missing[:10]) + (f", ... (+{len(missing) - 10})" if len(missing) > 10 else "")
+        print(f"No export found for {len(missing)} table(s): {shown}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Estimate VertiPaq column memory from exported model data")
+    parser.add_argument("definition", nargs="?", default=DEFINITION_PATH, help="SemanticModel definition folder")
+    parser.add_argument("--data", default=DEFAULT_DATA_PATH, help="Folder holding the exported tables")
+    parser.add_argument("--dataset", default=DEFAULT_DATASET, help="Dataset name used in export table names")
+    parser.add_argument("--prefix", default=DEFAULT_PREFIX, help="Export table name prefix")
+    parser.add_argument("--table", "-t", action="append", default=[], help="Model table to estimate (repeatable)")
+    parser.add_argument("--engine", choices=("arrow", "duckdb"), default="arrow", help="Statistics engine")
+    parser.add_argument("--top", type=int, default=25, help="Columns to list (0 = all)")
+    parser.add_argument("--json", action="store_true", help="Output JSON")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.data):
+        print(f"❌ Data folder not found: {args.data}")
+        return 1
+    model = load_model(args.definition)
+    missing = [t for t in args.table if t not in model.tables]
+    if missing:
+        print(f"❌ No model table named: {', '.join(missing)}")
+        return 1
+
+    try:
+        results = estimate_model(model, args.data, args.dataset, args.prefix, args.table, args.engine)
+    except ImportError as e:
+        print(f"❌ {e}")
+        return 1
+
+    if args.json:
+        out = []
+        for r in results:
+            d = asdict(r)
+            d["total_bytes"] = r.total_bytes
+            for c, est in zip(d["columns"], r.columns):
+                c["total_bytes"] = est.total_bytes
+            out.append(d)
+        print(json.dumps(out, indent=2))
+        return 0
+
+    if not any(r.columns for r in results):
+        print(f"❌ No exported tables matched under {args.data}")
+        return 1
+    print_report(results, args.top)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
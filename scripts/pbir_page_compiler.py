@@ -0,0 +1,527 @@
+#!/usr/bin/env python3
+"""
+PBIR Page Compiler
+pbir/specs/*.yaml -> pbir/pages/*.json
+
+Compiles compact YAML page specs into the page JSON that pbir/pages holds,
+so the header banner, card styling and coordinates stop being copied by
+hand from page to page:
+
+1. Visual templates (card, kpi, gauge, charts, table, slicer panel, ...)
+   are compiled once per batch from themes/BMD_Sales_Theme.json (the same
+   theme pbir/report.json points at): colors, fonts, card chrome
+2. Each spec places visuals on a 12-column grid (`at: [col, row]`,
+   `size: [cols, rows]`) and binds measures/columns as `Table[Field]`
+3. Every page is compiled and checked before anything is written: pages
+   over the visual or query budget (report_query_load.py defaults) fail
+   the batch, and `--validate` also checks bindings against the model
+
+Spec format:
+    page: Clients Dashboard
+    ordinal: 10
+    header: "🏪 CLIENTS DASHBOARD    |    Dealers & Retailers Performance"
+    accent: "#1F4E79"                       # optional, theme tableAccent by default
+    page_filter: {table: Dim_Client_Simple, column: EntityGroup, values: [Clients]}
+    visuals:
+      - {type: card, name: KPI_Total_Visits, measure: "Fact_Visit[Total_Visits]",
+         title: TOTAL VISITS, format: "#,##0", at: [0, 0], size: [2, 1]}
+      - type: lineChart
+        title: VISIT TREND
+        category: "Dim_Date[YearMonth]"
+        measures: ["Fact_Visit[Visits_Clients]"]
+        at: [0, 1]
+        size: [6, 2]
+        options: {dataLabels: {show: false}}   # merged into the config; null drops a template key
+    interactions: [...]                     # optional, copied as-is
+    page_options: {drillThrough: {...}}     # optional, merged into the page object
+
+Requires PyYAML (`pip install pyyaml`) for .yaml specs; .json specs work
+without it.
+
+Usage:
+    python scripts/pbir_page_compiler.py                       # pbir/specs -> pbir/pages
+    python scripts/pbir_page_compiler.py pbir/specs/clients_dashboard.yaml --out-dir /tmp/pages --validate
+    python scripts/pbir_page_compiler.py --check               # compile + budgets, write nothing
+"""
+
+import argparse
+import copy
+import glob
+import json
+import os
+import re
+import sys
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List
+
+from report_document import PbirPage
+from report_query_load import DEFAULT_MAX_QUERIES, DEFAULT_MAX_VISUALS
+
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+SPEC_DIR = os.path.join(REPO_ROOT, "pbir", "specs")
+PAGES_DIR = os.path.join(REPO_ROOT, "pbir", "pages")
+THEME_PATH = os.path.join(REPO_ROOT, "themes", "BMD_Sales_Theme.json")
+
+PAGE_WIDTH = 1920
+PAGE_HEIGHT = 1080
+HEADER_HEIGHT = 60
+
+# Grid: 12 columns between 40px margins, 20px gutters, rows start under the header
+GRID_COLUMNS = 12
+GRID_MARGIN = 40
+GRID_GAP = 20
+GRID_TOP = HEADER_HEIGHT + GRID_GAP
+GRID_ROW_HEIGHT = 120
+
+
+# =============================================================================
+# Theme
+# =============================================================================
+
+def _solid(styles: Dict, *path: str, default: str) -> str:
+    """Color at visualStyles[...][0].color.solid.color, or default"""
+    node: Any = styles
+    for key in path:
+        node = node.get(key, {}) if isinstance(node, dict) else {}
+    if isinstance(node, list) and node:
+        return node[0].get("color", {}).get("solid", {}).get("color", default)
+    return default
+
+
+@dataclass
+class Theme:
+    path: str
+    data_colors: List[str]
+    accent: str
+    foreground: str
+    page_background: str
+    card_background: str
+    card_border: str
+    card_radius: int
+    title_font: str
+    label_font: str
+
+    def color(self, i: int) -> str:
+        return self.data_colors[i % len(self.data_colors)]
+
+
+def load_theme(path: str = THEME_PATH) -> Theme:
+    with open(path, "r", encoding="utf-8") as f:
+        t = json.load(f)
+    styles = t.get("visualStyles", {})
+    text = t.get("textClasses", {})
+    card_border = (styles.get("card", {}).get("*", {}).get("border") or [{}])[0]
+    return Theme(
+        path=path,
+        data_colors=t.get("dataColors") or ["#0066CC"],
+        accent=t.get("tableAccent", "#0066CC"),
+        foreground=t.get("foreground", "#2C3E50"),
+        page_background=_solid(styles, "page", "*", "background", default="#F5F7FA"),
+        card_background=_solid(styles, "card", "*", "background", default="#FFFFFF"),
+        card_border=card_border.get("color", {}).get("solid", {}).get("color", "#E0E0E0"),
+        card_radius=card_border.get("radius", 8),
+        title_font=text.get("title", {}).get("fontFace", "Segoe UI Semibold"),
+        label_font=text.get("label", {}).get("fontFace", "Segoe UI"),
+    )
+
+
+# =============================================================================
+# Visual templates
+# =============================================================================
+
+class SpecError(ValueError):
+    pass
+
+
+Binder = Callable[[Dict[str, Any], Dict[str, Any], Theme], None]
+
+
+@dataclass
+class VisualTemplate:
+    type: str
+    base: Dict[str, Any]           # theme-resolved config skeleton, copied per visual
+    bind: Binder
+    size: List[int] = field(default_factory=lambda: [3, 2])
+
+    def render(self, spec: Dict[str, Any], theme: Theme) -> Dict[str, Any]:
+        config = copy.deepcopy(self.base)
+        if "title" in spec:
+            config["title"] = spec["title"]
+        self.bind(spec, config, theme)
+        _merge(config, spec.get("options") or {})
+        return config
+
+
+def _merge(target: Dict, extra: Dict) -> None:
+    """Deep-merge extra into target; a null value removes the key"""
+    for key, value in extra.items():
+        if value is None:
+            target.pop(key, None)
+        elif isinstance(value, dict) and isinstance(target.get(key), dict):
+            _merge(target[key], value)
+        else:
+            target[key] = copy.deepcopy(value)
+
+
+def _measures(spec: Dict) -> List[Dict[str, Any]]:
+    items = spec.get("measures") or ([spec["measure"]] if spec.get("measure") else [])
+    return [{"field": m} if isinstance(m, str) else dict(m) for m in items]
+
+
+def _require(spec: Dict, key: str) -> Any:
+    if not spec.get(key):
+        raise SpecError(f"{spec.get('type')} visual needs '{key}'")
+    return spec[key]
+
+
+def _bind_card(spec, config, theme):
+    config["dataField"] = _require(spec, "measure")
+    for key in ("format", "subtitle"):
+        if key in spec:
+            config[key] = spec[key]
+
+
+def _bind_kpi(spec, config, theme):
+    config["value"] = _require(spec, "measure")
+    for key in ("target", "min", "max"):
+        if key in spec:
+            config[key] = spec[key]
+
+
+def _axis_binder(category_axis: str, value_axis: str) -> Binder:
+    def bind(spec, config, theme):
+        config.setdefault(category_axis, {})["field"] = _require(spec, "category")
+        if spec.get("category_title"):
+            config[category_axis]["title"] = spec["category_title"]
+        if spec.get("value_title"):
+            config.setdefault(value_axis, {})["title"] = spec["value_title"]
+        measures = _measures(spec)
+        if not measures:
+            raise SpecError(f"{spec.get('type')} visual needs 'measure' or 'measures'")
+        config["series"] = [{"name": m.get("name") or re.sub(r"^.*\[(.*)\]$", r"\1", m["field"]),
+                             "field": m["field"], "color": m.get("color") or theme.color(i)}
+                            for i, m in enumerate(measures)]
+        if spec.get("legend"):
+            config["legend"] = {"show": True, "position": "top", "field": spec["legend"]}
+        _bind_ordering(spec, config, measures[0]["field"])
+    return bind
+
+
+def _part_binder(category_key: str) -> Binder:
+    def bind(spec, config, theme):
+        config[category_key] = {"field": _require(spec, "category")}
+        config["values"] = {"field": _require(spec, "measure")}
+        _bind_ordering(spec, config, spec["measure"])
+    return bind
+
+
+def _bind_ordering(spec, config, default_sort: str):
+    sort = spec.get("sort")
+    if sort or spec.get("top_n"):
+        direction = "ascending" if sort == "ascending" else "descending"
+        config["sort"] = {"field": default_sort, "direction": direction}
+    if spec.get("top_n"):
+        config["topN"] = int(spec["top_n"])
+
+
+def _bind_table(spec, config, theme):
+    columns = _require(spec, "columns")
+    config["columns"] = [{"field": c} if isinstance(c, str) else dict(c) for c in columns]
+
+
+def _bind_map(spec, config, theme):
+    config["location"] = {"field": _require(spec, "category")}
+    config["colorSaturation"] = {"field": _require(spec, "measure"),
+                                 "min": theme.color(3), "mid": theme.color(2), "max": theme.color(1)}
+
+
+def _bind_slicers(spec, config, theme):
+    slicers = _require(spec, "slicers")
+    config["slicers"] = [{"field": s, "type": "dropdown", "default": "All"} if isinstance(s, str)
+                         else {"type": "dropdown", "default": "All", **s} for s in slicers]
+
+
+def _bind_textbox(spec, config, theme):
+    config["textbox"]["paragraphs"][0]["textRuns"][0]["value"] = _require(spec, "text")
+
+
+def compile_templates(theme: Theme) -> Dict[str, VisualTemplate]:
+    """Theme-resolved templates for every supported visual type (built once per batch)"""
+    chrome = {"backgroundColor": theme.card_background,
+              "border": {"radius": theme.card_radius, "color": theme.card_border}}
+    card = {**chrome, "fontSize": 36, "fontColor": theme.foreground, "shadow": True}
+    chart = {**chrome, "dataLabels": {"show": True}}
+    templates = {
+        "card": VisualTemplate("card", card, _bind_card, [2, 1]),
+        "kpi": VisualTemplate("kpi", dict(chrome), _bind_kpi, [2, 1]),
+        "gauge": VisualTemplate("gauge", {**chrome, "min": 0, "max": 1}, _bind_kpi, [2, 2]),
+        "table": VisualTemplate("table", dict(chrome), _bind_table, [6, 3]),
+        "filledMap": VisualTemplate("filledMap", dict(chrome), _bind_map, [6, 3]),
+        "slicerPanel": VisualTemplate("slicerPanel", {"layout": "horizontal"}, _bind_slicers, [6, 1]),
+        "funnel": VisualTemplate("funnel", dict(chart), _part_binder("category"), [3, 2]),
+        "textbox": VisualTemplate("textbox", {"textbox": {"paragraphs": [{"textRuns": [{
+            "value": "", "textStyle": {"fontFamily": theme.label_font, "fontSize": 12,
+                                       "fontColor": theme.foreground}}]}]}}, _bind_textbox, [4, 1]),
+    }
+    for t in ("donutChart", "pieChart"):
+        templates[t] = VisualTemplate(t, {**chart, "legend": {"show": True}}, _part_binder("legend"), [3, 2])
+    for t in ("lineChart", "areaChart", "columnChart", "clusteredColumnChart", "stackedColumnChart"):
+        templates[t] = VisualTemplate(t, dict(chart), _axis_binder("xAxis", "yAxis"), [6, 2])
+    for t in ("barChart", "clusteredBarChart", "stackedBarChart"):
+        templates[t] = VisualTemplate(t, dict(chart), _axis_binder("yAxis", "xAxis"), [6, 2])
+    return templates
+
+
+# =============================================================================
+# Page compilation
+# =============================================================================
+
+@dataclass
+class CompiledPage:
+    spec_path: str
+    file_name: str
+    page: Dict[str, Any]
+    visuals: int = 0
+    queries: int = 0
+    errors: List[str] = field(default_factory=list)
+    warnings: List[str] = field(default_factory=list)
+
+
+def grid_box(at: List[int], size: List[int]) -> Dict[str, int]:
+    col, row = at
+    cols, rows = size
+    if col < 0 or cols < 1 or col + cols > GRID_COLUMNS:
+        raise SpecError(f"columns {col}..{col + cols - 1} are outside the {GRID_COLUMNS}-column grid")
+    cell = (PAGE_WIDTH - 2 * GRID_MARGIN - (GRID_COLUMNS - 1) * GRID_GAP) / GRID_COLUMNS
+    return {
+        "x": round(GRID_MARGIN + col * (cell + GRID_GAP)),
+        "y": GRID_TOP + row * (GRID_ROW_HEIGHT + GRID_GAP),
+        "width": round(cols * cell + (cols - 1) * GRID_GAP),
+        "height": rows * GRID_ROW_HEIGHT + (rows - 1) * GRID_GAP,
+    }
+
+
+def _slug(text: str) -> str:
+    return re.sub(r"_+", "_", re.sub(r"[^0-9A-Za-z]+", "_", text)).strip("_")
+
+
+def header_visual(name: str, text: str, accent: str, theme: Theme) -> Dict[str, Any]:
+    return {
+        "name": f"Header_{_slug(name)}", "type": "textbox",
+        "x": 0, "y": 0, "width": PAGE_WIDTH, "height": HEADER_HEIGHT,
+        "config": {"textbox": {"paragraphs": [{"textRuns": [{"value": text, "textStyle": {
+            "fontFamily": theme.title_font, "fontSize": 18, "fontColor": "#FFFFFF"}}]}],
+            "backgroundColor": accent}},
+    }
+
+
+def compile_page(spec: Dict[str, Any], spec_path: str, templates: Dict[str, VisualTemplate],
+                 theme: Theme) -> CompiledPage:
+    name = spec.get("page")
+    if not name:
+        raise SpecError("spec needs a 'page' name")
+    ordinal = int(spec.get("ordinal", 0))
+    file_name = spec.get("file") or f"{ordinal:02d}_{_slug(name)}.json"
+    config: Dict[str, Any] = {"background": {"color": spec.get("background", theme.page_background),
+                                             "transparency": 0},
+                              "visibility": "hidden" if spec.get("hidden") else "visible"}
+    if spec.get("page_type"):
+        config["pageType"] = spec["page_type"]
+    if spec.get("page_filter"):
+        config["pageFilter"] = {"enabled": True, "filter": spec["page_filter"]}
+
+    page = {"objectType": "page", "name": name, "displayName": spec.get("display_name", name),
+            "displayOption": "FitToPage", "width": PAGE_WIDTH, "height": PAGE_HEIGHT,
+            "ordinal": ordinal, "config": config, "visuals": []}
+    result = CompiledPage(spec_path, file_name, page)
+    if spec.get("header"):
+        page["visuals"].append(header_visual(spec.get("header_name", name), spec["header"],
+                                             spec.get("accent", theme.accent), theme))
+
+    names = set()
+    for i, v in enumerate(spec.get("visuals") or []):
+        vtype = v.get("type")
+        label = v.get("name") or f"{vtype}_{i + 1}"
+        template = templates.get(vtype)
+        if template is None:
+            result.errors.append(f"{label}: unsupported visual type '{vtype}' "
+                                 f"(supported: {', '.join(sorted(templates))})")
+            continue
+        if label in names:
+            result.errors.append(f"{label}: duplicate visual name")
+            continue
+        names.add(label)
+        try:
+            if all(k in v for k in ("x", "y", "width", "height")):
+                box = {k: v[k] for k in ("x", "y", "width", "height")}
+            else:
+                box = grid_box(v.get("at") or [0, 0], v.get("size") or template.size)
+            visual = {"name": label, "type": vtype, **box, "config": template.render(v, theme)}
+        except SpecError as e:
+            result.errors.append(f"{label}: {e}")
+            continue
+        if box["x"] + box["width"] > PAGE_WIDTH or box["y"] + box["height"] > PAGE_HEIGHT:
+            result.warnings.append(f"{label}: extends past the {PAGE_WIDTH}x{PAGE_HEIGHT} page")
+        page["visuals"].append(visual)
+    if spec.get("interactions"):
+        page["interactions"] = spec["interactions"]
+    _merge(page, spec.get("page_options") or {})
+    return result
+
+
+def check_budget(result: CompiledPage, max_visuals: int, max_queries: int) -> None:
+    """Count visuals/queries the way report_query_load.py does for pbir pages"""
+    entry = PbirPage(result.file_name, result.page).entry()
+    result.visuals = sum(1 for v in entry.visuals if not v.hidden)
+    result.queries = sum(1 for v in entry.visuals if v.query_fields and not v.hidden)
+    if result.visuals > max_visuals:
+        result.errors.append(f"{result.visuals} visuals (budget {max_visuals})")
+    if result.queries > max_queries:
+        result.errors.append(f"{result.queries} queries on open (budget {max_queries})")
+
+
+def validate_bindings(results: List[CompiledPage], model_path: str) -> None:
+    from report_binding_validator import build_model_fields, check_binding
+    model = build_model_fields(model_path)
+    for result in results:
+        entry = PbirPage(result.file_name, result.page).entry()
+        refs = [(None, f) for f in entry.fields] + [(v, f) for v in entry.visuals for f in v.fields]
+        for visual, ref in refs:
+            problem = check_binding(model, ref)
+            if problem:
+                severity, text, hint = problem
+                where = visual.name if visual else "(page)"
+                message = f"{where}: {ref.key} - {text}" + (f" ({hint})" if hint else "")
+                (result.errors if severity == "error" else result.warnings).append(message)
+
+
+def load_specs(paths: List[str]) -> List[tuple]:
+    """(path, spec) pairs from .yaml/.yml/.json files or folders of them"""
+    files = []
+    for p in paths:
+        if os.path.isdir(p):
+            files.extend(sorted(f for ext in ("*.yaml", "*.yml", "*.json") for f in glob.glob(os.path.join(p, ext))))
+        else:
+            files.append(p)
+    specs = []
+    for path in files:
+        with open(path, "r", encoding="utf-8") as f:
+            if path.endswith(".json"):
+                docs = [json.load(f)]
+            else:
+                try:
+                    import yaml
+                except ImportError:
+                    raise ImportError("YAML specs need the PyYAML package: pip install pyyaml")
+                docs = [d for d in yaml.safe_load_all(f) if d]
+        specs.extend((path, d) for d in docs)
+    return specs
+
+
+def compile_batch(specs: List[tuple], theme: Theme, max_visuals: int = DEFAULT_MAX_VISUALS,
+                  max_queries: int = DEFAULT_MAX_QUERIES) -> List[CompiledPage]:
+    templates = compile_templates(theme)
+    results = []
+    for path, spec in specs:
+        try:
+            result = compile_page(spec, path, templates, theme)
+        except SpecError as e:
+            result = CompiledPage(path, os.path.basename(path), {}, errors=[str(e)])
+            results.append(result)
+            continue
+        check_budget(result, max_visuals, max_queries)
+        results.append(result)
+    seen: Dict[str, str] = {}
+    for r in results:
+        if r.file_name in seen:
+            r.errors.append(f"output {r.file_name} also produced by {seen[r.file_name]}")
+        seen.setdefault(r.file_name, r.spec_path)
+    return results
+
+
+def _unchanged(path: str, page: Dict[str, Any]) -> bool:
+    """True if the file already holds this page; key order and formatting don't count"""
+    if not os.path.isfile(path):
+        return False
+    try:
+        with open(path, "r", encoding="utf-8-sig") as f:
+            return json.load(f) == page
+    except ValueError:
+        return False
+
+
+def write_pages(results: List[CompiledPage], out_dir: str) -> List[str]:
+    """Write pages whose content changed; equal ones keep their (often hand-written) layout"""
+    os.makedirs(out_dir, exist_ok=True)
+    written = []
+    for r in results:
+        path = os.path.join(out_dir, r.file_name)
+        if _unchanged(path, r.page):
+            continue
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(r.page, f, indent=4, ensure_ascii=False)
+            f.write("\n")
+        written.append(path)
+    return written
+
+
+# =============================================================================
+# CLI
+# =============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile YAML page specs into pbir page JSON")
+    parser.add_argument("specs", nargs="*", default=[SPEC_DIR], help="Spec files or folders")
+    parser.add_argument("--out-dir", default=PAGES_DIR, help="Where page JSON is written")
+    parser.add_argument("--theme", default=THEME_PATH, help="Report theme JSON")
+    parser.add_argument("--max-visuals", type=int, default=DEFAULT_MAX_VISUALS, help="Visuals per page")
+    parser.add_argument("--max-queries", type=int, default=DEFAULT_MAX_QUERIES, help="Queries per page open")
+    parser.add_argument("--validate", action="store_true", help="Check bindings against the semantic model")
+    parser.add_argument("--model", help="Model definition for --validate (default: BMD_sales)")
+    parser.add_argument("--check", action="store_true", help="Compile and check only; write nothing")
+    args = parser.parse_args()
+
+    missing = [p for p in args.specs if not os.path.exists(p)]
+    if missing:
+        print(f"❌ Spec path not found: {', '.join(missing)}")
+        return 1
+    try:
+        specs = load_specs(args.specs)
+    except (ImportError, ValueError) as e:
+        print(f"❌ {e}")
+        return 1
+    if not specs:
+        print("❌ No page specs found")
+        return 1
+
+    theme = load_theme(args.theme)
+    results = compile_batch(specs, theme, args.max_visuals, args.max_queries)
+    if args.validate:
+        from tmdl_model import DEFINITION_PATH
+        validate_bindings([r for r in results if r.page], args.model or DEFINITION_PATH)
+
+    for r in results:
+        status = "❌" if r.errors else ("⚠️" if r.warnings else "✅")
+        print(f"{status} {os.path.relpath(r.spec_path)} -> {r.file_name}: "
+              f"{r.visuals} visuals, {r.queries} queries on open")
+        for e in r.errors:
+            print(f"  ❌ {e}")
+        for w in r.warnings:
+            print(f"  ⚠️ {w}")
+
+    failed = [r for r in results if r.errors]
+    if failed:
+        print(f"\n❌ {len(failed)} of {len(results)} page(s) failed; nothing written")
+        return 1
+    if args.check:
+        print(f"\n✅ {len(results)} page(s) compiled (--check: nothing written)")
+        return 0
+    written = write_pages(results, args.out_dir)
+    print(f"\n✅ Wrote {len(written)} page(s) to {os.path.relpath(args.out_dir)}"
+          f"{f', {len(results) - len(written)} unchanged' if len(written) < len(results) else ''}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,833 @@
+#!/usr/bin/env python3
+"""
+PostgreSQL -> Lakehouse Bulk Loader
+BMD Sales source database (bmdsalesdb)
+
+Copies the PostgreSQL tables behind the semantic model straight to Parquet
+(or Delta) files, so the model and notebooks can read the Lakehouse copy
+instead of scanning the OLTP database on every refresh:
+
+1. Table list comes from BMD_sales.SemanticModel/definition/expressions.tmdl
+   (every `Source{[Schema = ..., Item = ...]}` navigation step)
+2. Large tables are split into primary-key ranges (from pg_stats histogram
+   bounds when available) and read in parallel over a connection pool
+3. Each range is streamed with `COPY (...) TO STDOUT (FORMAT csv)` straight
+   into pyarrow's streaming CSV reader with an explicit Arrow schema built
+   from the catalog, and written as it arrives; no range is held in memory
+4. All ranges of a run read the same exported snapshot, so a table split
+   across connections is still a consistent copy
+
+For tests without a server, `--dump` reads a plain-format `pg_dump` file
+(CREATE TABLE + COPY blocks) through the same conversion and writers.
+
+Requires psycopg2 (`pip install psycopg2-binary`) and pyarrow; `--format
+delta` additionally needs the `deltalake` package.
+
+Usage:
+    export PGUSER=... PGPASSWORD=...
+    python scripts/pg_bulk_loader.py --out-dir /lakehouse/default/Files/bmdsalesdb
+    python scripts/pg_bulk_loader.py --table public.visits --workers 8 --plan
+    python scripts/pg_bulk_loader.py --dump fixtures/bmdsalesdb.sql --out-dir /tmp/bmdsalesdb
+"""
+
+import argparse
+import getpass
+import io
+import os
+import re
+import shutil
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple
+
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+
+
+# Configuration (same source as the semantic model's M expressions)
+DEFAULT_HOST = "172.17.19.21"
+DEFAULT_PORT = 5432
+DEFAULT_DBNAME = "bmdsalesdb"
+EXPRESSIONS_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..",
+    "BMD_sales.SemanticModel", "definition", "expressions.tmdl"
+)
+
+DEFAULT_WORKERS = 4
+# Tables are split so each range holds roughly this many rows
+DEFAULT_ROWS_PER_PARTITION = 1_000_000
+DEFAULT_MAX_PARTITIONS = 16
+
+# Pipe buffer between COPY and the CSV parser, and Arrow block size
+COPY_BUFFER_SIZE = 1024 * 1024
+CSV_BLOCK_SIZE = 8 * 1024 * 1024
+
+INTEGER_KEY_TYPES = {"smallint", "integer", "bigint"}
+
+
+# =============================================================================
+# Configuration and table discovery
+# =============================================================================
+
+@dataclass
+class PgConfig:
+    host: str = DEFAULT_HOST
+    port: int = DEFAULT_PORT
+    dbname: str = DEFAULT_DBNAME
+    user: Optional[str] = None
+    password: Optional[str] = None
+
+    @classmethod
+    def from_env(cls) -> "PgConfig":
+        return cls(
+            host=os.environ.get("PGHOST", DEFAULT_HOST),
+            port=int(os.environ.get("PGPORT", DEFAULT_PORT)),
+            dbname=os.environ.get("PGDATABASE", DEFAULT_DBNAME),
+            user=os.environ.get("PGUSER"),
+            password=os.environ.get("PGPASSWORD"),
+        )
+
+    def connect_kwargs(self) -> Dict[str, object]:
+        kwargs: Dict[str, object] = {
+            "host": self.host,
+            "port": self.port,
+            "dbname": self.dbname,
+            "application_name": "pg_bulk_loader",
+            # Stable text output for the CSV parser
+            "options": "-c TimeZone=UTC -c DateStyle=ISO,YMD -c extra_float_digits=3",
+        }
+        if self.user:
+            kwargs["user"] = self.user
+        if self.password:
+            kwargs["password"] = self.password
+        return kwargs
+
+
+def source_tables(expressions_path: str = EXPRESSIONS_PATH) -> List[Tuple[str, str]]:
+    """(schema, table) pairs navigated to by the model's PostgreSQL expressions"""
+    with open(expressions_path, "r", encoding="utf-8") as f:
+        text = f.read()
+    pairs = re.findall(r'Schema\s*=\s*"([^"]+)"\s*,\s*Item\s*=\s*"([^"]+)"', text)
+    return sorted(set(pairs))
+
+
+def parse_table_arg(value: str) -> Tuple[str, str]:
+    schema, _, table = value.rpartition(".")
+    return (schema or "public"), table
+
+
+def quote_ident(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def target_name(schema: str, table: str) -> str:
+    n = re.sub(r"[^0-9a-zA-Z_]", "_", f"{schema}_{table}")
+    return re.sub(r"_+", "_", n).strip("_").lower()
+
+
+# =============================================================================
+# Type mapping
+# =============================================================================
+
+def arrow_type(pg_type: str) -> pa.DataType:
+    """Arrow type for a `format_type()` / pg_dump column type; unknown types stay strings"""
+    t = pg_type.strip().lower()
+    if t.endswith("[]"):
+        return pa.string()
+    base = re.sub(r"\(.*?\)", "", t).strip()
+
+    if base in ("smallint", "int2"):
+        return pa.int16()
+    if base in ("integer", "int", "int4"):
+        return pa.int32()
+    if base in ("bigint", "int8"):
+        return pa.int64()
+    if base in ("real", "float4"):
+        return pa.float32()
+    if base in ("double precision", "float8"):
+        return pa.float64()
+    if base in ("numeric", "decimal"):
+        m = re.search(r"\((\d+)\s*(?:,\s*(\d+))?\)", t)
+        if m and int(m.group(1)) <= 38:
+            return pa.decimal128(int(m.group(1)), int(m.group(2) or 0))
+        # Unconstrained numeric can carry any scale; Arrow decimals can't
+        return pa.float64()
+    if base in ("boolean", "bool"):
+        return pa.bool_()
+    if base == "date":
+        return pa.date32()
+    if base.startswith("timestamp"):
+        return pa.timestamp("us", tz="UTC") if "with time zone" in base else pa.timestamp("us")
+    # text, varchar, uuid, json(b), time, interval, bytea (hex text), ...
+    return pa.string()
+
+
+# =============================================================================
+# Table plan
+# =============================================================================
+
+@dataclass
+class KeyRange:
+    """Half-open [lo, hi) key range; None means unbounded on that side"""
+    lo: Optional[int] = None
+    hi: Optional[int] = None
+
+    def where(self, key: str) -> str:
+        clauses = []
+        if self.lo is not None:
+            clauses.append(f"{quote_ident(key)} >= {int(self.lo)}")
+        if self.hi is not None:
+            clauses.append(f"{quote_ident(key)} < {int(self.hi)}")
+        return " WHERE " + " AND ".join(clauses) if clauses else ""
+
+
+@dataclass
+class TableInfo:
+    schema: str
+    name: str
+    columns: List[Tuple[str, str]]          # (column, pg type)
+    key: Optional[str] = None               # single-column integer primary key
+    estimated_rows: int = 0
+    ranges: List[KeyRange] = field(default_factory=lambda: [KeyRange()])
+
+    @property
+    def qualified(self) -> str:
+        return f"{quote_ident(self.schema)}.{quote_ident(self.name)}"
+
+    @property
+    def target(self) -> str:
+        return target_name(self.schema, self.name)
+
+    def arrow_schema(self) -> pa.Schema:
+        return pa.schema([(c, arrow_type(t)) for c, t in self.columns])
+
+    def copy_sql(self, key_range: KeyRange) -> str:
+        cols = ", ".join(quote_ident(c) for c, _ in self.columns)
+        where = key_range.where(self.key) if self.key else ""
+        return f"COPY (SELECT {cols} FROM {self.qualified}{where}) TO STDOUT WITH (FORMAT csv)"
+
+
+def split_points(bounds: List[int], lo: Optional[int], hi: Optional[int], partitions: int) -> List[int]:
+    """
+    partitions - 1 ascending split keys.
+
+    Histogram bounds give roughly equal-row ranges even when keys have gaps;
+    without statistics the [lo, hi] key span is cut evenly.
+    """
+    if partitions <= 1:
+        return []
+    if bounds:
+        points = [bounds[len(bounds) * i // partitions] for i in range(1, partitions)]
+    elif lo is not None and hi is not None and hi > lo:
+        step = (hi - lo + 1) / partitions
+        points = [lo + int(step * i) for i in range(1, partitions)]
+    else:
+        return []
+    return sorted(set(points))
+
+
+def ranges_from_points(points: List[int]) -> List[KeyRange]:
+    # First and last ranges are open-ended so stale statistics never drop rows
+    edges: List[Optional[int]] = [None] + list(points) + [None]
+    return [KeyRange(edges[i], edges[i + 1]) for i in range(len(edges) - 1)]
+
+
+def describe_table(
+    conn,
+    schema: str,
+    table: str,
+    rows_per_partition: int = DEFAULT_ROWS_PER_PARTITION,
+    max_partitions: int = DEFAULT_MAX_PARTITIONS
+) -> TableInfo:
+    """Columns, key and key ranges from the catalog; never scans the table"""
+    regclass = f"{quote_ident(schema)}.{quote_ident(table)}"
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT a.attname, format_type(a.atttypid, a.atttypmod) FROM pg_attribute a "
+            "WHERE a.attrelid = %s::regclass AND a.attnum > 0 AND NOT a.attisdropped ORDER BY a.attnum",
+            (regclass,)
+        )
+        columns = [(name, pg_type) for name, pg_type in cur.fetchall()]
+
+        cur.execute(
+            "SELECT a.attname, format_type(a.atttypid, a.atttypmod) FROM pg_index i "
+            "JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = i.indkey[0] "
+            "WHERE i.indrelid = %s::regclass AND i.indisprimary AND i.indnatts = 1",
+            (regclass,)
+        )
+        pk = cur.fetchone()
+        key = pk[0] if pk and pk[1] in INTEGER_KEY_TYPES else None
+
+        # reltuples is -1 until the table is first vacuumed/analyzed
+        cur.execute(
+            "SELECT reltuples::bigint, pg_relation_size(oid) FROM pg_class WHERE oid = %s::regclass",
+            (regclass,)
+        )
+        reltuples, size_bytes = cur.fetchone()
+        estimated = reltuples if reltuples >= 0 else size_bytes // 128
+
+        info = TableInfo(schema, table, columns, key, int(estimated))
+        partitions = min(max_partitions, max(1, -(-info.estimated_rows // max(1, rows_per_partition))))
+        if key and partitions > 1:
+            cur.execute(
+                "SELECT histogram_bounds::text FROM pg_stats "
+                "WHERE schemaname = %s AND tablename = %s AND attname = %s",
+                (schema, table, key)
+            )
+            row = cur.fetchone()
+            bounds = [int(v) for v in row[0].strip("{}").split(",")] if row and row[0] else []
+            lo = hi = None
+            if not bounds:
+                # Both served from the primary key index
+                cur.execute(f"SELECT min({quote_ident(key)}), max({quote_ident(key)}) FROM {info.qualified}")
+                lo, hi = cur.fetchone()
+            info.ranges = ranges_from_points(split_points(bounds, lo, hi, partitions))
+    conn.rollback()
+    return info
+
+
+# =============================================================================
+# CSV -> Arrow -> Parquet / Delta
+# =============================================================================
+
+def csv_reader(stream: BinaryIO, schema: pa.Schema) -> pa.RecordBatchReader:
+    """
+    Streaming reader for PostgreSQL CSV output.
+
+    COPY writes NULL as an unquoted empty field and '' as a quoted one, so
+    only unquoted empties become nulls; booleans arrive as t/f. An empty
+    table or key range produces no output at all, which pyarrow rejects as
+    an empty CSV file, so that case yields a zero-row reader instead.
+    """
+    if not hasattr(stream, "peek"):
+        stream = io.BufferedReader(stream)
+    if not stream.peek(1):
+        return pa.RecordBatchReader.from_batches(schema, [])
+    return pacsv.open_csv(
+        stream,
+        read_options=pacsv.ReadOptions(column_names=schema.names, block_size=CSV_BLOCK_SIZE),
+        parse_options=pacsv.ParseOptions(newlines_in_values=True),
+        convert_options=pacsv.ConvertOptions(
+            column_types=schema,
+            null_values=[""],
+            strings_can_be_null=True,
+            quoted_strings_can_be_null=False,
+            true_values=["t"],
+            false_values=["f"],
+            timestamp_parsers=[pacsv.ISO8601],
+        ),
+    )
+
+
+def _counted(reader: pa.RecordBatchReader, counter: List[int]) -> Iterator[pa.RecordBatch]:
+    for batch in reader:
+        counter[0] += batch.num_rows
+        yield batch
+
+
+class ParquetTarget:
+    """
+    One directory per table, one part file per key range.
+
+    Parts are written to a hidden staging directory next to the table's and
+    only swapped in by commit() once every range has loaded, so a failed or
+    interrupted load leaves the previous copy in place.
+    """
+
+    def __init__(self, out_dir: str):
+        self.out_dir = out_dir
+
+    def path(self, info: TableInfo) -> str:
+        return os.path.join(self.out_dir, info.target)
+
+    def staging_path(self, info: TableInfo) -> str:
+        # Dot-prefixed, so Spark and pyarrow readers of out_dir skip it
+        return os.path.join(self.out_dir, f".{info.target}.staging")
+
+    def prepare(self, info: TableInfo) -> None:
+        staging = self.staging_path(info)
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+
+    def write(self, info: TableInfo, part: int, reader: pa.RecordBatchReader) -> int:
+        final = os.path.join(self.staging_path(info), f"part-{part:05d}.parquet")
+        tmp = final + ".tmp"
+        counter = [0]
+        with pq.ParquetWriter(tmp, info.arrow_schema(), compression="snappy") as writer:
+            for batch in _counted(reader, counter):
+                writer.write_batch(batch)
+        os.replace(tmp, final)
+        return counter[0]
+
+    def commit(self, info: TableInfo) -> None:
+        """Swap the staged parts in for the table's directory"""
+        path, old = self.path(info), os.path.join(self.out_dir, f".{info.target}.old")
+        shutil.rmtree(old, ignore_errors=True)
+        if os.path.exists(path):
+            os.rename(path, old)
+        os.rename(self.staging_path(info), path)
+        shutil.rmtree(old, ignore_errors=True)
+
+    def abort(self, info: TableInfo) -> None:
+        shutil.rmtree(self.staging_path(info), ignore_errors=True)
+
+
+class DeltaTarget(ParquetTarget):
+    """
+    One Delta table per source table (deltalake package).
+
+    Ranges are staged as Parquet parts like ParquetTarget; commit() streams
+    them into a single overwrite of the Delta table, so readers go straight
+    from the previous version to the complete new one.
+    """
+
+    def __init__(self, out_dir: str):
+        super().__init__(out_dir)
+        try:
+            from deltalake import write_deltalake
+        except ImportError:
+            raise ImportError("--format delta needs the deltalake package: pip install deltalake")
+        self._write_deltalake = write_deltalake
+
+    def commit(self, info: TableInfo) -> None:
+        import pyarrow.dataset as ds
+
+        staging = self.staging_path(info)
+        parts = sorted(os.path.join(staging, n) for n in os.listdir(staging) if n.endswith(".parquet"))
+        schema = info.arrow_schema()
+        reader = ds.dataset(parts, schema=schema, format="parquet").scanner().to_reader()
+        self._write_deltalake(self.path(info), reader, mode="overwrite", schema_mode="overwrite")
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+TARGETS = {"parquet": ParquetTarget, "delta": DeltaTarget}
+
+
+def stream_copy(conn, sql: str, sink: Callable[[BinaryIO], int]) -> int:
+    """
+    Run COPY ... TO STDOUT on a thread writing into a pipe while `sink`
+    consumes the other end, so memory stays at the pipe + Arrow block size.
+    """
+    read_fd, write_fd = os.pipe()
+    reader = os.fdopen(read_fd, "rb", buffering=COPY_BUFFER_SIZE)
+    writer = os.fdopen(write_fd, "wb", buffering=COPY_BUFFER_SIZE)
+    errors: List[BaseException] = []
+
+    def produce():
+        try:
+            with conn.cursor() as cur:
+                cur.copy_expert(sql, writer, size=COPY_BUFFER_SIZE)
+        except BaseException as e:
+            errors.append(e)
+        finally:
+            try:
+                writer.close()
+            except OSError:
+                pass
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        rows = sink(reader)
+    except BaseException as e:
+        import psycopg2.extensions
+
+        # Stop the server side; closing the pipe below unblocks the producer
+        conn.cancel()
+        reader.close()
+        thread.join()
+        # A COPY error is the cause, the sink only saw the truncated stream; the
+        # cancel and broken pipe above are just the producer reacting to the sink
+        cause = errors[0] if errors else None
+        if isinstance(cause, psycopg2.Error) and not isinstance(cause, psycopg2.extensions.QueryCanceledError):
+            raise cause from e
+        raise
+    reader.close()
+    thread.join()
+    if errors:
+        raise errors[0]
+    return rows
+
+
+# =============================================================================
+# Loader
+# =============================================================================
+
+@dataclass
+class TableLoad:
+    schema: str
+    table: str
+    target: str
+    partitions: int
+    rows: int = 0
+    seconds: float = 0.0
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class BulkLoader:
+    """
+    Parallel COPY-based extract of many tables.
+
+    Every (table, key range) pair is a task on one thread pool, largest
+    tables first; each task borrows a pooled connection that imports the
+    coordinator's snapshot before copying.
+    """
+
+    def __init__(
+        self,
+        config: PgConfig,
+        target: ParquetTarget,
+        workers: int = DEFAULT_WORKERS,
+        rows_per_partition: int = DEFAULT_ROWS_PER_PARTITION,
+        max_partitions: int = DEFAULT_MAX_PARTITIONS,
+        use_snapshot: bool = True
+    ):
+        import psycopg2.pool
+
+        self.config = config
+        self.target = target
+        self.workers = max(1, workers)
+        self.rows_per_partition = rows_per_partition
+        self.max_partitions = max_partitions
+        self.use_snapshot = use_snapshot
+        # One extra connection for the coordinator holding the snapshot open
+        self.pool = psycopg2.pool.ThreadedConnectionPool(1, self.workers + 1, **config.connect_kwargs())
+
+    def close(self) -> None:
+        self.pool.closeall()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def plan(self, tables: List[Tuple[str, str]]) -> Tuple[List[TableInfo], List[TableLoad]]:
+        """Describe tables (largest first); missing tables come back as failed loads"""
+        infos, missing = [], []
+        conn = self.pool.getconn()
+        try:
+            for schema, table in tables:
+                try:
+                    infos.append(describe_table(conn, schema, table, self.rows_per_partition, self.max_partitions))
+                except Exception as e:
+                    conn.rollback()
+                    missing.append(TableLoad(schema, table, target_name(schema, table), 0,
+                                             error=str(e).strip().splitlines()[0]))
+        finally:
+            self.pool.putconn(conn)
+        infos.sort(key=lambda i: -i.estimated_rows)
+        return infos, missing
+
+    def _copy_range(self, info: TableInfo, part: int, snapshot: Optional[str]) -> int:
+        conn = self.pool.getconn()
+        broken = False
+        try:
+            conn.set_session(isolation_level="REPEATABLE READ", readonly=True)
+            if snapshot:
+                with conn.cursor() as cur:
+                    cur.execute("SET TRANSACTION SNAPSHOT %s", (snapshot,))
+            sink = lambda stream: self.target.write(info, part, csv_reader(stream, info.arrow_schema()))
+            return stream_copy(conn, info.copy_sql(info.ranges[part]), sink)
+        except BaseException:
+            broken = True
+            raise
+        finally:
+            if not broken:
+                conn.rollback()
+                conn.set_session(isolation_level="DEFAULT", readonly="DEFAULT")
+            # A cancelled COPY leaves the connection unusable; don't return it to the pool
+            self.pool.putconn(conn, close=broken)
+
+    def load(
+        self,
+        infos: List[TableInfo],
+        log: Callable[[str], None] = print
+    ) -> List[TableLoad]:
+        loads = {i.target: TableLoad(i.schema, i.name, i.target, len(i.ranges)) for i in infos}
+        started: Dict[str, float] = {}
+        pending = {i.target: len(i.ranges) for i in infos}
+
+        coordinator = self.pool.getconn()
+        snapshot = None
+        try:
+            if self.use_snapshot:
+                coordinator.set_session(isolation_level="REPEATABLE READ", readonly=True)
+                with coordinator.cursor() as cur:
+                    cur.execute("SELECT pg_export_snapshot()")
+                    snapshot = cur.fetchone()[0]
+
+            ready = []
+            for info in infos:
+                try:
+                    self.target.prepare(info)
+                    ready.append(info)
+                except Exception as e:
+                    loads[info.target].error = f"prepare failed: {e}"
+
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                futures = {}
+                for info in ready:
+                    for part in range(len(info.ranges)):
+                        futures[pool.submit(self._timed_copy, info, part, snapshot, started)] = (info, part)
+
+                for future in as_completed(futures):
+                    info, part = futures[future]
+                    load = loads[info.target]
+                    try:
+                        load.rows += future.result()
+                    except Exception as e:
+                        if load.error is None:
+                            load.error = f"range {part}: {str(e).strip().splitlines()[0] if str(e).strip() else repr(e)}"
+                    pending[info.target] -= 1
+                    if pending[info.target] == 0:
+                        self._finish(info, load)
+                        load.seconds = time.perf_counter() - started.get(info.target, time.perf_counter())
+                        status = f"✅ {load.rows:,} rows" if load.ok else f"❌ {load.error}"
+                        log(f"  {info.schema}.{info.name} -> {info.target} "
+                            f"({load.partitions} range(s), {load.seconds:.1f}s): {status}")
+        finally:
+            coordinator.rollback()
+            coordinator.set_session(isolation_level="DEFAULT", readonly="DEFAULT")
+            self.pool.putconn(coordinator)
+
+        return [loads[i.target] for i in infos]
+
+    def _finish(self, info: TableInfo, load: TableLoad) -> None:
+        """Swap in a fully loaded table; drop the staged parts of a failed one"""
+        if not load.ok:
+            self.target.abort(info)
+            return
+        try:
+            self.target.commit(info)
+        except Exception as e:
+            load.error = f"commit failed: {e}"
+            self.target.abort(info)
+
+    def _timed_copy(self, info: TableInfo, part: int, snapshot: Optional[str], started: Dict[str, float]) -> int:
+        started.setdefault(info.target, time.perf_counter())
+        return self._copy_range(info, part, snapshot)
+
+
+# =============================================================================
+# pg_dump fixtures
+# =============================================================================
+
+_TEXT_ESCAPES = {"b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t", "v": "\v"}
+
+
+def _unescape_text(value: str) -> str:
+    def repl(m: re.Match) -> str:
+        s = m.group(1)
+        if s in _TEXT_ESCAPES:
+            return _TEXT_ESCAPES[s]
+        if s[0] == "x":
+            return chr(int(s[1:], 16))
+        if s[0].isdigit():
+            return chr(int(s, 8))
+        return s
+    return re.sub(r"\\(x[0-9a-fA-F]{1,2}|[0-7]{1,3}|.)", repl, value)
+
+
+def _csv_field(value: Optional[str]) -> str:
+    return "" if value is None else '"' + value.replace('"', '""') + '"'
+
+
+def _unquote(name: str) -> str:
+    name = name.strip()
+    return name[1:-1].replace('""', '"') if name.startswith('"') else name
+
+
+def _split_qualified(name: str) -> Tuple[str, str]:
+    parts = re.findall(r'"((?:[^"]|"")*)"|([^.]+)', name)
+    names = [q.replace('""', '"') if q else u for q, u in parts]
+    return (names[0], names[1]) if len(names) == 2 else ("public", names[-1])
+
+
+class DumpFixture:
+    """
+    Tables and rows from a plain-format pg_dump file.
+
+    COPY text-format rows are re-encoded as PostgreSQL-style CSV so the
+    fixture exercises the same Arrow conversion as a live COPY.
+    """
+
+    _CREATE_RE = re.compile(r"^CREATE (?:UNLOGGED )?TABLE (.+?) \($")
+    _COPY_RE = re.compile(r"^COPY (.+?) \((.*)\) FROM stdin;$")
+    _COLUMN_RE = re.compile(
+        r'^\s+("(?:[^"]|"")+"|\S+) (.+?)(?: COLLATE \S+)?(?: DEFAULT .*| NOT NULL.*| GENERATED .*| NULL)?,?$'
+    )
+
+    def __init__(self, path: str):
+        self.path = path
+        self.columns: Dict[Tuple[str, str], List[Tuple[str, str]]] = {}
+        self.rows: Dict[Tuple[str, str], List[str]] = {}
+        self.copy_columns: Dict[Tuple[str, str], List[str]] = {}
+        self._parse()
+
+    def _parse(self) -> None:
+        with open(self.path, "r", encoding="utf-8") as f:
+            lines = iter(f.read().split("\n"))
+        for line in lines:
+            m = self._CREATE_RE.match(line)
+            if m:
+                key = _split_qualified(m.group(1))
+                cols = []
+                for col_line in lines:
+                    if col_line.startswith(")"):
+                        break
+                    cm = self._COLUMN_RE.match(col_line)
+                    if cm and not re.match(r"\s+(CONSTRAINT|PRIMARY|UNIQUE|CHECK|FOREIGN|EXCLUDE)\b", col_line):
+                        cols.append((_unquote(cm.group(1)), cm.group(2)))
+                self.columns[key] = cols
+                continue
+            m = self._COPY_RE.match(line)
+            if m:
+                key = _split_qualified(m.group(1))
+                self.copy_columns[key] = [
+                    _unquote(c) for c in re.findall(r'"(?:[^"]|"")*"|[^,\s][^,]*', m.group(2))
+                ]
+                data = []
+                for row in lines:
+                    if row == "\\.":
+                        break
+                    data.append(row)
+                self.rows[key] = data
+
+    def tables(self) -> List[Tuple[str, str]]:
+        return sorted(self.columns)
+
+    def describe(self, schema: str, table: str) -> TableInfo:
+        key = (schema, table)
+        if key not in self.columns:
+            raise KeyError(f"{schema}.{table} not in dump")
+        columns = self.columns[key]
+        if key in self.copy_columns:
+            # COPY rows follow the COPY column list
+            types = dict(columns)
+            columns = [(c, types.get(c, "text")) for c in self.copy_columns[key]]
+        return TableInfo(schema, table, columns, estimated_rows=len(self.rows.get(key, [])))
+
+    def csv_stream(self, schema: str, table: str) -> BinaryIO:
+        out = io.StringIO()
+        for row in self.rows.get((schema, table), []):
+            fields = [None if v == "\\N" else _unescape_text(v) for v in row.split("\t")]
+            out.write(",".join(_csv_field(v) for v in fields) + "\n")
+        return io.BytesIO(out.getvalue().encode("utf-8"))
+
+
+def load_dump(
+    path: str,
+    target: ParquetTarget,
+    tables: Optional[List[Tuple[str, str]]] = None,
+    log: Callable[[str], None] = print
+) -> List[TableLoad]:
+    """Sequential load of pg_dump fixture tables through the normal writers"""
+    fixture = DumpFixture(path)
+    results = []
+    for schema, table in tables or fixture.tables():
+        started = time.perf_counter()
+        load = TableLoad(schema, table, target_name(schema, table), 1)
+        try:
+            info = fixture.describe(schema, table)
+            target.prepare(info)
+            try:
+                load.rows = target.write(info, 0, csv_reader(fixture.csv_stream(schema, table), info.arrow_schema()))
+                target.commit(info)
+            except Exception:
+                target.abort(info)
+                raise
+        except Exception as e:
+            load.error = str(e).strip().splitlines()[0]
+        load.seconds = time.perf_counter() - started
+        status = f"✅ {load.rows:,} rows" if load.ok else f"❌ {load.error}"
+        log(f"  {schema}.{table} -> {load.target}: {status}")
+        results.append(load)
+    return results
+
+
+# =============================================================================
+# CLI
+# =============================================================================
+
+def print_summary(results: List[TableLoad], elapsed: float) -> None:
+    failed = [r for r in results if not r.ok]
+    rows = sum(r.rows for r in results if r.ok)
+    print(f"\n{'='*50}")
+    print(f"Loaded: {len(results) - len(failed)}/{len(results)} table(s), {rows:,} rows in {elapsed:.1f}s "
+          f"({rows / elapsed if elapsed > 0 else 0:,.0f} rows/s)")
+    for r in failed:
+        print(f"  ❌ {r.schema}.{r.table}: {r.error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk copy PostgreSQL tables to Parquet/Delta via COPY")
+    parser.add_argument("--out-dir", "-o", default="bmdsalesdb", help="Output directory (one folder per table)")
+    parser.add_argument("--format", "-f", default="parquet", choices=list(TARGETS))
+    parser.add_argument("--table", "-t", action="append", default=[],
+                        help="schema.table to load (repeatable; default: tables in expressions.tmdl)")
+    parser.add_argument("--expressions", default=EXPRESSIONS_PATH, help="TMDL expressions file listing source tables")
+    parser.add_argument("--workers", "-j", type=int, default=DEFAULT_WORKERS, help="Parallel COPY connections")
+    parser.add_argument("--rows-per-partition", type=int, default=DEFAULT_ROWS_PER_PARTITION)
+    parser.add_argument("--max-partitions", type=int, default=DEFAULT_MAX_PARTITIONS)
+    parser.add_argument("--no-snapshot", action="store_true",
+                        help="Don't share one snapshot across connections (e.g. behind pgbouncer)")
+    parser.add_argument("--plan", action="store_true", help="Show tables and key ranges without copying")
+    parser.add_argument("--dump", help="Load from a plain-format pg_dump file instead of a server")
+    parser.add_argument("--host")
+    parser.add_argument("--port", type=int)
+    parser.add_argument("--dbname")
+    parser.add_argument("--user", "-U")
+    args = parser.parse_args()
+
+    tables = [parse_table_arg(t) for t in args.table] or None
+    try:
+        target = TARGETS[args.format](args.out_dir)
+    except ImportError as e:
+        print(f"❌ {e}")
+        return 1
+
+    started = time.perf_counter()
+    if args.dump:
+        print(f"Loading pg_dump fixture {args.dump} -> {args.out_dir} ({args.format})\n")
+        results = load_dump(args.dump, target, tables)
+        print_summary(results, time.perf_counter() - started)
+        return 0 if all(r.ok for r in results) else 1
+
+    config = PgConfig.from_env()
+    config.host = args.host or config.host
+    config.port = args.port or config.port
+    config.dbname = args.dbname or config.dbname
+    config.user = args.user or config.user
+    if not config.password and sys.stdin.isatty():
+        config.password = getpass.getpass(f"PostgreSQL password for {config.user or getpass.getuser()}: ")
+
+    tables = tables or source_tables(args.expressions)
+    with BulkLoader(config, target, args.workers, args.rows_per_partition,
+                    args.max_partitions, use_snapshot=not args.no_snapshot) as loader:
+        infos, missing = loader.plan(tables)
+        print(f"{len(infos)} table(s) from {config.host}/{config.dbname}, "
+              f"{sum(len(i.ranges) for i in infos)} range(s), {args.workers} connection(s)\n")
+        if args.plan:
+            for info in infos:
+                key = f"key {info.key}, " if info.key else ""
+                print(f"  {info.schema}.{info.name}: ~{info.estimated_rows:,} rows, {key}{len(info.ranges)} range(s)")
+            for m in missing:
+                print(f"  ❌ {m.schema}.{m.table}: {m.error}")
+            return 0
+        results = loader.load(infos) + missing
+
+    print_summary(results, time.perf_counter() - started)
+    return 0 if all(r.ok for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
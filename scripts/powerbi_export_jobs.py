@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Power BI ExportTo Job Runner
+BMD Sales report snapshots (PDF / PPTX / PNG)
+
+Submits asynchronous ExportTo jobs for many reports and pages at once, polls
+them with adaptive backoff, and streams finished files to disk. In-flight
+jobs are capped per Premium/Fabric capacity, since the service throttles
+concurrent exports per capacity rather than per report.
+
+Usage:
+    python scripts/powerbi_export_jobs.py --workspace <ws> --report <id> --format PDF --per-page
+    python scripts/powerbi_export_jobs.py --workspace <ws> --all-reports --format PNG --out-dir snapshots/
+"""
+
+import argparse
+import asyncio
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Optional, Dict, Any, List
+
+from powerbi_report_builder import PowerBIClient, PowerBIConfig
+
+
+EXPORT_FORMATS = {"PDF": ".pdf", "PPTX": ".pptx", "PNG": ".png"}
+
+# Poll delay bounds in seconds
+POLL_MIN_DELAY = 2.0
+POLL_MAX_DELAY = 30.0
+POLL_GROWTH = 1.5
+
+# Concurrent ExportTo jobs allowed per capacity
+DEFAULT_MAX_PER_CAPACITY = 5
+DEFAULT_JOB_TIMEOUT = 30 * 60
+
+
+@dataclass
+class ExportJob:
+    """One ExportTo request: a whole report, or a single page of it"""
+    report_id: str
+    workspace_id: str
+    format: str
+    out_path: str
+    page_name: Optional[str] = None
+    capacity_id: str = "shared"
+    export_id: Optional[str] = None
+    status: str = "Pending"
+    percent_complete: int = 0
+    polls: int = 0
+    bytes_written: int = 0
+    error: Optional[str] = None
+    submitted_at: float = 0.0
+    ready_at: float = 0.0
+    finished_at: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.status == "Succeeded" and self.error is None
+
+    @property
+    def render_seconds(self) -> float:
+        return self.ready_at - self.submitted_at if self.ready_at else 0.0
+
+
+def safe_file_name(name: str) -> str:
+    return re.sub(r"[^0-9A-Za-z._ -]+", "_", name).strip() or "export"
+
+
+def next_poll_delay(
+    previous_delay: float,
+    retry_after: Optional[float],
+    percent: int,
+    last_percent: int,
+    interval: float,
+    min_delay: float = POLL_MIN_DELAY,
+    max_delay: float = POLL_MAX_DELAY
+) -> float:
+    """
+    Adaptive poll delay.
+
+    Honours Retry-After when the service sends one. Otherwise, if progress
+    moved since the last poll, aim for half the projected remaining time;
+    if it stalled, back off geometrically.
+    """
+    if retry_after:
+        return min(retry_after, max_delay)
+    if percent > last_percent and interval > 0:
+        rate = (percent - last_percent) / interval
+        delay = (100 - percent) / rate / 2
+    else:
+        delay = previous_delay * POLL_GROWTH
+    return min(max(delay, min_delay), max_delay)
+
+
+class ExportJobRunner:
+    """
+    Runs ExportJobs concurrently.
+
+    Submission and polling happen on worker threads over the client's pooled
+    session. A per-capacity semaphore bounds how many jobs render at once;
+    the slot is released as soon as the file is ready, so downloads overlap
+    with the next renders.
+    """
+
+    def __init__(
+        self,
+        client: PowerBIClient,
+        max_per_capacity: int = DEFAULT_MAX_PER_CAPACITY,
+        job_timeout: float = DEFAULT_JOB_TIMEOUT,
+        poll_min_delay: float = POLL_MIN_DELAY,
+        progress: bool = False
+    ):
+        self.client = client
+        self.max_per_capacity = max_per_capacity
+        self.job_timeout = job_timeout
+        self.poll_min_delay = poll_min_delay
+        self.progress = progress
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._pool: Optional[ThreadPoolExecutor] = None
+
+    async def _call(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool, lambda: fn(*args, **kwargs))
+
+    def _submit(self, job: ExportJob) -> None:
+        config: Dict[str, Any] = {}
+        if job.page_name:
+            config["pages"] = [{"pageName": job.page_name}]
+        body = {"format": job.format, "powerBIReportConfiguration": config}
+        response = self.client.request("POST", f"/reports/{job.report_id}/ExportTo", job.workspace_id, json=body)
+        job.submitted_at = time.perf_counter()
+        if response is None or response.status_code != 202:
+            job.status = "Failed"
+            job.error = response.text if response is not None else "connection failed"
+            return
+        payload = response.json()
+        job.export_id = payload["id"]
+        job.status = payload.get("status", "NotStarted")
+
+    def _poll(self, job: ExportJob) -> Optional[float]:
+        """Refresh job status; returns the service's Retry-After, if any"""
+        response = self.client.request(
+            "GET", f"/reports/{job.report_id}/exports/{job.export_id}", job.workspace_id
+        )
+        job.polls += 1
+        if response is None or response.status_code not in (200, 202):
+            job.status = "Failed"
+            job.error = response.text if response is not None else "connection failed"
+            return None
+        payload = response.json()
+        job.status = payload.get("status", job.status)
+        job.percent_complete = int(payload.get("percentComplete") or 0)
+        if job.status == "Failed":
+            job.error = str(payload.get("error") or "export failed")
+        retry_after = response.headers.get("Retry-After")
+        return float(retry_after) if retry_after else None
+
+    async def _render(self, job: ExportJob) -> None:
+        """Submit and poll until the export has succeeded or failed"""
+        await self._call(self._submit, job)
+        delay = self.poll_min_delay
+        last_percent, last_poll = 0, time.perf_counter()
+        while job.status not in ("Succeeded", "Failed"):
+            if time.perf_counter() - job.submitted_at > self.job_timeout:
+                job.status, job.error = "Failed", f"timed out after {self.job_timeout:.0f}s"
+                return
+            await asyncio.sleep(delay)
+            retry_after = await self._call(self._poll, job)
+            now = time.perf_counter()
+            delay = next_poll_delay(delay, retry_after, job.percent_complete, last_percent,
+                                    now - last_poll, min_delay=self.poll_min_delay)
+            last_percent, last_poll = job.percent_complete, now
+        job.ready_at = time.perf_counter()
+
+    async def _run_job(self, job: ExportJob) -> ExportJob:
+        semaphore = self._semaphores.setdefault(job.capacity_id, asyncio.Semaphore(self.max_per_capacity))
+        async with semaphore:
+            await self._render(job)
+        if job.ok:
+            os.makedirs(os.path.dirname(job.out_path) or ".", exist_ok=True)
+            downloaded = await self._call(
+                self.client.download_to_file,
+                f"/reports/{job.report_id}/exports/{job.export_id}/file",
+                job.out_path, job.workspace_id, progress=self.progress
+            )
+            if downloaded:
+                job.bytes_written = os.path.getsize(job.out_path)
+            else:
+                job.error = "download failed"
+        job.finished_at = time.perf_counter()
+        status = "OK" if job.ok else f"FAILED ({job.error})"
+        print(f"  {status} {job.out_path} [{job.render_seconds:.1f}s render, {job.polls} polls]")
+        return job
+
+    async def run(self, jobs: List[ExportJob]) -> List[ExportJob]:
+        # Threads only block on HTTP; size the pool for every job's submit/poll/download
+        with ThreadPoolExecutor(max_workers=max(4, len(jobs))) as pool:
+            self._pool = pool
+            try:
+                return await asyncio.gather(*(self._run_job(job) for job in jobs))
+            finally:
+                self._pool = None
+
+
+def capacity_map(client: PowerBIClient) -> Dict[str, str]:
+    """Workspace ID -> capacity ID (shared capacity workspaces map to "shared")"""
+    return {ws["id"]: ws.get("capacityId") or "shared" for ws in client.list_workspaces()}
+
+
+def build_jobs(
+    client: PowerBIClient,
+    workspace_id: str,
+    report_ids: List[str],
+    export_format: str,
+    out_dir: str,
+    per_page: bool = False,
+    capacities: Optional[Dict[str, str]] = None
+) -> List[ExportJob]:
+    """Expand reports (and optionally their pages) into ExportJobs"""
+    extension = EXPORT_FORMATS[export_format]
+    capacity_id = (capacities or {}).get(workspace_id, "shared")
+    reports = {r["id"]: r for r in client.list_reports(workspace_id)}
+    jobs = []
+
+    for report_id in report_ids:
+        report_name = safe_file_name(reports.get(report_id, {}).get("name", report_id))
+        # PNG exports are single-page only
+        if per_page or export_format == "PNG":
+            pages = client.get_paged(f"/reports/{report_id}/pages", workspace_id)
+            for page in sorted(pages, key=lambda p: p.get("order", 0)):
+                file_name = safe_file_name(page.get("displayName") or page["name"]) + extension
+                jobs.append(ExportJob(
+                    report_id=report_id,
+                    workspace_id=workspace_id,
+                    format=export_format,
+                    page_name=page["name"],
+                    out_path=os.path.join(out_dir, report_name, file_name),
+                    capacity_id=capacity_id
+                ))
+        else:
+            jobs.append(ExportJob(
+                report_id=report_id,
+                workspace_id=workspace_id,
+                format=export_format,
+                out_path=os.path.join(out_dir, report_name + extension),
+                capacity_id=capacity_id
+            ))
+    return jobs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export Power BI reports/pages via the ExportTo API")
+    parser.add_argument("--workspace", "-w", required=True, help="Workspace ID")
+    parser.add_argument("--report", "-r", action="append", default=[], help="Report ID (repeatable)")
+    parser.add_argument("--all-reports", action="store_true", help="Export every report in the workspace")
+    parser.add_argument("--format", "-f", default="PDF", choices=list(EXPORT_FORMATS))
+    parser.add_argument("--per-page", action="store_true", help="One file per report page")
+    parser.add_argument("--out-dir", "-o", default="exports", help="Output directory")
+    parser.add_argument("--max-per-capacity", type=int, default=DEFAULT_MAX_PER_CAPACITY,
+                        help="Concurrent export jobs per capacity")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_JOB_TIMEOUT, help="Per-job timeout in seconds")
+    args = parser.parse_args()
+
+    with PowerBIClient(PowerBIConfig()) as client:
+        report_ids = args.report
+        if args.all_reports:
+            report_ids = [r["id"] for r in client.list_reports(args.workspace)]
+        if not report_ids:
+            print("Please provide --report or --all-reports")
+            return 1
+
+        jobs = build_jobs(client, args.workspace, report_ids, args.format, args.out_dir,
+                          per_page=args.per_page, capacities=capacity_map(client))
+        print(f"Exporting {len(jobs)} file(s) as {args.format} "
+              f"(max {args.max_per_capacity} in flight per capacity)\n")
+
+        started = time.perf_counter()
+        runner = ExportJobRunner(client, max_per_capacity=args.max_per_capacity, job_timeout=args.timeout)
+        results = asyncio.run(runner.run(jobs))
+        elapsed = time.perf_counter() - started
+
+    failed = [j for j in results if not j.ok]
+    total_mb = sum(j.bytes_written for j in results) / (1024 * 1024)
+    print(f"\n{'='*50}")
+    print(f"Exported: {len(results) - len(failed)}/{len(results)} file(s), {total_mb:,.1f} MiB in {elapsed:.1f}s")
+    for job in failed:
+        print(f"  ❌ {job.out_path}: {job.error}")
+    return 0 if not failed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -11,16 +11,57 @@ This script provides utilities for:
 Dataset ID: 3477f170-bf61-42a4-b7a6-4414d7bf8881
 """
 
+import asyncio
+import base64
+import hashlib
+import io
 import json
+import os
+import random
+import re
+import sqlite3
 import subprocess
+import sys
+import threading
+import time
+import uuid
 import requests
-from dataclasses import dataclass
-from typing import Optional, Dict, Any, List
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from datetime import datetime
+from requests.adapters import HTTPAdapter
+from typing import Optional, Dict, Any, List, Tuple, Callable, BinaryIO
+from urllib.parse import quote
 
 
 # Configuration
 DATASET_ID = "3477f170-bf61-42a4-b7a6-4414d7bf8881"
-API_BASE = "https://api.powerbi.com/v1.0/myorg"
+# POWERBI_API_BASE lets the CLI target a local stand-in (scripts/mock_powerbi_server.py)
+API_BASE = os.environ.get("POWERBI_API_BASE", "https://api.powerbi.com/v1.0/myorg")
+
+# executeQueries currently accepts a single query per request. Batching logic
+# packs up to this many queries per POST so it picks up a raised limit for free.
+MAX_QUERIES_PER_REQUEST = 1
+
+# Status codes worth retrying: throttling and transient service errors
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Cached Azure CLI tokens are renewed this many seconds before they expire
+TOKEN_REFRESH_MARGIN = 300
+
+# Streaming transfer settings
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+UPLOAD_BLOCK_SIZE = 8 * 1024 * 1024
+UPLOAD_WORKERS = 4
+# Power BI rejects multipart imports above 1 GB; larger files go through a temporary upload location
+LARGE_IMPORT_THRESHOLD = 1024 ** 3
+
+# Persistent DAX result cache (see DaxResultCache)
+DAX_CACHE_PATH = os.environ.get(
+    "POWERBI_DAX_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "bmd_powerbi", "dax_cache.sqlite")
+)
+DAX_CACHE_MAX_ENTRIES = 500
+DAX_CACHE_TTL_SECONDS = 24 * 3600
 
 
 @dataclass
@@ -31,19 +72,48 @@ class PowerBIConfig:
     workspace_id: Optional[str] = None  # Set if using workspace-specific API
 
 
-def get_access_token() -> str:
-    """Get Azure AD access token for Power BI API using Azure CLI"""
+_token_cache: Dict[str, Any] = {}
+_token_lock = threading.Lock()
+
+
+def _token_expiry(token_info: Dict[str, Any]) -> float:
+    """Epoch expiry of an `az account get-access-token` result"""
+    if token_info.get("expires_on"):
+        return float(token_info["expires_on"])
     try:
-        result = subprocess.run(
-            ["az", "account", "get-access-token", 
-             "--resource", "https://analysis.windows.net/powerbi/api",
-             "--query", "accessToken", "-o", "tsv"],
-            capture_output=True, text=True, check=True
-        )
-        return result.stdout.strip()
-    except subprocess.CalledProcessError as e:
-        print(f"Error getting token: {e.stderr}")
-        raise
+        # Older CLI versions only report local time, e.g. "2025-01-01 12:00:00.000000"
+        return datetime.strptime(token_info["expiresOn"], "%Y-%m-%d %H:%M:%S.%f").timestamp()
+    except (KeyError, ValueError):
+        return time.time() + 45 * 60
+
+
+def get_access_token() -> str:
+    """Get Azure AD access token for Power BI API using Azure CLI
+
+    POWERBI_ACCESS_TOKEN, when set, is used as-is (CI runs, local mock server).
+    Tokens from the CLI are cached in-process until shortly before expiry, so
+    the `az` subprocess runs once per session rather than once per request.
+    """
+    env_token = os.environ.get("POWERBI_ACCESS_TOKEN")
+    if env_token:
+        return env_token
+    with _token_lock:
+        if _token_cache and _token_cache["expires_at"] - TOKEN_REFRESH_MARGIN > time.time():
+            return _token_cache["token"]
+        try:
+            result = subprocess.run(
+                ["az", "account", "get-access-token", 
+                 "--resource", "https://analysis.windows.net/powerbi/api",
+                 "-o", "json"],
+                capture_output=True, text=True, check=True
+            )
+        except subprocess.CalledProcessError as e:
+            print(f"Error getting token: {e.stderr}")
+            raise
+        token_info = json.loads(result.stdout)
+        _token_cache["token"] = token_info["accessToken"]
+        _token_cache["expires_at"] = _token_expiry(token_info)
+        return _token_cache["token"]
 
 
 def get_headers(token: str) -> Dict[str, str]:
@@ -54,21 +124,660 @@ def get_headers(token: str) -> Dict[str, str]:
     }
 
 
+# =============================================================================
+# HTTP Client
+# =============================================================================
+
+def create_session(pool_size: int = 8) -> requests.Session:
+    """Create a keep-alive session with a connection pool sized for pool_size workers"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def _retry_delay(response: Optional[requests.Response], attempt: int, backoff: float) -> float:
+    """Honour Retry-After on throttled responses, else exponential backoff with jitter"""
+    if response is not None:
+        retry_after = response.headers.get("Retry-After")
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+    return backoff * (2 ** attempt) * (0.5 + random.random())
+
+
+def request_with_retry(
+    session: requests.Session,
+    method: str,
+    url: str,
+    max_retries: int = 4,
+    backoff: float = 1.0,
+    **kwargs
+) -> Tuple[Optional[requests.Response], int]:
+    """
+    Send a request, retrying throttled (429), 5xx and connection failures.
+
+    Returns:
+        (response, attempts). response is None if every attempt failed to connect.
+    """
+    kwargs.setdefault("timeout", 120)
+    response = None
+    for attempt in range(max_retries + 1):
+        try:
+            response = session.request(method, url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            response = None
+            if attempt == max_retries:
+                print(f"Request failed after {attempt + 1} attempts: {e}")
+                return None, attempt + 1
+        else:
+            if response.status_code not in RETRY_STATUS_CODES or attempt == max_retries:
+                return response, attempt + 1
+        delay = _retry_delay(response, attempt, backoff)
+        if response is not None:
+            # Hand the connection back to the pool (a stream=True body is never read otherwise)
+            response.close()
+        time.sleep(delay)
+    return response, max_retries + 1
+
+
+class TransferProgress:
+    """Thread-safe byte counter that prints progress and throughput to stderr"""
+
+    def __init__(self, label: str, total: Optional[int] = None, initial: int = 0,
+                 interval: float = 2.0, enabled: bool = True):
+        self.label = label
+        self.total = total
+        self.done = initial
+        self.interval = interval
+        self.enabled = enabled
+        self._initial = initial       # resumed bytes don't count towards throughput
+        self._started = time.perf_counter()
+        self._last_print = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._started
+
+    @property
+    def throughput(self) -> float:
+        """Bytes per second transferred by this run"""
+        return (self.done - self._initial) / self.elapsed if self.elapsed > 0 else 0.0
+
+    def update(self, n: int):
+        with self._lock:
+            self.done += n
+            now = time.perf_counter()
+            if self.enabled and now - self._last_print >= self.interval:
+                self._last_print = now
+                self._print()
+
+    def finish(self):
+        if self.enabled:
+            self._print(final=True)
+
+    def _print(self, final: bool = False):
+        mib = 1024 * 1024
+        done = f"{self.done / mib:,.1f}"
+        if self.total:
+            done += f"/{self.total / mib:,.1f} MiB ({self.done / self.total:.0%})"
+        else:
+            done += " MiB"
+        suffix = f" in {self.elapsed:.1f}s" if final else ""
+        print(f"  {self.label}: {done} at {self.throughput / mib:,.1f} MiB/s{suffix}", file=sys.stderr)
+
+
+class _MultipartFileStream:
+    """multipart/form-data body that streams a file from disk instead of buffering it"""
+
+    def __init__(self, file_path: str, filename: str, progress: Optional[TransferProgress] = None):
+        self.boundary = uuid.uuid4().hex
+        head = (
+            f"--{self.boundary}\r\n"
+            f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+            "Content-Type: application/octet-stream\r\n\r\n"
+        ).encode("utf-8")
+        tail = f"\r\n--{self.boundary}--\r\n".encode("utf-8")
+        self._file = open(file_path, "rb")
+        self._parts: List[BinaryIO] = [io.BytesIO(head), self._file, io.BytesIO(tail)]
+        self._length = len(head) + os.path.getsize(file_path) + len(tail)
+        self._progress = progress
+
+    @property
+    def content_type(self) -> str:
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def __len__(self) -> int:
+        return self._length
+
+    def read(self, size: int = -1) -> bytes:
+        chunks = []
+        while self._parts and (size < 0 or size > 0):
+            part = self._parts[0]
+            data = part.read(size)
+            if not data:
+                self._parts.pop(0)
+                continue
+            if part is self._file and self._progress:
+                self._progress.update(len(data))
+            chunks.append(data)
+            if size > 0:
+                size -= len(data)
+        return b"".join(chunks)
+
+    def close(self):
+        self._file.close()
+
+
+class PowerBIClient:
+    """
+    Power BI REST client holding one keep-alive session and a cached token.
+
+    Collection endpoints follow @odata.nextLink pagination. The a* coroutines
+    fan calls out across workspaces/datasets on worker threads that share the
+    session's connection pool, bounded by max_concurrency.
+    """
+
+    def __init__(
+        self,
+        config: PowerBIConfig = PowerBIConfig(),
+        pool_size: int = 16,
+        max_retries: int = 4,
+        backoff: float = 1.0
+    ):
+        self.config = config
+        self.session = create_session(pool_size)
+        self.max_concurrency = pool_size
+        self.max_retries = max_retries
+        self.backoff = backoff
+        # One worker pool per client, shared by every fan-out, so concurrent
+        # fan-outs never run more threads than the adapter has connections
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+
+    def __enter__(self) -> "PowerBIClient":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        self.session.close()
+
+    def url(self, path: str, workspace_id: Optional[str] = None) -> str:
+        """Absolute URL for an API path, scoped to a workspace when given"""
+        if path.startswith(("http://", "https://")):
+            return path
+        if workspace_id:
+            return f"{self.config.api_base}/groups/{workspace_id}{path}"
+        return f"{self.config.api_base}{path}"
+
+    def request(
+        self,
+        method: str,
+        path: str,
+        workspace_id: Optional[str] = None,
+        **kwargs
+    ) -> Optional[requests.Response]:
+        """Send an authenticated request with retry. Returns None if the connection failed."""
+        kwargs.setdefault("headers", get_headers(get_access_token()))
+        response, _ = request_with_retry(
+            self.session, method, self.url(path, workspace_id),
+            max_retries=self.max_retries, backoff=self.backoff, **kwargs
+        )
+        return response
+
+    def get_json(self, path: str, workspace_id: Optional[str] = None) -> Dict[str, Any]:
+        response = self.request("GET", path, workspace_id)
+        if response is not None and response.status_code == 200:
+            return response.json()
+        print(f"Error: {response.text if response is not None else 'connection failed'}")
+        return {}
+
+    def get_paged(self, path: str, workspace_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """GET a collection, following @odata.nextLink until exhausted"""
+        items: List[Dict[str, Any]] = []
+        url: Optional[str] = self.url(path, workspace_id)
+        while url:
+            response = self.request("GET", url)
+            if response is None or response.status_code != 200:
+                print(f"Error: {response.text if response is not None else 'connection failed'}")
+                break
+            payload = response.json()
+            items.extend(payload.get("value", []))
+            url = payload.get("@odata.nextLink")
+        return items
+
+    # -------------------------------------------------------------------------
+    # Workspaces, datasets and reports
+    # -------------------------------------------------------------------------
+
+    def list_workspaces(self) -> List[Dict[str, Any]]:
+        return self.get_paged("/groups")
+
+    def list_datasets(self, workspace_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        return self.get_paged("/datasets", workspace_id)
+
+    def list_reports(self, workspace_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        return self.get_paged("/reports", workspace_id)
+
+    def get_dataset_info(self, dataset_id: str = DATASET_ID, workspace_id: Optional[str] = None) -> Dict[str, Any]:
+        return self.get_json(f"/datasets/{dataset_id}", workspace_id)
+
+    def clone_report(
+        self,
+        source_report_id: str,
+        target_name: str,
+        target_workspace_id: Optional[str] = None,
+        target_dataset_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        body = {"name": target_name}
+        if target_workspace_id:
+            body["targetWorkspaceId"] = target_workspace_id
+        if target_dataset_id:
+            body["targetModelId"] = target_dataset_id
+
+        response = self.request("POST", f"/reports/{source_report_id}/Clone", json=body)
+        if response is not None and response.status_code in [200, 202]:
+            return response.json()
+        print(f"Error: {response.text if response is not None else 'connection failed'}")
+        return {}
+
+    def export_report_to_file(
+        self,
+        report_id: str,
+        file_path: str,
+        workspace_id: Optional[str] = None,
+        progress: bool = True
+    ) -> bool:
+        if self.download_to_file(f"/reports/{report_id}/Export", file_path, workspace_id, progress=progress):
+            print(f"Report exported to {file_path}")
+            return True
+        return False
+
+    # -------------------------------------------------------------------------
+    # Streaming transfers
+    # -------------------------------------------------------------------------
+
+    def download_to_file(
+        self,
+        path: str,
+        file_path: str,
+        workspace_id: Optional[str] = None,
+        max_resumes: int = 5,
+        chunk_size: int = DOWNLOAD_CHUNK_SIZE,
+        progress: bool = True
+    ) -> bool:
+        """
+        Stream a GET response to disk without holding it in memory.
+
+        Data is written to <file_path>.part and renamed once complete. If the
+        connection drops, or a .part file is left from an earlier run, the
+        download resumes with a Range request; servers that ignore Range (200
+        instead of 206) cause a restart from byte zero.
+        """
+        part_path = f"{file_path}.part"
+        tracker: Optional[TransferProgress] = None
+
+        for attempt in range(max_resumes + 1):
+            offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+            headers = get_headers(get_access_token())
+            if offset:
+                headers["Range"] = f"bytes={offset}-"
+            response = self.request("GET", path, workspace_id, headers=headers, stream=True)
+            if response is None:
+                continue
+            if response.status_code == 416:
+                # Range not satisfiable: the .part file already holds the whole payload
+                response.close()
+                break
+            if response.status_code not in (200, 206):
+                print(f"Error: {response.text}")
+                response.close()
+                return False
+            if response.status_code == 200:
+                offset = 0
+
+            length = response.headers.get("Content-Length")
+            total = offset + int(length) if length else None
+            if tracker is None:
+                tracker = TransferProgress(os.path.basename(file_path), total, initial=offset, enabled=progress)
+            else:
+                tracker.total, tracker.done = total, offset
+
+            try:
+                with open(part_path, "ab" if offset else "wb") as f:
+                    for chunk in response.iter_content(chunk_size=chunk_size):
+                        f.write(chunk)
+                        tracker.update(len(chunk))
+            except (requests.ConnectionError, requests.exceptions.ChunkedEncodingError) as e:
+                print(f"  Download interrupted ({e}); resuming ({attempt + 1}/{max_resumes})", file=sys.stderr)
+                continue
+            finally:
+                response.close()
+
+            if total is None or os.path.getsize(part_path) >= total:
+                break
+        else:
+            print(f"Error: download of {file_path} did not complete after {max_resumes} resumes")
+            return False
+
+        os.replace(part_path, file_path)
+        if tracker:
+            tracker.finish()
+        return True
+
+    def import_pbix(
+        self,
+        file_path: str,
+        report_name: str,
+        workspace_id: str,
+        name_conflict: str = "CreateOrOverwrite",
+        progress: bool = True
+    ) -> Dict[str, Any]:
+        """Import a .pbix, streaming it from disk; files over LARGE_IMPORT_THRESHOLD use a temporary upload location"""
+        path = (f"/imports?datasetDisplayName={quote(report_name)}"
+                f"&nameConflict={quote(name_conflict)}")
+        size = os.path.getsize(file_path)
+        tracker = TransferProgress(os.path.basename(file_path), size, enabled=progress)
+
+        if size > LARGE_IMPORT_THRESHOLD:
+            file_url = self.upload_to_temporary_location(file_path, workspace_id, tracker)
+            if not file_url:
+                return {}
+            response = self.request("POST", path, workspace_id, json={"fileUrl": file_url})
+        else:
+            body = _MultipartFileStream(file_path, f"{report_name}.pbix", tracker)
+            headers = {"Authorization": f"Bearer {get_access_token()}", "Content-Type": body.content_type}
+            try:
+                # Sent once: a consumed stream can't be replayed by the retry loop
+                response = self.session.post(self.url(path, workspace_id), headers=headers, data=body, timeout=None)
+            except requests.RequestException as e:
+                print(f"Error: {e}")
+                return {}
+            finally:
+                body.close()
+        tracker.finish()
+
+        if response is not None and response.status_code in [200, 202]:
+            return response.json()
+        print(f"Error: {response.text if response is not None else 'connection failed'}")
+        return {}
+
+    def upload_to_temporary_location(
+        self,
+        file_path: str,
+        workspace_id: str,
+        tracker: Optional[TransferProgress] = None,
+        block_size: int = UPLOAD_BLOCK_SIZE,
+        max_workers: int = UPLOAD_WORKERS
+    ) -> Optional[str]:
+        """
+        Upload a file to a Power BI temporary upload location (an Azure blob SAS URL)
+        as parallel blocks, then commit the block list.
+
+        Returns:
+            The SAS URL to pass as fileUrl to the imports endpoint, or None on failure.
+        """
+        response = self.request("POST", "/imports/createTemporaryUploadLocation", workspace_id)
+        if response is None or response.status_code != 200:
+            print(f"Error: {response.text if response is not None else 'connection failed'}")
+            return None
+        sas_url = response.json()["url"]
+        separator = "&" if "?" in sas_url else "?"
+
+        size = os.path.getsize(file_path)
+        offsets = list(range(0, size, block_size)) or [0]
+        block_ids = [base64.b64encode(f"block-{i:08d}".encode()).decode() for i in range(len(offsets))]
+
+        def _put_block(index: int) -> bool:
+            with open(file_path, "rb") as f:
+                f.seek(offsets[index])
+                data = f.read(block_size)
+            block_url = f"{sas_url}{separator}comp=block&blockid={quote(block_ids[index], safe='')}"
+            resp, _ = request_with_retry(self.session, "PUT", block_url, max_retries=self.max_retries,
+                                         backoff=self.backoff, data=data)
+            if tracker:
+                tracker.update(len(data))
+            return resp is not None and resp.status_code == 201
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            if not all(pool.map(_put_block, range(len(offsets)))):
+                print("Error: block upload failed")
+                return None
+
+        block_list = "".join(f"<Latest>{b}</Latest>" for b in block_ids)
+        body = f'<?xml version="1.0" encoding="utf-8"?><BlockList>{block_list}</BlockList>'
+        resp, _ = request_with_retry(self.session, "PUT", f"{sas_url}{separator}comp=blocklist",
+                                     max_retries=self.max_retries, backoff=self.backoff,
+                                     data=body.encode("utf-8"), headers={"Content-Type": "application/xml"})
+        if resp is None or resp.status_code != 201:
+            print(f"Error committing upload: {resp.text if resp is not None else 'connection failed'}")
+            return None
+        return sas_url
+
+    # -------------------------------------------------------------------------
+    # Async fan-out
+    # -------------------------------------------------------------------------
+
+    async def _fan_out(self, fn: Callable[..., Any], calls: List[Tuple]) -> List[Any]:
+        """Run fn(*args) for each args tuple on worker threads, max_concurrency at a time"""
+        loop = asyncio.get_running_loop()
+        # A dedicated pool: the loop's default executor is sized by CPU count, not I/O
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency,
+                                                    thread_name_prefix="powerbi")
+            pool = self._executor
+        return await asyncio.gather(*(loop.run_in_executor(pool, fn, *args) for args in calls))
+
+    async def alist_datasets(self, workspace_ids: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+        results = await self._fan_out(self.list_datasets, [(ws,) for ws in workspace_ids])
+        return dict(zip(workspace_ids, results))
+
+    async def alist_reports(self, workspace_ids: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+        results = await self._fan_out(self.list_reports, [(ws,) for ws in workspace_ids])
+        return dict(zip(workspace_ids, results))
+
+    async def aget_dataset_infos(self, datasets: List[Tuple[str, Optional[str]]]) -> List[Dict[str, Any]]:
+        """Fetch details for (dataset_id, workspace_id) pairs concurrently"""
+        return await self._fan_out(self.get_dataset_info, datasets)
+
+    async def inventory(self, workspace_ids: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Collect datasets and reports for many workspaces at once.
+
+        Returns:
+            Mapping of workspace ID -> {"name", "datasets", "reports"}
+        """
+        if workspace_ids is None:
+            workspaces = (await self._fan_out(self.list_workspaces, [()]))[0]
+        else:
+            workspaces = [{"id": ws, "name": ws} for ws in workspace_ids]
+        ids = [ws["id"] for ws in workspaces]
+        datasets, reports = await asyncio.gather(self.alist_datasets(ids), self.alist_reports(ids))
+        return {
+            ws["id"]: {"name": ws.get("name"), "datasets": datasets[ws["id"]], "reports": reports[ws["id"]]}
+            for ws in workspaces
+        }
+
+
+_default_client: Optional[PowerBIClient] = None
+_default_client_lock = threading.Lock()
+
+
+def get_default_client() -> PowerBIClient:
+    """Shared client used by the module-level helper functions"""
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = PowerBIClient()
+        return _default_client
+
+
+# =============================================================================
+# DAX Result Cache
+# =============================================================================
+
+# Comments and string literals in DAX; strings are kept verbatim when normalizing
+_DAX_TOKEN_PATTERN = re.compile(r'"(?:[^"]|"")*"|//[^\n]*|--[^\n]*|/\*.*?\*/|\s+', re.DOTALL)
+
+
+def normalize_dax(query: str) -> str:
+    """Strip comments and collapse whitespace outside string literals"""
+    def _replace(match: re.Match) -> str:
+        token = match.group(0)
+        if token.startswith('"'):
+            return token
+        return " "
+    return _DAX_TOKEN_PATTERN.sub(_replace, query).strip()
+
+
+def get_last_refresh_time(config: PowerBIConfig = PowerBIConfig()) -> Optional[str]:
+    """
+    Return the end time of the dataset's latest completed refresh.
+
+    Returns None when refresh history is unavailable (e.g. no permission) or
+    none of the recent refreshes completed, in which case results should not
+    be cached: there is no refresh time that would invalidate them.
+    """
+    if config.workspace_id:
+        url = f"{config.api_base}/groups/{config.workspace_id}/datasets/{config.dataset_id}/refreshes"
+    else:
+        url = f"{config.api_base}/datasets/{config.dataset_id}/refreshes"
+
+    response = get_default_client().request("GET", url, params={"$top": 10})
+    if response is None or response.status_code != 200:
+        status = response.status_code if response is not None else "connection failed"
+        print(f"Could not read refresh history ({status}); caching disabled", file=sys.stderr)
+        return None
+
+    for refresh in response.json().get("value", []):
+        if refresh.get("status") == "Completed" and refresh.get("endTime"):
+            return refresh["endTime"]
+    return None
+
+
+class DaxResultCache:
+    """
+    Persistent DAX query-result cache backed by SQLite.
+
+    Entries are keyed by normalized DAX text, dataset ID and the dataset's last
+    refresh time, so a refresh invalidates every cached result for that dataset.
+    The cache is capped at max_entries (least recently used evicted first) and
+    entries older than ttl_seconds are ignored.
+    """
+
+    def __init__(
+        self,
+        path: str = DAX_CACHE_PATH,
+        max_entries: int = DAX_CACHE_MAX_ENTRIES,
+        ttl_seconds: float = DAX_CACHE_TTL_SECONDS
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS dax_cache (
+                cache_key TEXT PRIMARY KEY,
+                dataset_id TEXT NOT NULL,
+                refreshed_at TEXT NOT NULL,
+                result TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(query: str, dataset_id: str, refreshed_at: str) -> str:
+        text = "\x1f".join([dataset_id, refreshed_at, normalize_dax(query)])
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get(self, query: str, dataset_id: str, refreshed_at: str) -> Optional[Dict[str, Any]]:
+        key = self.make_key(query, dataset_id, refreshed_at)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT result, created_at FROM dax_cache WHERE cache_key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE dax_cache SET last_access = ? WHERE cache_key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, query: str, dataset_id: str, refreshed_at: str, result: Dict[str, Any]):
+        key = self.make_key(query, dataset_id, refreshed_at)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO dax_cache VALUES (?, ?, ?, ?, ?, ?)",
+                (key, dataset_id, refreshed_at, json.dumps(result), now, now)
+            )
+            # Drop results from superseded refreshes and expired entries, then enforce the LRU cap
+            self._conn.execute(
+                "DELETE FROM dax_cache WHERE (dataset_id = ? AND refreshed_at != ?) OR created_at < ?",
+                (dataset_id, refreshed_at, now - self.ttl_seconds)
+            )
+            self._conn.execute("""
+                DELETE FROM dax_cache WHERE cache_key IN (
+                    SELECT cache_key FROM dax_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_entries,))
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM dax_cache")
+            self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+
 # =============================================================================
 # DAX Query Execution
 # =============================================================================
 
-def execute_dax_query(query: str, config: PowerBIConfig = PowerBIConfig()) -> Dict[str, Any]:
+def execute_dax_query(
+    query: str,
+    config: PowerBIConfig = PowerBIConfig(),
+    cache: Optional[DaxResultCache] = None
+) -> Dict[str, Any]:
     """
     Execute a DAX query against the semantic model.
     
     Args:
         query: DAX query string (EVALUATE statement)
         config: PowerBI configuration
+        cache: Optional result cache, checked against the dataset's last refresh
     
     Returns:
         Query results as dictionary
     """
+    refreshed_at = get_last_refresh_time(config) if cache else None
+    if cache and refreshed_at:
+        cached = cache.get(query, config.dataset_id, refreshed_at)
+        if cached is not None:
+            return cached
+
     token = get_access_token()
     
     # API endpoint
@@ -85,67 +794,183 @@ def execute_dax_query(query: str, config: PowerBIConfig = PowerBIConfig()) -> Di
         }
     }
     
-    response = requests.post(url, headers=get_headers(token), json=body)
+    response = get_default_client().request("POST", url, headers=get_headers(token), json=body)
     
+    if response is None:
+        print("Error: connection failed")
+        return {"error": "connection failed"}
     if response.status_code == 200:
-        return response.json()
+        result = response.json()
+        # A 200 can still carry per-query errors; those must not be pinned until the next refresh
+        failed = any("error" in r for r in result.get("results", [])) or "error" in result
+        if cache and refreshed_at and not failed:
+            cache.put(query, config.dataset_id, refreshed_at, result)
+        return result
     else:
         print(f"Error {response.status_code}: {response.text}")
         return {"error": response.text}
 
 
+@dataclass
+class DaxQueryResult:
+    """Outcome of one query executed through execute_dax_batch"""
+    name: str
+    query: str
+    status_code: int = 0
+    latency_ms: float = 0.0         # wall time of the HTTP request that carried this query
+    attempts: int = 0
+    batch_size: int = 1             # number of queries sharing that request
+    result: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+    cached: bool = False
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def _execute_queries_url(config: PowerBIConfig) -> str:
+    if config.workspace_id:
+        return f"{config.api_base}/groups/{config.workspace_id}/datasets/{config.dataset_id}/executeQueries"
+    return f"{config.api_base}/datasets/{config.dataset_id}/executeQueries"
+
+
+def _run_query_batch(
+    session: requests.Session,
+    url: str,
+    headers: Dict[str, str],
+    batch: List[Tuple[str, str]],
+    max_retries: int,
+    backoff: float
+) -> List[DaxQueryResult]:
+    """POST one executeQueries request carrying every query in batch"""
+    body = {
+        "queries": [{"query": query} for _, query in batch],
+        "serializerSettings": {
+            "includeNulls": True
+        }
+    }
+    started = time.perf_counter()
+    response, attempts = request_with_retry(
+        session, "POST", url, max_retries=max_retries, backoff=backoff, headers=headers, json=body
+    )
+    latency_ms = (time.perf_counter() - started) * 1000
+
+    results = [
+        DaxQueryResult(name=name, query=query, latency_ms=latency_ms, attempts=attempts, batch_size=len(batch))
+        for name, query in batch
+    ]
+    if response is None:
+        for r in results:
+            r.error = "connection failed"
+        return results
+
+    for r in results:
+        r.status_code = response.status_code
+    if response.status_code != 200:
+        for r in results:
+            r.error = response.text
+        return results
+
+    payload = response.json()
+    query_results = payload.get("results", [])
+    for i, r in enumerate(results):
+        if i >= len(query_results):
+            r.error = "missing result in response"
+            continue
+        r.result = query_results[i]
+        if "error" in query_results[i]:
+            r.error = json.dumps(query_results[i]["error"])
+    return results
+
+
+def execute_dax_batch(
+    queries: Dict[str, str],
+    config: PowerBIConfig = PowerBIConfig(),
+    max_workers: int = 4,
+    queries_per_request: int = MAX_QUERIES_PER_REQUEST,
+    max_retries: int = 4,
+    backoff: float = 1.0,
+    session: Optional[requests.Session] = None,
+    cache: Optional[DaxResultCache] = None
+) -> Dict[str, DaxQueryResult]:
+    """
+    Execute several named DAX queries, packing and running requests concurrently.
+
+    Queries are grouped into executeQueries requests of up to queries_per_request
+    and independent requests run on a thread pool over one pooled session. The
+    token is fetched once for the whole run. Throttling (429 + Retry-After)
+    and transient 5xx errors are retried with exponential backoff.
+
+    Args:
+        queries: Mapping of query name -> DAX query (e.g. EXECUTIVE_DASHBOARD_QUERIES)
+        config: PowerBI configuration
+        max_workers: Concurrent requests in flight
+        queries_per_request: Queries packed per request (API limit: MAX_QUERIES_PER_REQUEST)
+        max_retries: Retries per request for retryable failures
+        backoff: Base backoff delay in seconds
+        session: Optional session to use instead of the shared client's pool
+        cache: Optional result cache; hits are returned without a request
+
+    Returns:
+        Mapping of query name -> DaxQueryResult, in input order
+    """
+    items = list(queries.items())
+    if not items:
+        return {}
+
+    collected: Dict[str, DaxQueryResult] = {}
+    refreshed_at = get_last_refresh_time(config) if cache else None
+    if cache and refreshed_at:
+        for name, query in items:
+            cached = cache.get(query, config.dataset_id, refreshed_at)
+            if cached is not None:
+                collected[name] = DaxQueryResult(
+                    name=name, query=query, status_code=200, result=cached["results"][0], cached=True
+                )
+    pending = [(name, query) for name, query in items if name not in collected]
+
+    per_request = max(1, queries_per_request)
+    batches = [pending[i:i + per_request] for i in range(0, len(pending), per_request)]
+    if not batches:
+        return {name: collected[name] for name, _ in items}
+
+    url = _execute_queries_url(config)
+    headers = get_headers(get_access_token())
+    session = session or get_default_client().session
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = [
+            pool.submit(_run_query_batch, session, url, headers, batch, max_retries, backoff)
+            for batch in batches
+        ]
+        for future in as_completed(futures):
+            for r in future.result():
+                collected[r.name] = r
+                if cache and refreshed_at and r.ok:
+                    # Stored in the single-query response shape used by execute_dax_query
+                    cache.put(r.query, config.dataset_id, refreshed_at, {"results": [r.result]})
+
+    return {name: collected[name] for name, _ in items}
+
+
 # =============================================================================
 # Dataset & Workspace Operations
 # =============================================================================
 
 def list_datasets(workspace_id: Optional[str] = None) -> List[Dict[str, Any]]:
     """List all datasets in workspace or personal workspace"""
-    token = get_access_token()
-    
-    if workspace_id:
-        url = f"{API_BASE}/groups/{workspace_id}/datasets"
-    else:
-        url = f"{API_BASE}/datasets"
-    
-    response = requests.get(url, headers=get_headers(token))
-    
-    if response.status_code == 200:
-        return response.json().get("value", [])
-    else:
-        print(f"Error: {response.text}")
-        return []
+    return get_default_client().list_datasets(workspace_id)
 
 
 def list_workspaces() -> List[Dict[str, Any]]:
     """List all workspaces the user has access to"""
-    token = get_access_token()
-    url = f"{API_BASE}/groups"
-    
-    response = requests.get(url, headers=get_headers(token))
-    
-    if response.status_code == 200:
-        return response.json().get("value", [])
-    else:
-        print(f"Error: {response.text}")
-        return []
+    return get_default_client().list_workspaces()
 
 
 def get_dataset_info(dataset_id: str = DATASET_ID, workspace_id: Optional[str] = None) -> Dict[str, Any]:
     """Get detailed dataset information"""
-    token = get_access_token()
-    
-    if workspace_id:
-        url = f"{API_BASE}/groups/{workspace_id}/datasets/{dataset_id}"
-    else:
-        url = f"{API_BASE}/datasets/{dataset_id}"
-    
-    response = requests.get(url, headers=get_headers(token))
-    
-    if response.status_code == 200:
-        return response.json()
-    else:
-        print(f"Error: {response.text}")
-        return {}
+    return get_default_client().get_dataset_info(dataset_id, workspace_id)
 
 
 # =============================================================================
@@ -154,20 +979,7 @@ def get_dataset_info(dataset_id: str = DATASET_ID, workspace_id: Optional[str] =
 
 def list_reports(workspace_id: Optional[str] = None) -> List[Dict[str, Any]]:
     """List all reports in workspace"""
-    token = get_access_token()
-    
-    if workspace_id:
-        url = f"{API_BASE}/groups/{workspace_id}/reports"
-    else:
-        url = f"{API_BASE}/reports"
-    
-    response = requests.get(url, headers=get_headers(token))
-    
-    if response.status_code == 200:
-        return response.json().get("value", [])
-    else:
-        print(f"Error: {response.text}")
-        return []
+    return get_default_client().list_reports(workspace_id)
 
 
 def clone_report(
@@ -184,22 +996,9 @@ def clone_report(
     2. Publish to workspace
     3. Clone and rebind to production datasets
     """
-    token = get_access_token()
-    url = f"{API_BASE}/reports/{source_report_id}/Clone"
-    
-    body = {"name": target_name}
-    if target_workspace_id:
-        body["targetWorkspaceId"] = target_workspace_id
-    if target_dataset_id:
-        body["targetModelId"] = target_dataset_id
-    
-    response = requests.post(url, headers=get_headers(token), json=body)
-    
-    if response.status_code in [200, 202]:
-        return response.json()
-    else:
-        print(f"Error: {response.text}")
-        return {}
+    return get_default_client().clone_report(
+        source_report_id, target_name, target_workspace_id, target_dataset_id
+    )
 
 
 def export_report_to_file(
@@ -208,23 +1007,7 @@ def export_report_to_file(
     workspace_id: Optional[str] = None
 ) -> bool:
     """Export report to .pbix file (for Premium/PPU workspaces only)"""
-    token = get_access_token()
-    
-    if workspace_id:
-        url = f"{API_BASE}/groups/{workspace_id}/reports/{report_id}/Export"
-    else:
-        url = f"{API_BASE}/reports/{report_id}/Export"
-    
-    response = requests.get(url, headers=get_headers(token))
-    
-    if response.status_code == 200:
-        with open(file_path, "wb") as f:
-            f.write(response.content)
-        print(f"Report exported to {file_path}")
-        return True
-    else:
-        print(f"Error: {response.text}")
-        return False
+    return get_default_client().export_report_to_file(report_id, file_path, workspace_id)
 
 
 def import_pbix(
@@ -242,19 +1025,7 @@ def import_pbix(
         workspace_id: Target workspace ID
         name_conflict: CreateOrOverwrite, Abort, or Overwrite
     """
-    token = get_access_token()
-    url = f"{API_BASE}/groups/{workspace_id}/imports?datasetDisplayName={report_name}&nameConflict={name_conflict}"
-    
-    with open(file_path, "rb") as f:
-        files = {"file": (f"{report_name}.pbix", f, "application/octet-stream")}
-        headers = {"Authorization": f"Bearer {token}"}
-        response = requests.post(url, headers=headers, files=files)
-    
-    if response.status_code in [200, 202]:
-        return response.json()
-    else:
-        print(f"Error: {response.text}")
-        return {}
+    return get_default_client().import_pbix(file_path, report_name, workspace_id, name_conflict)
 
 
 # =============================================================================
@@ -365,6 +1136,31 @@ def main():
     dax_parser.add_argument("--query", "-q", help="DAX query to execute")
     dax_parser.add_argument("--preset", "-p", choices=list(EXECUTIVE_DASHBOARD_QUERIES.keys()),
                            help="Use preset query")
+    dax_parser.add_argument("--all-presets", action="store_true",
+                           help="Run every preset query as a concurrent batch")
+    dax_parser.add_argument("--workers", type=int, default=4, help="Concurrent requests for --all-presets")
+    dax_parser.add_argument("--no-cache", action="store_true", help="Bypass the local result cache")
+    dax_parser.add_argument("--cache-ttl", type=float, default=DAX_CACHE_TTL_SECONDS,
+                           help="Cache entry lifetime in seconds")
+    dax_parser.add_argument("--clear-cache", action="store_true", help="Empty the local result cache first")
+    
+    # Export / import reports
+    export_parser = subparsers.add_parser("export", help="Export a report to .pbix")
+    export_parser.add_argument("--report", "-r", required=True, help="Report ID")
+    export_parser.add_argument("--out", "-o", required=True, help="Output .pbix path")
+    export_parser.add_argument("--workspace", "-w", help="Workspace ID")
+    
+    import_parser = subparsers.add_parser("import", help="Import a .pbix into a workspace")
+    import_parser.add_argument("--file", "-f", required=True, help=".pbix file to upload")
+    import_parser.add_argument("--name", "-n", required=True, help="Report/dataset name")
+    import_parser.add_argument("--workspace", "-w", required=True, help="Workspace ID")
+    import_parser.add_argument("--name-conflict", default="CreateOrOverwrite",
+                               choices=["CreateOrOverwrite", "Abort", "Overwrite"])
+    
+    # Inventory across workspaces
+    inventory_parser = subparsers.add_parser("inventory", help="List datasets and reports of many workspaces")
+    inventory_parser.add_argument("--workspace", "-w", action="append", help="Workspace ID (repeatable, default: all)")
+    inventory_parser.add_argument("--concurrency", type=int, default=16, help="Concurrent requests")
     
     # Dataset info
     info_parser = subparsers.add_parser("info", help="Get dataset info")
@@ -392,12 +1188,58 @@ def main():
     
     elif args.command == "dax":
         query = args.query or EXECUTIVE_DASHBOARD_QUERIES.get(args.preset)
-        if query:
-            result = execute_dax_query(query)
+        cache = None if args.no_cache else DaxResultCache(ttl_seconds=args.cache_ttl)
+        if cache and args.clear_cache:
+            cache.clear()
+        if args.all_presets:
+            started = time.perf_counter()
+            results = execute_dax_batch(EXECUTIVE_DASHBOARD_QUERIES, max_workers=args.workers, cache=cache)
+            elapsed = time.perf_counter() - started
+            print("\n=== Preset Queries ===")
+            for name, r in results.items():
+                if r.cached:
+                    print(f"  {name}: OK (cache hit)")
+                    continue
+                status = "OK" if r.ok else f"ERROR {r.status_code}"
+                print(f"  {name}: {status} {r.latency_ms:.0f} ms (attempts={r.attempts})")
+                if not r.ok:
+                    print(f"    {r.error}")
+            print(f"\nTotal: {len(results)} queries in {elapsed:.2f}s")
+            if cache:
+                print(f"Cache: {cache.hits} hit(s), {cache.misses} miss(es)")
+        elif query:
+            result = execute_dax_query(query, cache=cache)
+            if cache:
+                # stderr keeps stdout pipeable as JSON
+                print(f"Cache: {'hit' if cache.hits else 'miss'}", file=sys.stderr)
             print(json.dumps(result, indent=2))
         else:
             print("Please provide --query or --preset")
     
+    elif args.command == "export":
+        if not export_report_to_file(args.report, args.out, args.workspace):
+            sys.exit(1)
+    
+    elif args.command == "import":
+        result = import_pbix(args.file, args.name, args.workspace, args.name_conflict)
+        if not result:
+            sys.exit(1)
+        print(json.dumps(result, indent=2))
+    
+    elif args.command == "inventory":
+        started = time.perf_counter()
+        with PowerBIClient(pool_size=args.concurrency) as client:
+            inventory = asyncio.run(client.inventory(args.workspace))
+        elapsed = time.perf_counter() - started
+        print("\n=== Inventory ===")
+        for ws_id, ws in inventory.items():
+            print(f"  {ws['name']}: {ws_id} ({len(ws['datasets'])} datasets, {len(ws['reports'])} reports)")
+            for ds in ws["datasets"]:
+                print(f"    [dataset] {ds.get('name')}: {ds.get('id')}")
+            for rpt in ws["reports"]:
+                print(f"    [report]  {rpt.get('name')}: {rpt.get('id')}")
+        print(f"\nTotal: {len(inventory)} workspaces in {elapsed:.2f}s")
+    
     elif args.command == "info":
         info = get_dataset_info(args.dataset)
         print(json.dumps(info, indent=2))
@@ -0,0 +1,524 @@
+#!/usr/bin/env python3
+"""
+Query Log Analyzer
+Exported Monitoring_sample logs -> hot query fingerprints -> costly model measures
+
+Monitoring_sample's Eventhouse collects SemanticModelLogs (DAX and
+DirectQuery SQL text per QueryEnd/DirectQueryEnd), EH_QueryLogs (KQL/SQL
+with CPU, scanned rows) and the per-operation SM_ExecutionMetrics /
+MDB_TableExecutionLogs. This ranks what those logs say costs the most:
+
+1. Exported logs (JSONL, CSV or Parquet; files or folders) are read batch
+   by batch with pyarrow, projected to the columns that matter (text,
+   duration, CPU, rows, operation), so memory stays flat on large exports
+2. Query text is normalized into a fingerprint: comments dropped,
+   literals and IN-lists replaced by `?`, whitespace collapsed, keywords
+   case-folded (DAX/SQL). Each distinct text in a batch is normalized once
+   and every row is mapped to its fingerprint with array operations
+3. Fingerprints are ranked by total CPU (or duration/count) with p50/p95/p99
+   duration, then mapped back to the measures and tables of the TMDL model
+   they reference, so the most expensive measures in production surface
+
+Logs without query text (SM_ExecutionMetrics, MDB_TableExecutionLogs) are
+grouped by report visual (`ReportId/VisualId`) or source table instead.
+A fingerprint's cost counts in full toward every model measure it
+references ("inclusive") and split evenly between them ("shared").
+
+Usage:
+    python scripts/query_log_analyzer.py SemanticModelLogs.jsonl
+    python scripts/query_log_analyzer.py exports/ --sort duration --top 30
+    python scripts/query_log_analyzer.py EH_QueryLogs.parquet --model path/to/definition --json
+"""
+
+import argparse
+import csv as csv_module
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.json as pa_json
+
+from model_size_estimator import is_delta, open_dataset
+from tmdl_model import DEFINITION_PATH, load_model
+
+
+DEFAULT_BATCH_ROWS = 64 * 1024
+DEFAULT_TOP = 20
+# Raw text -> fingerprint cache is dropped past this many entries
+TEXT_CACHE_LIMIT = 200_000
+SAMPLE_CHARS = 2000
+LOG_EXTENSIONS = (".jsonl", ".json", ".ndjson", ".csv", ".parquet")
+
+
+# =============================================================================
+# Log layouts
+# =============================================================================
+
+# First column present wins; names as exported from the Eventhouse tables
+COLUMN_ALIASES = {
+    "text": ["EventText", "QueryText", "TextData", "CommandText", "Query"],
+    "duration": ["DurationMs", "TotalDurationMs", "Duration"],
+    "cpu": ["CpuTimeMs", "TotalCpuTimeMs", "CPUTime", "CpuTime"],
+    "rows": ["QueryResultRows", "TotalRowsCount", "DirectQueryTotalRows", "ProcessedRows", "RowCount"],
+    "operation": ["OperationName", "EventClass"],
+}
+# Grouping keys for logs that carry no query text
+FALLBACK_KEYS = [(("ReportId", "VisualId"), "visual"), (("SourceSchemaName", "SourceTableName"), "table")]
+# SemanticModelLogs events that carry query text, and the language of that text
+QUERY_OPERATIONS = {"QueryEnd": "DAX", "DirectQueryEnd": "SQL"}
+
+
+@dataclass
+class ColumnMap:
+    text: Optional[str]
+    key: Tuple[str, ...]
+    key_kind: str
+    duration: str
+    cpu: Optional[str]
+    rows: Optional[str]
+    operation: Optional[str]
+
+    @property
+    def columns(self) -> List[str]:
+        cols = [self.text, *self.key, self.duration, self.cpu, self.rows, self.operation]
+        return [c for c in cols if c]
+
+
+def resolve_columns(names: List[str]) -> ColumnMap:
+    present = set(names)
+
+    def first(role: str) -> Optional[str]:
+        return next((c for c in COLUMN_ALIASES[role] if c in present), None)
+
+    text, duration = first("text"), first("duration")
+    key, key_kind = (), ""
+    if text is None:
+        key, key_kind = next(((k, kind) for k, kind in FALLBACK_KEYS if set(k) <= present), ((), ""))
+    if duration is None or (text is None and not key):
+        raise ValueError("no query text/grouping key and duration columns "
+                         f"(looked for {', '.join(COLUMN_ALIASES['text'])} and {', '.join(COLUMN_ALIASES['duration'])})")
+    operation = first("operation")
+    # Only SemanticModelLogs mixes query events with everything else
+    if text != "EventText":
+        operation = None
+    return ColumnMap(text, key, key_kind, duration, first("cpu"), first("rows"), operation)
+
+
+def _column_types(cmap: ColumnMap) -> Dict[str, pa.DataType]:
+    types = {c: pa.string() for c in (cmap.text, *cmap.key, cmap.operation) if c}
+    types.update({c: pa.float64() for c in (cmap.duration, cmap.cpu, cmap.rows) if c})
+    return types
+
+
+def log_format(path: str) -> str:
+    # Folders come from find_logs only as Delta tables
+    if os.path.isdir(path) or path.endswith(".parquet"):
+        return "parquet"
+    if path.endswith(".csv"):
+        return "csv"
+    return "jsonl"
+
+
+def log_columns(path: str) -> List[str]:
+    """Column names of an exported log, from the schema, header or first record"""
+    fmt = log_format(path)
+    if fmt == "parquet":
+        return open_dataset(path).schema.names
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        if fmt == "csv":
+            return next(csv_module.reader(f), [])
+        first = next((line for line in f if line.strip()), "{}")
+    return list(json.loads(first))
+
+
+def stream_log(path: str, types: Dict[str, pa.DataType],
+               batch_rows: int = DEFAULT_BATCH_ROWS) -> Iterator[pa.RecordBatch]:
+    """Batches of just the given columns; text formats are parsed with those types"""
+    fmt = log_format(path)
+    if fmt == "parquet":
+        return open_dataset(path).to_batches(columns=list(types), batch_size=batch_rows)
+    if fmt == "csv":
+        return iter(pa_csv.open_csv(path, convert_options=pa_csv.ConvertOptions(
+            include_columns=list(types), column_types=types)))
+    return iter(pa_json.open_json(path, read_options=pa_json.ReadOptions(block_size=16 * 1024 * 1024),
+                                  parse_options=pa_json.ParseOptions(explicit_schema=pa.schema(list(types.items())),
+                                                                     unexpected_field_behavior="ignore")))
+
+
+def read_batches(path: str, batch_rows: int = DEFAULT_BATCH_ROWS) -> Tuple[ColumnMap, Iterator[pa.RecordBatch]]:
+    """Column map plus a streaming reader projected to the mapped columns"""
+    cmap = resolve_columns(log_columns(path))
+    return cmap, stream_log(path, _column_types(cmap), batch_rows)
+
+
+def find_logs(paths: List[str]) -> List[str]:
+    """
+    Log files under the given paths, each read on its own; a folder holding
+    a _delta_log is one Delta table. Underscore/dot folders (the Delta log,
+    Spark metadata) are skipped.
+    """
+    files = []
+    for p in paths:
+        if not os.path.isdir(p) or is_delta(p):
+            files.append(p)
+            continue
+        for root, dirs, names in os.walk(p):
+            if is_delta(root):
+                files.append(root)
+                dirs.clear()
+                continue
+            dirs[:] = sorted(d for d in dirs if not d.startswith(("_", ".")))
+            files.extend(os.path.join(root, n) for n in sorted(names) if n.endswith(LOG_EXTENSIONS))
+    return files
+
+
+# =============================================================================
+# Fingerprints
+# =============================================================================
+
+_TOKEN_RE = re.compile(r"""
+    (?P<comment>//[^\n]*|--[^\n]*|/\*.*?\*/)
+  | (?P<dquote>"(?:[^"]|"")*")
+  | (?P<squote>'(?:[^']|'')*')
+  | (?P<bracket>\[(?:[^\]]|\]\])*\])
+  | (?P<number>(?<![\w.])\d+(?:\.\d+)?(?:[eE][-+]?\d+)?)
+  | (?P<word>[A-Za-z_][A-Za-z0-9_]*)
+  | (?P<ws>\s+)
+""", re.X | re.S)
+_LIST_RE = re.compile(r"\?(?:\s*,\s*\?)+")
+
+# Which quote style is a literal (the other one quotes names)
+LITERAL_QUOTES = {"DAX": {"dquote"}, "MDX": {"dquote"}, "SQL": {"squote"}, "KQL": {"dquote", "squote"}}
+
+
+def guess_dialect(text: str, hint: Optional[str] = None) -> str:
+    head = text.lstrip()[:200].upper()
+    if hint in ("DAX", "SQL"):
+        if hint == "DAX" and head.startswith(("SELECT", "WITH MEMBER", "WITH SET")) and " ON " in text.upper():
+            return "MDX"
+        return hint
+    if head.startswith(("DEFINE", "EVALUATE")):
+        return "DAX"
+    if re.match(r"(SELECT|WITH|INSERT|UPDATE|DELETE|EXEC)\b", head):
+        return "SQL"
+    return hint or "KQL"
+
+
+def normalize_query(text: str, dialect: str) -> str:
+    """Query shape with literals as `?`; case-folded outside names for DAX/MDX/SQL"""
+    literal = LITERAL_QUOTES.get(dialect, {"dquote", "squote"})
+    fold = dialect != "KQL"
+    out, pos = [], 0
+    for m in _TOKEN_RE.finditer(text):
+        # Operators and punctuation between tokens are kept as-is
+        out.append(text[pos:m.start()])
+        pos = m.end()
+        kind, token = m.lastgroup, m.group()
+        if kind in ("comment", "ws"):
+            out.append(" ")
+        elif kind == "number" or kind in literal:
+            out.append("?")
+        elif kind == "word" and fold:
+            out.append(token.upper())
+        else:
+            out.append(token)
+    out.append(text[pos:])
+    result = re.sub(r"\s+", " ", "".join(out)).strip()
+    result = re.sub(r"\s*([(),{}=<>+*/-])\s*", r"\1", result)
+    return _LIST_RE.sub("?", result)
+
+
+def fingerprint_id(normalized: str) -> str:
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()[:12]
+
+
+@dataclass
+class Fingerprint:
+    id: str
+    dialect: str
+    text: str
+    sample: str
+    count: int = 0
+    duration_ms: float = 0.0
+    cpu_ms: float = 0.0
+    rows: float = 0.0
+    p50_ms: float = 0.0
+    p95_ms: float = 0.0
+    p99_ms: float = 0.0
+    max_ms: float = 0.0
+    measures: List[str] = field(default_factory=list)
+    tables: List[str] = field(default_factory=list)
+    durations: List[pa.Array] = field(default_factory=list, repr=False)
+
+    def finish(self) -> None:
+        values = pa.chunked_array(self.durations, pa.float64()) if self.durations else pa.chunked_array([], pa.float64())
+        if values.null_count < len(values):
+            p50, p95, p99 = pc.quantile(values, q=[0.5, 0.95, 0.99]).to_pylist()
+            self.p50_ms, self.p95_ms, self.p99_ms = p50, p95, p99
+            self.max_ms = pc.max(values).as_py()
+        self.durations = []
+
+
+class LogAggregator:
+    def __init__(self):
+        self.fingerprints: List[Fingerprint] = []
+        self._by_normalized: Dict[str, int] = {}
+        self._by_text: Dict[Tuple[str, str], int] = {}
+        self.rows_read = 0
+        self.rows_used = 0
+
+    def _fingerprint(self, text: str, dialect_hint: Optional[str]) -> int:
+        cached = self._by_text.get((dialect_hint or "", text))
+        if cached is not None:
+            return cached
+        if len(self._by_text) > TEXT_CACHE_LIMIT:
+            self._by_text.clear()
+        if dialect_hint in ("visual", "table"):
+            dialect, normalized = dialect_hint, text
+        else:
+            dialect = guess_dialect(text, dialect_hint)
+            normalized = normalize_query(text, dialect)
+        index = self._by_normalized.get(normalized)
+        if index is None:
+            index = len(self.fingerprints)
+            self._by_normalized[normalized] = index
+            self.fingerprints.append(Fingerprint(fingerprint_id(normalized), dialect, normalized, text[:SAMPLE_CHARS]))
+        self._by_text[(dialect_hint or "", text)] = index
+        return index
+
+    def add_batch(self, batch: pa.RecordBatch, cmap: ColumnMap) -> None:
+        self.rows_read += batch.num_rows
+        if cmap.operation:
+            for operation, dialect in QUERY_OPERATIONS.items():
+                mask = pc.fill_null(pc.equal(batch.column(cmap.operation), operation), False)
+                self._add_rows(batch.filter(mask), cmap, dialect)
+        elif cmap.text:
+            self._add_rows(batch, cmap, None)
+        else:
+            self._add_rows(batch, cmap, cmap.key_kind)
+
+    def _add_rows(self, batch: pa.RecordBatch, cmap: ColumnMap, dialect_hint: Optional[str]) -> None:
+        if cmap.text:
+            text = batch.column(cmap.text)
+        else:
+            text = pc.binary_join_element_wise(*[pc.cast(batch.column(k), pa.string()) for k in cmap.key], "/")
+        valid = pc.is_valid(text)
+        batch, text = batch.filter(valid), text.filter(valid)
+        if batch.num_rows == 0:
+            return
+        self.rows_used += batch.num_rows
+
+        # Normalize each distinct text once, then map rows to fingerprints with a take
+        encoded = pc.dictionary_encode(text)
+        ids = pa.array([self._fingerprint(t, dialect_hint) for t in encoded.dictionary.to_pylist()], pa.int32())
+        row_fp = pc.take(ids, encoded.indices)
+
+        def numeric(name: Optional[str]) -> pa.Array:
+            if name is None:
+                return pa.nulls(batch.num_rows, pa.float64())
+            return pc.cast(batch.column(name), pa.float64())
+
+        table = pa.table({"fp": row_fp, "duration": numeric(cmap.duration),
+                          "cpu": numeric(cmap.cpu), "rows": numeric(cmap.rows)})
+        table = table.take(pc.sort_indices(row_fp))
+        grouped = table.group_by("fp", use_threads=False).aggregate(
+            [("fp", "count"), ("duration", "sum"), ("cpu", "sum"), ("rows", "sum")])
+        durations = table.column("duration").combine_chunks()
+        offset = 0
+        for fp, count, duration, cpu, rows in zip(*(grouped.column(c).to_pylist() for c in (
+                "fp", "fp_count", "duration_sum", "cpu_sum", "rows_sum"))):
+            f = self.fingerprints[fp]
+            f.count += count
+            f.duration_ms += duration or 0.0
+            f.cpu_ms += cpu or 0.0
+            f.rows += rows or 0.0
+            f.durations.append(durations.slice(offset, count))
+            offset += count
+
+    def finish(self) -> List[Fingerprint]:
+        for f in self.fingerprints:
+            f.finish()
+        return self.fingerprints
+
+
+# =============================================================================
+# Model mapping
+# =============================================================================
+
+# [Name] with an optional 'Table' or Table prefix
+_FIELD_REF_RE = re.compile(r"(?:'((?:[^']|'')*)'|([A-Za-z_][A-Za-z0-9_]*))?\[((?:[^\]]|\]\])*)\]")
+_LOCAL_MEASURE_RE = re.compile(r"\bMEASURE\s+(?:'(?:[^']|'')*'|[A-Za-z_][A-Za-z0-9_]*)\[((?:[^\]]|\]\])*)\]", re.I)
+_IDENTIFIER_RE = re.compile(r'\[([^\]]+)\]|"([^"]+)"|`([^`]+)`|([A-Za-z_][A-Za-z0-9_]*)')
+
+
+@dataclass
+class ModelNames:
+    measures: Dict[str, str]       # casefolded measure name -> Table[Measure]
+    tables: Dict[str, str]         # casefolded table name -> table
+
+
+def model_names(definition: str) -> ModelNames:
+    model = load_model(definition)
+    measures, tables = {}, {}
+    for table in model.tables.values():
+        tables[table.name.casefold()] = table.name
+        for m in table.measures:
+            measures[m.name.casefold()] = f"{table.name}[{m.name}]"
+    return ModelNames(measures, tables)
+
+
+def map_to_model(f: Fingerprint, names: ModelNames) -> None:
+    if f.dialect in ("DAX", "MDX"):
+        local = {m.replace("]]", "]").casefold() for m in _LOCAL_MEASURE_RE.findall(f.text)}
+        measures, tables = set(), set()
+        for quoted, bare, name in _FIELD_REF_RE.findall(f.text):
+            table = (quoted.replace("''", "'") or bare).casefold()
+            key = name.replace("]]", "]").casefold()
+            if table in names.tables:
+                tables.add(names.tables[table])
+            if key in names.measures and key not in local:
+                measures.add(names.measures[key])
+        f.measures, f.tables = sorted(measures), sorted(tables)
+    elif f.dialect in ("SQL", "KQL", "table"):
+        idents = {next(g for g in m if g).casefold() for m in _IDENTIFIER_RE.findall(f.text)}
+        f.tables = sorted(names.tables[i] for i in idents if i in names.tables)
+
+
+@dataclass
+class MeasureCost:
+    measure: str
+    fingerprints: int = 0
+    queries: int = 0
+    cpu_ms: float = 0.0
+    duration_ms: float = 0.0
+    shared_cpu_ms: float = 0.0
+    shared_duration_ms: float = 0.0
+
+
+def measure_costs(fingerprints: List[Fingerprint]) -> List[MeasureCost]:
+    costs: Dict[str, MeasureCost] = {}
+    for f in fingerprints:
+        for m in f.measures:
+            c = costs.setdefault(m, MeasureCost(m))
+            c.fingerprints += 1
+            c.queries += f.count
+            c.cpu_ms += f.cpu_ms
+            c.duration_ms += f.duration_ms
+            c.shared_cpu_ms += f.cpu_ms / len(f.measures)
+            c.shared_duration_ms += f.duration_ms / len(f.measures)
+    return list(costs.values())
+
+
+# =============================================================================
+# CLI
+# =============================================================================
+
+SORT_KEYS = {"cpu": "cpu_ms", "duration": "duration_ms", "count": "count"}
+
+
+def analyze(paths: List[str], model: Optional[str], batch_rows: int = DEFAULT_BATCH_ROWS,
+            log=print) -> Tuple[LogAggregator, List[Fingerprint]]:
+    agg = LogAggregator()
+    read = 0
+    for path in find_logs(paths):
+        before = agg.rows_used
+        try:
+            cmap, batches = read_batches(path, batch_rows)
+            for batch in batches:
+                agg.add_batch(batch, cmap)
+        except (ValueError, pa.ArrowException) as e:
+            partial = f" after {agg.rows_used - before:,} queries" if agg.rows_used > before else ""
+            log(f"  ⚠️ {os.path.relpath(path)}: skipped{partial} ({str(e).splitlines()[0]})")
+            continue
+        read += 1
+        source = cmap.text or "/".join(cmap.key)
+        log(f"  {os.path.relpath(path)}: {agg.rows_used - before:,} queries ({source}, {cmap.duration}"
+            f"{', ' + cmap.cpu if cmap.cpu else ''})")
+    if not read:
+        raise ValueError("no readable query logs in " + ", ".join(paths))
+    fingerprints = agg.finish()
+    if model:
+        names = model_names(model)
+        for f in fingerprints:
+            map_to_model(f, names)
+    return agg, fingerprints
+
+
+def print_fingerprints(fingerprints: List[Fingerprint], top: int) -> None:
+    print(f"\n  {'#':>3s} {'Fingerprint':12s} {'Lang':6s} {'Count':>8s} {'CPU s':>9s} {'Dur s':>9s} "
+          f"{'p50 ms':>8s} {'p95 ms':>8s} {'p99 ms':>8s}  Query")
+    for i, f in enumerate(fingerprints[:top], 1):
+        print(f"  {i:>3d} {f.id:12s} {f.dialect:6s} {f.count:>8,d} {f.cpu_ms / 1000:>9.1f} "
+              f"{f.duration_ms / 1000:>9.1f} {f.p50_ms:>8.0f} {f.p95_ms:>8.0f} {f.p99_ms:>8.0f}  {f.text[:70]}")
+        if f.measures:
+            shown = ", ".join(f.measures[:4]) + (f" +{len(f.measures) - 4}" if len(f.measures) > 4 else "")
+            print(f"      measures: {shown}")
+
+
+def print_measures(costs: List[MeasureCost], top: int) -> None:
+    if not costs:
+        print("\n⚠️ No fingerprint references a model measure")
+        return
+    print(f"\n  {'Measure':55s} {'Queries':>9s} {'Shapes':>7s} {'CPU s':>9s} {'Shared CPU s':>13s} {'Dur s':>9s}")
+    for c in costs[:top]:
+        print(f"  {c.measure[:55]:55s} {c.queries:>9,d} {c.fingerprints:>7d} {c.cpu_ms / 1000:>9.1f} "
+              f"{c.shared_cpu_ms / 1000:>13.1f} {c.duration_ms / 1000:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rank query fingerprints and model measures by cost from exported logs")
+    parser.add_argument("logs", nargs="+", help="JSONL/CSV/Parquet log exports or folders of them")
+    parser.add_argument("--model", default=DEFINITION_PATH, help="Model definition to map measures against")
+    parser.add_argument("--no-model", action="store_true", help="Skip mapping fingerprints to the model")
+    parser.add_argument("--sort", choices=list(SORT_KEYS), default="cpu", help="Ranking (default: total CPU)")
+    parser.add_argument("--top", type=int, default=DEFAULT_TOP, help="Rows per table")
+    parser.add_argument("--min-count", type=int, default=1, help="Ignore fingerprints seen fewer times")
+    parser.add_argument("--batch-rows", type=int, default=DEFAULT_BATCH_ROWS, help="Rows per Parquet batch")
+    parser.add_argument("--json", action="store_true", help="Output JSON")
+    args = parser.parse_args()
+
+    missing = [p for p in args.logs if not os.path.exists(p)]
+    if missing:
+        print(f"❌ Not found: {', '.join(missing)}")
+        return 1
+    start = time.perf_counter()
+    try:
+        agg, fingerprints = analyze(args.logs, None if args.no_model else args.model, args.batch_rows,
+                                    log=(lambda *_: None) if args.json else print)
+    except (OSError, ValueError, pa.ArrowException) as e:
+        print(f"❌ {e}")
+        return 1
+    elapsed = time.perf_counter() - start
+
+    key = SORT_KEYS[args.sort]
+    if args.sort == "cpu" and not any(f.cpu_ms for f in fingerprints):
+        key = "duration_ms"
+    ranked = sorted((f for f in fingerprints if f.count >= args.min_count), key=lambda f: -getattr(f, key))
+    costs = sorted(measure_costs(ranked), key=lambda c: -(c.cpu_ms if key == "cpu_ms" else c.duration_ms))
+
+    if args.json:
+        print(json.dumps({"rows_read": agg.rows_read, "queries": agg.rows_used, "elapsed_s": elapsed,
+                          "fingerprints": [{k: v for k, v in asdict(f).items() if k != "durations"} for f in ranked], "measures": [asdict(c) for c in costs]},
+                         indent=2, default=str))
+        return 0
+
+    print(f"\n{agg.rows_used:,} queries ({agg.rows_read:,} log rows) -> {len(fingerprints):,} fingerprints "
+          f"in {elapsed:.2f} s ({agg.rows_read / elapsed if elapsed else 0:,.0f} rows/s)")
+    if key != SORT_KEYS[args.sort]:
+        print("⚠️ Logs carry no CPU column; ranking by duration")
+    print_fingerprints(ranked, args.top)
+    if not args.no_model:
+        print_measures(costs, args.top)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,517 @@
+#!/usr/bin/env python3
+"""
+Semantic Model Refresh Planner
+BMD_sales enhanced refresh, table by table
+
+RefreshSemanticModel1 / pipeline1 refresh the whole model as one unit. This
+reads the TMDL definition instead and builds a table-level dependency graph:
+
+  * M partitions depend on the PostgreSQL tables (and other sources) they
+    read, directly or through shared expressions such as #"public visits",
+    and on any other table query they reference
+  * calculated tables depend on the tables their DAX references
+    (LocalDateTable_* on its fact/dim table, field parameters on the tables
+    they NAMEOF)
+
+Calculated columns that reference other tables do not order the waves: the
+engine recalculates them when a table they read is refreshed. The plan
+lists them so it is clear which tables get recalculated without a reload.
+
+Given which sources changed, only the affected tables and everything
+downstream of them are refreshed. They are scheduled in dependency waves
+(largest first when row counts are known), and each wave becomes one
+enhanced-refresh request whose maxParallelism caps concurrent tables:
+
+    POST /groups/{ws}/datasets/{id}/refreshes
+    {"type": "full", "commitMode": "transactional", "maxParallelism": 4,
+     "retryCount": 2, "objects": [{"table": "Fact_Visit"}, ...]}
+
+Changed sources come from --changed, from comparing source fingerprints
+(pg_stat_user_tables insert/update/delete counters) with the state saved by
+the previous run, or --full. Sources without a change signal (Google
+Sheets, inline tables) count as changed unless --skip-unknown is given.
+
+Everything except --submit and --pg works offline against the repo's model.
+
+Usage:
+    python scripts/refresh_planner.py --full
+    python scripts/refresh_planner.py --changed public.visits --changed public.users_territory
+    python scripts/refresh_planner.py --pg --state refresh_state.json --json
+    python scripts/refresh_planner.py --pg --state refresh_state.json --submit --workspace <ws>
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from dataclasses import dataclass, field, asdict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from m_parser import MNode, MSyntaxError, parse_m
+from m_folding_analyzer import LOCAL_SOURCES, LOCAL_TABLE_CONSTRUCTORS
+from tmdl_model import DEFINITION_PATH, TmdlModel, load_model
+
+
+DEFAULT_MAX_PARALLELISM = 4
+DEFAULT_RETRY_COUNT = 2
+
+# Refresh status polling (seconds)
+POLL_MIN_DELAY = 5.0
+POLL_MAX_DELAY = 60.0
+POLL_GROWTH = 1.5
+DEFAULT_WAVE_TIMEOUT = 2 * 3600
+
+# Source pseudo-names for inputs without a PostgreSQL change signal
+UNKNOWN_SOURCE_PREFIX = "external:"
+
+_DAX_STRING_RE = re.compile(r'"(?:[^"]|"")*"')
+_DAX_COMMENT_RE = re.compile(r"//[^\n]*|--[^\n]*|/\*.*?\*/", re.DOTALL)
+_DAX_QUOTED_TABLE_RE = re.compile(r"'((?:[^']|'')+)'")
+_DAX_WORD_RE = re.compile(r"\b([A-Za-z_][A-Za-z0-9_]*)\b")
+
+
+@dataclass
+class RefreshNode:
+    """One table in the refresh graph"""
+    table: str
+    kind: str                               # m | calculated | mixed
+    partitions: List[str] = field(default_factory=list)
+    sources: Set[str] = field(default_factory=set)       # schema.table or external:...
+    depends_on: Set[str] = field(default_factory=set)    # other tables
+    column_refs: Set[str] = field(default_factory=set)   # tables read by calculated columns
+    rows: Optional[int] = None
+
+
+@dataclass
+class RefreshPlan:
+    waves: List[List[str]]
+    reasons: Dict[str, str]                 # table -> why it is refreshed
+    skipped: List[str]
+    changed_sources: List[str]
+    max_parallelism: int
+    recalculated: Dict[str, List[str]] = field(default_factory=dict)   # table -> refreshed tables it reads
+
+    @property
+    def tables(self) -> List[str]:
+        return [t for wave in self.waves for t in wave]
+
+
+# =============================================================================
+# Dependency graph
+# =============================================================================
+
+def dax_table_references(expression: str, table_names: Set[str]) -> Set[str]:
+    """Tables referenced by a DAX expression ('Table'[Col], Table[Col], VALUES(Table))"""
+    text = _DAX_COMMENT_RE.sub(" ", _DAX_STRING_RE.sub('""', expression or ""))
+    refs = {unq.replace("''", "'") for unq in _DAX_QUOTED_TABLE_RE.findall(text)}
+    refs |= set(_DAX_WORD_RE.findall(_DAX_QUOTED_TABLE_RE.sub(" ", text)))
+    return refs & table_names
+
+
+def _source_label(function: str, args: List[MNode]) -> str:
+    """Short name for a non-PostgreSQL source, e.g. GoogleSheets.Contents:<sheet id>"""
+    arg = args[0].value if args and args[0].kind == "literal" else ""
+    sheet = re.search(r"/d/([\w-]+)", arg or "")
+    key = sheet.group(1) if sheet else arg
+    return f"{function}:{key}" if key else function
+
+
+class _SourceResolver:
+    """Source tables read by each M query, following shared expressions"""
+
+    def __init__(self, model: TmdlModel):
+        self.sources = model.m_sources()
+        self.table_names = set(model.tables)
+        self._trees: Dict[str, Optional[MNode]] = {}
+        self._memo: Dict[str, Tuple[Set[str], Set[str]]] = {}
+
+    def _tree(self, name: str) -> Optional[MNode]:
+        if name not in self._trees:
+            try:
+                self._trees[name] = parse_m(self.sources[name])
+            except MSyntaxError as e:
+                print(f"⚠️ {name}: {e}", file=sys.stderr)
+                self._trees[name] = None
+        return self._trees[name]
+
+    def resolve(self, name: str, active: Optional[Set[str]] = None) -> Tuple[Set[str], Set[str]]:
+        """(sources, referenced table queries) for an M query"""
+        if name in self._memo:
+            return self._memo[name]
+        active = (active or set()) | {name}
+        sources: Set[str] = set()
+        tables: Set[str] = set()
+        tree = self._tree(name)
+        if tree is None:
+            sources.add(f"{UNKNOWN_SOURCE_PREFIX}{name}")
+        else:
+            for node in tree.walk():
+                if node.kind == "item" and node.children[1].kind == "record":
+                    fields = {k: v.value for k, v in node.children[1].record_fields().items() if v.kind == "literal"}
+                    if "Item" in fields and "Schema" in fields:
+                        sources.add(f"{fields['Schema']}.{fields['Item']}")
+                fn = node.call_name()
+                if fn in LOCAL_SOURCES:
+                    sources.add(f"{UNKNOWN_SOURCE_PREFIX}{_source_label(fn, node.args)}")
+                elif node.kind == "ident" and node.value in self.sources and node.value not in active:
+                    if "IsParameterQuery" in self.sources[node.value]:
+                        continue                # parameters (RangeStart/RangeEnd) read no data
+                    if node.value in self.table_names:
+                        tables.add(node.value)
+                    else:
+                        s, t = self.resolve(node.value, active)
+                        sources |= s
+                        tables |= t
+            # Inline tables (#table, Table.FromRecords) carry no external source
+            if not sources and not any(n.call_name() in LOCAL_TABLE_CONSTRUCTORS for n in tree.walk()):
+                sources.add(f"{UNKNOWN_SOURCE_PREFIX}{name}")
+        self._memo[name] = (sources, tables)
+        return sources, tables
+
+
+def build_graph(model: TmdlModel, row_counts: Optional[Dict[str, int]] = None) -> Dict[str, RefreshNode]:
+    """Table-level refresh graph; tables without partitions (calculation groups) are left out"""
+    resolver = _SourceResolver(model)
+    table_names = set(model.tables)
+    counts = {k.lower(): v for k, v in (row_counts or {}).items()}
+    graph: Dict[str, RefreshNode] = {}
+    for table in model.tables.values():
+        if not table.partitions:
+            continue
+        kinds = {(p.expression or "").strip() for p in table.partitions}
+        node = RefreshNode(table.name, kinds.pop() if len(kinds) == 1 else "mixed",
+                           [p.name for p in table.partitions])
+        for partition in table.partitions:
+            kind = (partition.expression or "").strip()
+            if kind == "m":
+                key = table.name if partition.name == table.name else f"{table.name}/{partition.name}"
+                sources, refs = resolver.resolve(key)
+                node.sources |= sources
+                node.depends_on |= refs
+            elif kind == "calculated":
+                node.depends_on |= dax_table_references(partition.prop("source", ""), table_names)
+        for column in table.columns:
+            if column.expression:
+                node.column_refs |= dax_table_references(column.expression, table_names)
+        node.depends_on.discard(table.name)
+        node.column_refs -= node.depends_on | {table.name}
+        known = [counts.get(s.lower()) for s in node.sources if not s.startswith(UNKNOWN_SOURCE_PREFIX)]
+        if known and all(c is not None for c in known):
+            node.rows = max(known)
+        graph[table.name] = node
+    for node in graph.values():
+        node.depends_on &= set(graph)
+        node.column_refs &= set(graph)
+    return graph
+
+
+def find_cycle(graph: Dict[str, RefreshNode]) -> Optional[List[str]]:
+    state: Dict[str, int] = {}
+    path: List[str] = []
+
+    def visit(name: str) -> Optional[List[str]]:
+        state[name] = 1
+        path.append(name)
+        for dep in sorted(graph[name].depends_on):
+            if state.get(dep) == 1:
+                return path[path.index(dep):] + [dep]
+            if dep not in state:
+                cycle = visit(dep)
+                if cycle:
+                    return cycle
+        state[name] = 2
+        path.pop()
+        return None
+
+    for name in sorted(graph):
+        if name not in state:
+            cycle = visit(name)
+            if cycle:
+                return cycle
+    return None
+
+
+def downstream(graph: Dict[str, RefreshNode], tables: Set[str]) -> Set[str]:
+    """tables plus every table that (transitively) depends on them"""
+    dependents: Dict[str, Set[str]] = {t: set() for t in graph}
+    for node in graph.values():
+        for dep in node.depends_on:
+            dependents[dep].add(node.table)
+    result, stack = set(), list(tables)
+    while stack:
+        t = stack.pop()
+        if t in result:
+            continue
+        result.add(t)
+        stack.extend(dependents[t])
+    return result
+
+
+# =============================================================================
+# Planning
+# =============================================================================
+
+def plan_refresh(
+    graph: Dict[str, RefreshNode],
+    changed_sources: Optional[Set[str]] = None,
+    max_parallelism: int = DEFAULT_MAX_PARALLELISM,
+    skip_unknown: bool = False
+) -> RefreshPlan:
+    """
+    Tables to refresh, grouped into dependency waves.
+
+    changed_sources=None refreshes everything. A wave only holds tables whose
+    dependencies were refreshed in earlier waves (or are not being refreshed);
+    max_parallelism caps how many of its tables the engine processes at once.
+    """
+    cycle = find_cycle(graph)
+    if cycle:
+        raise ValueError(f"Dependency cycle: {' -> '.join(cycle)}")
+
+    reasons: Dict[str, str] = {}
+    if changed_sources is None:
+        selected = set(graph)
+        reasons = {t: "full refresh" for t in graph}
+    else:
+        direct = set()
+        for node in graph.values():
+            hits = sorted(s for s in node.sources if s in changed_sources)
+            unknown = sorted(s for s in node.sources if s.startswith(UNKNOWN_SOURCE_PREFIX))
+            if hits:
+                reasons[node.table] = "source changed: " + ", ".join(hits)
+                direct.add(node.table)
+            elif unknown and not skip_unknown:
+                reasons[node.table] = "no change signal: " + ", ".join(unknown)
+                direct.add(node.table)
+        selected = downstream(graph, direct)
+        for t in selected - direct:
+            upstream = sorted(d for d in graph[t].depends_on if d in selected)
+            reasons[t] = "depends on " + ", ".join(upstream)
+
+    remaining = set(selected)
+    waves: List[List[str]] = []
+    while remaining:
+        ready = [t for t in remaining if not (graph[t].depends_on & remaining)]
+        ready.sort(key=lambda t: (-(graph[t].rows or 0), t))
+        waves.append(ready)
+        remaining -= set(ready)
+
+    recalculated = {t: sorted(graph[t].column_refs & selected) for t in sorted(set(graph) - selected)
+                    if graph[t].column_refs & selected}
+    return RefreshPlan(waves, reasons, sorted(set(graph) - selected),
+                       sorted(changed_sources) if changed_sources is not None else [], max_parallelism,
+                       recalculated)
+
+
+def refresh_payload(tables: List[str], max_parallelism: int = DEFAULT_MAX_PARALLELISM,
+                    retry_count: int = DEFAULT_RETRY_COUNT, refresh_type: str = "full",
+                    commit_mode: str = "transactional") -> Dict[str, Any]:
+    """Enhanced refresh request body for a list of tables"""
+    return {
+        "type": refresh_type,
+        "commitMode": commit_mode,
+        "maxParallelism": max_parallelism,
+        "retryCount": retry_count,
+        "objects": [{"table": t} for t in tables],
+    }
+
+
+def plan_payloads(plan: RefreshPlan, retry_count: int = DEFAULT_RETRY_COUNT) -> List[Dict[str, Any]]:
+    return [refresh_payload(wave, plan.max_parallelism, retry_count) for wave in plan.waves]
+
+
+# =============================================================================
+# Source change detection
+# =============================================================================
+
+def pg_fingerprints(tables: List[str]) -> Dict[str, str]:
+    """Change counters per schema.table from pg_stat_user_tables"""
+    import psycopg2
+    from pg_bulk_loader import PgConfig
+
+    wanted = set(tables)
+    fingerprints = {}
+    with psycopg2.connect(**PgConfig.from_env().connect_kwargs()) as conn, conn.cursor() as cur:
+        cur.execute(
+            "SELECT schemaname, relname, n_tup_ins, n_tup_upd, n_tup_del, n_live_tup "
+            "FROM pg_stat_user_tables"
+        )
+        for schema, rel, ins, upd, dele, live in cur.fetchall():
+            name = f"{schema}.{rel}"
+            if name in wanted:
+                fingerprints[name] = f"{ins}:{upd}:{dele}:{live}"
+    return fingerprints
+
+
+def changed_since(previous: Dict[str, str], current: Dict[str, str]) -> Set[str]:
+    """Sources whose fingerprint differs (or is new) since the saved state"""
+    return {name for name, value in current.items() if previous.get(name) != value}
+
+
+def load_state(path: str) -> Dict[str, str]:
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f).get("sources", {})
+
+
+def save_state(path: str, fingerprints: Dict[str, str]) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"saved_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                   "sources": fingerprints}, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+# =============================================================================
+# Submission
+# =============================================================================
+
+def submit_plan(client, plan: RefreshPlan, dataset_id: str, workspace_id: Optional[str] = None,
+                retry_count: int = DEFAULT_RETRY_COUNT, wave_timeout: float = DEFAULT_WAVE_TIMEOUT,
+                poll_min_delay: float = POLL_MIN_DELAY) -> bool:
+    """
+    Run the plan wave by wave through the enhanced refresh API.
+
+    Each wave is polled until it completes; a failed wave stops the run so
+    downstream tables are not refreshed on top of stale inputs.
+    """
+    for number, (wave, payload) in enumerate(zip(plan.waves, plan_payloads(plan, retry_count)), 1):
+        print(f"\nWave {number}/{len(plan.waves)}: {', '.join(wave)}")
+        response = client.request("POST", f"/datasets/{dataset_id}/refreshes", workspace_id, json=payload)
+        if response is None or response.status_code not in (200, 202):
+            detail = response.text[:300] if response is not None else "connection failed"
+            print(f"  ❌ Refresh request rejected: {detail}")
+            return False
+        location = response.headers.get("Location", "")
+        request_id = response.headers.get("x-ms-request-id") or location.rstrip("/").rsplit("/", 1)[-1]
+        if not request_id:
+            print("  ⚠️ No refresh id returned; cannot track completion")
+            return False
+
+        started = time.time()
+        delay = poll_min_delay
+        while True:
+            time.sleep(delay)
+            status = client.get_json(f"/datasets/{dataset_id}/refreshes/{request_id}", workspace_id)
+            state = status.get("extendedStatus") or status.get("status") or "Unknown"
+            if state in ("Completed", "Succeeded"):
+                print(f"  ✅ Completed in {time.time() - started:.0f}s")
+                break
+            if state in ("Failed", "Cancelled", "Disabled", "TimedOut"):
+                errors = [o.get("error") or o for o in status.get("messages", [])][:3]
+                print(f"  ❌ {state}: {errors or status}")
+                return False
+            if time.time() - started > wave_timeout:
+                print(f"  ❌ Timed out after {wave_timeout:.0f}s (refresh {request_id} still {state})")
+                return False
+            delay = min(delay * POLL_GROWTH, POLL_MAX_DELAY)
+    return True
+
+
+# =============================================================================
+# CLI
+# =============================================================================
+
+def print_plan(plan: RefreshPlan, graph: Dict[str, RefreshNode]) -> None:
+    print(f"Refresh plan: {len(plan.tables)} of {len(graph)} tables in {len(plan.waves)} wave(s), "
+          f"max {plan.max_parallelism} in parallel")
+    if plan.changed_sources:
+        print(f"Changed sources: {', '.join(plan.changed_sources)}")
+    for number, wave in enumerate(plan.waves, 1):
+        print(f"\nWave {number}")
+        for t in wave:
+            rows = f" (~{graph[t].rows:,} rows)" if graph[t].rows else ""
+            print(f"  {t}{rows}  - {plan.reasons.get(t, '')}")
+    if plan.recalculated:
+        print("\nCalculated columns recalculated by the engine (no reload):")
+        for t, refs in plan.recalculated.items():
+            print(f"  {t}  - reads {', '.join(refs)}")
+    if plan.skipped:
+        print(f"\nUnchanged, skipped ({len(plan.skipped)}): {', '.join(plan.skipped)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Plan a dependency-ordered enhanced refresh")
+    parser.add_argument("definition", nargs="?", default=DEFINITION_PATH, help="SemanticModel definition folder")
+    parser.add_argument("--full", action="store_true", help="Refresh every table")
+    parser.add_argument("--changed", action="append", default=[], help="Changed source, e.g. public.visits")
+    parser.add_argument("--state", help="Source fingerprint state file from the previous run")
+    parser.add_argument("--fingerprints", help="Current fingerprints as JSON (offline alternative to --pg)")
+    parser.add_argument("--pg", action="store_true", help="Read fingerprints from pg_stat_user_tables")
+    parser.add_argument("--skip-unknown", action="store_true", help="Skip tables whose sources have no change signal")
+    parser.add_argument("--row-counts", help='JSON file of {"schema.table": rows} for largest-first ordering')
+    parser.add_argument("--max-parallelism", type=int, default=DEFAULT_MAX_PARALLELISM)
+    parser.add_argument("--retry-count", type=int, default=DEFAULT_RETRY_COUNT)
+    parser.add_argument("--save-state", action="store_true",
+                        help="Save fingerprints without --submit (the refresh runs elsewhere)")
+    parser.add_argument("--json", action="store_true", help="Print the plan and payloads as JSON")
+    parser.add_argument("--submit", action="store_true", help="Run the plan through the Power BI API")
+    parser.add_argument("--workspace", "-w", help="Workspace ID for --submit")
+    parser.add_argument("--dataset", help="Dataset ID for --submit (default: configured dataset)")
+    args = parser.parse_args()
+
+    model = load_model(args.definition)
+    row_counts = {}
+    if args.row_counts:
+        with open(args.row_counts, "r", encoding="utf-8") as f:
+            row_counts = json.load(f)
+    graph = build_graph(model, row_counts)
+    pg_sources = sorted({s for n in graph.values() for s in n.sources if not s.startswith(UNKNOWN_SOURCE_PREFIX)})
+
+    fingerprints: Dict[str, str] = {}
+    if args.fingerprints:
+        with open(args.fingerprints, "r", encoding="utf-8") as f:
+            fingerprints = json.load(f)
+    elif args.pg:
+        fingerprints = pg_fingerprints(pg_sources)
+
+    changed: Optional[Set[str]] = None
+    if not args.full:
+        if args.changed:
+            changed = set(args.changed)
+        elif fingerprints:
+            previous = load_state(args.state) if args.state else {}
+            changed = changed_since(previous, fingerprints) if previous else None
+            if not previous:
+                print("No saved source state; planning a full refresh", file=sys.stderr)
+        else:
+            print("No change information (--changed, --fingerprints or --pg); planning a full refresh",
+                  file=sys.stderr)
+    unknown = sorted(set(changed or ()) - set(pg_sources))
+    if unknown:
+        print(f"⚠️ Not read by any partition: {', '.join(unknown)}", file=sys.stderr)
+
+    try:
+        plan = plan_refresh(graph, changed, args.max_parallelism, args.skip_unknown)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+
+    if args.json:
+        print(json.dumps({
+            "plan": asdict(plan),
+            "payloads": plan_payloads(plan, args.retry_count),
+            "graph": {t: {"sources": sorted(n.sources), "depends_on": sorted(n.depends_on),
+                          "column_refs": sorted(n.column_refs)}
+                      for t, n in sorted(graph.items())},
+        }, indent=2))
+    else:
+        print_plan(plan, graph)
+
+    ok = True
+    if args.submit and plan.waves:
+        from powerbi_report_builder import PowerBIClient, PowerBIConfig
+
+        config = PowerBIConfig(workspace_id=args.workspace)
+        with PowerBIClient(config) as client:
+            ok = submit_plan(client, plan, args.dataset or config.dataset_id, args.workspace, args.retry_count)
+    if ok and args.state and fingerprints and (args.submit or args.save_state or not plan.waves):
+        save_state(args.state, fingerprints)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Report -> Semantic Model Binding Validator
+Every report in the repo vs. BMD_sales.SemanticModel (or its own model)
+
+Renaming a table, column or measure in the model breaks the visuals bound
+to it silently until someone opens the report. This checks every field
+reference in every report in one pass, fast enough to gate merges:
+
+1. Each semantic model is loaded once (tmdl_model.py) into hash sets of
+   tables, columns, measures and hierarchies, plus a name -> tables map for
+   measures so a moved measure can be pointed at its new home
+2. Each report's field index comes from report_document.py (disk-cached by
+   file hash); reports are checked in parallel
+3. Broken bindings are listed with page, visual, position and role, with a
+   close-match suggestion when the field looks renamed
+
+A report's model comes from definition.pbir (`datasetReference.byPath`);
+reports bound by connection only (pbir/) are checked against `--model`.
+Exits 1 when any binding is broken (case-only mismatches too with
+`--strict`).
+
+Usage:
+    python scripts/report_binding_validator.py                 # every report in the repo
+    python scripts/report_binding_validator.py pbir Sales_Visit.Report
+    python scripts/report_binding_validator.py --strict --json
+"""
+
+import argparse
+import difflib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
+
+from report_document import CACHE_DIR, REPO_ROOT, FieldBinding, ReportIndex, find_reports, load_index
+from tmdl_model import DEFINITION_PATH, load_model
+
+
+DEFAULT_WORKERS = 8
+
+
+# =============================================================================
+# Model field index
+# =============================================================================
+
+@dataclass
+class ModelFields:
+    path: str
+    tables: Set[str] = field(default_factory=set)
+    columns: Set[Tuple[str, str]] = field(default_factory=set)
+    measures: Set[Tuple[str, str]] = field(default_factory=set)
+    hierarchies: Set[Tuple[str, str]] = field(default_factory=set)
+    levels: Set[Tuple[str, str, str]] = field(default_factory=set)
+    # Columns with an auto date (variation) hierarchy
+    variations: Set[Tuple[str, str]] = field(default_factory=set)
+    measure_tables: Dict[str, List[str]] = field(default_factory=dict)
+    # casefolded (table, name) -> actual, for case-only mismatches
+    folded: Dict[Tuple[str, str], Tuple[str, str]] = field(default_factory=dict)
+    folded_tables: Dict[str, str] = field(default_factory=dict)
+
+    def fields_of(self, table: str) -> List[str]:
+        return sorted({n for t, n in self.columns | self.measures if t == table})
+
+
+def build_model_fields(definition: str) -> ModelFields:
+    model = load_model(definition)
+    index = ModelFields(os.path.abspath(definition))
+    for table in model.tables.values():
+        t = table.name
+        index.tables.add(t)
+        index.folded_tables[t.casefold()] = t
+        for column in table.columns:
+            index.columns.add((t, column.name))
+            if column.children_of("variation"):
+                index.variations.add((t, column.name))
+        for measure in table.measures:
+            index.measures.add((t, measure.name))
+            index.measure_tables.setdefault(measure.name, []).append(t)
+        for hierarchy in table.children_of("hierarchy"):
+            index.hierarchies.add((t, hierarchy.name))
+            for level in hierarchy.children_of("level"):
+                index.levels.add((t, hierarchy.name, level.name))
+    for t, n in index.columns | index.measures:
+        index.folded[(t.casefold(), n.casefold())] = (t, n)
+    return index
+
+
+def report_model_path(index: ReportIndex) -> Optional[str]:
+    """Definition folder of the model a report is bound to by path, if any"""
+    folder = os.path.dirname(index.path) if index.layout == "legacy" else index.path
+    pbir = os.path.join(folder, "definition.pbir")
+    if not os.path.isfile(pbir):
+        return None
+    with open(pbir, "r", encoding="utf-8-sig") as f:
+        reference = json.load(f).get("datasetReference") or {}
+    path = (reference.get("byPath") or {}).get("path")
+    if not path:
+        return None
+    return os.path.normpath(os.path.join(folder, path, "definition"))
+
+
+# =============================================================================
+# Validation
+# =============================================================================
+
+@dataclass
+class BindingIssue:
+    report: str
+    page: str
+    visual: str
+    visual_type: str
+    x: float
+    y: float
+    role: str
+    field: str
+    kind: str
+    severity: str                  # error / warning
+    problem: str
+    hint: str = ""
+
+
+@dataclass
+class ReportResult:
+    report: str
+    model: str
+    bindings: int = 0
+    issues: List[BindingIssue] = field(default_factory=list)
+    error: Optional[str] = None
+
+    @property
+    def errors(self) -> int:
+        return sum(1 for i in self.issues if i.severity == "error")
+
+
+def _suggest(model: ModelFields, table: str, name: str) -> str:
+    match = difflib.get_close_matches(name, model.fields_of(table), n=1, cutoff=0.75)
+    return f"did you mean {table}[{match[0]}]?" if match else ""
+
+
+def check_binding(model: ModelFields, ref: FieldBinding) -> Optional[Tuple[str, str, str]]:
+    """(severity, problem, hint) for a broken reference, None when it resolves"""
+    t, n = ref.table, ref.name
+    key = (t, n)
+
+    if t not in model.tables:
+        actual = model.folded_tables.get(t.casefold())
+        if actual:
+            return "warning", f"table name case differs from the model ('{actual}')", ""
+        if ref.kind in ("measure", "field") and n in model.measure_tables:
+            return "error", "table not in model", f"measure is defined on {', '.join(model.measure_tables[n])}"
+        match = difflib.get_close_matches(t, sorted(model.tables), n=1, cutoff=0.75)
+        return "error", "table not in model", f"did you mean '{match[0]}'?" if match else ""
+
+    if ref.kind == "hierarchy":
+        parts = n.split(".")
+        if len(parts) == 3 and (t, parts[0]) in model.variations:
+            return None
+        if len(parts) == 2 and (t, parts[0], parts[1]) in model.levels:
+            return None
+        return "error", "hierarchy level not in model", ""
+
+    is_column, is_measure = key in model.columns, key in model.measures
+    if ref.kind == "measure":
+        if is_measure:
+            return None
+        if is_column:
+            return "error", "bound as a measure but it's a column", ""
+        if n in model.measure_tables:
+            return "error", "measure not on this table", f"now on {', '.join(model.measure_tables[n])}"
+    elif ref.kind in ("column", "aggregation"):
+        if is_column:
+            return None
+        if is_measure:
+            return "error", "bound as a column but it's a measure", ""
+    elif is_column or is_measure:
+        return None
+
+    actual = model.folded.get((t.casefold(), n.casefold()))
+    if actual:
+        return "warning", f"name case differs from the model ('{actual[1]}')", ""
+    return "error", f"{'measure' if ref.kind == 'measure' else 'field'} not in model", _suggest(model, t, n)
+
+
+def validate_report(index: ReportIndex, model: ModelFields) -> ReportResult:
+    result = ReportResult(index.path, model.path)
+    for page, visual, ref in index.bindings():
+        result.bindings += 1
+        problem = check_binding(model, ref)
+        if problem is None:
+            continue
+        severity, text, hint = problem
+        result.issues.append(BindingIssue(
+            report=index.path,
+            page=page.display_name if page else "(report)",
+            visual=visual.name if visual else "(page)",
+            visual_type=visual.visual_type if visual else "",
+            x=visual.x if visual else 0, y=visual.y if visual else 0,
+            role=ref.role, field=ref.key, kind=ref.kind,
+            severity=severity, problem=text, hint=hint,
+        ))
+    return result
+
+
+def validate_all(paths: List[str], default_model: str, cache_dir: Optional[str],
+                 workers: int = DEFAULT_WORKERS) -> List[ReportResult]:
+    """Index reports and load their models in parallel, then check every binding"""
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        indexes = list(pool.map(lambda p: load_index(p, cache_dir), paths))
+        model_paths = [report_model_path(i) or os.path.abspath(default_model) for i in indexes]
+        unique = sorted(set(model_paths))
+        models = dict(zip(unique, pool.map(build_model_fields, unique)))
+        return list(pool.map(lambda im: validate_report(im[0], models[im[1]]), zip(indexes, model_paths)))
+
+
+# =============================================================================
+# CLI
+# =============================================================================
+
+def _rel(path: str) -> str:
+    return os.path.relpath(path, REPO_ROOT)
+
+
+def print_results(results: List[ReportResult], show_warnings: bool = True) -> None:
+    for r in results:
+        status = "❌" if r.errors else ("⚠️" if r.issues else "✅")
+        print(f"\n{status} {_rel(r.report)} -> {_rel(os.path.dirname(r.model))}: "
+              f"{r.bindings} bindings, {r.errors} broken")
+        for i in r.issues:
+            if i.severity == "warning" and not show_warnings:
+                continue
+            mark = "❌" if i.severity == "error" else "⚠️"
+            where = f"{i.page} / {i.visual_type} {i.visual} at ({i.x:.0f}, {i.y:.0f})" if i.visual_type \
+                else f"{i.page} / {i.visual}"
+            hint = f" ({i.hint})" if i.hint else ""
+            print(f"  {mark} {where} [{i.role}]: {i.field} - {i.problem}{hint}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate report field bindings against the semantic model")
+    parser.add_argument("reports", nargs="*",
+                        help="report.json files, .Report or pbir folders (default: every report in the repo)")
+    parser.add_argument("--model", default=DEFINITION_PATH,
+                        help="Model definition for reports not bound by path")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Parallel reports")
+    parser.add_argument("--no-cache", action="store_true", help="Don't use the report index cache")
+    parser.add_argument("--strict", action="store_true", help="Fail on warnings (name case mismatches) too")
+    parser.add_argument("--quiet", action="store_true", help="Hide warnings")
+    parser.add_argument("--json", action="store_true", help="Output JSON")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    paths = args.reports or find_reports()
+    try:
+        results = validate_all(paths, args.model, None if args.no_cache else CACHE_DIR, args.workers)
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}")
+        return 1
+    elapsed = time.perf_counter() - start
+
+    errors = sum(r.errors for r in results)
+    warnings = sum(len(r.issues) for r in results) - errors
+    failed = errors > 0 or (args.strict and warnings > 0)
+
+    if args.json:
+        print(json.dumps([asdict(r) for r in results], indent=2))
+        return 1 if failed else 0
+
+    print_results(results, show_warnings=not args.quiet)
+    print(f"\n{'='*70}")
+    print(f"{sum(r.bindings for r in results)} bindings in {len(results)} report(s) checked in "
+          f"{elapsed * 1000:.0f} ms: {errors} broken, {warnings} warning(s)")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,558 @@
+#!/usr/bin/env python3
+"""
+Report Document Loader & Field Index
+Sales_Visit.Report, BMDSalesReport.Report, Monitoring_Report.Report, pbir/
+
+Shared reader for the repo's report definitions, used by the report tools
+(query load, binding validation, ...). Two layouts are supported:
+
+- legacy `report.json`: sections -> visualContainers, where each visual's
+  `config`, `filters` and `query` are JSON documents stored as strings
+- the `pbir/` layout: `report.json` plus one plain JSON file per page under
+  `pages/`, with fields written as `Table[Field]` strings
+
+The outer document is parsed once; nested config strings are only decoded
+when a visual's `config` / `filters` is first read. `load_index` goes one
+step further and builds a flat visual -> page -> bound fields index, cached
+on disk under the SHA-256 of the input files, so repeat runs over an
+unchanged report don't parse it at all.
+
+Usage:
+    from report_document import load_index
+    index = load_index("Sales_Visit.Report")
+    for visual in index.visuals():
+        print(visual.page, visual.name, [f.key for f in visual.fields])
+
+    python scripts/report_document.py                 # index every report in the repo
+    python scripts/report_document.py pbir --no-cache --json
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass, field
+from functools import cached_property
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+CACHE_DIR = os.environ.get("REPORT_INDEX_CACHE",
+                           os.path.join(os.path.expanduser("~"), ".cache", "bmd-report-index"))
+# Bump when the index layout changes; old cache entries are then ignored
+INDEX_VERSION = 2
+
+# Legacy section config: "type" of tooltip pages, "visibility" of hidden pages
+TOOLTIP_PAGE_TYPE = 1
+HIDDEN_PAGE_VISIBILITY = 1
+
+# Roles that don't feed a visual's query
+FILTER_ROLES = {"filter", "visibility", "drillthrough"}
+
+# `Table[Field]` / `'Table name'[Field]` in pbir strings
+FIELD_REF_RE = re.compile(r"(?:'([^']+)'|\b([A-Za-z_][\w]*))\[([^\]]+)\]")
+# pbir keys whose strings are expressions that may embed several references
+EXPRESSION_KEYS = {"condition", "expression", "filter"}
+# pbir keys that don't name a role themselves: the enclosing key does
+# (`xAxis.field` -> xAxis), or the key itself at the top of a config
+PBIR_ROLE_SKIP = {"config"}
+PBIR_LEAF_KEYS = {"field", "fields", "dataField", "value"}
+
+
+# =============================================================================
+# Index model
+# =============================================================================
+
+@dataclass
+class FieldBinding:
+    table: str
+    name: str
+    kind: str                      # measure / column / aggregation / hierarchy / field (pbir: unresolved)
+    role: str                      # projection role (Values, Category, ...), pbir key, or filter
+
+    @property
+    def key(self) -> str:
+        return f"{self.table}[{self.name}]"
+
+
+@dataclass
+class VisualEntry:
+    page: str
+    name: str
+    visual_type: str
+    x: float
+    y: float
+    width: float
+    height: float
+    hidden: bool = False
+    group: Optional[str] = None
+    fields: List[FieldBinding] = field(default_factory=list)
+    top_n: bool = False
+    filtered_columns: List[str] = field(default_factory=list)
+
+    @property
+    def query_fields(self) -> List[FieldBinding]:
+        return [f for f in self.fields if f.role not in FILTER_ROLES]
+
+    @property
+    def measures(self) -> List[str]:
+        return [f.key for f in self.query_fields if f.kind == "measure"]
+
+    @property
+    def group_by(self) -> List[FieldBinding]:
+        # pbir "field" bindings aren't resolved to columns vs measures, so they're left out
+        return [f for f in self.query_fields if f.kind in ("column", "hierarchy")]
+
+
+@dataclass
+class PageEntry:
+    name: str
+    display_name: str
+    ordinal: int
+    kind: str                      # page / tooltip / hidden / drillthrough
+    visuals: List[VisualEntry] = field(default_factory=list)
+    # Page-level filters and drill-through fields
+    fields: List[FieldBinding] = field(default_factory=list)
+
+
+@dataclass
+class ReportIndex:
+    path: str
+    layout: str                    # legacy / pbir
+    sha256: str
+    pages: List[PageEntry] = field(default_factory=list)
+    fields: List[FieldBinding] = field(default_factory=list)
+    from_cache: bool = False
+
+    def visuals(self) -> Iterator[VisualEntry]:
+        for page in self.pages:
+            yield from page.visuals
+
+    def bindings(self) -> Iterator[Tuple[Optional[PageEntry], Optional[VisualEntry], FieldBinding]]:
+        """Every field reference with its page and visual (None at report / page level)"""
+        for f in self.fields:
+            yield None, None, f
+        for page in self.pages:
+            for f in page.fields:
+                yield page, None, f
+            for visual in page.visuals:
+                for f in visual.fields:
+                    yield page, visual, f
+
+    def field_map(self) -> Dict[str, List[VisualEntry]]:
+        """`Table[Field]` -> visuals binding it"""
+        result: Dict[str, List[VisualEntry]] = {}
+        for visual in self.visuals():
+            for key in dict.fromkeys(f.key for f in visual.fields):
+                result.setdefault(key, []).append(visual)
+        return result
+
+
+def _bindings_from(data: List[Dict]) -> List[FieldBinding]:
+    return [FieldBinding(**f) for f in data]
+
+
+def index_from_dict(data: Dict) -> ReportIndex:
+    pages = []
+    for p in data["pages"]:
+        visuals = [VisualEntry(**{**v, "fields": _bindings_from(v["fields"])}) for v in p["visuals"]]
+        pages.append(PageEntry(**{**p, "visuals": visuals, "fields": _bindings_from(p["fields"])}))
+    return ReportIndex(**{**data, "pages": pages, "fields": _bindings_from(data["fields"])})
+
+
+# =============================================================================
+# Legacy report.json
+# =============================================================================
+
+def decode_json(value: Any, default: Any) -> Any:
+    """Decode a JSON-in-a-string property; dicts/lists pass through"""
+    if not value:
+        return default
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except json.JSONDecodeError:
+            return default
+    return value
+
+
+def _entity(expr: Dict, aliases: Dict[str, str]) -> str:
+    ref = expr.get("SourceRef", {})
+    return ref.get("Entity") or aliases.get(ref.get("Source", ""), ref.get("Source", "?"))
+
+
+def field_ref(expr: Dict, aliases: Dict[str, str], role: str = "") -> Optional[FieldBinding]:
+    """Binding for a query expression (Measure / Column / Aggregation / HierarchyLevel)"""
+    if "Measure" in expr:
+        m = expr["Measure"]
+        return FieldBinding(_entity(m.get("Expression", {}), aliases), m.get("Property", ""), "measure", role)
+    if "Column" in expr:
+        c = expr["Column"]
+        return FieldBinding(_entity(c.get("Expression", {}), aliases), c.get("Property", ""), "column", role)
+    if "Aggregation" in expr:
+        inner = field_ref(expr["Aggregation"].get("Expression", {}), aliases, role)
+        return FieldBinding(inner.table, inner.name, "aggregation", role) if inner else None
+    if "HierarchyLevel" in expr:
+        level = expr["HierarchyLevel"]
+        hierarchy = level.get("Expression", {}).get("Hierarchy", {})
+        source = hierarchy.get("Expression", {})
+        name = f"{hierarchy.get('Hierarchy', '')}.{level.get('Level', '')}"
+        # Variation (auto date) hierarchies hang off a column: Column.Hierarchy.Level
+        if "PropertyVariationSource" in source:
+            source = source["PropertyVariationSource"]
+            name = f"{source.get('Property', '')}.{name}"
+        return FieldBinding(_entity(source, aliases), name, "hierarchy", role)
+    return None
+
+
+def filter_bindings(filters: List[Dict]) -> Tuple[bool, Set[str], List[FieldBinding]]:
+    """(has a TopN filter, columns restricted by a condition, every filtered field)"""
+    top_n = False
+    restricted = set()
+    bindings = []
+    for f in filters:
+        if f.get("type") == "TopN":
+            top_n = True
+        ref = field_ref(f.get("expression", {}), {}, "filter")
+        if ref is None:
+            continue
+        bindings.append(ref)
+        if f.get("filter") and ref.kind == "column":
+            restricted.add(ref.key)
+    return top_n, restricted, bindings
+
+
+class LegacyVisual:
+    """One visualContainer; config/filters are decoded on first access"""
+
+    def __init__(self, container: Dict):
+        self.container = container
+
+    @cached_property
+    def config(self) -> Dict:
+        return decode_json(self.container.get("config"), {})
+
+    @cached_property
+    def filters(self) -> List[Dict]:
+        return decode_json(self.container.get("filters"), [])
+
+    @property
+    def name(self) -> str:
+        return self.config.get("name", "")
+
+    @property
+    def single(self) -> Dict:
+        return self.config.get("singleVisual") or {}
+
+    @property
+    def group(self) -> Optional[Dict]:
+        return self.config.get("singleVisualGroup")
+
+    @property
+    def query(self) -> Dict:
+        return self.single.get("prototypeQuery") or {}
+
+    def entry(self, page: str) -> VisualEntry:
+        c = self.container
+        group = self.group
+        visual = VisualEntry(page, self.name, "group" if group is not None else self.single.get("visualType", "?"),
+                             round(c.get("x", 0)), round(c.get("y", 0)),
+                             round(c.get("width", 0)), round(c.get("height", 0)),
+                             bool(group.get("isHidden")) if group is not None
+                             else (self.single.get("display") or {}).get("mode") == "hidden",
+                             self.config.get("parentGroupName"))
+        if group is not None:
+            return visual
+        roles = {}
+        for role, items in (self.single.get("projections") or {}).items():
+            for item in items:
+                roles.setdefault(item.get("queryRef"), role)
+        aliases = {f.get("Name"): f.get("Entity") for f in self.query.get("From", [])}
+        for select in self.query.get("Select", []):
+            ref = field_ref(select, aliases, roles.get(select.get("Name"), "select"))
+            if ref:
+                visual.fields.append(ref)
+        visual.top_n, restricted, filtered = filter_bindings(self.filters)
+        visual.fields.extend(filtered)
+        visual.filtered_columns = sorted(restricted)
+        return visual
+
+
+class LegacyPage:
+    def __init__(self, section: Dict, position: int):
+        self.section = section
+        self.position = position
+
+    @cached_property
+    def config(self) -> Dict:
+        return decode_json(self.section.get("config"), {})
+
+    @cached_property
+    def filters(self) -> List[Dict]:
+        return decode_json(self.section.get("filters"), [])
+
+    @cached_property
+    def visuals(self) -> List[LegacyVisual]:
+        return [LegacyVisual(c) for c in self.section.get("visualContainers", [])]
+
+    @property
+    def kind(self) -> str:
+        if self.config.get("type") == TOOLTIP_PAGE_TYPE:
+            return "tooltip"
+        if self.config.get("visibility") == HIDDEN_PAGE_VISIBILITY:
+            return "hidden"
+        return "page"
+
+    def entry(self) -> PageEntry:
+        s = self.section
+        display = s.get("displayName") or s.get("name", "")
+        page = PageEntry(s.get("name", ""), display, s.get("ordinal", self.position), self.kind)
+        _, restricted, page.fields = filter_bindings(self.filters)
+        parents: Dict[str, Optional[str]] = {}
+        hidden_groups = set()
+        for v in self.visuals:
+            entry = v.entry(display)
+            parents[entry.name] = entry.group
+            if entry.visual_type == "group" and entry.hidden:
+                hidden_groups.add(entry.name)
+            entry.filtered_columns = sorted(set(entry.filtered_columns) | restricted)
+            page.visuals.append(entry)
+        # A visual inside a hidden group (at any depth) is hidden too
+        for entry in page.visuals:
+            parent = entry.group
+            while parent and not entry.hidden:
+                entry.hidden = parent in hidden_groups
+                parent = parents.get(parent)
+        return page
+
+
+# =============================================================================
+# pbir/ page files
+# =============================================================================
+
+def pbir_bindings(value: Any, role: str = "") -> Iterator[FieldBinding]:
+    """`Table[Field]` strings anywhere under a pbir visual/page config"""
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if key in EXPRESSION_KEYS and isinstance(item, str):
+                for m in FIELD_REF_RE.finditer(item):
+                    yield FieldBinding(m.group(1) or m.group(2), m.group(3), "field",
+                                       "visibility" if role == "visibility" else "filter")
+                continue
+            keep = key in PBIR_ROLE_SKIP or (key in PBIR_LEAF_KEYS and role)
+            yield from pbir_bindings(item, role if keep else key)
+    elif isinstance(value, list):
+        for item in value:
+            yield from pbir_bindings(item, role)
+    elif isinstance(value, str):
+        m = FIELD_REF_RE.fullmatch(value.strip())
+        if m:
+            yield FieldBinding(m.group(1) or m.group(2), m.group(3), "field", role)
+
+
+def _has_key(value: Any, key: str) -> bool:
+    if isinstance(value, dict):
+        return key in value or any(_has_key(v, key) for v in value.values())
+    if isinstance(value, list):
+        return any(_has_key(v, key) for v in value)
+    return False
+
+
+class PbirPage:
+    def __init__(self, path: str, data: Dict):
+        self.path = path
+        self.data = data
+
+    @property
+    def config(self) -> Dict:
+        return self.data.get("config") or {}
+
+    @property
+    def kind(self) -> str:
+        page_type = (self.config.get("pageType") or "").lower()
+        if page_type in ("tooltip", "drillthrough"):
+            return page_type
+        return "hidden" if self.config.get("visibility") == "hidden" else "page"
+
+    def entry(self) -> PageEntry:
+        d = self.data
+        display = d.get("displayName") or d.get("name", "")
+        page = PageEntry(d.get("name", ""), display, d.get("ordinal", 0), self.kind)
+        drill = self.config.get("drillThroughFilter") or {}
+        page.fields = [FieldBinding(f.table, f.name, f.kind, "drillthrough")
+                       for f in pbir_bindings(drill.get("fields", []))]
+        page.fields.extend(pbir_bindings(d.get("filters") or [], "filter"))
+        for v in d.get("visuals", []):
+            visual = VisualEntry(display, v.get("name", ""), v.get("type", "?"),
+                                 v.get("x", 0), v.get("y", 0), v.get("width", 0), v.get("height", 0),
+                                 v.get("visibility") == "hidden")
+            visual.fields = list(pbir_bindings({k: val for k, val in v.items()
+                                                if k not in ("name", "type")}))
+            visual.top_n = _has_key(v.get("config", {}), "topN")
+            page.visuals.append(visual)
+        return page
+
+
+# =============================================================================
+# Documents
+# =============================================================================
+
+def resolve_report(path: str) -> Tuple[str, str]:
+    """(layout, path) for a report.json file, a .Report folder or a pbir folder"""
+    if os.path.isdir(path):
+        if os.path.isdir(os.path.join(path, "pages")):
+            return "pbir", path
+        path = os.path.join(path, "report.json")
+    if not os.path.isfile(path):
+        raise FileNotFoundError(f"No report definition at {path}")
+    return "legacy", path
+
+
+def find_reports(root: str = REPO_ROOT) -> List[str]:
+    """Every report definition under a folder: *.Report/report.json and pbir-style folders"""
+    found = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith(".") and d not in ("node_modules", "__pycache__"))
+        if os.path.basename(dirpath).endswith(".Report") and "report.json" in filenames:
+            found.append(os.path.join(dirpath, "report.json"))
+        elif "pages" in dirnames and "report.json" in filenames:
+            found.append(dirpath)
+    return found
+
+
+class ReportDocument:
+    """A report definition read once from disk; pages and visual configs decode lazily"""
+
+    def __init__(self, path: str):
+        self.layout, self.path = resolve_report(path)
+        self.files = self._files()
+        self._content: Dict[str, bytes] = {}
+        for f in self.files:
+            with open(f, "rb") as fh:
+                self._content[f] = fh.read()
+
+    def _files(self) -> List[str]:
+        if self.layout == "legacy":
+            return [self.path]
+        files = sorted(glob.glob(os.path.join(self.path, "pages", "*.json")))
+        top = os.path.join(self.path, "report.json")
+        return ([top] if os.path.isfile(top) else []) + files
+
+    @cached_property
+    def sha256(self) -> str:
+        h = hashlib.sha256(f"v{INDEX_VERSION}:{self.layout}".encode())
+        for f in self.files:
+            h.update(os.path.relpath(f, self.path if self.layout == "pbir" else os.path.dirname(f)).encode())
+            h.update(b"\0")
+            h.update(self._content[f])
+        return h.hexdigest()
+
+    def _json(self, path: str) -> Any:
+        return json.loads(self._content[path].decode("utf-8-sig"))
+
+    @cached_property
+    def document(self) -> Dict:
+        """Outer report document (legacy report.json or pbir report.json)"""
+        top = self.path if self.layout == "legacy" else os.path.join(self.path, "report.json")
+        return self._json(top) if top in self._content else {}
+
+    @cached_property
+    def pages(self) -> List[Any]:
+        if self.layout == "legacy":
+            return [LegacyPage(s, i) for i, s in enumerate(self.document.get("sections", []))]
+        return [PbirPage(f, self._json(f)) for f in self.files if os.path.dirname(f).endswith("pages")]
+
+    def build_index(self) -> ReportIndex:
+        index = ReportIndex(self.path, self.layout, self.sha256)
+        if self.layout == "legacy":
+            _, _, index.fields = filter_bindings(decode_json(self.document.get("filters"), []))
+        index.pages = sorted((p.entry() for p in self.pages), key=lambda p: p.ordinal)
+        return index
+
+
+def _cache_file(cache_dir: str, sha256: str) -> str:
+    return os.path.join(cache_dir, f"{sha256}.json")
+
+
+def load_index(path: str, cache_dir: Optional[str] = CACHE_DIR, use_cache: bool = True) -> ReportIndex:
+    """Field index for a report, from the disk cache when the files are unchanged"""
+    document = ReportDocument(path)
+    cache_path = _cache_file(cache_dir, document.sha256) if cache_dir else None
+    if use_cache and cache_path and os.path.isfile(cache_path):
+        try:
+            with open(cache_path, "r", encoding="utf-8") as f:
+                index = index_from_dict(json.load(f))
+            index.path, index.from_cache = document.path, True
+            return index
+        except (OSError, ValueError, TypeError, KeyError):
+            pass  # unreadable entry: rebuild and overwrite it
+
+    index = document.build_index()
+    if cache_path:
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(asdict(index), f)
+            os.replace(tmp, cache_path)
+        except OSError as e:
+            print(f"⚠️ Could not write report index cache: {e}", file=sys.stderr)
+    return index
+
+
+def clear_cache(cache_dir: str = CACHE_DIR) -> int:
+    removed = 0
+    for f in glob.glob(os.path.join(cache_dir, "*.json")):
+        os.remove(f)
+        removed += 1
+    return removed
+
+
+# =============================================================================
+# CLI
+# =============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Index report definitions (visual -> page -> bound fields)")
+    parser.add_argument("reports", nargs="*", help="report.json files, .Report or pbir folders (default: all in repo)")
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="Index cache folder")
+    parser.add_argument("--no-cache", action="store_true", help="Rebuild without reading or writing the cache")
+    parser.add_argument("--clear-cache", action="store_true", help="Delete cached indexes first")
+    parser.add_argument("--json", action="store_true", help="Output the index as JSON")
+    args = parser.parse_args()
+
+    if args.clear_cache:
+        print(f"🧹 Removed {clear_cache(args.cache_dir)} cached index(es)", file=sys.stderr)
+    paths = args.reports or find_reports()
+    cache_dir = None if args.no_cache else args.cache_dir
+
+    indexes = []
+    for path in paths:
+        start = time.perf_counter()
+        try:
+            index = load_index(path, cache_dir)
+        except (OSError, ValueError) as e:
+            print(f"❌ {path}: {e}")
+            return 1
+        indexes.append((index, time.perf_counter() - start))
+
+    if args.json:
+        print(json.dumps([asdict(i) for i, _ in indexes], indent=2))
+        return 0
+
+    for index, elapsed in indexes:
+        visuals = list(index.visuals())
+        fields = {f.key for _, _, f in index.bindings()}
+        source = "cache" if index.from_cache else "parsed"
+        print(f"✅ {os.path.relpath(index.path, REPO_ROOT)} ({index.layout}): {len(index.pages)} pages, "
+              f"{len(visuals)} visuals, {len(fields)} distinct fields [{source} in {elapsed * 1000:.1f} ms]")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Report Visual Query-Load Analyzer
+Every report in the repo (Sales_Visit.Report, Monitoring_Report.Report, pbir/, ...)
+
+Estimates how many DAX queries each report page fires when it opens, so
+slow pages can be trimmed before users complain:
+
+1. The visual -> page -> bound fields index comes from report_document.py
+   (each visual config decoded once, then cached on disk by file hash)
+2. A visible visual with a query costs one DAX query on page open; hidden
+   visuals (directly or through a hidden group) cost nothing until shown,
+   and tooltip pages only query on hover
+3. Pages over a visual-count or query budget are flagged, as are visuals
+   that group by a high-cardinality column with no top-N filter
+
+Cardinality comes from `--cardinality`: either model_size_estimator.py
+`--json` output or a `{"Table[Column]": distinct}` file. Columns without
+numbers fall back to a name heuristic (keys, timestamps, free text). pbir
+fields aren't resolved to columns vs measures, so only their query counts
+and budgets are reported.
+
+Usage:
+    python scripts/report_query_load.py                       # every report in the repo
+    python scripts/report_query_load.py Sales_Visit.Report --max-queries 10
+    python scripts/report_query_load.py --cardinality sizes.json --json
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional
+
+from report_document import (
+    CACHE_DIR, REPO_ROOT, FieldBinding, PageEntry, VisualEntry, find_reports, load_index
+)
+
+
+DEFAULT_MAX_VISUALS = 20
+DEFAULT_MAX_QUERIES = 12
+DEFAULT_MIN_CARDINALITY = 1000
+
+# Visuals that show a single value even when a column is bound
+SINGLE_VALUE_VISUALS = {"card", "cardVisual", "multiRowCard", "kpi", "gauge"}
+
+# Names that usually mean one value per row: keys, timestamps, free text
+LIKELY_HIGH_CARDINALITY_RE = re.compile(
+    r"(?:ID|Id|_id|^id|Time|Timestamp|_at|Text|Message|Reason|Fault|Comment|"
+    r"Feedback|Description|Phone|Mobile|mobile_no|Email|Address|Photo|Url|URL)$"
+)
+
+
+# =============================================================================
+# Data model
+# =============================================================================
+
+@dataclass
+class VisualLoad:
+    visual: VisualEntry
+    notes: List[str] = field(default_factory=list)
+
+    @property
+    def queries(self) -> int:
+        return 1 if self.visual.query_fields and not self.visual.hidden else 0
+
+
+@dataclass
+class PageLoad:
+    page: PageEntry
+    visuals: List[VisualLoad] = field(default_factory=list)
+    notes: List[str] = field(default_factory=list)
+
+    @property
+    def display_name(self) -> str:
+        return self.page.display_name
+
+    @property
+    def kind(self) -> str:
+        return self.page.kind
+
+    @property
+    def visible_visuals(self) -> int:
+        return sum(1 for v in self.visuals if not v.visual.hidden and v.visual.visual_type != "group")
+
+    @property
+    def queries(self) -> int:
+        return sum(v.queries for v in self.visuals)
+
+    @property
+    def measures(self) -> int:
+        return len({m for v in self.visuals if v.queries for m in v.visual.measures})
+
+    @property
+    def columns(self) -> int:
+        return len({f.key for v in self.visuals if v.queries for f in v.visual.group_by})
+
+
+@dataclass
+class ReportLoad:
+    path: str
+    layout: str
+    pages: List[PageLoad] = field(default_factory=list)
+
+    @property
+    def visuals(self) -> int:
+        return sum(len(p.visuals) for p in self.pages)
+
+
+def analyze_report(path: str, cache_dir: Optional[str] = CACHE_DIR) -> ReportLoad:
+    index = load_index(path, cache_dir)
+    report = ReportLoad(index.path, index.layout)
+    for page in index.pages:
+        report.pages.append(PageLoad(page, [VisualLoad(v) for v in page.visuals]))
+    return report
+
+
+# =============================================================================
+# Budgets and cardinality
+# =============================================================================
+
+def load_cardinality(path: str) -> Dict[str, int]:
+    """`Table[Column]` -> distinct values, from model_size_estimator --json or a plain mapping"""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        result = {}
+        for key, value in data.items():
+            if "[" not in key and "." in key:
+                table, _, column = key.partition(".")
+                key = f"{table}[{column}]"
+            result[key] = int(value)
+        return result
+    return {f"{c['table']}[{c['column']}]": int(c["distinct"])
+            for t in data for c in t.get("columns", [])}
+
+
+def cardinality_note(ref: FieldBinding, cardinality: Dict[str, int], min_cardinality: int) -> Optional[str]:
+    if ref.key in cardinality:
+        distinct = cardinality[ref.key]
+        return f"{ref.key} ({distinct:,} values)" if distinct >= min_cardinality else None
+    if ref.kind == "column" and LIKELY_HIGH_CARDINALITY_RE.search(ref.name):
+        return f"{ref.key} (likely high cardinality)"
+    return None
+
+
+def apply_budgets(report: ReportLoad, max_visuals: int, max_queries: int,
+                  cardinality: Dict[str, int], min_cardinality: int) -> None:
+    for page in report.pages:
+        if page.kind != "tooltip":
+            if page.visible_visuals > max_visuals:
+                page.notes.append(f"{page.visible_visuals} visible visuals (budget {max_visuals})")
+            if page.queries > max_queries:
+                page.notes.append(f"{page.queries} queries on open (budget {max_queries})")
+        for load in page.visuals:
+            visual = load.visual
+            if not load.queries or visual.top_n or visual.visual_type in SINGLE_VALUE_VISUALS:
+                continue
+            for ref in visual.group_by:
+                if ref.key in visual.filtered_columns:
+                    continue
+                note = cardinality_note(ref, cardinality, min_cardinality)
+                if note:
+                    load.notes.append(f"groups by {note} with no top-N filter")
+
+
+# =============================================================================
+# CLI
+# =============================================================================
+
+def print_report(report: ReportLoad, verbose: bool = True) -> None:
+    print(f"\n{os.path.relpath(report.path, REPO_ROOT)} ({report.layout}; "
+          f"{len(report.pages)} pages, {report.visuals} visuals)")
+    print(f"  {'Page':36s} {'Kind':12s} {'Visuals':>8s} {'Queries':>8s} {'Measures':>9s} {'Columns':>8s}")
+    for page in report.pages:
+        status = "⚠️" if page.notes else "✅"
+        print(f"{status} {page.display_name[:36]:36s} {page.kind:12s} {page.visible_visuals:>8d} "
+              f"{page.queries:>8d} {page.measures:>9d} {page.columns:>8d}")
+    if not verbose:
+        return
+    for page in report.pages:
+        for note in page.notes:
+            print(f"  ⚠️ {page.display_name}: {note}")
+        for load in page.visuals:
+            v = load.visual
+            for note in load.notes:
+                print(f"  ⚠️ {page.display_name} / {v.visual_type} {v.name} at ({v.x:.0f}, {v.y:.0f}): {note}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Estimate DAX queries per report page from report.json")
+    parser.add_argument("reports", nargs="*",
+                        help="report.json files, .Report or pbir folders (default: every report in the repo)")
+    parser.add_argument("--max-visuals", type=int, default=DEFAULT_MAX_VISUALS, help="Visible visuals per page")
+    parser.add_argument("--max-queries", type=int, default=DEFAULT_MAX_QUERIES, help="Queries per page open")
+    parser.add_argument("--cardinality", help="Column cardinalities (model_size_estimator --json output)")
+    parser.add_argument("--min-cardinality", type=int, default=DEFAULT_MIN_CARDINALITY,
+                        help="Distinct values that make a column high-cardinality")
+    parser.add_argument("--no-cache", action="store_true", help="Don't use the report index cache")
+    parser.add_argument("--summary", action="store_true", help="Only print the page tables")
+    parser.add_argument("--json", action="store_true", help="Output JSON")
+    args = parser.parse_args()
+
+    cardinality = load_cardinality(args.cardinality) if args.cardinality else {}
+    reports = []
+    for path in args.reports or find_reports():
+        try:
+            report = analyze_report(path, None if args.no_cache else CACHE_DIR)
+        except (OSError, ValueError) as e:
+            print(f"❌ {path}: {e}")
+            return 1
+        apply_budgets(report, args.max_visuals, args.max_queries, cardinality, args.min_cardinality)
+        reports.append(report)
+
+    if args.json:
+        out = []
+        for report in reports:
+            d = asdict(report)
+            for page, pd_ in zip(report.pages, d["pages"]):
+                pd_.update(visible_visuals=page.visible_visuals, queries=page.queries,
+                           measures=page.measures, columns=page.columns)
+            out.append(d)
+        print(json.dumps(out, indent=2))
+        return 0
+
+    for report in reports:
+        print_report(report, verbose=not args.summary)
+
+    pages = [p for r in reports for p in r.pages]
+    opened = [p for p in pages if p.kind != "tooltip"]
+    print(f"\n{'='*70}")
+    print(f"{len(pages)} pages, {sum(r.visuals for r in reports)} visuals, "
+          f"{sum(p.queries for p in opened)} queries across all page opens")
+    print(f"{sum(1 for p in pages if p.notes)} page(s) over budget, "
+          f"{sum(1 for p in pages for v in p.visuals if v.notes)} visual(s) with unbounded high-cardinality columns")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,847 @@
+#!/usr/bin/env python3
+"""
+RLS Filter Cost Analyzer
+security/rls_configuration.dax (+ model roles) -> rows per role -> Security_UserScope bridge
+
+The zone and region roles filter Dim_Territory with
+`LOOKUPVALUE('Dim_User'[ZoneID], 'Dim_User'[EmployeeEmail], USERPRINCIPALNAME())`
+or a FILTER over a user mapping table; that lookup is evaluated for every
+query. A precomputed bridge of email -> allowed keys, filtered with a plain
+equality and propagated through a relationship, is much cheaper. This:
+
+1. Parses the role filters: `// Role:` / `ROLE:` names, `Apply to: <table>`
+   targets and the DAX below them in the .dax file, plus tablePermissions
+   of roles already in the model. Each filter is classified as static, a
+   user-mapping lookup (LOOKUPVALUE, IN VALUES(FILTER(...)), CONTAINS) or
+   unsupported, and its tables and columns are checked against the model
+2. Estimates against the local data replica (as in dax_offline_harness.py)
+   the rows each filter leaves visible, per user for dynamic filters
+   (min/median/max), for the filtered table and every table the filter
+   reaches through chains of active many-to-one relationships; a related
+   table missing from the replica is skipped with a warning
+3. Plans a narrow Security_UserScope table (EmployeeEmail, Role, one key
+   column per secured table) as a calculated table over the same mapping
+   (referenced from model.tmdl; emails a LOOKUPVALUE filter would error on
+   for having several keys get no rows, so they still see nothing), a
+   bi-directional security relationship to each secured table, and the
+   roles rewritten to `[EmployeeEmail] = USERPRINCIPALNAME() && [Role] = ...`
+   on the bridge; static filters are carried over with resolved table names
+
+Without --write the planned TMDL changes are printed as a unified diff.
+With --data, the bridge rows computed from the replica are also written to
+`--bridge-out` as Parquet.
+
+Usage:
+    python scripts/rls_analyzer.py
+    python scripts/rls_analyzer.py --data /lakehouse/default/Tables --bridge-out security/
+    python scripts/rls_analyzer.py --role Zone_RLS --role Region_RLS --write
+"""
+
+import argparse
+import difflib
+import json
+import os
+import re
+import statistics
+import sys
+import textwrap
+import uuid
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from dax_offline_harness import (SQL_OPERATORS, Binary, Call, ColumnRef, Literal, Parser, Relationship, Replica,
+                                 ReplicaError, Unary, UnsupportedDax, model_relationships, open_replica, quote)
+from model_size_estimator import DEFAULT_DATASET, DEFAULT_PREFIX
+from report_document import REPO_ROOT
+from tmdl_model import DEFINITION_PATH, TmdlModel, load_model, quote_name, unquote_name
+
+
+RLS_PATH = os.path.join(REPO_ROOT, "security", "rls_configuration.dax")
+BRIDGE_TABLE = "Security_UserScope"
+EMAIL_COLUMN = "EmployeeEmail"
+ROLE_COLUMN = "Role"
+USER_FUNCTIONS = ("USERPRINCIPALNAME", "USERNAME", "USEROBJECTID", "CUSTOMDATA")
+
+
+# =============================================================================
+# Role filters
+# =============================================================================
+
+@dataclass
+class UserScope:
+    """`[column]` restricted to `mapping[key]` where `mapping[email]` = USERPRINCIPALNAME()"""
+    column: str
+    mapping_table: str
+    key: str
+    email: str
+    single: bool                   # LOOKUPVALUE: one value per user or an error
+
+
+@dataclass
+class RlsFilter:
+    role: str
+    table: str                     # as written
+    expression: str
+    source: str                    # file:line
+    model_table: Optional[str] = None
+    kind: str = "static"           # static / dynamic / bridged / unsupported
+    scope: Optional[UserScope] = None
+    problems: List[str] = field(default_factory=list)
+    notes: List[str] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.problems
+
+
+@dataclass
+class RlsRole:
+    name: str
+    filters: List[RlsFilter] = field(default_factory=list)
+    source: str = ""
+
+
+_ROLE_COMMENT_RE = re.compile(r"^\s*//\s*Role:\s*(.+?)\s*$", re.I)
+_ROLE_BLOCK_RE = re.compile(r"^\s*ROLE:\s*(.+?)\s*$")
+_APPLY_RE = re.compile(r"Apply to:\s*('(?:[^']|'')*'|[\w ]+?)\s+table\b", re.I)
+_CALCULATED_COLUMN_RE = re.compile(r"^\s*[\w ]+=\s*$")
+
+
+def parse_rls_file(path: str) -> List[RlsRole]:
+    """Roles and their filters as laid out in the .dax file (comments carry names and targets)"""
+    with open(path, "r", encoding="utf-8-sig") as f:
+        lines = f.read().split("\n")
+    rel = os.path.relpath(path, REPO_ROOT)
+    roles: Dict[str, RlsRole] = {}
+    role: Optional[str] = None
+    table: Optional[str] = None
+    in_block = False
+    body: List[str] = []
+    start = 0
+
+    def flush():
+        nonlocal body, table
+        text = "\n".join(body).strip()
+        body = []
+        if not text:
+            return
+        if _CALCULATED_COLUMN_RE.match(text.split("\n")[0]):
+            # A calculated column definition (e.g. HasAccess =), not a role filter
+            return
+        if role is None:
+            return
+        roles[role].filters.append(RlsFilter(role, table or "", text, f"{rel}:{start}"))
+        table = None
+
+    for number, line in enumerate(lines, 1):
+        stripped = line.strip()
+        if in_block:
+            m = _ROLE_BLOCK_RE.match(stripped)
+            if m:
+                role = m.group(1).split("(")[0].strip()
+                roles.setdefault(role, RlsRole(role, source=f"{rel}:{number}"))
+            if "*/" in stripped:
+                in_block = False
+            continue
+        if stripped.startswith("/*"):
+            flush()
+            in_block = "*/" not in stripped
+            continue
+        if stripped.startswith("//"):
+            flush()
+            m = _ROLE_COMMENT_RE.match(stripped)
+            if m:
+                # `// Role: Zone_RLS` names the role the preceding ROLE: block described
+                previous = roles.get(role) if role else None
+                role = m.group(1)
+                if previous is not None and not previous.filters and previous.name != role:
+                    del roles[previous.name]
+                roles.setdefault(role, RlsRole(role, source=f"{rel}:{number}"))
+            m = _APPLY_RE.search(stripped)
+            if m:
+                table = unquote_name(m.group(1).strip())
+            continue
+        if not stripped:
+            flush()
+            continue
+        if not body:
+            start = number
+        body.append(line)
+    flush()
+    return list(roles.values())
+
+
+def model_roles(model: TmdlModel) -> List[RlsRole]:
+    roles = []
+    for role in model.roles.values():
+        rel = os.path.relpath(role.path, REPO_ROOT)
+        filters = [RlsFilter(role.name, tp.name, tp.expression or "", f"{rel}:{tp.line}")
+                   for tp in role.children_of("tablePermission")]
+        roles.append(RlsRole(role.name, filters, f"{rel}:{role.line}"))
+    return roles
+
+
+# =============================================================================
+# Classification and model checks
+# =============================================================================
+
+_NAME = r"('(?:[^']|'')*'|[A-Za-z_]\w*)"
+_COL = r"\[([^\]]+)\]"
+_UPN = r"USERPRINCIPALNAME\(\s*\)"
+_LOOKUP_RE = re.compile(rf"^{_COL}\s*=\s*LOOKUPVALUE\(\s*{_NAME}{_COL}\s*,\s*{_NAME}{_COL}\s*,\s*{_UPN}\s*\)$", re.I)
+_IN_VALUES_RE = re.compile(
+    rf"^{_COL}\s+IN\s+VALUES\(\s*FILTER\(\s*{_NAME}\s*,\s*{_NAME}{_COL}\s*=\s*{_UPN}\s*\)\s*{_COL}\s*\)$", re.I)
+_CONTAINS_RE = re.compile(
+    rf"^CONTAINS\(\s*FILTER\(\s*{_NAME}\s*,\s*{_NAME}{_COL}\s*=\s*{_UPN}\s*\)\s*,\s*{_NAME}{_COL}\s*,\s*{_COL}\s*\)$", re.I)
+
+
+def _collapse(expression: str) -> str:
+    text = re.sub(r"//[^\n]*|--[^\n]*|/\*.*?\*/", " ", expression, flags=re.S)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def classify(f: RlsFilter) -> None:
+    text = _collapse(f.expression)
+    if unquote_name(f.table) == BRIDGE_TABLE:
+        f.kind = "bridged"
+        return
+    m = _LOOKUP_RE.match(text)
+    if m:
+        col, t1, key, _, email = m.groups()
+        f.kind, f.scope = "dynamic", UserScope(col, unquote_name(t1), key, email, True)
+        return
+    m = _IN_VALUES_RE.match(text)
+    if m:
+        col, t1, _, email, key = m.groups()
+        f.kind, f.scope = "dynamic", UserScope(col, unquote_name(t1), key, email, False)
+        return
+    m = _CONTAINS_RE.match(text)
+    if m:
+        t1, _, email, _, key, col = m.groups()
+        f.kind, f.scope = "dynamic", UserScope(col, unquote_name(t1), key, email, False)
+        return
+    if any(re.search(rf"\b{fn}\s*\(", text, re.I) for fn in USER_FUNCTIONS):
+        f.kind = "unsupported"
+        f.problems.append("user-dependent filter in a pattern the bridge can't replace")
+        return
+    try:
+        Parser(text).expression()
+    except UnsupportedDax as e:
+        f.kind = "unsupported"
+        f.problems.append(f"can't parse filter: {e}")
+
+
+def resolve_table(model: TmdlModel, name: str) -> Tuple[Optional[str], str]:
+    """Model table for a name as written, with a note when it was matched loosely"""
+    if name in model.tables:
+        return name, ""
+    folded = {t.casefold(): t for t in model.tables}
+    if name.casefold() in folded:
+        return folded[name.casefold()], ""
+    prefixed = sorted(t for t in model.tables if t.casefold().startswith(name.casefold() + "_"))
+    match = prefixed or difflib.get_close_matches(name, sorted(model.tables), n=1, cutoff=0.8)
+    if match:
+        return match[0], f"{name} is not in the model; using {match[0]}"
+    return None, ""
+
+
+def _model_column(model: TmdlModel, table: str, column: str) -> Optional[str]:
+    columns = {c.name.casefold(): c.name for c in model.tables[table].columns}
+    return columns.get(column.casefold())
+
+
+def _bare_columns(e: Any) -> List[str]:
+    if isinstance(e, ColumnRef):
+        return [e.column] if e.table is None else []
+    if isinstance(e, Binary):
+        return _bare_columns(e.left) + _bare_columns(e.right)
+    if isinstance(e, Unary):
+        return _bare_columns(e.operand)
+    if isinstance(e, Call):
+        return [c for a in e.args for c in _bare_columns(a)]
+    return []
+
+
+def check_filter(f: RlsFilter, model: TmdlModel) -> None:
+    classify(f)
+    if not f.table:
+        f.problems.append("no `Apply to:` table")
+        return
+    f.model_table, note = resolve_table(model, f.table)
+    if note:
+        f.notes.append(note)
+    if f.model_table is None:
+        f.problems.append(f"table {f.table} not in model")
+        return
+
+    def need(table: str, column: str) -> None:
+        if _model_column(model, table, column) is None:
+            hint = difflib.get_close_matches(column, [c.name for c in model.tables[table].columns], n=1, cutoff=0.6)
+            f.problems.append(f"column {table}[{column}] not in model" + (f" (did you mean [{hint[0]}]?)" if hint else ""))
+
+    if f.scope:
+        need(f.model_table, f.scope.column)
+        mapping, note = resolve_table(model, f.scope.mapping_table)
+        if mapping is None:
+            f.problems.append(f"mapping table {f.scope.mapping_table} not in model")
+        else:
+            if note:
+                f.notes.append(note)
+            f.scope.mapping_table = mapping
+            need(mapping, f.scope.key)
+            need(mapping, f.scope.email)
+    elif f.kind == "static":
+        for column in dict.fromkeys(_bare_columns(Parser(_collapse(f.expression)).expression())):
+            need(f.model_table, column)
+
+
+def load_roles(rls_path: Optional[str], model: TmdlModel, names: List[str]) -> List[RlsRole]:
+    roles = (parse_rls_file(rls_path) if rls_path else []) + model_roles(model)
+    if names:
+        wanted = {n.casefold() for n in names}
+        roles = [r for r in roles if r.name.casefold() in wanted]
+    for role in roles:
+        for f in role.filters:
+            check_filter(f, model)
+    return roles
+
+
+# =============================================================================
+# Bridge keys and relationships
+# =============================================================================
+
+def bridge_key(table: str, column: str, relationships: List[Relationship]) -> str:
+    """Column the bridge relates to: the one-side column facts join on, else the filtered column"""
+    ones = [r for r in relationships if r.to_table == table]
+    preferred = [r for r in ones if r.active] or ones
+    return preferred[0].to_column if preferred else column
+
+
+def facts_of(table: str, relationships: List[Relationship]) -> Tuple[List[Relationship], List[Relationship]]:
+    """Relationships into `table` from its many side: (active, inactive)"""
+    into = [r for r in relationships if r.to_table == table and r.from_table != BRIDGE_TABLE]
+    return [r for r in into if r.active], [r for r in into if not r.active]
+
+
+def filtered_tables(table: str, relationships: List[Relationship]) -> List[Tuple[str, List[Relationship]]]:
+    """
+    Tables a filter on `table` reaches through chains of active many-to-one
+    relationships, nearest first, each with its path from `table` outward
+    """
+    reached = {table}
+    out: List[Tuple[str, List[Relationship]]] = []
+    frontier: List[Tuple[str, List[Relationship]]] = [(table, [])]
+    while frontier:
+        next_frontier = []
+        for one_side, path in frontier:
+            for r in facts_of(one_side, relationships)[0]:
+                if r.from_table not in reached:
+                    reached.add(r.from_table)
+                    next_frontier.append((r.from_table, path + [r]))
+        out.extend(next_frontier)
+        frontier = next_frontier
+    return out
+
+
+# =============================================================================
+# Estimates from the replica
+# =============================================================================
+
+@dataclass
+class RowEstimate:
+    table: str
+    total: int
+    visible_min: int
+    visible_median: float
+    visible_max: int
+    via: List[str] = field(default_factory=list)   # tables between this one and the secured table
+
+    @property
+    def filtered_pct(self) -> float:
+        return 100.0 * (1 - self.visible_median / self.total) if self.total else 0.0
+
+
+@dataclass
+class FilterEstimate:
+    role: str
+    table: str
+    kind: str
+    users: int = 0
+    unscoped_users: int = 0        # LOOKUPVALUE users with several values (query error in DAX)
+    rows: List[RowEstimate] = field(default_factory=list)
+    bridge_rows: int = 0
+    skipped: List[str] = field(default_factory=list)   # related tables missing from the replica
+    error: Optional[str] = None
+
+
+def predicate_sql(e: Any, replica: Replica, table: str, alias: str = "t") -> str:
+    """SQL for a static RLS predicate; bare [Column] is a column of the secured table"""
+    if isinstance(e, Literal):
+        return e.sql
+    if isinstance(e, ColumnRef):
+        if e.table not in (None, table):
+            raise UnsupportedDax(f"{e.table}[{e.column}] from another table")
+        return f"{alias}.{quote(replica.column(table, e.column))}"
+    if isinstance(e, Unary):
+        inner = predicate_sql(e.operand, replica, table, alias)
+        return f"(NOT {inner})" if e.op == "NOT" else f"({e.op}{inner})"
+    if isinstance(e, Binary):
+        left = predicate_sql(e.left, replica, table, alias)
+        if e.op == "IN":
+            if not (isinstance(e.right, Call) and e.right.name == "{}" and e.right.args):
+                raise UnsupportedDax("IN is only supported with a {...} list")
+            return f"({left} IN ({', '.join(predicate_sql(v, replica, table, alias) for v in e.right.args)}))"
+        op = SQL_OPERATORS.get(e.op, e.op)
+        return f"({left} {op} {predicate_sql(e.right, replica, table, alias)})"
+    if isinstance(e, Call):
+        args = [predicate_sql(a, replica, table, alias) for a in e.args]
+        if e.name in ("TRUE", "FALSE") and not args:
+            return "(1 = 1)" if e.name == "TRUE" else "(1 = 0)"
+        if e.name == "BLANK" and not args:
+            return "NULL"
+        if e.name == "NOT" and len(args) == 1:
+            return f"(NOT {args[0]})"
+        if e.name == "ISBLANK" and len(args) == 1:
+            return f"({args[0]} IS NULL)"
+        if e.name == "CONTAINSSTRING" and len(args) == 2:
+            return f"(instr(lower({args[0]}), lower({args[1]})) > 0)"
+    raise UnsupportedDax(f"{getattr(e, 'name', type(e).__name__)} in an RLS filter")
+
+
+class Estimator:
+    def __init__(self, replica: Replica, relationships: List[Relationship]):
+        self.replica = replica
+        self.relationships = relationships  # inactive ones too: they pick bridge keys, not fact joins
+        self.con = None
+        # (role, table) -> tables reached from the secured table, and the ones the replica lacks
+        self.paths: Dict[Tuple[str, str], List[Tuple[str, List[Relationship]]]] = {}
+        self.skipped: Dict[Tuple[str, str], List[str]] = {}
+
+    def _add(self, used: Dict[str, Set[str]], table: str, column: str) -> None:
+        used.setdefault(self.replica.table(table).sql_name, set()).add(self.replica.column(table, column))
+
+    def _columns(self, f: RlsFilter) -> Dict[str, Set[str]]:
+        """Replica columns a filter's estimate reads, by replica table"""
+        used: Dict[str, Set[str]] = {}
+        t = f.model_table
+        if f.scope:
+            self._add(used, t, f.scope.column)
+            self._add(used, f.scope.mapping_table, f.scope.key)
+            self._add(used, f.scope.mapping_table, f.scope.email)
+        else:
+            for column in _bare_columns(Parser(_collapse(f.expression)).expression()):
+                self._add(used, t, column)
+        key = bridge_key(t, f.scope.column if f.scope else "", self.relationships)
+        if key:
+            self._add(used, t, key)
+
+        # A related table missing from the replica only drops that table (and what lies beyond it)
+        paths, skipped = [], []
+        for table, path in filtered_tables(t, self.relationships):
+            hop: Dict[str, Set[str]] = {}
+            try:
+                for r in path:
+                    self._add(hop, r.from_table, r.from_column)
+                    self._add(hop, r.to_table, r.to_column)
+            except ReplicaError as e:
+                skipped.append(f"{table}: {e}")
+                continue
+            for name, columns in hop.items():
+                used.setdefault(name, set()).update(columns)
+            paths.append((table, path))
+        self.paths[(f.role, f.table)] = paths
+        self.skipped[(f.role, f.table)] = skipped
+        return used
+
+    def prepare(self, filters: List[RlsFilter]) -> Dict[Tuple[str, str], str]:
+        """Load what the filters need; returns (role, table) -> error for the ones that can't be estimated"""
+        used: Dict[str, Set[str]] = {}
+        errors = {}
+        for f in filters:
+            try:
+                for table, columns in self._columns(f).items():
+                    used.setdefault(table, set()).update(columns)
+            except (ReplicaError, UnsupportedDax) as e:
+                errors[(f.role, f.table)] = str(e)
+        self.replica.prepare(used)
+        self.con = self.replica.connect()
+        return errors
+
+    def _scalar(self, sql: str) -> int:
+        return self.con.execute(sql).fetchall()[0][0] or 0
+
+    def _table(self, name: str) -> str:
+        return quote(self.replica.table(name).sql_name)
+
+    def _col(self, table: str, column: str, alias: str) -> str:
+        return f"{alias}.{quote(self.replica.column(table, column))}"
+
+    def _scope_join(self, f: RlsFilter) -> Tuple[str, str]:
+        """
+        FROM clause of (email, row of the secured table) pairs, and the email
+        expression; a LOOKUPVALUE errors for an email with several keys, so
+        those emails get no rows
+        """
+        s = f.scope
+        email, key = self._col(s.mapping_table, s.email, 'm'), self._col(s.mapping_table, s.key, 'm')
+        ambiguous = ""
+        if s.single:
+            ambiguous = (f" AND {email} NOT IN (SELECT {email} FROM {self._table(s.mapping_table)} AS m "
+                         f"WHERE {email} IS NOT NULL GROUP BY 1 HAVING COUNT(DISTINCT {key}) > 1)")
+        mapping = (f"(SELECT DISTINCT {email} AS e, {key} AS k FROM {self._table(s.mapping_table)} AS m "
+                   f"WHERE {email} IS NOT NULL{ambiguous})")
+        return (f"{mapping} AS m JOIN {self._table(f.model_table)} AS t "
+                f"ON {self._col(f.model_table, s.column, 't')} = m.k"), "m.e"
+
+    def _joins(self, path: List[Relationship]) -> str:
+        """JOINs from the secured table (alias t) out along path; the last table is aliased j<len - 1>"""
+        joins, previous = [], "t"
+        for i, r in enumerate(path):
+            alias = f"j{i}"
+            joins.append(f"JOIN {self._table(r.from_table)} AS {alias} "
+                         f"ON {self._col(r.from_table, r.from_column, alias)} = "
+                         f"{self._col(r.to_table, r.to_column, previous)}")
+            previous = alias
+        return " ".join(joins)
+
+    def _per_user(self, f: RlsFilter, join: str, users: List[str]) -> Tuple[int, float, int]:
+        from_clause, email = self._scope_join(f)
+        counts = dict(self.con.execute(f"SELECT {email}, COUNT(*) FROM {from_clause} {join} GROUP BY {email}").fetchall())
+        values = [counts.get(u, 0) for u in users] or [0]
+        return min(values), statistics.median(values), max(values)
+
+    def estimate(self, f: RlsFilter) -> FilterEstimate:
+        t = f.model_table
+        est = FilterEstimate(f.role, t, f.kind, skipped=self.skipped.get((f.role, f.table), []))
+        reached = self.paths.get((f.role, f.table), [])
+        if f.scope:
+            s = f.scope
+            users = [u for (u,) in self.con.execute(
+                f"SELECT DISTINCT {self._col(s.mapping_table, s.email, 'm')} FROM {self._table(s.mapping_table)} AS m "
+                f"WHERE {self._col(s.mapping_table, s.email, 'm')} IS NOT NULL").fetchall()]
+            est.users = len(users)
+            if s.single:
+                est.unscoped_users = self._scalar(
+                    f"SELECT COUNT(*) FROM (SELECT {self._col(s.mapping_table, s.email, 'm')} FROM "
+                    f"{self._table(s.mapping_table)} AS m GROUP BY 1 "
+                    f"HAVING COUNT(DISTINCT {self._col(s.mapping_table, s.key, 'm')}) > 1) AS x")
+            total = self._scalar(f"SELECT COUNT(*) FROM {self._table(t)}")
+            est.rows.append(RowEstimate(t, total, *self._per_user(f, "", users)))
+            for table, path in reached:
+                total = self._scalar(f"SELECT COUNT(*) FROM {self._table(table)}")
+                est.rows.append(RowEstimate(table, total, *self._per_user(f, self._joins(path), users),
+                                            via=[r.to_table for r in path[1:]]))
+            key = bridge_key(t, s.column, self.relationships)
+            from_clause, email = self._scope_join(f)
+            est.bridge_rows = self._scalar(
+                f"SELECT COUNT(*) FROM (SELECT DISTINCT {email}, {self._col(t, key, 't')} FROM {from_clause}) AS b")
+            return est
+
+        where = predicate_sql(Parser(_collapse(f.expression)).expression(), self.replica, t)
+        total = self._scalar(f"SELECT COUNT(*) FROM {self._table(t)}")
+        visible = self._scalar(f"SELECT COUNT(*) FROM {self._table(t)} AS t WHERE {where}")
+        est.rows.append(RowEstimate(t, total, visible, visible, visible))
+        for table, path in reached:
+            total = self._scalar(f"SELECT COUNT(*) FROM {self._table(table)}")
+            visible = self._scalar(f"SELECT COUNT(*) FROM {self._table(t)} AS t {self._joins(path)} WHERE {where}")
+            est.rows.append(RowEstimate(table, total, visible, visible, visible, via=[r.to_table for r in path[1:]]))
+        return est
+
+    def bridge_rows(self, filters: List[RlsFilter], key_columns: Dict[str, str]) -> List[Dict[str, Any]]:
+        rows = []
+        for f in filters:
+            t = f.model_table
+            from_clause, email = self._scope_join(f)
+            key = bridge_key(t, f.scope.column, self.relationships)
+            for e, k in self.con.execute(
+                    f"SELECT DISTINCT {email}, {self._col(t, key, 't')} FROM {from_clause}").fetchall():
+                row = {EMAIL_COLUMN: e, ROLE_COLUMN: f.role, **{c: None for c in key_columns.values()}}
+                row[key_columns[t]] = k
+                rows.append(row)
+        return rows
+
+    def close(self) -> None:
+        if self.con is not None:
+            self.con.close()
+        self.replica.close()
+
+
+# =============================================================================
+# TMDL generation
+# =============================================================================
+
+def key_columns(filters: List[RlsFilter], relationships: List[Relationship]) -> Dict[str, str]:
+    """Secured table -> bridge column holding its allowed keys"""
+    keys = {}
+    for f in filters:
+        keys.setdefault(f.model_table, bridge_key(f.model_table, f.scope.column, relationships))
+    names = list(keys.values())
+    return {t: (k if names.count(k) == 1 else f"{t}_{k}") for t, k in keys.items()}
+
+
+def _dax_name(table: str, column: str) -> str:
+    return f"{quote_name(table)}[{column}]"
+
+
+def bridge_expression(filters: List[RlsFilter], columns: Dict[str, str], relationships: List[Relationship]) -> str:
+    parts = []
+    for f in filters:
+        s, t = f.scope, f.model_table
+        key = bridge_key(t, s.column, relationships)
+        outputs = [f'"{EMAIL_COLUMN}", [__Email]', f'"{ROLE_COLUMN}", "{f.role}"']
+        outputs += [f'"{c}", {"[__Row]" if table == t else "BLANK()"}' for table, c in columns.items()]
+        mapping = f"NOT ISBLANK({_dax_name(s.mapping_table, s.email)})"
+        if s.single:
+            # LOOKUPVALUE errors for an email with several keys, so that user sees nothing; keep it that way
+            mapping += (f" && CALCULATE(DISTINCTCOUNT({_dax_name(s.mapping_table, s.key)}), "
+                        f"ALLEXCEPT({quote_name(s.mapping_table)}, {_dax_name(s.mapping_table, s.email)})) = 1")
+        parts.append("\n".join([
+            "SELECTCOLUMNS(",
+            "    GENERATE(",
+            "        SELECTCOLUMNS(",
+            f"            FILTER(ALLNOBLANKROW({quote_name(s.mapping_table)}), {mapping}),",
+            f'            "__Email", {_dax_name(s.mapping_table, s.email)},',
+            f'            "__Key", {_dax_name(s.mapping_table, s.key)}',
+            "        ),",
+            "        SELECTCOLUMNS(",
+            f"            FILTER(ALLNOBLANKROW({quote_name(t)}), {_dax_name(t, s.column)} = [__Key]),",
+            f'            "__Row", {_dax_name(t, key)}',
+            "        )",
+            "    ),",
+            ",\n".join("    " + o for o in outputs),
+            ")"]))
+    if len(parts) == 1:
+        return "DISTINCT(\n" + textwrap.indent(parts[0], "    ") + "\n)"
+    body = textwrap.indent(",\n".join(parts), "        ")
+    return f"DISTINCT(\n    UNION(\n{body}\n    )\n)"
+
+
+def render_bridge_table(filters: List[RlsFilter], columns: Dict[str, str], relationships: List[Relationship]) -> str:
+    lines = [f"table {BRIDGE_TABLE}", "\tisHidden", f"\tlineageTag: {uuid.uuid4()}", ""]
+    for name in [EMAIL_COLUMN, ROLE_COLUMN, *columns.values()]:
+        lines += [f"\tcolumn {quote_name(name)}", "\t\tisHidden", f"\t\tlineageTag: {uuid.uuid4()}",
+                  "\t\tsummarizeBy: none", "\t\tisNameInferred", f"\t\tsourceColumn: [{name}]", "",
+                  "\t\tannotation SummarizationSetBy = Automatic", ""]
+    lines += [f"\tpartition {BRIDGE_TABLE} = calculated", "\t\tmode: import", "\t\tsource = ```"]
+    lines += ["\t\t\t\t" + l for l in bridge_expression(filters, columns, relationships).split("\n")]
+    lines += ["\t\t\t\t```", "", "\tannotation PBI_Id = " + uuid.uuid4().hex, ""]
+    return "\n".join(lines)
+
+
+def render_relationships(columns: Dict[str, str], relationships: List[Relationship]) -> str:
+    lines = []
+    for table, column in columns.items():
+        key = bridge_key(table, column, relationships)
+        lines += [f"relationship {uuid.uuid4()}", "\tcrossFilteringBehavior: bothDirections",
+                  "\tsecurityFilteringBehavior: bothDirections",
+                  f"\tfromColumn: {BRIDGE_TABLE}.{quote_name(column)}",
+                  f"\ttoColumn: {quote_name(table)}.{quote_name(key)}", ""]
+    return "\n".join(lines)
+
+
+def rewritten_filters(role: RlsRole) -> List[Tuple[str, str]]:
+    """(table, filter) pairs of a role on top of the bridge"""
+    out, bridged = [], False
+    for f in role.filters:
+        if not f.ok:
+            continue
+        if f.scope:
+            if not bridged:
+                out.append((BRIDGE_TABLE, f'[{EMAIL_COLUMN}] = USERPRINCIPALNAME() && [{ROLE_COLUMN}] = "{role.name}"'))
+                bridged = True
+        else:
+            out.append((f.model_table, _collapse(f.expression)))
+    return out
+
+
+def render_role(role: RlsRole) -> str:
+    lines = [f"role {quote_name(role.name)}", "\tmodelPermission: read", ""]
+    for table, expression in rewritten_filters(role):
+        lines.append(f"\ttablePermission {quote_name(table)} = {expression}")
+    return "\n".join(lines).rstrip("\n") + "\n"
+
+
+def add_table_ref(model_text: str, table: str) -> str:
+    """model.tmdl with `ref table <table>` after the existing ones"""
+    lines = model_text.rstrip("\n").split("\n")
+    refs = [i for i, line in enumerate(lines) if line.startswith("ref table ")]
+    at = refs[-1] + 1 if refs else len(lines)
+    if not refs:
+        lines.insert(at, "")
+        at += 1
+    lines.insert(at, f"ref table {quote_name(table)}")
+    return "\n".join(lines) + "\n"
+
+
+def plan_changes(roles: List[RlsRole], model: TmdlModel, relationships: List[Relationship],
+                 definition: str) -> Dict[str, Tuple[str, str]]:
+    """path -> (old text, new text) for the bridge table, its model.tmdl ref, relationships and the rewritten roles"""
+    dynamic = [f for r in roles for f in r.filters if f.ok and f.scope]
+    changes: Dict[str, Tuple[str, str]] = {}
+    if dynamic:
+        columns = key_columns(dynamic, relationships)
+        path = os.path.join(definition, "tables", f"{BRIDGE_TABLE}.tmdl")
+        old = open(path, encoding="utf-8-sig").read() if os.path.isfile(path) else ""
+        changes[path] = (old, render_bridge_table(dynamic, columns, relationships))
+        if BRIDGE_TABLE not in model.tables:
+            path = os.path.join(definition, "relationships.tmdl")
+            old = open(path, encoding="utf-8-sig").read() if os.path.isfile(path) else ""
+            changes[path] = (old, old.rstrip("\n") + "\n\n" + render_relationships(columns, relationships))
+            path = os.path.join(definition, "model.tmdl")
+            if os.path.isfile(path):
+                old = open(path, encoding="utf-8-sig").read()
+                changes[path] = (old, add_table_ref(old, BRIDGE_TABLE))
+    for role in roles:
+        if any(not f.ok for f in role.filters):
+            # Dropping a filter would widen what the role sees; leave the role to be fixed by hand
+            continue
+        path = os.path.join(definition, "roles", f"{role.name}.tmdl")
+        old = open(path, encoding="utf-8-sig").read() if os.path.isfile(path) else ""
+        changes[path] = (old, render_role(role))
+    return {path: change for path, change in changes.items() if change[0] != change[1]}
+
+
+# =============================================================================
+# CLI
+# =============================================================================
+
+def _diff(path: str, old: str, new: str) -> str:
+    rel = os.path.relpath(path, REPO_ROOT)
+    return "".join(difflib.unified_diff(old.splitlines(True), new.splitlines(True), f"a/{rel}", f"b/{rel}"))
+
+
+def print_roles(roles: List[RlsRole], relationships: List[Relationship]) -> None:
+    for role in roles:
+        status = "❌" if any(not f.ok for f in role.filters) else "✅"
+        print(f"\n{status} {role.name} ({role.source}): "
+              f"{len(role.filters) or 'no'} filter{'' if len(role.filters) == 1 else 's'}")
+        for f in role.filters:
+            what = f"{f.kind}"
+            if f.scope:
+                what += (f", {'LOOKUPVALUE' if f.scope.single else 'mapping'} "
+                         f"{f.scope.mapping_table}[{f.scope.key}] by [{f.scope.email}]")
+            print(f"  {f.model_table or f.table} ({what}): {_collapse(f.expression)[:90]}")
+            for note in f.notes:
+                print(f"    ⚠️ {note}")
+            for problem in f.problems:
+                print(f"    ❌ {problem}")
+            if f.model_table:
+                inactive = facts_of(f.model_table, relationships)[1]
+                if inactive and not facts_of(f.model_table, relationships)[0]:
+                    print(f"    ⚠️ only inactive relationships reach {f.model_table} "
+                          f"({', '.join(r.from_table for r in inactive)}); the filter doesn't propagate to them")
+
+
+def print_estimates(estimates: List[FilterEstimate]) -> None:
+    print(f"\n  {'Role':22s} {'Table':22s} {'Users':>6s} {'Rows':>10s} {'Visible min/med/max':>26s} {'Filtered':>9s}")
+    for e in estimates:
+        if e.error:
+            print(f"  {e.role[:22]:22s} {e.table[:22]:22s} ❌ {e.error}")
+            continue
+        for i, r in enumerate(e.rows):
+            users = f"{e.users:>6,d}" if e.kind == "dynamic" and i == 0 else " " * 6
+            print(f"  {(e.role if i == 0 else '')[:22]:22s} {r.table[:22]:22s} {users} {r.total:>10,d} "
+                  f"{f'{r.visible_min:,}/{r.visible_median:,.0f}/{r.visible_max:,}':>26s} {r.filtered_pct:>8.1f}%")
+        for r in e.rows:
+            if r.via:
+                print(f"    {r.table} is filtered through {' -> '.join([e.table] + r.via)}")
+        for note in e.skipped:
+            print(f"    ⚠️ Not estimated, missing from the replica: {note}")
+        if e.unscoped_users:
+            print(f"    ⚠️ {e.unscoped_users} user(s) map to several keys; LOOKUPVALUE errors for them, "
+                  f"so they see nothing and get no bridge rows either")
+        if e.kind == "dynamic":
+            print(f"    Bridge: {e.bridge_rows:,} rows replace the per-query lookup")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze RLS filters and generate a Security_UserScope bridge")
+    parser.add_argument("--rls", default=RLS_PATH, help="RLS definitions (.dax); '' to use model roles only")
+    parser.add_argument("--model", default=DEFINITION_PATH, help="Semantic model definition")
+    parser.add_argument("--role", action="append", default=[], help="Only these roles")
+    parser.add_argument("--data", help="Replica folder or .duckdb/.sqlite file for row estimates")
+    parser.add_argument("--dataset", default=DEFAULT_DATASET)
+    parser.add_argument("--prefix", default=DEFAULT_PREFIX)
+    parser.add_argument("--engine", choices=["auto", "duckdb", "sqlite"], default="auto")
+    parser.add_argument("--bridge-out", help="Folder for Security_UserScope.parquet computed from --data")
+    parser.add_argument("--write", action="store_true", help="Write the TMDL changes (default: print a diff)")
+    parser.add_argument("--json", action="store_true", help="Output JSON")
+    args = parser.parse_args()
+
+    try:
+        model = load_model(args.model)
+        relationships = model_relationships(args.model, include_inactive=True)
+        roles = load_roles(args.rls or None, model, args.role)
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}")
+        return 1
+    if not roles:
+        print("❌ No roles found")
+        return 1
+    filters = [f for r in roles for f in r.filters if f.ok and f.kind != "bridged"]
+
+    estimates: List[FilterEstimate] = []
+    bridge: List[Dict[str, Any]] = []
+    if args.data:
+        try:
+            estimator = Estimator(open_replica(args.data, args.dataset, args.prefix, args.engine), relationships)
+            errors = estimator.prepare(filters)
+            try:
+                for f in filters:
+                    error = errors.get((f.role, f.table))
+                    estimates.append(FilterEstimate(f.role, f.model_table, f.kind, error=error) if error
+                                     else estimator.estimate(f))
+                dynamic = [f for f in filters if f.scope and (f.role, f.table) not in errors]
+                if dynamic:
+                    bridge = estimator.bridge_rows(dynamic, key_columns(dynamic, relationships))
+            finally:
+                estimator.close()
+        except (ReplicaError, ImportError, OSError) as e:
+            print(f"❌ {e}")
+            return 1
+
+    changes = plan_changes(roles, model, relationships, args.model)
+
+    if args.json:
+        print(json.dumps({"roles": [asdict(r) for r in roles],
+                          "estimates": [dict(asdict(e), rows=[dict(asdict(r), filtered_pct=r.filtered_pct)
+                                                              for r in e.rows]) for e in estimates],
+                          "bridge_rows": len(bridge),
+                          "changes": sorted(os.path.relpath(p, REPO_ROOT) for p in changes)}, indent=2, default=str))
+    else:
+        print_roles(roles, relationships)
+        if estimates:
+            print_estimates(estimates)
+        elif not args.data:
+            print("\n⚠️ No --data replica; row estimates skipped")
+
+    if args.bridge_out and bridge:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        os.makedirs(args.bridge_out, exist_ok=True)
+        out = os.path.join(args.bridge_out, f"{BRIDGE_TABLE}.parquet")
+        pq.write_table(pa.Table.from_pylist(bridge), out)
+        if not args.json:
+            print(f"\n✅ {len(bridge):,} bridge rows written to {out}")
+
+    if args.json:
+        return 0
+    if not changes:
+        print("\n✅ Nothing to change: roles and bridge are up to date or need fixing by hand")
+        return 0
+    if args.write:
+        for path, (_, new) in changes.items():
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(new)
+            print(f"✅ Wrote {os.path.relpath(path, REPO_ROOT)}")
+    else:
+        print()
+        for path, (old, new) in changes.items():
+            print(_diff(path, old, new))
+        print(f"{len(changes)} file(s) planned; rerun with --write to apply")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
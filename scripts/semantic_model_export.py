@@ -0,0 +1,831 @@
+#!/usr/bin/env python3
+"""
+Semantic Model -> Lakehouse Delta Export
+BMD Sales (used by Sales_convert.Notebook)
+
+Reusable export path for semantic model tables:
+1. Reads a table through a sempy-style reader into pandas
+2. Converts it to Spark via Arrow, with an explicit schema built from the
+   model's column metadata (Spark never infers types row by row)
+3. Writes Delta in row batches through a staging table, so very large
+   tables don't need a single driver-side Arrow buffer, then swaps the
+   target in one commit
+4. Exports many tables concurrently, largest first, with retries
+5. Optionally exports append-mostly fact tables incrementally: only rows at
+   or above a stored high-watermark are read (via DAX) and MERGEd into Delta
+
+In Fabric, upload this file to the lakehouse under Files/scripts/ (see
+EXPORT_MODULE_PATH in the notebook). Locally, any pyspark SparkSession and
+a reader callable `table_name -> pandas.DataFrame` can stand in for sempy:
+
+    catalog = ColumnCatalog(columns_df)
+    export_table(spark, lambda t: frames[t], catalog, "BMD_sales", "public visits")
+"""
+
+import datetime
+import re
+import threading
+import time
+import urllib.parse
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+import pyarrow as pa
+
+from pyspark.sql.types import (
+    StructType, StructField, DataType,
+    StringType, LongType, IntegerType, DoubleType, BooleanType,
+    TimestampType, DateType, DecimalType, BinaryType
+)
+
+
+# Typical PBIX helper tables that are not worth exporting
+EXCLUDE_PATTERNS = [
+    r"^LocalDateTable_", r"^DateTableTemplate_", r"^Label_",
+    r"^LastRefresh_", r"^TranslatedReportLabels$", r"^ActionsMeasures$",
+    r"^VisualsEmptyStateMeasures$", r"^Measure$", r"^_Metrics$"
+]
+
+# Rows per Spark conversion + Delta write for large tables
+DEFAULT_BATCH_ROWS = 250_000
+
+# Post-write verification: "off", "metrics" (Delta commit numOutputRows vs
+# source rows, metadata only) or "sample" (metrics + sampled row hashes)
+VERIFY_MODES = ("off", "metrics", "sample")
+# "sample" verification reads about 1 in SAMPLE_BUCKETS of the files written
+SAMPLE_BUCKETS = 100
+
+TableReader = Callable[[str], Optional[pd.DataFrame]]
+# Runs a DAX query against the model (fabric.evaluate_dax in Fabric)
+DaxRunner = Callable[[str], Optional[pd.DataFrame]]
+
+# Delta table holding per-target high-watermarks for incremental exports
+WATERMARK_STATE_TABLE = "sm_export_watermarks"
+
+
+# =============================================================================
+# Naming helpers
+# =============================================================================
+
+def should_exclude(name: str, patterns: List[str] = EXCLUDE_PATTERNS) -> bool:
+    return any(re.search(p, name) for p in patterns)
+
+
+def safe_table_name(name: str) -> str:
+    n = re.sub(r"[^0-9a-zA-Z_]", "_", name)
+    n = re.sub(r"_+", "_", n).strip("_")
+    if re.match(r"^[0-9]", n):
+        n = f"t_{n}"
+    return n.lower()
+
+
+def clean_col_name(c: str) -> str:
+    c2 = re.sub(r"[^0-9a-zA-Z_]", "_", c)
+    c2 = re.sub(r"_+", "_", c2).strip("_")
+    return c2
+
+
+def dedupe_names(names: List[str]) -> List[str]:
+    """Suffix _2, _3, ... onto names that collide after cleaning (case-insensitively, like Spark)"""
+    seen = set()
+    result = []
+    for name in names:
+        new_name = name
+        i = 2
+        while new_name.lower() in seen:
+            new_name = f"{name}_{i}"
+            i += 1
+        seen.add(new_name.lower())
+        result.append(new_name)
+    return result
+
+
+# =============================================================================
+# Type mapping
+# =============================================================================
+
+def pbi_to_spark_type(pbi_type: Optional[str]) -> DataType:
+    """Best-effort mapping from semantic model data types -> Spark types."""
+    if not pbi_type:
+        return StringType()
+
+    t = str(pbi_type).strip().lower()
+
+    # Common Power BI / Vertipaq / SemPy labels
+    if t in ["string", "text"]:
+        return StringType()
+    if t in ["int64", "long", "bigint"]:
+        return LongType()
+    if t in ["int32", "int", "integer"]:
+        return IntegerType()
+    if t in ["double", "float"]:
+        return DoubleType()
+    if t in ["decimal", "currency", "fixed decimal number"]:
+        # If precision/scale known, update here; else keep a safe default
+        return DecimalType(38, 18)
+    if t in ["boolean", "bool", "logical"]:
+        return BooleanType()
+    if t in ["datetime", "timestamp", "date/time"]:
+        return TimestampType()
+    if t in ["date"]:
+        return DateType()
+    if t in ["binary"]:
+        return BinaryType()
+
+    # fallback
+    return StringType()
+
+
+def pandas_to_spark_type(series: pd.Series) -> DataType:
+    """Spark type for a column the model metadata doesn't describe"""
+    dtype = series.dtype
+    if pd.api.types.is_bool_dtype(dtype):
+        return BooleanType()
+    if pd.api.types.is_integer_dtype(dtype):
+        return LongType()
+    if pd.api.types.is_float_dtype(dtype):
+        return DoubleType()
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return TimestampType()
+    return StringType()
+
+
+class ColumnCatalog:
+    """
+    Column metadata from fabric.list_columns(), indexed by table.
+
+    Column names in the metadata frame differ between sempy versions, so the
+    table/column/type columns are detected once here.
+    """
+
+    def __init__(self, cols_df: pd.DataFrame):
+        self.table_col = "Table Name" if "Table Name" in cols_df.columns else ("Table" if "Table" in cols_df.columns else None)
+        self.col_col = "Column Name" if "Column Name" in cols_df.columns else ("Column" if "Column" in cols_df.columns else None)
+        self.type_col = "Data Type" if "Data Type" in cols_df.columns else ("Type" if "Type" in cols_df.columns else None)
+
+        if not (self.table_col and self.col_col):
+            raise ValueError(f"Could not find required columns in fabric.list_columns() output. Columns seen: {list(cols_df.columns)}")
+
+        self._types: Dict[str, Dict[str, Optional[str]]] = {}
+        for _, r in cols_df.iterrows():
+            table_types = self._types.setdefault(str(r[self.table_col]), {})
+            table_types[str(r[self.col_col])] = r[self.type_col] if self.type_col else None
+
+    def column_types(self, table_name: str) -> Dict[str, Optional[str]]:
+        """Raw column name -> model data type, in metadata order"""
+        return self._types.get(table_name, {})
+
+    def build_schema_for_table(self, table_name: str) -> StructType:
+        types = self.column_types(table_name)
+        if not types:
+            # As a fallback, if metadata isn't available, write a single dummy column.
+            return StructType([StructField("empty_table", StringType(), True)])
+
+        names = dedupe_names([clean_col_name(c) or "col" for c in types])
+        return StructType([
+            StructField(name, pbi_to_spark_type(pbi_type), True)
+            for name, pbi_type in zip(names, types.values())
+        ])
+
+
+# =============================================================================
+# pandas -> Spark conversion
+# =============================================================================
+
+def enable_arrow(spark) -> None:
+    """Use Arrow for pandas <-> Spark conversion, falling back silently if a type isn't supported"""
+    spark.conf.set("spark.sql.execution.arrow.pyspark.enabled", "true")
+    spark.conf.set("spark.sql.execution.arrow.pyspark.fallback.enabled", "true")
+
+
+def _coerce_series(series: pd.Series, spark_type: DataType) -> pd.Series:
+    """Make a pandas column Arrow-convertible to the declared Spark type"""
+    if isinstance(spark_type, StringType):
+        # Arrow-backed columns go to Arrow as they are (pyspark skips its null mask for them)
+        return series.astype("string")
+    if isinstance(spark_type, (TimestampType, DateType)):
+        converted = pd.to_datetime(series, errors="coerce")
+        if getattr(converted.dt, "tz", None) is not None:
+            converted = converted.dt.tz_convert("UTC").dt.tz_localize(None)
+        return converted.dt.date if isinstance(spark_type, DateType) else converted
+    if isinstance(spark_type, DecimalType):
+        # Floats go through their shortest repr (0.1 -> 0.1, not 0.1000000000000000055...), all in Arrow
+        numeric = pd.api.types.is_numeric_dtype(series.dtype) and not pd.api.types.is_bool_dtype(series.dtype)
+        values = pa.array(series if numeric else series.astype("string"), from_pandas=True).cast(pa.string())
+        # Unsafe like pyspark's own conversion: digits beyond the scale are dropped
+        decimals = values.cast(pa.decimal128(spark_type.precision, spark_type.scale), safe=False)
+        return pd.Series(decimals, dtype=pd.ArrowDtype(decimals.type), index=series.index)
+    if isinstance(spark_type, (LongType, IntegerType, DoubleType)):
+        if pd.api.types.is_object_dtype(series.dtype):
+            return pd.to_numeric(series, errors="coerce")
+    return series
+
+
+def frame_schema(
+    pdf: pd.DataFrame,
+    catalog: Optional[ColumnCatalog],
+    table_name: str
+) -> StructType:
+    """
+    Explicit Spark schema with Delta-safe column names for a frame.
+
+    Types come from the model metadata; columns it doesn't describe fall back
+    to the pandas dtype. Schema fields follow the frame's column order.
+    """
+    model_types = catalog.column_types(table_name) if catalog else {}
+    raw_names = [str(c) for c in pdf.columns]
+    clean_names = dedupe_names([clean_col_name(c) or "col" for c in raw_names])
+
+    fields = []
+    for raw, clean, (_, series) in zip(raw_names, clean_names, pdf.items()):
+        if raw in model_types:
+            spark_type = pbi_to_spark_type(model_types[raw])
+        else:
+            spark_type = pandas_to_spark_type(series)
+        fields.append(StructField(clean, spark_type, True))
+    return StructType(fields)
+
+
+def coerce_frame(pdf: pd.DataFrame, schema: StructType) -> pd.DataFrame:
+    """Copy of pdf renamed and converted to the schema from frame_schema"""
+    columns = {f.name: _coerce_series(series, f.dataType) for f, (_, series) in zip(schema.fields, pdf.items())}
+    return pd.DataFrame(columns, index=pdf.index)
+
+
+def prepare_frame(
+    pdf: pd.DataFrame,
+    catalog: Optional[ColumnCatalog],
+    table_name: str
+) -> Tuple[pd.DataFrame, StructType]:
+    """Rename columns to Delta-safe names and build the explicit Spark schema"""
+    schema = frame_schema(pdf, catalog, table_name)
+    return coerce_frame(pdf, schema), schema
+
+
+def to_spark(spark, pdf: pd.DataFrame, schema: StructType):
+    """Arrow-backed createDataFrame with an explicit schema"""
+    return spark.createDataFrame(pdf, schema=schema)
+
+
+# =============================================================================
+# Export
+# =============================================================================
+
+@dataclass
+class ExportResult:
+    table: str
+    target: str
+    rows: int
+    batches: int
+    seconds: float
+    verified: Optional[bool] = None
+    mode: str = "overwrite"
+    watermark: Optional[object] = None
+
+
+def target_table_name(dataset: str, table: str, prefix: str = "sm_") -> str:
+    return safe_table_name(f"{prefix}{dataset}_{table}")
+
+
+def write_delta(sdf, target: str, mode: str, overwrite_schema: bool) -> None:
+    writer = sdf.write.format("delta").mode(mode)
+    if mode == "overwrite" and overwrite_schema:
+        # If overwriting, keep schema aligned
+        writer = writer.option("overwriteSchema", "true")
+    writer.saveAsTable(target)
+
+
+def staging_table_name(target: str) -> str:
+    """Unique scratch table next to target, so parallel exports never share one"""
+    return f"{target}__staging_{uuid.uuid4().hex[:8]}"
+
+
+# =============================================================================
+# Verification
+# =============================================================================
+
+def delta_output_rows(spark, target: str, commits: int = 1) -> int:
+    """Rows written by the last `commits` Delta commits, from the transaction log"""
+    history = spark.sql(f"DESCRIBE HISTORY {target} LIMIT {int(commits)}").select("operationMetrics").collect()
+    return sum(int((row.operationMetrics or {}).get("numOutputRows", 0)) for row in history)
+
+
+def row_hashes(sdf) -> pd.Series:
+    """xxhash64 of every row of a frame, collected to the driver (8 bytes a row)"""
+    from pyspark.sql import functions as F
+
+    row_hash = F.xxhash64(*[F.col(f"`{c}`") for c in sdf.columns])
+    return sdf.select(row_hash.alias("h")).toPandas()["h"]
+
+
+def committed_files(spark, target: str) -> List[str]:
+    """Data files added by the target's last commit, from its Delta log entry"""
+    location = spark.sql(f"DESCRIBE DETAIL {target}").collect()[0]["location"].rstrip("/")
+    version = int(spark.sql(f"DESCRIBE HISTORY {target} LIMIT 1").collect()[0]["version"])
+    entry = spark.read.json(f"{location}/_delta_log/{version:020d}.json")
+    if "add" not in entry.columns:
+        return []
+    paths = sorted(row["path"] for row in entry.where("add IS NOT NULL").select("add.path").collect())
+    # Log paths are relative and URI-encoded; fresh files carry no deletion vectors
+    return [p if "://" in p else f"{location}/{urllib.parse.unquote(p)}" for p in paths]
+
+
+def sampled_written_hashes(spark, target: str, columns: List[str],
+                           buckets: int = SAMPLE_BUCKETS) -> Tuple[pd.Series, int, int]:
+    """
+    Row hashes from every `buckets`-th file the last commit added, with the
+    number of files read and added.
+
+    Only files of that commit are listed, so earlier rows of an appended
+    table are never read, and only the sampled files are scanned: the cost
+    is about 1/buckets of what this run wrote (at least one file).
+    """
+    files = committed_files(spark, target)
+    sample = files[::max(1, buckets)]
+    if not sample:
+        return pd.Series([], dtype="int64"), 0, len(files)
+    # Exported names are Delta-safe, so tables don't use column mapping and
+    # the Parquet columns are the table's
+    sdf = spark.read.parquet(*sample).select(*[f"`{c}`" for c in columns])
+    return row_hashes(sdf), len(sample), len(files)
+
+
+def unmatched_rows(sampled: pd.Series, source: pd.Series) -> int:
+    """Sampled rows not accounted for by the source rows (as multisets of hashes)"""
+    written, available = sampled.value_counts(), source.value_counts()
+    return int((written - available.reindex(written.index, fill_value=0)).clip(lower=0).sum())
+
+
+def verify_export(
+    spark,
+    target: str,
+    source_rows: int,
+    commits: int,
+    mode: str = "metrics",
+    source_hashes: Optional[pd.Series] = None,
+    columns: Optional[List[str]] = None,
+    buckets: int = SAMPLE_BUCKETS,
+    log: Callable[[str], None] = print
+) -> bool:
+    """
+    Check the last `commits` Delta commits against the source.
+
+    "metrics" compares the commits' numOutputRows with source_rows, from the
+    transaction log only. "sample" also reads about 1 in `buckets` of the
+    files the last commit added and checks each of their rows against the
+    source's row hashes (kept on the driver, 8 bytes a source row).
+    """
+    committed = delta_output_rows(spark, target, commits)
+    ok = committed == source_rows
+    if not ok:
+        log(f"❗ {target}: source has {source_rows:,} rows but Delta committed {committed:,}")
+    if mode == "sample" and source_hashes is not None and columns:
+        sampled, read, written = sampled_written_hashes(spark, target, columns, buckets)
+        unmatched = unmatched_rows(sampled, source_hashes)
+        if unmatched:
+            log(f"❗ {target}: {unmatched:,} of {len(sampled):,} sampled rows ({read} of {written} files) "
+                f"don't match any source row")
+            ok = False
+    return ok
+
+
+def export_table(
+    spark,
+    read_table: TableReader,
+    catalog: Optional[ColumnCatalog],
+    dataset: str,
+    table: str,
+    target_prefix: str = "sm_",
+    overwrite: bool = True,
+    batch_rows: int = DEFAULT_BATCH_ROWS,
+    verify: str = "off",
+    watermark_column: Optional[str] = None,
+    log: Callable[[str], None] = print
+) -> ExportResult:
+    """
+    Export one semantic model table to a Lakehouse Delta table.
+
+    Rows are converted and written to a staging table in batches of
+    batch_rows, so only one batch at a time is copied for the Arrow
+    conversion. The target is then replaced (or appended to) from staging in
+    a single Delta commit: readers never see a half-loaded table, and a
+    failure partway through leaves the previous version intact.
+
+    The reported row count is the number of source rows written; the target
+    is not re-read. See VERIFY_MODES for optional checks. If watermark_column
+    is given, its maximum is returned so an incremental export can resume
+    from it.
+    """
+    if verify not in VERIFY_MODES:
+        raise ValueError(f"verify must be one of {VERIFY_MODES}, got {verify!r}")
+    started = time.perf_counter()
+    mode = "overwrite" if overwrite else "append"
+    target = target_table_name(dataset, table, target_prefix)
+    hashes: List[pd.Series] = []
+    watermark = None
+
+    log(f"\nReading semantic model table: {table}")
+    pdf = read_table(table)
+
+    # Handle empty result sets explicitly (Spark can't infer schema from empty)
+    if pdf is None or pdf.shape[0] == 0:
+        log(f"⚠️ Table '{table}' returned 0 rows. Creating empty Spark DF with schema from metadata.")
+        schema = catalog.build_schema_for_table(table) if catalog else StructType([StructField("empty_table", StringType(), True)])
+        log(f"Writing Lakehouse Delta table: {target} (mode={mode})")
+        write_delta(spark.createDataFrame([], schema=schema), target, mode, overwrite)
+        rows, batches = 0, 1
+    else:
+        if watermark_column:
+            watermark = max_watermark(pdf, watermark_column)
+        schema = frame_schema(pdf, catalog, table)
+        batch_rows = max(1, batch_rows)
+        batches = (len(pdf) + batch_rows - 1) // batch_rows
+        rows = len(pdf)
+        staging = staging_table_name(target)
+        log(f"Writing Lakehouse Delta table: {target} (mode={mode}, {rows:,} rows in {batches} batch(es) "
+            f"via {staging})")
+        try:
+            for i, start in enumerate(range(0, rows, batch_rows)):
+                sdf = to_spark(spark, coerce_frame(pdf.iloc[start:start + batch_rows], schema), schema)
+                if verify == "sample":
+                    hashes.append(row_hashes(sdf))
+                write_delta(sdf, staging, "overwrite" if i == 0 else "append", True)
+            write_delta(spark.table(staging), target, mode, overwrite)
+        finally:
+            spark.sql(f"DROP TABLE IF EXISTS {staging}")
+
+    verified = None
+    if verify != "off":
+        source_hashes = pd.concat(hashes, ignore_index=True) if hashes else pd.Series([], dtype="int64")
+        verified = verify_export(spark, target, rows, 1, verify, source_hashes, schema.fieldNames(), log=log)
+    return ExportResult(table, target, rows, batches, time.perf_counter() - started, verified,
+                        mode=mode, watermark=watermark)
+
+
+# =============================================================================
+# Incremental export
+# =============================================================================
+
+@dataclass
+class IncrementalSpec:
+    """
+    How to export a table incrementally.
+
+    keys: model columns identifying a row (the MERGE condition)
+    watermark: monotonically increasing model column, e.g. an identity `id`
+        (new rows only) or `updated_at` (new and changed rows). Rows where it
+        is blank are re-read on every run.
+    full_every_days: run a full overwrite instead once the last one is this
+        old. MERGE never removes rows, so this is what drops rows deleted at
+        the source; None keeps merging indefinitely.
+    """
+    keys: List[str]
+    watermark: str
+    full_every_days: Optional[float] = None
+
+
+def max_watermark(pdf: pd.DataFrame, column: str):
+    if column not in pdf.columns:
+        raise KeyError(f"Watermark column '{column}' not in table columns")
+    value = pdf[column].dropna().max() if len(pdf) else None
+    if value is None or pd.isna(value):
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.to_pydatetime()
+    return value.item() if hasattr(value, "item") else value
+
+
+def dax_literal(value) -> str:
+    if isinstance(value, bool):
+        return "TRUE()" if value else "FALSE()"
+    if isinstance(value, datetime.datetime):
+        # Whole seconds only; the >= filter makes truncation re-read, never skip
+        return (f"DATE({value.year}, {value.month}, {value.day}) + "
+                f"TIME({value.hour}, {value.minute}, {value.second})")
+    if isinstance(value, datetime.date):
+        return f"DATE({value.year}, {value.month}, {value.day})"
+    if isinstance(value, (int, float)):
+        return repr(value)
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+def incremental_dax(table: str, column: str, watermark) -> str:
+    """
+    Rows at or above the watermark, plus rows where it is blank.
+
+    >= rather than > so rows sharing the last exported value (same updated_at
+    second) are picked up; the MERGE makes re-reading them harmless. Blank
+    rows can't be ordered against the watermark, so they are always re-read
+    rather than silently never exported again.
+    """
+    ref = "'" + table.replace("'", "''") + "'"
+    col = f"{ref}[{column}]"
+    return f"EVALUATE FILTER({ref}, {col} >= {dax_literal(watermark)} || ISBLANK({col}))"
+
+
+def last_full_export(spark, target: str) -> Optional[datetime.datetime]:
+    """Time of the target's latest overwrite (full export), from its Delta history"""
+    history = spark.sql(f"DESCRIBE HISTORY {target}").select("timestamp", "operation", "operationParameters").collect()
+    full = [row["timestamp"] for row in history
+            if row["operation"] in ("CREATE TABLE AS SELECT", "CREATE OR REPLACE TABLE AS SELECT",
+                                    "REPLACE TABLE AS SELECT")
+            or (row["operationParameters"] or {}).get("mode") == "Overwrite"]
+    return max(full) if full else None
+
+
+def strip_dax_column_names(pdf: pd.DataFrame) -> pd.DataFrame:
+    """evaluate_dax names columns 'Table'[Column]; keep just Column, like read_table"""
+    return pdf.rename(columns=lambda c: re.sub(r"^.*\[(.*)\]$", r"\1", str(c)))
+
+
+def _encode_watermark(value) -> Tuple[str, str]:
+    if isinstance(value, datetime.datetime):
+        return "datetime", value.isoformat()
+    if isinstance(value, datetime.date):
+        return "date", value.isoformat()
+    if isinstance(value, bool):
+        return "string", str(value)
+    if isinstance(value, int):
+        return "int", str(value)
+    if isinstance(value, float):
+        return "float", repr(value)
+    return "string", str(value)
+
+
+def _decode_watermark(value_type: str, value: str):
+    if value_type == "datetime":
+        return datetime.datetime.fromisoformat(value)
+    if value_type == "date":
+        return datetime.date.fromisoformat(value)
+    if value_type == "int":
+        return int(value)
+    if value_type == "float":
+        return float(value)
+    return value
+
+
+class WatermarkStore:
+    """
+    Per-target high-watermarks kept in a small Delta table.
+
+    State is loaded once; updates are serialised through a lock so parallel
+    table exports never race on the state table's Delta log.
+    """
+
+    def __init__(self, spark, table: str = WATERMARK_STATE_TABLE):
+        self.spark = spark
+        self.table = table
+        self._lock = threading.Lock()
+        self._state: Dict[str, Tuple[str, object]] = {}
+        if spark.catalog.tableExists(table):
+            for row in spark.table(table).collect():
+                self._state[row["target"]] = (row["column"], _decode_watermark(row["value_type"], row["value"]))
+
+    def get(self, target: str, column: str):
+        """Stored watermark, or None if absent or recorded for a different column"""
+        stored = self._state.get(target)
+        if stored is None or stored[0] != column:
+            return None
+        return stored[1]
+
+    def set(self, target: str, table: str, column: str, value, rows: int) -> None:
+        value_type, encoded = _encode_watermark(value)
+        schema = StructType([
+            StructField("target", StringType(), False),
+            StructField("source_table", StringType(), True),
+            StructField("column", StringType(), True),
+            StructField("value_type", StringType(), True),
+            StructField("value", StringType(), True),
+            StructField("rows", LongType(), True),
+            StructField("updated_at", TimestampType(), True),
+        ])
+        row = [(target, table, column, value_type, encoded, int(rows), datetime.datetime.utcnow())]
+        with self._lock:
+            sdf = self.spark.createDataFrame(row, schema=schema)
+            if self.spark.catalog.tableExists(self.table):
+                merge_into(self.spark, sdf, self.table, ["target"])
+            else:
+                write_delta(sdf, self.table, "overwrite", True)
+            self._state[target] = (column, value)
+
+
+def merge_into(spark, sdf, target: str, keys: List[str]) -> None:
+    """Upsert sdf into a Delta table on the given (Spark-side) key columns"""
+    view = f"_sm_merge_{uuid.uuid4().hex}"
+    condition = " AND ".join(f"t.`{k}` <=> s.`{k}`" for k in keys)
+    sdf.createOrReplaceTempView(view)
+    try:
+        spark.sql(
+            f"MERGE INTO {target} t USING {view} s ON {condition} "
+            f"WHEN MATCHED THEN UPDATE SET * WHEN NOT MATCHED THEN INSERT *"
+        )
+    finally:
+        spark.catalog.dropTempView(view)
+
+
+def export_incremental(
+    spark,
+    read_table: TableReader,
+    run_dax: DaxRunner,
+    catalog: Optional[ColumnCatalog],
+    dataset: str,
+    table: str,
+    spec: IncrementalSpec,
+    store: WatermarkStore,
+    target_prefix: str = "sm_",
+    batch_rows: int = DEFAULT_BATCH_ROWS,
+    log: Callable[[str], None] = print
+) -> ExportResult:
+    """
+    Export only rows at or above the table's stored watermark and MERGE them
+    into the existing Delta table.
+
+    The first run (no watermark, or no target table) falls back to a full
+    overwrite and records the watermark from it, as does any run once the
+    last full export is older than spec.full_every_days. The watermark only
+    advances after the MERGE commits, so a failed run is simply repeated.
+    """
+    target = target_table_name(dataset, table, target_prefix)
+    watermark = store.get(target, spec.watermark)
+
+    reason = None
+    if watermark is None or not spark.catalog.tableExists(target):
+        reason = f"No watermark for {target}"
+    elif spec.full_every_days is not None:
+        last_full = last_full_export(spark, target)
+        if last_full is None or datetime.datetime.now() - last_full >= datetime.timedelta(days=spec.full_every_days):
+            reason = f"Last full export of {target} is older than {spec.full_every_days:g} day(s); reconciling deletes"
+
+    if reason:
+        log(f"\n{reason}; running a full export")
+        result = export_table(
+            spark, read_table, catalog, dataset, table,
+            target_prefix=target_prefix, overwrite=True, batch_rows=batch_rows,
+            watermark_column=spec.watermark, log=log
+        )
+        if result.watermark is not None:
+            store.set(target, table, spec.watermark, result.watermark, result.rows)
+        return result
+
+    started = time.perf_counter()
+    log(f"\nReading changes from {table} where {spec.watermark} >= {watermark}")
+    pdf = run_dax(incremental_dax(table, spec.watermark, watermark))
+    if pdf is None or pdf.shape[0] == 0:
+        log(f"No new rows for {target}")
+        return ExportResult(table, target, 0, 0, time.perf_counter() - started,
+                            mode="merge", watermark=watermark)
+
+    pdf = strip_dax_column_names(pdf)
+    new_watermark = max_watermark(pdf, spec.watermark)
+    pdf, schema = prepare_frame(pdf, catalog, table)
+    keys = [clean_col_name(k) for k in spec.keys]
+
+    batch_rows = max(1, batch_rows)
+    batches = (len(pdf) + batch_rows - 1) // batch_rows
+    log(f"Merging into Lakehouse Delta table: {target} ({len(pdf):,} changed rows in {batches} batch(es))")
+    for start in range(0, len(pdf), batch_rows):
+        merge_into(spark, to_spark(spark, pdf.iloc[start:start + batch_rows], schema), target, keys)
+
+    store.set(target, table, spec.watermark, new_watermark, len(pdf))
+    return ExportResult(table, target, len(pdf), batches, time.perf_counter() - started,
+                        mode="merge", watermark=new_watermark)
+
+
+# =============================================================================
+# Parallel export
+# =============================================================================
+
+@dataclass
+class ExportSummary:
+    ok: List[Tuple[str, str, int]]          # (table, target, rows)
+    skipped: List[Tuple[str, str]]          # (table, error)
+    results: Dict[str, ExportResult]
+    attempts: Dict[str, int]
+    elapsed: float
+
+    @property
+    def total_rows(self) -> int:
+        return sum(r.rows for r in self.results.values())
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.total_rows / self.elapsed if self.elapsed > 0 else 0.0
+
+
+def order_by_size(tables: List[str], sizes: Optional[Dict[str, float]] = None) -> List[str]:
+    """Largest tables first, so the longest export starts immediately; unknown sizes go last"""
+    sizes = sizes or {}
+    return sorted(tables, key=lambda t: (-(sizes.get(t) or 0), t))
+
+
+def export_tables(
+    spark,
+    read_table: TableReader,
+    catalog: Optional[ColumnCatalog],
+    dataset: str,
+    tables: List[str],
+    sizes: Optional[Dict[str, float]] = None,
+    max_workers: int = 4,
+    retries: int = 2,
+    backoff: float = 5.0,
+    target_prefix: str = "sm_",
+    overwrite: bool = True,
+    batch_rows: int = DEFAULT_BATCH_ROWS,
+    verify: str = "off",
+    incremental: Optional[Dict[str, IncrementalSpec]] = None,
+    run_dax: Optional[DaxRunner] = None,
+    store: Optional[WatermarkStore] = None,
+    log: Callable[[str], None] = print
+) -> ExportSummary:
+    """
+    Export tables concurrently on a thread pool, largest first.
+
+    Spark schedules jobs submitted from several driver threads in parallel,
+    so wall time tends towards the largest table rather than the sum. Failed
+    tables are retried with exponential backoff before being reported as
+    skipped.
+
+    Tables listed in `incremental` go through export_incremental (needs
+    run_dax; verify does not apply to merges); the rest are written in full.
+    """
+    incremental = incremental or {}
+    if incremental:
+        if run_dax is None:
+            raise ValueError("run_dax is required for incremental exports")
+        store = store or WatermarkStore(spark)
+    ordered = order_by_size(tables, sizes)
+    results: Dict[str, ExportResult] = {}
+    attempts: Dict[str, int] = {}
+    skipped: List[Tuple[str, str]] = []
+    started = time.perf_counter()
+
+    def _export(table: str) -> ExportResult:
+        prefixed = lambda msg: log(f"[{table}] {msg.strip()}")
+        for attempt in range(retries + 1):
+            attempts[table] = attempt + 1
+            try:
+                if table in incremental:
+                    return export_incremental(
+                        spark, read_table, run_dax, catalog, dataset, table,
+                        incremental[table], store,
+                        target_prefix=target_prefix, batch_rows=batch_rows, log=prefixed
+                    )
+                return export_table(
+                    spark, read_table, catalog, dataset, table,
+                    target_prefix=target_prefix, overwrite=overwrite,
+                    batch_rows=batch_rows, verify=verify, log=prefixed
+                )
+            except Exception as e:
+                if attempt == retries:
+                    raise
+                delay = backoff * (2 ** attempt)
+                prefixed(f"⚠️ attempt {attempt + 1} failed ({e!r}); retrying in {delay:.0f}s")
+                time.sleep(delay)
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        futures = {pool.submit(_export, t): t for t in ordered}
+        for future in as_completed(futures):
+            table = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                log(f"❌ Skipping '{table}' due to error: {repr(e)}")
+                skipped.append((table, repr(e)))
+                continue
+            results[table] = result
+            rate = result.rows / result.seconds if result.seconds > 0 else 0.0
+            check = {True: ", verified", False: ", ❗ verification failed"}.get(result.verified, "")
+            log(f"✅ {result.target}: {result.rows:,} rows in {result.seconds:.1f}s ({rate:,.0f} rows/s{check})")
+
+    ok = [(t, results[t].target, results[t].rows) for t in ordered if t in results]
+    return ExportSummary(ok, skipped, results, attempts, time.perf_counter() - started)
+
+
+def print_summary(summary: ExportSummary, log: Callable[[str], None] = print) -> None:
+    log("\n================ SUMMARY ================")
+    log(f"✅ Exported: {len(summary.ok)}")
+    log(f"❌ Skipped:  {len(summary.skipped)}")
+    unverified = [r.table for r in summary.results.values() if r.verified is False]
+    if unverified:
+        log(f"❗ Verification failed: {', '.join(sorted(unverified))}")
+    serial = sum(r.seconds for r in summary.results.values())
+    log(f"⏱️ Wall time: {summary.elapsed:.1f}s (sum of table times {serial:.1f}s), "
+        f"{summary.total_rows:,} rows at {summary.rows_per_second:,.0f} rows/s")
+
+    if summary.results:
+        log("\nPer-table timings (slowest first):")
+        for r in sorted(summary.results.values(), key=lambda r: -r.seconds):
+            rate = r.rows / r.seconds if r.seconds > 0 else 0.0
+            retried = f", {summary.attempts[r.table]} attempts" if summary.attempts.get(r.table, 1) > 1 else ""
+            merged = f", merged (watermark {r.watermark})" if r.mode == "merge" else ""
+            log(f" - {r.table}: {r.rows:,} rows, {r.seconds:.1f}s, {rate:,.0f} rows/s{merged}{retried}")
+
+    if summary.skipped:
+        log("\nSkipped tables:")
+        for t, err in summary.skipped[:25]:
+            log(f" - {t}: {err}")
+        if len(summary.skipped) > 25:
+            log(f" ... and {len(summary.skipped) - 25} more")
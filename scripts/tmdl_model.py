@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+TMDL Semantic Model Loader
+BMD_sales.SemanticModel/definition
+
+Read-only object model over a TMDL definition folder, shared by the model
+analysis scripts (query folding, refresh planning, size estimates, ...).
+Where tmdl_formatter.py works line by line to validate and re-indent, this
+builds the object tree: tables with their columns, measures and partitions,
+shared expressions, relationships and roles, each with its properties and
+(multi-line or ```-fenced) expression text.
+
+Usage:
+    from tmdl_model import load_model
+    model = load_model()                     # repo's BMD_sales model
+    for table, partition in model.partitions(kind="m"):
+        print(table.name, partition.expression)
+
+    python scripts/tmdl_model.py [definition_dir]   # print an object summary
+"""
+
+import os
+import re
+import sys
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+DEFINITION_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..",
+    "BMD_sales.SemanticModel", "definition"
+)
+
+# Keywords that start an object (everything else at line start is a property)
+OBJECT_KEYWORDS = {
+    "database", "model", "table", "column", "measure", "partition", "hierarchy",
+    "level", "expression", "relationship", "role", "tablePermission",
+    "columnPermission", "member", "perspective", "perspectiveTable",
+    "perspectiveColumn", "perspectiveMeasure", "perspectiveHierarchy",
+    "culture", "linguisticMetadata", "translation", "annotation",
+    "extendedProperty", "changedProperty", "calculationGroup",
+    "calculationItem", "dataSource", "queryGroup", "variation",
+    "formatStringDefinition", "detailRowsDefinition", "refreshPolicy",
+    "calendar", "function",
+}
+
+_DECL_RE = re.compile(r"^(\w+)(?:\s+('(?:[^']|'')*'|[^=]*?))?\s*(?:=\s*(.*))?$")
+_PROP_RE = re.compile(r"^(\w+)\s*(:|=)\s*(.*)$")
+
+
+@dataclass
+class TmdlObject:
+    """One TMDL object: `kind name [= expression]` plus properties and children"""
+    kind: str
+    name: str
+    expression: Optional[str] = None
+    properties: Dict[str, str] = field(default_factory=dict)
+    children: List["TmdlObject"] = field(default_factory=list)
+    path: str = ""
+    line: int = 0
+    parent: Optional["TmdlObject"] = field(default=None, repr=False)
+
+    def children_of(self, kind: str) -> List["TmdlObject"]:
+        return [c for c in self.children if c.kind == kind]
+
+    def child(self, kind: str, name: str) -> Optional["TmdlObject"]:
+        return next((c for c in self.children if c.kind == kind and c.name == name), None)
+
+    def prop(self, name: str, default: Optional[str] = None) -> Optional[str]:
+        return self.properties.get(name, default)
+
+    @property
+    def columns(self) -> List["TmdlObject"]:
+        return self.children_of("column")
+
+    @property
+    def measures(self) -> List["TmdlObject"]:
+        return self.children_of("measure")
+
+    @property
+    def partitions(self) -> List["TmdlObject"]:
+        return self.children_of("partition")
+
+    @property
+    def annotations(self) -> Dict[str, str]:
+        return {a.name: a.expression or "" for a in self.children_of("annotation")}
+
+    @property
+    def is_hidden(self) -> bool:
+        return self.properties.get("isHidden", "false").lower() == "true"
+
+
+def unquote_name(name: str) -> str:
+    name = name.strip()
+    if len(name) >= 2 and name[0] == "'" and name[-1] == "'":
+        return name[1:-1].replace("''", "'")
+    return name
+
+
+def quote_name(name: str) -> str:
+    """TMDL/DAX-style quoting when the name needs it"""
+    if re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*", name):
+        return name
+    return "'" + name.replace("'", "''") + "'"
+
+
+def _indent(line: str) -> int:
+    return len(line) - len(line.lstrip("\t"))
+
+
+def _dedent(lines: List[str]) -> str:
+    body = [l.rstrip() for l in lines]
+    while body and not body[-1].strip():
+        body.pop()
+    while body and not body[0].strip():
+        body.pop(0)
+    indents = [_indent(l) for l in body if l.strip()]
+    cut = min(indents) if indents else 0
+    return "\n".join(l[cut:] if l.strip() else "" for l in body)
+
+
+def _read_expression(lines: List[str], i: int, first: str, decl_indent: int) -> Tuple[Optional[str], int]:
+    """
+    Expression text starting after `=` on line i-1; returns (text, next line).
+
+    Fenced (```) expressions run to the closing fence. Otherwise the body is
+    the rest of the declaring line plus following lines indented deeper than
+    the declaration's properties (blank lines included).
+    """
+    first = first.strip()
+    if first.startswith("```"):
+        body = [first[3:]] if first[3:].strip() else []
+        while i < len(lines) and lines[i].strip() != "```":
+            body.append(lines[i])
+            i += 1
+        return _dedent(body), i + 1
+
+    body = []
+    while i < len(lines):
+        line = lines[i]
+        if line.strip() and _indent(line) <= decl_indent + 1:
+            break
+        body.append(line)
+        i += 1
+    text = _dedent(body)
+    if first:
+        text = first + ("\n" + text if text else "")
+    return (text or None), i
+
+
+def parse_tmdl(text: str, path: str = "") -> List[TmdlObject]:
+    """Top-level objects of one TMDL document"""
+    lines = text.replace("\r\n", "\n").split("\n")
+    roots: List[TmdlObject] = []
+    stack: List[Tuple[int, TmdlObject]] = []
+    i = 0
+    while i < len(lines):
+        raw = lines[i]
+        stripped = raw.strip()
+        i += 1
+        if not stripped or stripped.startswith("///") or stripped.startswith("ref "):
+            continue
+        indent = _indent(raw)
+        while stack and stack[-1][0] >= indent:
+            stack.pop()
+        parent = stack[-1][1] if stack else None
+
+        keyword = stripped.split(None, 1)[0]
+        decl = _DECL_RE.match(stripped) if keyword in OBJECT_KEYWORDS else None
+        if decl and not re.match(r"^\w+\s*:", stripped):
+            # Some objects (refreshPolicy, formatStringDefinition) have no name
+            kind, name, rest = decl.group(1), unquote_name(decl.group(2) or ""), decl.group(3)
+            line_number = i
+            expression = None
+            if rest is not None:
+                expression, i = _read_expression(lines, i, rest, indent)
+            obj = TmdlObject(kind, name, expression, path=path, line=line_number, parent=parent)
+            (parent.children if parent else roots).append(obj)
+            stack.append((indent, obj))
+            continue
+
+        if parent is None:
+            continue
+        prop = _PROP_RE.match(stripped)
+        if prop and prop.group(2) == "=":
+            value, i = _read_expression(lines, i, prop.group(3), indent)
+            parent.properties[prop.group(1)] = value or ""
+        elif prop:
+            parent.properties[prop.group(1)] = prop.group(3).strip()
+        else:
+            # Bare boolean flags such as `isHidden`
+            parent.properties[stripped] = "true"
+    return roots
+
+
+@dataclass
+class TmdlModel:
+    path: str
+    tables: Dict[str, TmdlObject] = field(default_factory=dict)
+    expressions: Dict[str, TmdlObject] = field(default_factory=dict)
+    relationships: List[TmdlObject] = field(default_factory=list)
+    roles: Dict[str, TmdlObject] = field(default_factory=dict)
+    model: Optional[TmdlObject] = None
+    others: List[TmdlObject] = field(default_factory=list)
+
+    def partitions(self, kind: Optional[str] = None) -> Iterator[Tuple[TmdlObject, TmdlObject]]:
+        """(table, partition) pairs; kind filters on the source type (m, calculated, ...)"""
+        for table in self.tables.values():
+            for partition in table.partitions:
+                if kind is None or (partition.expression or "").strip() == kind:
+                    yield table, partition
+
+    def m_sources(self) -> Dict[str, str]:
+        """Name -> M text for shared expressions and M partitions ("table" or "table/partition")"""
+        sources = {name: e.expression or "" for name, e in self.expressions.items()}
+        for table, partition in self.partitions(kind="m"):
+            key = table.name if partition.name == table.name else f"{table.name}/{partition.name}"
+            sources[key] = partition.prop("source", "")
+        return sources
+
+    def column(self, table: str, column: str) -> Optional[TmdlObject]:
+        t = self.tables.get(table)
+        return t.child("column", column) if t else None
+
+
+def load_model(definition_dir: str = DEFINITION_PATH) -> TmdlModel:
+    """Parse every .tmdl file under a SemanticModel definition folder"""
+    model = TmdlModel(os.path.abspath(definition_dir))
+    for root, _, files in os.walk(definition_dir):
+        for name in sorted(files):
+            if not name.endswith(".tmdl"):
+                continue
+            path = os.path.join(root, name)
+            with open(path, "r", encoding="utf-8-sig") as f:
+                objects = parse_tmdl(f.read(), path)
+            owner = next((o for o in objects if o.kind == "model"), None)
+            for obj in objects:
+                if owner is not None and obj.kind in ("annotation", "extendedProperty"):
+                    # model.tmdl puts the model's annotations at the top level
+                    obj.parent = owner
+                    owner.children.append(obj)
+                    continue
+                if obj.kind == "table":
+                    model.tables[obj.name] = obj
+                elif obj.kind == "expression":
+                    model.expressions[obj.name] = obj
+                elif obj.kind == "relationship":
+                    model.relationships.append(obj)
+                elif obj.kind == "role":
+                    model.roles[obj.name] = obj
+                elif obj.kind == "model":
+                    model.model = obj
+                else:
+                    model.others.append(obj)
+    return model
+
+
+def main():
+    model = load_model(sys.argv[1] if len(sys.argv) > 1 else DEFINITION_PATH)
+    kinds: Dict[str, int] = {}
+    for _, p in model.partitions():
+        k = (p.expression or "").strip()
+        kinds[k] = kinds.get(k, 0) + 1
+    print(f"Model: {model.path}")
+    print(f"  Tables:        {len(model.tables)}")
+    print(f"  Columns:       {sum(len(t.columns) for t in model.tables.values())}")
+    print(f"  Measures:      {sum(len(t.measures) for t in model.tables.values())}")
+    print(f"  Partitions:    {', '.join(f'{v} {k}' for k, v in sorted(kinds.items()))}")
+    print(f"  Expressions:   {len(model.expressions)}")
+    print(f"  Relationships: {len(model.relationships)}")
+    print(f"  Roles:         {len(model.roles)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())